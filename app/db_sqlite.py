@@ -12,7 +12,7 @@ import json
 import sqlite3
 from datetime import datetime
 from enum import Enum, auto
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Iterable
 
 # Import the centralized character reference functions
 from app.utils.character_references import (
@@ -250,6 +250,9 @@ def create_tables(conn: sqlite3.Connection) -> None:
         metadata_json TEXT,
         story_id INTEGER NOT NULL,
         event_id INTEGER,
+        content_hash TEXT,
+        source_path TEXT,
+        perceptual_hash TEXT,
         FOREIGN KEY (story_id) REFERENCES stories (id) ON DELETE CASCADE,
         FOREIGN KEY (event_id) REFERENCES events (id) ON DELETE SET NULL
     )
@@ -336,6 +339,24 @@ def create_tables(conn: sqlite3.Connection) -> None:
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_character_last_tagged_story_id ON character_last_tagged(story_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_character_last_tagged_character_id ON character_last_tagged(character_id)')
     
+    # Indexes for loading a story's gallery and its character tags
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_images_story_id_created_at ON images(story_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_image_character_tags_image_id ON image_character_tags(image_id)')
+    create_scene_membership_indexes(conn)
+    
+    conn.commit()
+
+
+def create_scene_membership_indexes(conn: sqlite3.Connection) -> None:
+    """Create the indexes used to look up the scenes and quick events of images.
+    
+    Without them, grouping a story's images by scene scans scene_images and
+    quick_event_images once per image.
+    """
+    cursor = conn.cursor()
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scene_images_image_id ON scene_images(image_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_quick_event_images_image_id ON quick_event_images(image_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scene_quick_events_quick_event_id ON scene_quick_events(quick_event_id)')
     conn.commit()
 
 
@@ -748,6 +769,24 @@ def initialize_database(db_path: str) -> sqlite3.Connection:
     # Run migrations for decision points
     migrate_decision_points_table(conn)
     
+    # Make sure the gallery_filter_presets table is created
+    create_gallery_filter_presets_table(conn)
+    
+    # Run migrations for images
+    migrate_images_table(conn)
+    
+    # Make sure the tag_review_queue table is created
+    create_tag_review_queue_table(conn)
+    
+    # Make sure the auto-tagging backfill tables are created
+    create_auto_tag_tables(conn)
+    
+    # Make sure the story_watch_folders table is created
+    create_story_watch_folders_table(conn)
+    
+    # Make sure the image_descriptors table is created
+    create_image_descriptors_table(conn)
+    
     return conn
 
 
@@ -793,7 +832,8 @@ def create_image(conn: sqlite3.Connection, filename: str, path: str, story_id: i
                 width: Optional[int] = None, height: Optional[int] = None,
                 file_size: Optional[int] = None, mime_type: Optional[str] = None,
                 is_featured: bool = False, date_taken: Optional[str] = None,
-                metadata_json: Optional[str] = None, event_id: Optional[int] = None) -> int:
+                metadata_json: Optional[str] = None, event_id: Optional[int] = None,
+                content_hash: Optional[str] = None, perceptual_hash: Optional[str] = None) -> int:
     """Create a new image.
     
     Args:
@@ -811,6 +851,8 @@ def create_image(conn: sqlite3.Connection, filename: str, path: str, story_id: i
         date_taken: Date the image was taken
         metadata_json: JSON string with metadata
         event_id: ID of the associated event
+        content_hash: SHA-256 hex digest of the image content, for duplicate detection
+        perceptual_hash: Hex dHash of the image, for near-duplicate detection
         
     Returns:
         ID of the created image
@@ -821,14 +863,14 @@ def create_image(conn: sqlite3.Connection, filename: str, path: str, story_id: i
         INSERT INTO images (
             filename, path, title, description, width, height,
             file_size, mime_type, is_featured, date_taken,
-            metadata_json, story_id, event_id,
+            metadata_json, story_id, event_id, content_hash, perceptual_hash,
             created_at, updated_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'), datetime('now'))
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'), datetime('now'))
         """,
         (
             filename, path, title, description, width, height,
             file_size, mime_type, 1 if is_featured else 0, date_taken,
-            metadata_json, story_id, event_id
+            metadata_json, story_id, event_id, content_hash, perceptual_hash
         )
     )
     conn.commit()
@@ -3242,4 +3284,790 @@ def migrate_decision_points_table(conn: sqlite3.Connection) -> None:
         ''')
         conn.commit()
     
-    return True
\ No newline at end of file
+    return True
+
+def create_gallery_filter_presets_table(conn: sqlite3.Connection) -> None:
+    """Create the gallery_filter_presets table if it doesn't exist.
+    
+    A preset stores a named set of character include/exclude filters and the
+    match mode used to combine the included characters.
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS gallery_filter_presets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        name TEXT NOT NULL,
+        story_id INTEGER NOT NULL,
+        filters_json TEXT NOT NULL,
+        match_mode TEXT DEFAULT 'all',
+        FOREIGN KEY (story_id) REFERENCES stories (id) ON DELETE CASCADE,
+        UNIQUE(story_id, name)
+    )
+    ''')
+    
+    conn.commit()
+
+
+def save_gallery_filter_preset(conn: sqlite3.Connection,
+                               story_id: int,
+                               name: str,
+                               character_filters: List[Tuple[int, bool]],
+                               match_mode: str = 'all') -> int:
+    """Save a gallery filter preset, replacing any preset with the same name.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        name: Name of the preset
+        character_filters: List of (character_id, include) tuples
+        match_mode: 'all' to require every included character, 'any' for at least one
+        
+    Returns:
+        The ID of the saved preset
+    """
+    cursor = conn.cursor()
+    
+    filters_json = json.dumps([[character_id, bool(include)] for character_id, include in character_filters])
+    
+    cursor.execute('''
+    INSERT INTO gallery_filter_presets (name, story_id, filters_json, match_mode)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(story_id, name) DO UPDATE SET
+        filters_json = excluded.filters_json,
+        match_mode = excluded.match_mode,
+        updated_at = CURRENT_TIMESTAMP
+    ''', (name, story_id, filters_json, match_mode))
+    
+    conn.commit()
+    
+    cursor.execute('''
+    SELECT id FROM gallery_filter_presets WHERE story_id = ? AND name = ?
+    ''', (story_id, name))
+    return cursor.fetchone()['id']
+
+
+def get_gallery_filter_presets(conn: sqlite3.Connection, story_id: int) -> List[Dict[str, Any]]:
+    """Get all gallery filter presets for a story.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        
+    Returns:
+        List of presets, each with a decoded 'character_filters' list of
+        (character_id, include) tuples
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    SELECT * FROM gallery_filter_presets
+    WHERE story_id = ?
+    ORDER BY name
+    ''', (story_id,))
+    
+    presets = []
+    for row in cursor.fetchall():
+        preset = dict(row)
+        try:
+            preset['character_filters'] = [(int(character_id), bool(include))
+                                           for character_id, include in json.loads(preset['filters_json'])]
+        except (ValueError, TypeError) as e:
+            print(f"Error decoding gallery filter preset {preset['id']}: {e}")
+            preset['character_filters'] = []
+        presets.append(preset)
+    
+    return presets
+
+
+def delete_gallery_filter_preset(conn: sqlite3.Connection, preset_id: int) -> bool:
+    """Delete a gallery filter preset.
+    
+    Args:
+        conn: Database connection
+        preset_id: ID of the preset
+        
+    Returns:
+        True if a preset was deleted, False otherwise
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    DELETE FROM gallery_filter_presets WHERE id = ?
+    ''', (preset_id,))
+    
+    conn.commit()
+    return cursor.rowcount > 0
+
+
+def migrate_images_table(conn: sqlite3.Connection) -> None:
+    """Add new columns and indexes to the images table if they don't exist."""
+    cursor = conn.cursor()
+    
+    # Check if the content_hash column exists in images table
+    cursor.execute("PRAGMA table_info(images)")
+    columns = cursor.fetchall()
+    column_names = [col['name'] for col in columns]
+    
+    if 'content_hash' not in column_names:
+        print("Adding content_hash column to images table")
+        cursor.execute('''
+        ALTER TABLE images
+        ADD COLUMN content_hash TEXT
+        ''')
+        conn.commit()
+    
+    # Check if the source_path column exists in images table
+    if 'source_path' not in column_names:
+        print("Adding source_path column to images table")
+        cursor.execute('''
+        ALTER TABLE images
+        ADD COLUMN source_path TEXT
+        ''')
+        conn.commit()
+    
+    # Check if the perceptual_hash column exists in images table
+    if 'perceptual_hash' not in column_names:
+        print("Adding perceptual_hash column to images table")
+        cursor.execute('''
+        ALTER TABLE images
+        ADD COLUMN perceptual_hash TEXT
+        ''')
+        conn.commit()
+    
+    # Index for duplicate detection on import
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_images_story_id_content_hash
+    ON images (story_id, content_hash)
+    ''')
+    conn.commit()
+    
+    # Databases created before the scene grouping engine lack these
+    create_scene_membership_indexes(conn)
+
+
+def find_image_by_content_hash(conn: sqlite3.Connection, story_id: int, content_hash: str) -> Optional[int]:
+    """Find an image in a story with the given content hash.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        content_hash: SHA-256 hex digest of the image content
+        
+    Returns:
+        ID of the matching image, or None if there is none
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT id FROM images
+    WHERE story_id = ? AND content_hash = ?
+    ORDER BY id
+    LIMIT 1
+    ''', (story_id, content_hash))
+    row = cursor.fetchone()
+    return row['id'] if row else None
+
+
+def get_story_content_hashes(conn: sqlite3.Connection, story_id: int) -> set:
+    """Get the content hashes of all images in a story.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        
+    Returns:
+        Set of content hashes (images without a hash are left out)
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT content_hash FROM images
+    WHERE story_id = ? AND content_hash IS NOT NULL
+    ''', (story_id,))
+    return {row['content_hash'] for row in cursor.fetchall()}
+
+
+def get_story_source_paths(conn: sqlite3.Connection, story_id: int) -> set:
+    """Get the paths of the files a story's images were imported from.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        
+    Returns:
+        Set of source file paths
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT source_path FROM images
+    WHERE story_id = ? AND source_path IS NOT NULL
+    ''', (story_id,))
+    return {row['source_path'] for row in cursor.fetchall()}
+
+
+def create_images_batch(conn: sqlite3.Connection, story_id: int, images: List[Dict[str, Any]]) -> List[int]:
+    """Create many images in a single transaction.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        images: List of image dictionaries with 'filename' and 'path', and
+            optionally 'width', 'height', 'file_size', 'mime_type',
+            'content_hash', 'perceptual_hash' and 'source_path'
+        
+    Returns:
+        IDs of the created images, in the same order
+    """
+    cursor = conn.cursor()
+    image_ids = []
+    try:
+        for image in images:
+            cursor.execute(
+                """
+                INSERT INTO images (
+                    filename, path, title, description, width, height,
+                    file_size, mime_type, story_id, content_hash, perceptual_hash, source_path,
+                    created_at, updated_at
+                ) VALUES (?, ?, '', '', ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'), datetime('now'))
+                """,
+                (
+                    image['filename'], image['path'], image.get('width'), image.get('height'),
+                    image.get('file_size'), image.get('mime_type'), story_id,
+                    image.get('content_hash'), image.get('perceptual_hash'), image.get('source_path')
+                )
+            )
+            image_ids.append(cursor.lastrowid)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return image_ids
+
+
+def create_tag_review_queue_table(conn: sqlite3.Connection) -> None:
+    """Create the tag_review_queue table if it doesn't exist.
+    
+    The queue holds images that were added without going through character
+    tagging (e.g. by bulk import), until the user has reviewed them.
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS tag_review_queue (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        image_id INTEGER NOT NULL UNIQUE,
+        story_id INTEGER NOT NULL,
+        reason TEXT,
+        FOREIGN KEY (image_id) REFERENCES images (id) ON DELETE CASCADE,
+        FOREIGN KEY (story_id) REFERENCES stories (id) ON DELETE CASCADE
+    )
+    ''')
+    
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_tag_review_queue_story_id
+    ON tag_review_queue (story_id)
+    ''')
+    
+    conn.commit()
+
+
+def add_images_to_tag_review_queue(conn: sqlite3.Connection, story_id: int, image_ids: List[int],
+                                   reason: Optional[str] = None) -> None:
+    """Queue images for character tag review.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        image_ids: IDs of the images
+        reason: Why the images were queued (e.g. 'bulk_import')
+    """
+    cursor = conn.cursor()
+    cursor.executemany('''
+    INSERT OR IGNORE INTO tag_review_queue (image_id, story_id, reason)
+    VALUES (?, ?, ?)
+    ''', [(image_id, story_id, reason) for image_id in image_ids])
+    conn.commit()
+
+
+def get_tag_review_queue(conn: sqlite3.Connection, story_id: int) -> List[int]:
+    """Get the images of a story waiting for tag review, newest first.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        
+    Returns:
+        List of image IDs
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT q.image_id
+    FROM tag_review_queue q
+    JOIN images i ON i.id = q.image_id
+    WHERE q.story_id = ?
+    ORDER BY i.created_at DESC, i.id DESC
+    ''', (story_id,))
+    return [row['image_id'] for row in cursor.fetchall()]
+
+
+def remove_images_from_tag_review_queue(conn: sqlite3.Connection, image_ids: List[int]) -> None:
+    """Remove reviewed images from the tag review queue.
+    
+    Args:
+        conn: Database connection
+        image_ids: IDs of the reviewed images
+    """
+    cursor = conn.cursor()
+    cursor.executemany('''
+    DELETE FROM tag_review_queue WHERE image_id = ?
+    ''', [(image_id,) for image_id in image_ids])
+    conn.commit()
+
+
+def create_auto_tag_tables(conn: sqlite3.Connection) -> None:
+    """Create the tables of the auto-tagging backfill if they don't exist.
+    
+    tag_suggestions holds the character regions proposed for images until
+    the user accepts or dismisses them. auto_tag_progress records, per story,
+    the last image the backfill has looked at, so it can resume there.
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS tag_suggestions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        image_id INTEGER NOT NULL,
+        character_id INTEGER NOT NULL,
+        x_position REAL NOT NULL,
+        y_position REAL NOT NULL,
+        width REAL NOT NULL,
+        height REAL NOT NULL,
+        similarity REAL NOT NULL,
+        source TEXT NOT NULL,
+        FOREIGN KEY (image_id) REFERENCES images (id) ON DELETE CASCADE,
+        FOREIGN KEY (character_id) REFERENCES characters (id) ON DELETE CASCADE
+    )
+    ''')
+    
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_tag_suggestions_image_id
+    ON tag_suggestions (image_id)
+    ''')
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS auto_tag_progress (
+        story_id INTEGER PRIMARY KEY,
+        started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_image_id INTEGER NOT NULL DEFAULT 0,
+        processed INTEGER NOT NULL DEFAULT 0,
+        suggested INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (story_id) REFERENCES stories (id) ON DELETE CASCADE
+    )
+    ''')
+    
+    conn.commit()
+
+
+def get_auto_tag_progress(conn: sqlite3.Connection, story_id: int) -> Dict[str, Any]:
+    """Get how far the auto-tagging backfill of a story has come.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        
+    Returns:
+        Dictionary with 'last_image_id', 'processed' and 'suggested' (all 0
+        if the backfill never ran)
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT last_image_id, processed, suggested FROM auto_tag_progress WHERE story_id = ?
+    ''', (story_id,))
+    row = cursor.fetchone()
+    if not row:
+        return {'last_image_id': 0, 'processed': 0, 'suggested': 0}
+    return dict(row)
+
+
+def save_auto_tag_batch(conn: sqlite3.Connection, story_id: int, last_image_id: int, processed: int,
+                        suggestions: List[Dict[str, Any]], reason: Optional[str] = None) -> None:
+    """Store the suggestions for a batch of images and move the checkpoint past them.
+    
+    Both happen in one transaction, so a batch is either fully recorded or
+    looked at again when the backfill resumes. Images with suggestions are
+    queued for tag review.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        last_image_id: ID of the last image of the batch
+        processed: Number of images in the batch
+        suggestions: Dictionaries with 'image_id', 'character_id', 'x_position',
+            'y_position', 'width', 'height' (center and size, 0.0-1.0),
+            'similarity' and 'source'
+        reason: Why the images are queued for review
+    """
+    image_ids = sorted({suggestion['image_id'] for suggestion in suggestions})
+    cursor = conn.cursor()
+    try:
+        cursor.executemany('''
+        INSERT INTO tag_suggestions (
+            image_id, character_id, x_position, y_position, width, height, similarity, source
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(
+            suggestion['image_id'], suggestion['character_id'], suggestion['x_position'],
+            suggestion['y_position'], suggestion['width'], suggestion['height'],
+            suggestion['similarity'], suggestion['source']
+        ) for suggestion in suggestions])
+        cursor.executemany('''
+        INSERT OR IGNORE INTO tag_review_queue (image_id, story_id, reason)
+        VALUES (?, ?, ?)
+        ''', [(image_id, story_id, reason) for image_id in image_ids])
+        cursor.execute('''
+        INSERT INTO auto_tag_progress (story_id, last_image_id, processed, suggested)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(story_id) DO UPDATE SET
+            last_image_id = MAX(last_image_id, excluded.last_image_id),
+            processed = processed + excluded.processed,
+            suggested = suggested + excluded.suggested,
+            updated_at = CURRENT_TIMESTAMP
+        ''', (story_id, last_image_id, processed, len(image_ids)))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+def reset_auto_tag_progress(conn: sqlite3.Connection, story_id: int) -> None:
+    """Make the next auto-tagging backfill of a story start from its first image.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    DELETE FROM auto_tag_progress WHERE story_id = ?
+    ''', (story_id,))
+    conn.commit()
+
+
+def get_tag_suggestions(conn: sqlite3.Connection, image_id: int) -> List[Dict[str, Any]]:
+    """Get the suggested character regions of an image, best first.
+    
+    Args:
+        conn: Database connection
+        image_id: ID of the image
+        
+    Returns:
+        List of suggestion dictionaries, with 'character_name'
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT s.*, c.name AS character_name
+    FROM tag_suggestions s
+    JOIN characters c ON c.id = s.character_id
+    WHERE s.image_id = ?
+    ORDER BY s.similarity DESC, s.id
+    ''', (image_id,))
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def delete_tag_suggestions(conn: sqlite3.Connection, suggestion_ids: Optional[List[int]] = None,
+                           image_ids: Optional[List[int]] = None) -> None:
+    """Delete tag suggestions, by ID or of whole images.
+    
+    Args:
+        conn: Database connection
+        suggestion_ids: IDs of the suggestions
+        image_ids: IDs of the images whose suggestions are deleted
+    """
+    cursor = conn.cursor()
+    if suggestion_ids:
+        cursor.executemany('''
+        DELETE FROM tag_suggestions WHERE id = ?
+        ''', [(suggestion_id,) for suggestion_id in suggestion_ids])
+    if image_ids:
+        cursor.executemany('''
+        DELETE FROM tag_suggestions WHERE image_id = ?
+        ''', [(image_id,) for image_id in image_ids])
+    conn.commit()
+
+
+def create_story_watch_folders_table(conn: sqlite3.Connection) -> None:
+    """Create the story_watch_folders and watch_folder_files tables if they don't exist.
+    
+    Each story can have one folder (e.g. a screenshot folder) whose new
+    images are imported automatically. baseline_at is set once the files
+    already in the folder were recorded in watch_folder_files, which also
+    records files skipped as duplicates; neither is imported.
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS story_watch_folders (
+        story_id INTEGER PRIMARY KEY,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        folder_path TEXT NOT NULL,
+        enabled INTEGER DEFAULT 1,
+        recursive INTEGER DEFAULT 0,
+        baseline_at TIMESTAMP,
+        FOREIGN KEY (story_id) REFERENCES stories (id) ON DELETE CASCADE
+    )
+    ''')
+    
+    # Folders set up before baselines were recorded had their files imported already
+    cursor.execute("PRAGMA table_info(story_watch_folders)")
+    if 'baseline_at' not in [column['name'] for column in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE story_watch_folders ADD COLUMN baseline_at TIMESTAMP')
+        cursor.execute('UPDATE story_watch_folders SET baseline_at = created_at')
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS watch_folder_files (
+        story_id INTEGER NOT NULL,
+        path TEXT NOT NULL,
+        PRIMARY KEY (story_id, path),
+        FOREIGN KEY (story_id) REFERENCES stories (id) ON DELETE CASCADE
+    )
+    ''')
+    
+    conn.commit()
+
+
+def set_story_watch_folder(conn: sqlite3.Connection, story_id: int, folder_path: str,
+                           enabled: bool = True, recursive: bool = False) -> None:
+    """Set the watch folder of a story, replacing any existing one.
+    
+    Changing the folder or whether subfolders are watched drops the
+    baseline, so the files already in the new folder are not imported.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        folder_path: Folder to watch for new images
+        enabled: Whether new images are imported
+        recursive: Whether subfolders are watched too
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    INSERT INTO story_watch_folders (story_id, folder_path, enabled, recursive)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(story_id) DO UPDATE SET
+        folder_path = excluded.folder_path,
+        enabled = excluded.enabled,
+        recursive = excluded.recursive,
+        baseline_at = CASE
+            WHEN story_watch_folders.folder_path = excluded.folder_path
+             AND story_watch_folders.recursive = excluded.recursive
+            THEN story_watch_folders.baseline_at
+        END,
+        updated_at = CURRENT_TIMESTAMP
+    ''', (story_id, folder_path, int(enabled), int(recursive)))
+    cursor.execute('''
+    DELETE FROM watch_folder_files
+    WHERE story_id = ? AND EXISTS (
+        SELECT 1 FROM story_watch_folders WHERE story_id = ? AND baseline_at IS NULL
+    )
+    ''', (story_id, story_id))
+    conn.commit()
+
+
+def get_story_watch_folder(conn: sqlite3.Connection, story_id: int) -> Optional[Dict[str, Any]]:
+    """Get the watch folder of a story.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        
+    Returns:
+        Dictionary with 'folder_path', 'enabled', 'recursive' and
+        'baseline_at' (None until the folder's existing files are recorded), or None
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT * FROM story_watch_folders WHERE story_id = ?
+    ''', (story_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    watch_folder = dict(row)
+    watch_folder['enabled'] = bool(watch_folder['enabled'])
+    watch_folder['recursive'] = bool(watch_folder['recursive'])
+    return watch_folder
+
+
+def remove_story_watch_folder(conn: sqlite3.Connection, story_id: int) -> None:
+    """Stop watching a folder for a story.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    DELETE FROM story_watch_folders WHERE story_id = ?
+    ''', (story_id,))
+    cursor.execute('''
+    DELETE FROM watch_folder_files WHERE story_id = ?
+    ''', (story_id,))
+    conn.commit()
+
+
+def get_watch_folder_files(conn: sqlite3.Connection, story_id: int) -> set:
+    """Get the files of a story's watch folder that are not to be imported.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        
+    Returns:
+        Set of file paths
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT path FROM watch_folder_files WHERE story_id = ?
+    ''', (story_id,))
+    return {row['path'] for row in cursor.fetchall()}
+
+
+def add_watch_folder_files(conn: sqlite3.Connection, story_id: int, paths: Iterable[str],
+                           baseline: bool = False) -> None:
+    """Record files of a story's watch folder that are not to be imported.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        paths: File paths (files already in the folder, or duplicates)
+        baseline: Whether the paths are the files already in the folder,
+            which sets the watch folder's baseline_at
+    """
+    cursor = conn.cursor()
+    cursor.executemany('''
+    INSERT OR IGNORE INTO watch_folder_files (story_id, path) VALUES (?, ?)
+    ''', [(story_id, path) for path in paths])
+    if baseline:
+        cursor.execute('''
+        UPDATE story_watch_folders SET baseline_at = CURRENT_TIMESTAMP WHERE story_id = ?
+        ''', (story_id,))
+    conn.commit()
+
+
+def get_story_perceptual_hashes(conn: sqlite3.Connection, story_id: int) -> List[Dict[str, Any]]:
+    """Get the perceptual hashes of a story's images.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        
+    Returns:
+        List of dictionaries with 'id', 'filename', 'path' and
+        'perceptual_hash' (None for images that don't have one yet)
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT id, filename, path, perceptual_hash FROM images
+    WHERE story_id = ?
+    ORDER BY id
+    ''', (story_id,))
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def update_image_perceptual_hashes(conn: sqlite3.Connection, hashes: List[Tuple[int, str]]) -> None:
+    """Store perceptual hashes for existing images.
+    
+    Args:
+        conn: Database connection
+        hashes: List of (image_id, perceptual_hash) tuples
+    """
+    cursor = conn.cursor()
+    cursor.executemany('''
+    UPDATE images SET perceptual_hash = ? WHERE id = ?
+    ''', [(perceptual_hash, image_id) for image_id, perceptual_hash in hashes])
+    conn.commit()
+
+
+def create_image_descriptors_table(conn: sqlite3.Connection) -> None:
+    """Create the image_descriptors table if it doesn't exist.
+    
+    Each image can have a global descriptor (a float32 vector stored as a
+    BLOB) used to find similar-looking images.
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS image_descriptors (
+        image_id INTEGER PRIMARY KEY,
+        story_id INTEGER NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        version INTEGER NOT NULL,
+        descriptor BLOB NOT NULL,
+        FOREIGN KEY (image_id) REFERENCES images (id) ON DELETE CASCADE,
+        FOREIGN KEY (story_id) REFERENCES stories (id) ON DELETE CASCADE
+    )
+    ''')
+    
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_image_descriptors_story_id
+    ON image_descriptors (story_id)
+    ''')
+    
+    conn.commit()
+
+
+def get_story_image_descriptors(conn: sqlite3.Connection, story_id: int) -> List[Dict[str, Any]]:
+    """Get the descriptors of a story's images.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        
+    Returns:
+        List of dictionaries with 'id', 'filename', 'path', 'version' and
+        'descriptor' (both None for images that don't have one yet)
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT i.id, i.filename, i.path, d.version, d.descriptor
+    FROM images i
+    LEFT JOIN image_descriptors d ON d.image_id = i.id
+    WHERE i.story_id = ?
+    ORDER BY i.id
+    ''', (story_id,))
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def save_image_descriptors(conn: sqlite3.Connection, story_id: int,
+                           descriptors: List[Tuple[int, bytes]], version: int) -> None:
+    """Store descriptors for images, replacing any they already have.
+    
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        descriptors: List of (image_id, descriptor BLOB) tuples
+        version: Version of the descriptor layout
+    """
+    cursor = conn.cursor()
+    cursor.executemany('''
+    INSERT OR REPLACE INTO image_descriptors (image_id, story_id, version, descriptor, updated_at)
+    VALUES (?, ?, ?, ?, datetime('now'))
+    ''', [(image_id, story_id, version, sqlite3.Binary(descriptor)) for image_id, descriptor in descriptors])
+    conn.commit()
+
+
+def delete_image_descriptors(conn: sqlite3.Connection, image_ids: List[int]) -> None:
+    """Delete the descriptors of images.
+    
+    Args:
+        conn: Database connection
+        image_ids: IDs of the images
+    """
+    cursor = conn.cursor()
+    cursor.executemany('''
+    DELETE FROM image_descriptors WHERE image_id = ?
+    ''', [(image_id,) for image_id in image_ids])
+    conn.commit()
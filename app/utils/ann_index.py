@@ -0,0 +1,412 @@
+"""
+Approximate Nearest Neighbor Index Module.
+
+This module finds the stored vectors closest (in Euclidean distance) to a
+query without comparing it with every one of them. IVFIndex partitions the
+vectors with k-means into lists around centroids; a query is only compared
+with the vectors of the nprobe lists whose centroids are closest to it. Up
+to exact_limit vectors, and until the index has been trained, every vector
+is compared instead, so small collections get exact results.
+
+Vectors can be added and removed at any time. Added vectors go to the list
+of their closest centroid; removed ones are marked and dropped when the
+arrays are compacted. The index trains itself once it grows past
+exact_limit, and again when it has grown RETRAIN_GROWTH times since.
+
+Training is the expensive part, so the centroids and the list of each vector
+are saved in the ann_indexes table of the story database (see save and
+load). The vectors themselves are not saved: they stay in the table they
+come from, and are passed to load, which puts vectors it has no list for
+into the list of their closest centroid.
+"""
+
+import sqlite3
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+# Below this many vectors, every vector is compared with the query
+EXACT_SEARCH_LIMIT = 4096
+
+# Number of lists: about the square root of the number of vectors, within these bounds
+MIN_LISTS = 16
+MAX_LISTS = 1024
+
+# Lists compared with each query
+DEFAULT_NPROBE = 8
+
+# k-means training: iterations, and sample size per list
+KMEANS_ITERATIONS = 10
+TRAINING_SAMPLES_PER_LIST = 40
+
+# Train again once the index has grown this many times since it was trained
+RETRAIN_GROWTH = 4
+
+# Vectors assigned to their closest centroid at once (bounds the distance matrix size)
+ASSIGN_BATCH_SIZE = 8192
+
+VECTOR_DTYPE = np.dtype('<f4')
+
+# Version of the layout saved in the ann_indexes table
+ANN_FORMAT_VERSION = 1
+
+
+def squared_distances(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Compute the squared Euclidean distances between two sets of vectors.
+
+    Args:
+        points: (n, d) array
+        centers: (m, d) array
+
+    Returns:
+        (n, m) array of squared distances
+    """
+    distances = (np.einsum('ij,ij->i', points, points)[:, None]
+                 - 2 * points @ centers.T
+                 + np.einsum('ij,ij->i', centers, centers)[None, :])
+    return np.maximum(distances, 0)
+
+
+def nearest_centers(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Find the closest center of each point, in batches.
+
+    Args:
+        points: (n, d) array
+        centers: (m, d) array
+
+    Returns:
+        Index of the closest center of each point
+    """
+    assignments = np.empty(len(points), dtype=np.int32)
+    for start in range(0, len(points), ASSIGN_BATCH_SIZE):
+        batch = points[start:start + ASSIGN_BATCH_SIZE]
+        assignments[start:start + len(batch)] = squared_distances(batch, centers).argmin(axis=1)
+    return assignments
+
+
+def kmeans(points: np.ndarray, count: int, iterations: int = KMEANS_ITERATIONS,
+           seed: int = 0) -> np.ndarray:
+    """Cluster vectors with k-means.
+
+    Args:
+        points: (n, d) array, with n >= count
+        count: Number of clusters
+        iterations: Number of refinement steps
+        seed: Seed of the random initialization
+
+    Returns:
+        (count, d) array of centroids
+    """
+    rng = np.random.default_rng(seed)
+    centroids = points[rng.choice(len(points), count, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = nearest_centers(points, centroids)
+        sizes = np.bincount(assignments, minlength=count)
+        filled = sizes > 0
+
+        # Sum the points of each cluster in one pass over the points sorted by cluster
+        order = np.argsort(assignments, kind='stable')
+        starts = (np.cumsum(sizes) - sizes)[filled]
+        sums = np.add.reduceat(points[order], starts, axis=0)
+        centroids[filled] = sums / sizes[filled, None]
+        # Restart empty clusters from random points
+        if not filled.all():
+            centroids[~filled] = points[rng.choice(len(points), int((~filled).sum()), replace=False)]
+    return centroids
+
+
+def create_ann_indexes_table(conn: sqlite3.Connection) -> None:
+    """Create the ann_indexes table if it doesn't exist.
+
+    Args:
+        conn: Database connection
+    """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS ann_indexes (
+        name TEXT PRIMARY KEY,
+        format_version INTEGER NOT NULL,
+        dimension INTEGER NOT NULL,
+        centroids BLOB NOT NULL,
+        ids BLOB NOT NULL,
+        assignments BLOB NOT NULL,
+        trained_size INTEGER NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    ''')
+    conn.commit()
+
+
+class IVFIndex:
+    """Inverted file index of vectors, searched exactly while it is small."""
+
+    def __init__(self, dimension: int, nprobe: int = DEFAULT_NPROBE,
+                 exact_limit: int = EXACT_SEARCH_LIMIT):
+        """Initialize an empty index.
+
+        Args:
+            dimension: Length of the vectors
+            nprobe: Lists compared with each query
+            exact_limit: Number of vectors up to which every vector is compared
+        """
+        self.dimension = dimension
+        self.nprobe = nprobe
+        self.exact_limit = exact_limit
+
+        # Rows [0, size) of these arrays are in use; removed rows are marked dead
+        self.size = 0
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.vectors = np.zeros((0, dimension), dtype=VECTOR_DTYPE)
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.row_by_id: Dict[int, int] = {}
+
+        # Set once the index is trained
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_size = 0
+        # Whether the centroids are the ones saved in the database
+        self.saved = False
+        # Rows of each list, rebuilt when rows are added, removed or moved
+        self._list_rows = None
+
+    def __len__(self) -> int:
+        """Get the number of vectors in the index."""
+        return len(self.row_by_id)
+
+    def is_trained(self) -> bool:
+        """Check whether the vectors have been partitioned into lists."""
+        return self.centroids is not None
+
+    def is_exact(self) -> bool:
+        """Check whether searches compare every vector (so their results are exact)."""
+        return not self.is_trained() or len(self) <= self.exact_limit
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """Add vectors (replacing the vectors of IDs already in the index).
+
+        Args:
+            ids: IDs of the vectors
+            vectors: (n, dimension) array
+        """
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        vectors = np.asarray(vectors, dtype=VECTOR_DTYPE).reshape(-1, self.dimension)
+        if len(ids) != len(vectors):
+            raise ValueError(f"Got {len(ids)} IDs for {len(vectors)} vectors")
+        if not len(ids):
+            return
+
+        self.remove([vector_id for vector_id in ids.tolist() if vector_id in self.row_by_id])
+        self._reserve(self.size + len(ids))
+
+        rows = slice(self.size, self.size + len(ids))
+        self.ids[rows] = ids
+        self.vectors[rows] = vectors
+        self.alive[rows] = True
+        self.assignments[rows] = nearest_centers(vectors, self.centroids) if self.is_trained() else 0
+        self.row_by_id.update(zip(ids.tolist(), range(self.size, self.size + len(ids))))
+        self.size += len(ids)
+        self._list_rows = None
+
+        if self._needs_training():
+            self.train()
+
+    def remove(self, ids) -> int:
+        """Remove vectors.
+
+        Args:
+            ids: IDs of the vectors (IDs not in the index are ignored)
+
+        Returns:
+            Number of vectors removed
+        """
+        rows = [self.row_by_id.pop(vector_id) for vector_id in list(ids) if vector_id in self.row_by_id]
+        if rows:
+            self.alive[rows] = False
+            self._list_rows = None
+            # Reclaim the rows once more than half of them are dead
+            if len(self.row_by_id) * 2 < self.size:
+                self._compact()
+        return len(rows)
+
+    def train(self) -> None:
+        """Partition the vectors into lists with k-means."""
+        count = len(self)
+        if count == 0:
+            return
+        vectors = self.vectors[:self.size][self.alive[:self.size]]
+        list_count = int(np.clip(np.sqrt(count), MIN_LISTS, MAX_LISTS))
+        list_count = min(list_count, count)
+
+        sample_size = min(count, list_count * TRAINING_SAMPLES_PER_LIST)
+        sample = vectors[np.random.default_rng(0).choice(count, sample_size, replace=False)]
+        self.centroids = kmeans(sample, list_count)
+        self.assignments[:self.size] = nearest_centers(self.vectors[:self.size], self.centroids)
+        self.trained_size = count
+        self.saved = False
+        self._list_rows = None
+
+    def search(self, query: np.ndarray, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the vectors closest to a query.
+
+        Args:
+            query: Vector of the index's dimension
+            k: Number of vectors to return
+
+        Returns:
+            (IDs, distances) of up to k vectors, closest first
+        """
+        query = np.asarray(query, dtype=VECTOR_DTYPE).reshape(1, self.dimension)
+        if not self.is_exact():
+            probed = np.argsort(squared_distances(query, self.centroids)[0])[:self.nprobe]
+            list_rows = self._get_list_rows()
+            rows = np.concatenate([list_rows[list_number] for list_number in probed])
+            vectors = self.vectors[rows]
+        elif len(self) == self.size:
+            # Nothing removed: compare the rows in place instead of gathering them
+            rows = np.arange(self.size)
+            vectors = self.vectors[:self.size]
+        else:
+            rows = np.flatnonzero(self.alive[:self.size])
+            vectors = self.vectors[rows]
+
+        if not len(rows):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+        # Direct differences rather than squared_distances, which loses precision for close vectors
+        distances = np.linalg.norm(vectors - query, axis=1)
+        if k < len(rows):
+            nearest = np.argpartition(distances, k)[:k]
+        else:
+            nearest = np.arange(len(rows))
+        nearest = nearest[np.argsort(distances[nearest])]
+        return self.ids[rows[nearest]], distances[nearest].astype(np.float64)
+
+    def save(self, conn: sqlite3.Connection, name: str) -> None:
+        """Save the centroids and the list of each vector in the ann_indexes table.
+
+        Does nothing while the index isn't trained.
+
+        Args:
+            conn: Database connection
+            name: Name of the index
+        """
+        if not self.is_trained():
+            return
+        create_ann_indexes_table(conn)
+        live = self.alive[:self.size]
+        conn.execute('''
+        INSERT OR REPLACE INTO ann_indexes (
+            name, format_version, dimension, centroids, ids, assignments, trained_size, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            name, ANN_FORMAT_VERSION, self.dimension,
+            self.centroids.astype(VECTOR_DTYPE).tobytes(),
+            self.ids[:self.size][live].astype('<i8').tobytes(),
+            self.assignments[:self.size][live].astype('<i4').tobytes(),
+            self.trained_size, datetime.now().isoformat()
+        ))
+        conn.commit()
+        self.saved = True
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, name: str, ids: np.ndarray, vectors: np.ndarray,
+             **kwargs) -> 'IVFIndex':
+        """Create an index of vectors, with the lists saved by save if there are any.
+
+        Vectors that weren't in the index when it was saved are put into the
+        list of their closest centroid. Without a usable saved index (none,
+        another version or dimension), the index is trained if it's large
+        enough.
+
+        Args:
+            conn: Database connection
+            name: Name of the index
+            ids: IDs of the vectors
+            vectors: (n, dimension) array
+            **kwargs: Arguments for IVFIndex
+
+        Returns:
+            The index
+        """
+        vectors = np.asarray(vectors, dtype=VECTOR_DTYPE)
+        index = cls(vectors.shape[1], **kwargs)
+        ids = np.asarray(ids, dtype=np.int64)
+
+        create_ann_indexes_table(conn)
+        row = conn.execute('''
+        SELECT format_version, dimension, centroids, ids, assignments, trained_size
+        FROM ann_indexes
+        WHERE name = ?
+        ''', (name,)).fetchone()
+        if row is None or row[0] != ANN_FORMAT_VERSION or row[1] != index.dimension:
+            index.add(ids, vectors)
+            return index
+
+        # Fill the index without training it, then apply the saved lists
+        index.centroids = np.frombuffer(row[2], dtype=VECTOR_DTYPE).reshape(-1, index.dimension).copy()
+        index.trained_size = row[5]
+        index.saved = True
+        saved_ids = np.frombuffer(row[3], dtype='<i8')
+        saved_assignments = np.frombuffer(row[4], dtype='<i4')
+
+        index._reserve(len(ids))
+        index.ids[:len(ids)] = ids
+        index.vectors[:len(ids)] = vectors
+        index.alive[:len(ids)] = True
+        index.row_by_id = dict(zip(ids.tolist(), range(len(ids))))
+        index.size = len(ids)
+
+        order = np.argsort(saved_ids)
+        positions = np.searchsorted(saved_ids[order], ids)
+        positions = np.minimum(positions, max(len(saved_ids) - 1, 0))
+        known = (np.zeros(len(ids), dtype=bool) if not len(saved_ids)
+                 else saved_ids[order][positions] == ids)
+        index.assignments[:len(ids)][known] = saved_assignments[order][positions[known]]
+        if not known.all():
+            index.assignments[:len(ids)][~known] = nearest_centers(vectors[~known], index.centroids)
+
+        if index._needs_training():
+            index.train()
+        return index
+
+    def _needs_training(self) -> bool:
+        """Check whether the index is large enough to be trained, or has outgrown its lists."""
+        if len(self) <= self.exact_limit:
+            return False
+        return not self.is_trained() or len(self) > self.trained_size * RETRAIN_GROWTH
+
+    def _reserve(self, capacity: int) -> None:
+        """Grow the arrays so they hold at least capacity rows."""
+        if capacity <= len(self.ids):
+            return
+        capacity = max(capacity, len(self.ids) * 2, 64)
+        ids = np.zeros(capacity, dtype=np.int64)
+        vectors = np.zeros((capacity, self.dimension), dtype=VECTOR_DTYPE)
+        assignments = np.zeros(capacity, dtype=np.int32)
+        alive = np.zeros(capacity, dtype=bool)
+        ids[:self.size] = self.ids[:self.size]
+        vectors[:self.size] = self.vectors[:self.size]
+        assignments[:self.size] = self.assignments[:self.size]
+        alive[:self.size] = self.alive[:self.size]
+        self.ids, self.vectors, self.assignments, self.alive = ids, vectors, assignments, alive
+
+    def _compact(self) -> None:
+        """Drop the rows of removed vectors."""
+        live = np.flatnonzero(self.alive[:self.size])
+        self.ids = self.ids[live]
+        self.vectors = self.vectors[live]
+        self.assignments = self.assignments[live]
+        self.alive = np.ones(len(live), dtype=bool)
+        self.size = len(live)
+        self.row_by_id = dict(zip(self.ids.tolist(), range(self.size)))
+        self._list_rows = None
+
+    def _get_list_rows(self):
+        """Get the live rows of each list."""
+        if self._list_rows is None:
+            live = np.flatnonzero(self.alive[:self.size])
+            order = live[np.argsort(self.assignments[live], kind='stable')]
+            bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+            self._list_rows = [order[bounds[number]:bounds[number + 1]] for number in range(len(self.centroids))]
+        return self._list_rows
@@ -0,0 +1,387 @@
+"""
+Auto-Tag Backfill Module.
+
+This module suggests character tags for the images of a story that have
+none, in the background. Recognition otherwise only runs when an image is
+added through the tagging dialog, so images imported in bulk or added
+before recognition existed are never looked at.
+
+The job walks the story's untagged images in ID order, in batches. Each
+image is read at a reduced size, and a fixed set of regions (the whole
+image and overlapping vertical strips, where characters usually stand) is
+scored against the story's feature index; the best region of each character
+above AUTO_TAG_THRESHOLD becomes a suggestion. When face recognition is
+installed, the faces it recognizes are suggested too.
+
+Nothing is tagged directly. Suggestions go to the tag_suggestions table and
+their images to the tag review queue, where the user accepts or dismisses
+them. Each batch is saved together with the checkpoint (the last image ID
+looked at) in one transaction, so a job stopped by a cancel, a crash or the
+application closing resumes after the last saved batch. Images added later
+have higher IDs, so running the job again picks them up.
+
+The job runs at idle thread priority and pauses after each image for as long
+as the image took to process times (1 - duty_cycle) / duty_cycle, so it
+leaves most of the CPU to the user even on systems that ignore priorities.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThread, QThreadPool, QRect, QSize, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader
+
+from app.db_sqlite import get_auto_tag_progress, save_auto_tag_batch
+from app.utils.image_prefetcher import get_database_path, get_worker_connection
+from app.utils.image_recognition_util import ImageRecognitionUtil, rank_character_scores
+
+try:
+    from app.utils.face_recognition_util import FaceRecognitionUtil
+except ImportError:
+    # Face recognition is optional (it needs the face_recognition package)
+    FaceRecognitionUtil = None
+
+
+# Images per checkpoint
+BATCH_SIZE = 25
+
+# Minimum similarity of a suggestion (higher than in the tagging dialog, since nobody picked the region)
+AUTO_TAG_THRESHOLD = 0.7
+
+# Suggestions kept per image
+MAX_SUGGESTIONS_PER_IMAGE = 3
+
+# Images are read with their longest side reduced to this
+MAX_IMAGE_DIMENSION = 512
+
+# Share of the time the job works; it sleeps the rest
+DEFAULT_DUTY_CYCLE = 0.5
+
+# Widths of the proposed regions (fractions of the image width); each is
+# tried at steps of half its width, over the full image height
+REGION_WIDTHS = (1.0, 1 / 2, 1 / 3)
+
+# Reason stored in the tag review queue
+REVIEW_REASON_AUTO_TAG = 'auto_tag'
+
+# Sources of suggestions
+SOURCE_FEATURES = 'features'
+SOURCE_FACES = 'faces'
+
+
+def propose_regions() -> List[Tuple[float, float, float, float]]:
+    """Get the regions of an image that are scored.
+
+    Returns:
+        List of (x, y, width, height) tuples, as fractions of the image size
+    """
+    regions = []
+    for width in REGION_WIDTHS:
+        steps = int(round((1.0 - width) / (width / 2))) + 1
+        for step in range(steps):
+            regions.append((step * width / 2, 0.0, width, 1.0))
+    return regions
+
+
+def read_scaled_image(path: str, max_dimension: int = MAX_IMAGE_DIMENSION) -> QImage:
+    """Read an image, decoding it at a reduced size if it's large.
+
+    Args:
+        path: Path of the image file
+        max_dimension: Longest side of the result
+
+    Returns:
+        The image (null if it can't be read)
+    """
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid() and max(size.width(), size.height()) > max_dimension:
+        reader.setScaledSize(size.scaled(QSize(max_dimension, max_dimension), Qt.AspectRatioMode.KeepAspectRatio))
+    return reader.read()
+
+
+def get_untagged_images(conn: sqlite3.Connection, story_id: int, after_image_id: int,
+                        limit: int) -> List[Dict[str, Any]]:
+    """Get the next images of a story that have no character tags and no suggestions.
+
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        after_image_id: Only images with a higher ID are returned
+        limit: Maximum number of images
+
+    Returns:
+        List of dictionaries with 'id', 'filename' and 'path', in ID order
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT i.id, i.filename, i.path
+    FROM images i
+    WHERE i.story_id = ? AND i.id > ?
+      AND NOT EXISTS (SELECT 1 FROM image_character_tags t WHERE t.image_id = i.id)
+      AND NOT EXISTS (SELECT 1 FROM tag_suggestions s WHERE s.image_id = i.id)
+    ORDER BY i.id
+    LIMIT ?
+    ''', (story_id, after_image_id, limit))
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def count_remaining_images(conn: sqlite3.Connection, story_id: int, after_image_id: int) -> int:
+    """Count the untagged images of a story the backfill hasn't looked at yet."""
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT COUNT(*)
+    FROM images i
+    WHERE i.story_id = ? AND i.id > ?
+      AND NOT EXISTS (SELECT 1 FROM image_character_tags t WHERE t.image_id = i.id)
+    ''', (story_id, after_image_id))
+    return cursor.fetchone()[0]
+
+
+class _AutoTagSignals(QObject):
+    """Signals for auto-tag backfill jobs (QRunnable can't define signals itself)."""
+
+    progress = pyqtSignal(object)  # summary so far, after each batch
+    finished = pyqtSignal(object)  # final summary
+
+
+class AutoTagBackfillJob(QRunnable):
+    """Background job that suggests character tags for a story's untagged images."""
+
+    def __init__(self, db_conn: sqlite3.Connection, story_id: int, batch_size: int = BATCH_SIZE,
+                 threshold: float = AUTO_TAG_THRESHOLD, duty_cycle: float = DEFAULT_DUTY_CYCLE,
+                 use_faces: bool = True, max_images: Optional[int] = None):
+        """Initialize the job.
+
+        Args:
+            db_conn: Database connection of the GUI thread
+            story_id: ID of the story
+            batch_size: Images per checkpoint
+            threshold: Minimum similarity of a suggestion
+            duty_cycle: Share of the time spent working (1 never pauses)
+            use_faces: Whether to suggest recognized faces too (if face recognition is installed)
+            max_images: Stop after this many images (None for all)
+        """
+        super().__init__()
+        self.setAutoDelete(False)
+        self.db_conn = db_conn
+        self.db_path = get_database_path(db_conn)
+        self.story_id = story_id
+        self.batch_size = max(1, batch_size)
+        self.threshold = threshold
+        self.duty_cycle = min(1.0, max(0.05, duty_cycle))
+        self.use_faces = use_faces and FaceRecognitionUtil is not None
+        self.max_images = max_images
+
+        self.signals = _AutoTagSignals()
+        self._cancel_event = threading.Event()
+
+    def start(self, pool: Optional[QThreadPool] = None) -> None:
+        """Start the job on a thread pool.
+
+        In-memory databases can't be opened from another thread, so for those
+        the job runs right away on the calling thread.
+
+        Args:
+            pool: Thread pool to use (the global pool if None)
+        """
+        if self.db_path:
+            (pool or QThreadPool.globalInstance()).start(self)
+        else:
+            self.run()
+
+    def cancel(self) -> None:
+        """Stop after the current image (safe to call from any thread)."""
+        self._cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        """Check whether the job has been cancelled."""
+        return self._cancel_event.is_set()
+
+    def run(self) -> None:
+        """Run the backfill at idle priority and report the summary."""
+        thread = QThread.currentThread()
+        priority = thread.priority()
+        if self.db_path:
+            thread.setPriority(QThread.Priority.IdlePriority)
+        try:
+            conn = get_worker_connection(self.db_path) if self.db_path else self.db_conn
+            summary = self.process(conn)
+        except Exception as e:
+            print(f"Error during auto-tagging: {e}")
+            summary = self._new_summary()
+            summary['errors'].append(('', str(e)))
+        finally:
+            # Pool threads are reused by other jobs
+            if self.db_path and priority != QThread.Priority.InheritPriority:
+                thread.setPriority(priority)
+        self.signals.finished.emit(summary)
+
+    def process(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+        """Suggest tags for the untagged images after the checkpoint.
+
+        Args:
+            conn: Database connection owned by the calling thread
+
+        Returns:
+            Summary with 'processed', 'suggested' (images with suggestions),
+            'suggestions', 'remaining', 'last_image_id', 'errors' (list of
+            (path, message)), 'elapsed', 'busy' (seconds spent working),
+            'completed' and 'cancelled'
+        """
+        start_time = time.perf_counter()
+        summary = self._new_summary()
+
+        recognition = ImageRecognitionUtil(conn)
+        faces = self._create_face_recognition(conn)
+        characters = {row['id']: row['name'] for row in conn.execute(
+            "SELECT id, name FROM characters WHERE story_id = ?", (self.story_id,))}
+
+        last_image_id = get_auto_tag_progress(conn, self.story_id)['last_image_id']
+        summary['last_image_id'] = last_image_id
+
+        while not self.is_cancelled():
+            limit = self.batch_size
+            if self.max_images is not None:
+                limit = min(limit, self.max_images - summary['processed'])
+                if limit <= 0:
+                    break
+            images = get_untagged_images(conn, self.story_id, last_image_id, limit)
+            if not images:
+                summary['completed'] = True
+                break
+
+            batch_suggestions = []
+            processed = 0
+            for image in images:
+                if self.is_cancelled():
+                    break
+                image_start = time.perf_counter()
+                try:
+                    batch_suggestions.extend(self.suggest_tags(image, recognition, faces, characters))
+                except Exception as e:
+                    summary['errors'].append((os.path.join(image['path'], image['filename']), str(e)))
+                last_image_id = image['id']
+                processed += 1
+
+                busy = time.perf_counter() - image_start
+                summary['busy'] += busy
+                self._throttle(busy)
+
+            if processed:
+                save_auto_tag_batch(conn, self.story_id, last_image_id, processed, batch_suggestions,
+                                    REVIEW_REASON_AUTO_TAG)
+                summary['processed'] += processed
+                summary['suggestions'] += len(batch_suggestions)
+                summary['suggested'] += len({suggestion['image_id'] for suggestion in batch_suggestions})
+                summary['last_image_id'] = last_image_id
+                summary['elapsed'] = time.perf_counter() - start_time
+                self.signals.progress.emit(dict(summary, errors=list(summary['errors'])))
+
+        summary['remaining'] = count_remaining_images(conn, self.story_id, last_image_id)
+        summary['cancelled'] = self.is_cancelled()
+        summary['elapsed'] = time.perf_counter() - start_time
+        return summary
+
+    def suggest_tags(self, image: Dict[str, Any], recognition: ImageRecognitionUtil,
+                     faces: Optional['FaceRecognitionUtil'], characters: Dict[int, str]) -> List[Dict[str, Any]]:
+        """Find the characters in one image.
+
+        Args:
+            image: Image dictionary with 'id', 'filename' and 'path'
+            recognition: Recognition utility
+            faces: Face recognition utility, or None
+            characters: Names of the story's characters by ID
+
+        Returns:
+            Suggestion dictionaries for save_auto_tag_batch, best first
+        """
+        image_path = os.path.join(image['path'], image['filename'])
+        picture = read_scaled_image(image_path)
+        if picture.isNull():
+            raise IOError("Failed to read image")
+
+        # Best region of each character
+        best: Dict[int, Dict[str, Any]] = {}
+        index = recognition.get_feature_index(self.story_id)
+        with_descriptor = index.reranks(recognition.cascade_top_k)
+        for x, y, width, height in propose_regions():
+            region = picture.copy(QRect(int(x * picture.width()), int(y * picture.height()),
+                                        max(1, int(width * picture.width())), max(1, int(height * picture.height()))))
+            features = recognition.extract_features_from_qimage(region, with_descriptor)
+            scores = index.score_cascade(features, recognition.cascade_top_k, recognition.cascade_budget_ms)
+            for match in rank_character_scores(scores, characters, self.threshold):
+                character_id = match['character_id']
+                if character_id not in best or match['similarity'] > best[character_id]['similarity']:
+                    best[character_id] = self._make_suggestion(
+                        image['id'], character_id, (x, y, width, height), match['similarity'], SOURCE_FEATURES)
+
+        if faces is not None:
+            # Face locations are in pixels of the full-size image
+            size = QImageReader(image_path).size()
+            for face in faces.identify_faces(image_path):
+                character_id = face['character_id']
+                if character_id not in characters or face['confidence'] < self.threshold:
+                    continue
+                top, right, bottom, left = face['location']
+                region = (left / size.width(), top / size.height(),
+                          (right - left) / size.width(), (bottom - top) / size.height())
+                # A recognized face places the tag better than a region of the image
+                if character_id not in best or best[character_id]['source'] != SOURCE_FACES:
+                    best[character_id] = self._make_suggestion(
+                        image['id'], character_id, region, face['confidence'], SOURCE_FACES)
+
+        suggestions = sorted(best.values(), key=lambda suggestion: suggestion['similarity'], reverse=True)
+        return suggestions[:MAX_SUGGESTIONS_PER_IMAGE]
+
+    def _create_face_recognition(self, conn: sqlite3.Connection) -> Optional['FaceRecognitionUtil']:
+        """Create the face recognition utility, or None if it isn't used or has no faces to find."""
+        if not self.use_faces:
+            return None
+        try:
+            faces = FaceRecognitionUtil(conn)
+        except Exception as e:
+            print(f"Face recognition unavailable for auto-tagging: {e}")
+            return None
+        return faces if len(faces.encoding_store) else None
+
+    def _throttle(self, busy: float) -> None:
+        """Pause after an image so the job only works duty_cycle of the time."""
+        if self.duty_cycle < 1.0:
+            self._cancel_event.wait(busy * (1.0 - self.duty_cycle) / self.duty_cycle)
+
+    @staticmethod
+    def _make_suggestion(image_id: int, character_id: int, region: Tuple[float, float, float, float],
+                         similarity: float, source: str) -> Dict[str, Any]:
+        """Create a suggestion, with the region stored by its center like character tags."""
+        x, y, width, height = region
+        return {
+            'image_id': image_id,
+            'character_id': character_id,
+            'x_position': x + width / 2,
+            'y_position': y + height / 2,
+            'width': width,
+            'height': height,
+            'similarity': similarity,
+            'source': source,
+        }
+
+    @staticmethod
+    def _new_summary() -> Dict[str, Any]:
+        """Create an empty summary."""
+        return {
+            'processed': 0,
+            'suggested': 0,
+            'suggestions': 0,
+            'remaining': 0,
+            'last_image_id': 0,
+            'errors': [],
+            'elapsed': 0.0,
+            'busy': 0.0,
+            'completed': False,
+            'cancelled': False,
+        }
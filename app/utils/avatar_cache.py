@@ -0,0 +1,214 @@
+"""
+Avatar Cache Module.
+
+This module keeps decoded, pre-scaled character avatars and the HTML of
+their hover tooltips in memory, so the character lists, cards and tooltips
+don't read, decode and scale the avatar files again every time they are
+shown.
+
+Avatars are cached per file path and fixed bounding size (see the AVATAR_SIZE
+constants), and tooltips per character and display name, with the PNG
+already base64-encoded. Character names and avatar paths are read once per
+story with a single query. Nothing is checked on disk when a cached entry is
+used, so whoever writes an avatar file or changes a character must call
+invalidate() (CharacterDialog does this when it saves).
+
+The cache holds QPixmaps, so it must only be used from the GUI thread.
+"""
+
+import html
+import os
+import sqlite3
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from PyQt6.QtCore import Qt, QBuffer, QByteArray, QIODevice
+from PyQt6.QtGui import QPixmap
+
+from app.utils.color_utils import string_to_color, get_contrasting_text_color
+
+
+# Bounding sizes avatars are scaled to (aspect ratio is kept)
+AVATAR_SIZE_TOOLTIP = (160, 160)
+AVATAR_SIZE_CARD = (150, 170)  # photo area of CharacterCard
+
+# Maximum number of cached scaled avatars and tooltips
+MAX_CACHED_PIXMAPS = 512
+MAX_CACHED_TOOLTIPS = 256
+
+
+class AvatarCache:
+    """In-memory cache of scaled avatars and avatar tooltips."""
+
+    def __init__(self, max_pixmaps: int = MAX_CACHED_PIXMAPS, max_tooltips: int = MAX_CACHED_TOOLTIPS):
+        """Initialize an empty cache.
+
+        Args:
+            max_pixmaps: Maximum number of scaled avatars kept
+            max_tooltips: Maximum number of tooltips kept
+        """
+        self.max_pixmaps = max_pixmaps
+        self.max_tooltips = max_tooltips
+        # (normalized path, width, height) -> scaled pixmap (null if the file can't be read)
+        self.pixmaps: "OrderedDict[Tuple[str, int, int], QPixmap]" = OrderedDict()
+        # (character ID, display name) -> tooltip HTML
+        self.tooltips: "OrderedDict[Tuple[int, str], str]" = OrderedDict()
+        # character ID -> (name, avatar path), or None for unknown characters
+        self.characters: Dict[int, Optional[Tuple[str, Optional[str]]]] = {}
+
+        # Counters, for checking how well the cache works
+        self.hits = 0
+        self.misses = 0
+
+    def get_pixmap(self, avatar_path: Optional[str], size: Tuple[int, int] = AVATAR_SIZE_TOOLTIP) -> Optional[QPixmap]:
+        """Get an avatar scaled to fit a bounding size.
+
+        Args:
+            avatar_path: Path to the avatar file
+            size: (width, height) to fit the avatar into
+
+        Returns:
+            The scaled avatar, or None if there is no readable avatar file
+        """
+        if not avatar_path:
+            return None
+
+        key = (os.path.normcase(os.path.abspath(avatar_path)), size[0], size[1])
+        pixmap = self.pixmaps.get(key)
+        if pixmap is not None:
+            self.hits += 1
+            self.pixmaps.move_to_end(key)
+        else:
+            self.misses += 1
+            pixmap = QPixmap(avatar_path) if os.path.exists(avatar_path) else QPixmap()
+            if not pixmap.isNull():
+                pixmap = pixmap.scaled(
+                    size[0], size[1],
+                    Qt.AspectRatioMode.KeepAspectRatio,
+                    Qt.TransformationMode.SmoothTransformation
+                )
+            self.pixmaps[key] = pixmap
+            while len(self.pixmaps) > self.max_pixmaps:
+                self.pixmaps.popitem(last=False)
+
+        return None if pixmap.isNull() else pixmap
+
+    def get_character(self, conn: sqlite3.Connection, character_id: int) -> Optional[Tuple[str, Optional[str]]]:
+        """Get a character's name and avatar path.
+
+        All characters of the character's story are read with one query the
+        first time any of them is asked for.
+
+        Args:
+            conn: Database connection
+            character_id: ID of the character
+
+        Returns:
+            (name, avatar path) tuple, or None if there is no such character
+        """
+        if character_id not in self.characters:
+            cursor = conn.cursor()
+            cursor.execute('''
+            SELECT id, name, avatar_path FROM characters
+            WHERE story_id = (SELECT story_id FROM characters WHERE id = ?)
+            ''', (character_id,))
+            for row in cursor.fetchall():
+                self.characters[row['id']] = (row['name'], row['avatar_path'])
+            self.characters.setdefault(character_id, None)
+        return self.characters[character_id]
+
+    def get_tooltip_html(self, conn: sqlite3.Connection, character_id: int,
+                         character_name: Optional[str] = None) -> str:
+        """Get the hover tooltip of a character: its name over its avatar.
+
+        Args:
+            conn: Database connection
+            character_id: ID of the character
+            character_name: Name to show (the character's name if None)
+
+        Returns:
+            Tooltip HTML (just the name if the character has no readable avatar)
+        """
+        character = self.get_character(conn, character_id)
+        if character_name is None:
+            character_name = character[0] if character else "Unknown"
+
+        key = (character_id, character_name)
+        tooltip = self.tooltips.get(key)
+        if tooltip is not None:
+            self.hits += 1
+            self.tooltips.move_to_end(key)
+            return tooltip
+
+        self.misses += 1
+        name_html = html.escape(character_name)
+        pixmap = self.get_pixmap(character[1] if character else None, AVATAR_SIZE_TOOLTIP)
+        if pixmap is None:
+            tooltip = f"<b>{name_html}</b>"
+        else:
+            bg_color = string_to_color(character_name)
+            text_color = get_contrasting_text_color(bg_color)
+
+            byte_array = QByteArray()
+            buffer = QBuffer(byte_array)
+            buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+            pixmap.save(buffer, "PNG")
+            image_data = byte_array.toBase64().data().decode()
+
+            width, height = AVATAR_SIZE_TOOLTIP
+            tooltip = f"""
+            <div style="background-color:{bg_color}; color:{text_color}; padding:5px; text-align:center;">
+                <b>{name_html}</b>
+            </div>
+            <div style="text-align:center; padding:5px;">
+                <img src="data:image/png;base64,{image_data}" width="{width}" height="{height}" style="max-width:{width}px; max-height:{height}px;"/>
+            </div>
+            """
+
+        self.tooltips[key] = tooltip
+        while len(self.tooltips) > self.max_tooltips:
+            self.tooltips.popitem(last=False)
+        return tooltip
+
+    def invalidate(self, avatar_path: Optional[str] = None, character_id: Optional[int] = None) -> None:
+        """Forget cached entries after an avatar file or a character has changed.
+
+        Args:
+            avatar_path: Avatar file that was written or removed
+            character_id: Character whose name or avatar changed
+        """
+        character_ids = set()
+        if character_id is not None:
+            character_ids.add(character_id)
+
+        if avatar_path:
+            normalized = os.path.normcase(os.path.abspath(avatar_path))
+            for key in [key for key in self.pixmaps if key[0] == normalized]:
+                del self.pixmaps[key]
+            character_ids.update(
+                cached_id for cached_id, character in self.characters.items()
+                if character and character[1]
+                and os.path.normcase(os.path.abspath(character[1])) == normalized
+            )
+
+        for cached_id in character_ids:
+            self.characters.pop(cached_id, None)
+        for key in [key for key in self.tooltips if key[0] in character_ids]:
+            del self.tooltips[key]
+
+    def clear(self) -> None:
+        """Forget everything."""
+        self.pixmaps.clear()
+        self.tooltips.clear()
+        self.characters.clear()
+
+
+_avatar_cache: Optional[AvatarCache] = None
+
+
+def get_avatar_cache() -> AvatarCache:
+    """Get the application's shared avatar cache."""
+    global _avatar_cache
+    if _avatar_cache is None:
+        _avatar_cache = AvatarCache()
+    return _avatar_cache
@@ -0,0 +1,371 @@
+"""
+Bulk Import Module.
+
+This module imports many image files into a story at once, without the
+interactive tagging dialog.
+
+Files are decoded, hashed, copied into the story and thumbnailed on a pool of
+worker threads (Qt's image code releases the GIL, so threads run in
+parallel). Finished images are inserted into the database in batches, one
+transaction per batch, and queued for character tag review. Files that were
+imported before (same source path) or whose pixels match an image already in
+the story are skipped as duplicates.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Any, Optional
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QImage
+
+from app.db_sqlite import (
+    create_images_batch, get_story_content_hashes, get_story_source_paths,
+    add_images_to_tag_review_queue, save_image_descriptors
+)
+from app.utils.image_descriptors import compute_descriptor, descriptor_to_blob, DESCRIPTOR_VERSION
+from app.utils.image_prefetcher import get_database_path, get_worker_connection
+from app.utils.ingest_pipeline import (
+    compute_image_hash, generate_thumbnail, store_original,
+    DEFAULT_ENCODE_FORMAT, DEFAULT_ENCODE_QUALITY
+)
+from app.utils.perceptual_hash import compute_dhash, hash_to_hex
+
+
+# File extensions picked up from folders
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp', '.tif', '.tiff')
+
+# Images inserted per database transaction
+BATCH_SIZE = 50
+
+# Reason stored in the tag review queue
+REVIEW_REASON_BULK_IMPORT = 'bulk_import'
+
+# Outcomes of preparing one file
+STATUS_IMPORTED = 'imported'
+STATUS_DUPLICATE = 'duplicate'
+STATUS_FAILED = 'failed'
+
+
+def collect_image_files(paths: List[str], recursive: bool = True) -> List[str]:
+    """Expand files and folders into a sorted list of image files.
+
+    Args:
+        paths: File and folder paths
+        recursive: Whether to include images in subfolders
+
+    Returns:
+        Absolute paths of the image files, without duplicates
+    """
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                for folder, _, filenames in os.walk(path):
+                    for filename in filenames:
+                        if filename.lower().endswith(IMAGE_EXTENSIONS):
+                            files.add(os.path.abspath(os.path.join(folder, filename)))
+            else:
+                for filename in os.listdir(path):
+                    full_path = os.path.join(path, filename)
+                    if os.path.isfile(full_path) and filename.lower().endswith(IMAGE_EXTENSIONS):
+                        files.add(os.path.abspath(full_path))
+        elif os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+            files.add(os.path.abspath(path))
+    return sorted(files)
+
+
+def prepare_image_file(source_path: str, images_folder: str, thumbnails_folder: str,
+                       claim_hash: Callable[[str], bool],
+                       encode_format: str = DEFAULT_ENCODE_FORMAT,
+                       encode_quality: int = DEFAULT_ENCODE_QUALITY,
+                       release_hash: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Decode, deduplicate, store and thumbnail one file (safe to run on worker threads).
+
+    Args:
+        source_path: Path of the file to import
+        images_folder: Story images folder
+        thumbnails_folder: Story thumbnails folder
+        claim_hash: Called with the content hash; returns False if the image
+            is a duplicate, otherwise records the hash and returns True
+        encode_format: Format for files that can't be kept as they are
+        encode_quality: Quality for files that can't be kept as they are
+        release_hash: Called with a claimed content hash if the file fails
+            after claiming it, so another copy of the image can still be imported
+
+    Returns:
+        Dictionary with 'status' and 'source_path', plus 'error' for failures
+        and the image row fields and 'written_files' (the stored original and
+        thumbnail) for imported images
+    """
+    result = {'status': STATUS_FAILED, 'source_path': source_path}
+    written_files: List[str] = []
+    claimed_hash = None
+    try:
+        with open(source_path, 'rb') as source_file:
+            data = source_file.read()
+
+        image = QImage.fromData(data)
+        if image.isNull():
+            result['error'] = "Not a valid image"
+            return result
+
+        content_hash = compute_image_hash(image)
+        if not claim_hash(content_hash):
+            result['status'] = STATUS_DUPLICATE
+            return result
+        claimed_hash = content_hash
+
+        filename, full_path, mime_type = store_original(
+            image, data, images_folder, encode_format, encode_quality, written_files
+        )
+
+        os.makedirs(thumbnails_folder, exist_ok=True)
+        thumbnail_path = os.path.join(thumbnails_folder, filename)
+        written_files.append(thumbnail_path)
+        if not generate_thumbnail(image).save(thumbnail_path, "PNG"):
+            raise IOError("Failed to save thumbnail.")
+
+        result.update({
+            'status': STATUS_IMPORTED,
+            'filename': filename,
+            'path': images_folder,
+            'width': image.width(),
+            'height': image.height(),
+            'file_size': os.path.getsize(full_path),
+            'mime_type': mime_type,
+            'content_hash': content_hash,
+            'perceptual_hash': hash_to_hex(compute_dhash(image)),
+            'descriptor': descriptor_to_blob(compute_descriptor(image)),
+            'written_files': written_files,
+        })
+    except Exception as e:
+        remove_files(written_files)
+        if claimed_hash is not None and release_hash is not None:
+            release_hash(claimed_hash)
+        result['error'] = str(e)
+
+    return result
+
+
+def remove_files(paths: List[str]) -> None:
+    """Delete files that were written for an image that isn't imported."""
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class _BulkImportSignals(QObject):
+    """Signals for bulk import jobs (QRunnable can't define signals itself)."""
+
+    progress = pyqtSignal(object)  # summary so far
+    finished = pyqtSignal(object)  # final summary
+
+
+class BulkImportJob(QRunnable):
+    """Background job that imports many image files into a story."""
+
+    def __init__(self, db_conn: sqlite3.Connection, story_id: int, images_folder: str,
+                 thumbnails_folder: str, file_paths: List[str], max_workers: Optional[int] = None,
+                 batch_size: int = BATCH_SIZE, encode_format: str = DEFAULT_ENCODE_FORMAT,
+                 encode_quality: int = DEFAULT_ENCODE_QUALITY,
+                 review_reason: str = REVIEW_REASON_BULK_IMPORT):
+        """Initialize the job.
+
+        Args:
+            db_conn: Database connection of the GUI thread
+            story_id: ID of the story to import into
+            images_folder: Story images folder
+            thumbnails_folder: Story thumbnails folder
+            file_paths: Image files to import
+            max_workers: Number of worker threads (defaults to the CPU count, up to 8)
+            batch_size: Images inserted per database transaction
+            encode_format: Format for files that can't be kept as they are
+            encode_quality: Quality for files that can't be kept as they are
+            review_reason: Reason stored with the images in the tag review queue
+        """
+        super().__init__()
+        self.setAutoDelete(False)
+        self.db_conn = db_conn
+        self.db_path = get_database_path(db_conn)
+        self.story_id = story_id
+        self.images_folder = images_folder
+        self.thumbnails_folder = thumbnails_folder
+        self.file_paths = list(file_paths)
+        self.max_workers = max_workers or min(8, os.cpu_count() or 2)
+        self.batch_size = max(1, batch_size)
+        self.encode_format = encode_format
+        self.encode_quality = encode_quality
+        self.review_reason = review_reason
+
+        self.signals = _BulkImportSignals()
+        self._cancel_event = threading.Event()
+        self._hash_lock = threading.Lock()
+        self._known_hashes: set = set()
+
+    def start(self, pool: Optional[QThreadPool] = None) -> None:
+        """Start the job on a thread pool.
+
+        In-memory databases can't be opened from another thread, so for those
+        the job runs right away on the calling thread.
+
+        Args:
+            pool: Thread pool to use (the global pool if None)
+        """
+        if self.db_path:
+            (pool or QThreadPool.globalInstance()).start(self)
+        else:
+            self.run()
+
+    def cancel(self) -> None:
+        """Stop after the files being processed right now (safe to call from any thread)."""
+        self._cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        """Check whether the job has been cancelled."""
+        return self._cancel_event.is_set()
+
+    def run(self) -> None:
+        """Import the files and report the summary."""
+        conn = get_worker_connection(self.db_path) if self.db_path else self.db_conn
+        try:
+            summary = self.process(conn)
+        except Exception as e:
+            print(f"Error during bulk import: {e}")
+            summary = self._new_summary()
+            summary['errors'].append(('', str(e)))
+        self.signals.finished.emit(summary)
+
+    def process(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+        """Import the files.
+
+        Args:
+            conn: Database connection owned by the calling thread
+
+        Returns:
+            Summary dictionary with 'total', 'processed', 'imported',
+            'duplicates', 'duplicate_paths', 'failed', 'errors' (list of
+            (path, message)), 'image_ids', 'elapsed', 'images_per_second'
+            and 'cancelled'
+        """
+        summary = self._new_summary()
+        start_time = time.perf_counter()
+
+        self._known_hashes = get_story_content_hashes(conn, self.story_id)
+        imported_sources = get_story_source_paths(conn, self.story_id)
+
+        # Files imported before are skipped without reading them
+        pending_paths = []
+        for path in self.file_paths:
+            if path in imported_sources:
+                summary['duplicates'] += 1
+                summary['processed'] += 1
+            else:
+                pending_paths.append(path)
+
+        batch: List[Dict[str, Any]] = []
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = [
+                executor.submit(prepare_image_file, path, self.images_folder, self.thumbnails_folder,
+                                self._claim_hash, self.encode_format, self.encode_quality, self._release_hash)
+                for path in pending_paths
+            ]
+
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                result = future.result()
+                summary['processed'] += 1
+
+                if result['status'] == STATUS_IMPORTED:
+                    batch.append(result)
+                    if len(batch) >= self.batch_size:
+                        self._insert_batch(conn, batch, summary)
+                        batch = []
+                elif result['status'] == STATUS_DUPLICATE:
+                    summary['duplicates'] += 1
+                    summary['duplicate_paths'].append(result['source_path'])
+                else:
+                    summary['failed'] += 1
+                    summary['errors'].append((result['source_path'], result.get('error', '')))
+
+                self._update_rate(summary, start_time)
+                self.signals.progress.emit(dict(summary))
+
+                if self.is_cancelled() and not summary['cancelled']:
+                    # Drop the queued files; the ones already running still finish
+                    summary['cancelled'] = True
+                    for pending in futures:
+                        pending.cancel()
+        finally:
+            executor.shutdown(wait=True)
+
+        # Files that were fully prepared before a cancel are still added
+        if batch:
+            self._insert_batch(conn, batch, summary)
+
+        self._update_rate(summary, start_time)
+        return summary
+
+    def _claim_hash(self, content_hash: str) -> bool:
+        """Record a content hash, or report it as a duplicate (called from worker threads)."""
+        with self._hash_lock:
+            if content_hash in self._known_hashes:
+                return False
+            self._known_hashes.add(content_hash)
+            return True
+
+    def _release_hash(self, content_hash: str) -> None:
+        """Forget a claimed content hash of an image that wasn't imported (called from worker threads)."""
+        with self._hash_lock:
+            self._known_hashes.discard(content_hash)
+
+    def _insert_batch(self, conn: sqlite3.Connection, batch: List[Dict[str, Any]],
+                      summary: Dict[str, Any]) -> None:
+        """Insert a batch of prepared images and queue them for tag review.
+
+        If the insert fails, the batch's files are deleted and its hashes
+        released, so the images count as failed and can be imported again.
+        """
+        try:
+            image_ids = create_images_batch(conn, self.story_id, batch)
+        except sqlite3.Error as e:
+            for image in batch:
+                remove_files(image['written_files'])
+                self._release_hash(image['content_hash'])
+                summary['failed'] += 1
+                summary['errors'].append((image['source_path'], str(e)))
+            return
+        save_image_descriptors(conn, self.story_id,
+                               [(image_id, image['descriptor']) for image_id, image in zip(image_ids, batch)],
+                               DESCRIPTOR_VERSION)
+        add_images_to_tag_review_queue(conn, self.story_id, image_ids, self.review_reason)
+        summary['imported'] += len(image_ids)
+        summary['image_ids'].extend(image_ids)
+
+    def _new_summary(self) -> Dict[str, Any]:
+        """Create an empty summary."""
+        return {
+            'total': len(self.file_paths),
+            'processed': 0,
+            'imported': 0,
+            'duplicates': 0,
+            'duplicate_paths': [],
+            'failed': 0,
+            'errors': [],
+            'image_ids': [],
+            'elapsed': 0.0,
+            'images_per_second': 0.0,
+            'cancelled': False,
+        }
+
+    @staticmethod
+    def _update_rate(summary: Dict[str, Any], start_time: float) -> None:
+        """Update the elapsed time and throughput in a summary."""
+        summary['elapsed'] = time.perf_counter() - start_time
+        if summary['elapsed'] > 0:
+            summary['images_per_second'] = summary['processed'] / summary['elapsed']
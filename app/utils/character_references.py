@@ -10,6 +10,9 @@ import sqlite3
 from typing import Dict, List, Any, Optional, Set, Tuple
 
 
+# Pattern of a persistent character reference; group 1 is the character ID
+CHAR_REF_PATTERN = re.compile(r'\[char:(\d+)\]')
+
 def convert_mentions_to_char_refs(text: str, characters: List[Dict[str, Any]]) -> str:
     """Convert @mentions in text to [char:ID] references.
     
@@ -95,7 +98,7 @@ def convert_char_refs_to_mentions(text: str, characters: List[Dict[str, Any]]) -
             return match.group(0)  # Keep original if not a valid ID
     
     # Replace all [char:ID] references with @mentions
-    result = re.sub(r'\[char:(\d+)\]', replace_reference, text)
+    result = CHAR_REF_PATTERN.sub(replace_reference, text)
     
     return result
 
@@ -113,7 +116,7 @@ def extract_character_ids(text: str) -> Set[int]:
         return set()
     
     # Find all [char:ID] references
-    matches = re.findall(r'\[char:(\d+)\]', text)
+    matches = CHAR_REF_PATTERN.findall(text)
     
     # Convert to integers and return as a set
     return {int(char_id) for char_id in matches if char_id.isdigit()}
@@ -141,7 +144,7 @@ def find_mentioned_characters(text: str, characters: List[Dict[str, Any]]) -> Li
     mentioned_chars = set()
     
     # Check for [char:ID] references
-    char_id_matches = re.findall(r'\[char:(\d+)\]', text)
+    char_id_matches = CHAR_REF_PATTERN.findall(text)
     for char_id in char_id_matches:
         if char_id in char_by_id:
             mentioned_chars.add(char_by_id[char_id]['id'])
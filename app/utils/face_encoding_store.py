@@ -0,0 +1,281 @@
+"""
+Face Encoding Store Module.
+
+This module keeps the face encodings of characters in the face_encodings
+table itself, as 128 little-endian float32 values in the encoding column,
+instead of one pickle file per encoding. FaceEncodingStore reads all of them
+with a single query and np.frombuffer into a nearest neighbor index (see
+ann_index.py), which compares a face with every stored encoding at once
+while there are few of them, and only with the closest part of them after.
+
+Encodings saved by older versions as pickle files (encoding_path) are
+converted when the table is opened. Their files are no longer referenced
+afterwards, so the storage cleanup collects them; nothing is unpickled
+anywhere else.
+"""
+
+import pickle
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.ann_index import IVFIndex
+
+
+# Layout of the encoding column
+ENCODING_SIZE = 128
+ENCODING_DTYPE = np.dtype('<f4')
+ENCODING_BLOB_SIZE = ENCODING_SIZE * ENCODING_DTYPE.itemsize
+
+# Name of the encodings' index in the ann_indexes table
+FACE_INDEX_NAME = 'face_encodings'
+
+# Closest encodings looked at per face once the index is too large to compare every encoding
+FACE_SEARCH_CANDIDATES = 64
+
+
+def create_face_encodings_table(conn: sqlite3.Connection) -> None:
+    """Create the face_encodings table if it doesn't exist, and bring it up to date.
+
+    Args:
+        conn: Database connection
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS face_encodings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        character_id INTEGER NOT NULL,
+        encoding_path TEXT NOT NULL,
+        confidence REAL NOT NULL DEFAULT 1.0,
+        is_avatar INTEGER NOT NULL DEFAULT 0,
+        image_id INTEGER,
+        x INTEGER,
+        y INTEGER,
+        width INTEGER,
+        height INTEGER,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        encoding BLOB,
+        FOREIGN KEY (character_id) REFERENCES characters (id) ON DELETE CASCADE,
+        FOREIGN KEY (image_id) REFERENCES images (id) ON DELETE CASCADE
+    )
+    ''')
+
+    # Add index for fast querying by character_id
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_face_encodings_character_id ON face_encodings(character_id)')
+
+    conn.commit()
+
+    migrate_face_encodings_table(conn)
+
+
+def migrate_face_encodings_table(conn: sqlite3.Connection) -> int:
+    """Move face encodings stored in pickle files into the table.
+
+    Converted rows get an empty encoding_path. Rows whose file can't be read
+    are left as they are (and are ignored by FaceEncodingStore).
+
+    Args:
+        conn: Database connection
+
+    Returns:
+        Number of encodings converted
+    """
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(face_encodings)")
+    column_names = [col['name'] for col in cursor.fetchall()]
+    if 'encoding' not in column_names:
+        print("Adding encoding column to face_encodings table")
+        cursor.execute('''
+        ALTER TABLE face_encodings
+        ADD COLUMN encoding BLOB
+        ''')
+        conn.commit()
+
+    cursor.execute('''
+    SELECT id, encoding_path
+    FROM face_encodings
+    WHERE encoding IS NULL AND encoding_path != ''
+    ''')
+
+    converted = []
+    for row in cursor.fetchall():
+        try:
+            with open(row['encoding_path'], 'rb') as f:
+                encoding = pickle.load(f)
+            converted.append((encode_face_encoding(encoding), row['id']))
+        except (OSError, pickle.PickleError, EOFError, ValueError) as e:
+            print(f"Error converting face encoding {row['encoding_path']}: {e}")
+
+    if converted:
+        cursor.executemany('''
+        UPDATE face_encodings
+        SET encoding = ?, encoding_path = ''
+        WHERE id = ?
+        ''', converted)
+        conn.commit()
+        print(f"Moved {len(converted)} face encodings from pickle files into the database")
+    return len(converted)
+
+
+def encode_face_encoding(encoding: np.ndarray) -> bytes:
+    """Encode a face encoding for the encoding column.
+
+    Args:
+        encoding: 128-dimensional face encoding
+
+    Returns:
+        Encoding blob
+    """
+    encoding = np.asarray(encoding, dtype=ENCODING_DTYPE).ravel()
+    if encoding.size != ENCODING_SIZE:
+        raise ValueError(f"Face encodings have {ENCODING_SIZE} values, not {encoding.size}")
+    return encoding.tobytes()
+
+
+def get_face_encodings_signature(conn: sqlite3.Connection) -> Tuple[int, int]:
+    """Get the number of face encoding rows and the highest ID.
+
+    Args:
+        conn: Database connection
+
+    Returns:
+        (row count, highest ID) tuple, which changes whenever rows are added or deleted
+    """
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*), COALESCE(MAX(id), 0) FROM face_encodings')
+    count, max_id = cursor.fetchone()
+    return count, max_id
+
+
+class FaceEncodingStore:
+    """Face encodings of every character, kept in memory in a nearest neighbor index."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        """Initialize the store and load the encodings.
+
+        Args:
+            conn: Database connection
+        """
+        self.conn = conn
+        # Encoding IDs in ascending order, and the character of each
+        self.encoding_ids = np.zeros(0, dtype=np.int64)
+        self.character_ids = np.zeros(0, dtype=np.int64)
+        # Created by the first refresh
+        self.index: Optional[IVFIndex] = None
+        # Table signature the encodings were loaded with
+        self.signature: Optional[Tuple[int, int]] = None
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Add and remove encodings that were added to or deleted from the table since they were loaded.
+
+        The index's lists are saved whenever it has been trained again.
+        """
+        signature = get_face_encodings_signature(self.conn)
+        if signature == self.signature:
+            return
+
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT id, character_id
+        FROM face_encodings
+        WHERE LENGTH(encoding) = ?
+        ORDER BY id
+        ''', (ENCODING_BLOB_SIZE,))
+        rows = cursor.fetchall()
+        encoding_ids = np.array([row['id'] for row in rows], dtype=np.int64)
+        character_ids = np.array([row['character_id'] for row in rows], dtype=np.int64)
+
+        added = np.setdiff1d(encoding_ids, self.encoding_ids, assume_unique=True)
+        removed = np.setdiff1d(self.encoding_ids, encoding_ids, assume_unique=True)
+        encodings = self._load_encodings(added)
+
+        if self.index is None:
+            self.index = IVFIndex.load(self.conn, FACE_INDEX_NAME, added, encodings)
+        else:
+            self.index.remove(removed.tolist())
+            self.index.add(added, encodings)
+
+        if self.index.is_trained() and not self.index.saved:
+            self.index.save(self.conn, FACE_INDEX_NAME)
+
+        self.encoding_ids = encoding_ids
+        self.character_ids = character_ids
+        self.signature = signature
+
+    def _load_encodings(self, encoding_ids: np.ndarray) -> np.ndarray:
+        """Read encodings from the table.
+
+        Args:
+            encoding_ids: IDs of the encodings, in ascending order
+
+        Returns:
+            (n, ENCODING_SIZE) array, in the order of the IDs
+        """
+        if not len(encoding_ids):
+            return np.zeros((0, ENCODING_SIZE), dtype=ENCODING_DTYPE)
+
+        # New encodings usually have the highest IDs, so only those rows are read
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT id, encoding
+        FROM face_encodings
+        WHERE LENGTH(encoding) = ? AND id >= ?
+        ORDER BY id
+        ''', (ENCODING_BLOB_SIZE, int(encoding_ids[0])))
+        rows = cursor.fetchall()
+        row_ids = np.array([row['id'] for row in rows], dtype=np.int64)
+        wanted = np.isin(row_ids, encoding_ids)
+        return np.frombuffer(b''.join(row['encoding'] for row, keep in zip(rows, wanted) if keep),
+                             dtype=ENCODING_DTYPE).reshape(-1, ENCODING_SIZE)
+
+    def get_character_encodings(self, character_id: Optional[int] = None) -> Dict[int, List[np.ndarray]]:
+        """Get the encodings of characters.
+
+        Args:
+            character_id: Character to get the encodings of, or None for all
+
+        Returns:
+            Dictionary mapping character IDs to lists of face encodings
+        """
+        self.refresh()
+        encodings_by_character: Dict[int, List[np.ndarray]] = {}
+        for encoding_id, char_id in zip(self.encoding_ids.tolist(), self.character_ids.tolist()):
+            if character_id is None or char_id == character_id:
+                row = self.index.row_by_id[encoding_id]
+                encodings_by_character.setdefault(char_id, []).append(self.index.vectors[row].copy())
+        return encodings_by_character
+
+    def get_closest_distances(self, encoding: np.ndarray,
+                              candidates: int = FACE_SEARCH_CANDIDATES) -> Dict[int, float]:
+        """Compare a face with the stored encodings.
+
+        While the index is small every encoding is compared, and every
+        character is in the result. Otherwise only the characters of the
+        closest candidates the index finds are.
+
+        Args:
+            encoding: Encoding of the face
+            candidates: Number of closest encodings to look at when the index is large
+
+        Returns:
+            Dictionary mapping character IDs to the Euclidean distance of their closest encoding
+        """
+        self.refresh()
+        if not len(self.index):
+            return {}
+
+        count = len(self.index) if self.index.is_exact() else candidates
+        encoding_ids, distances = self.index.search(encoding, count)
+        character_ids = self.character_ids[np.searchsorted(self.encoding_ids, encoding_ids)]
+
+        # Distances are in ascending order, so the first one of each character is its closest
+        character_ids, first = np.unique(character_ids, return_index=True)
+        return dict(zip(character_ids.tolist(), distances[first].tolist()))
+
+    def __len__(self) -> int:
+        """Get the number of stored encodings."""
+        return len(self.encoding_ids)
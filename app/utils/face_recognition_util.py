@@ -6,9 +6,10 @@ from pathlib import Path
 import sqlite3
 import face_recognition  # Will need to be installed
 from PyQt6.QtGui import QImage
-import pickle
 from datetime import datetime
 
+from app.utils.face_encoding_store import FaceEncodingStore, create_face_encodings_table, encode_face_encoding
+
 
 class FaceRecognitionUtil:
     """Utility for handling facial recognition in the application."""
@@ -34,33 +35,13 @@ class FaceRecognitionUtil:
         
         # Ensure face encodings table exists
         self._create_face_encodings_table()
+        
+        # All encodings, loaded once as one matrix
+        self.encoding_store = FaceEncodingStore(self.db_conn)
     
     def _create_face_encodings_table(self) -> None:
         """Create the face_encodings table if it doesn't exist."""
-        cursor = self.db_conn.cursor()
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS face_encodings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            character_id INTEGER NOT NULL,
-            encoding_path TEXT NOT NULL,
-            confidence REAL NOT NULL DEFAULT 1.0,
-            is_avatar INTEGER NOT NULL DEFAULT 0,
-            image_id INTEGER,
-            x INTEGER,
-            y INTEGER,
-            width INTEGER,
-            height INTEGER,
-            created_at TEXT NOT NULL,
-            updated_at TEXT NOT NULL,
-            FOREIGN KEY (character_id) REFERENCES characters (id) ON DELETE CASCADE,
-            FOREIGN KEY (image_id) REFERENCES images (id) ON DELETE CASCADE
-        )
-        ''')
-        
-        # Add index for fast querying by character_id
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_face_encodings_character_id ON face_encodings(character_id)')
-        
-        self.db_conn.commit()
+        create_face_encodings_table(self.db_conn)
     
     def extract_faces_from_image(self, image_path: str) -> List[Dict[str, Any]]:
         """Extract face locations and encodings from an image.
@@ -102,14 +83,9 @@ class FaceRecognitionUtil:
         Returns:
             ID of the saved encoding
         """
-        # Generate a unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        encoding_filename = f"face_{character_id}_{timestamp}.pkl"
-        encoding_path = os.path.join(self.cache_dir, encoding_filename)
-        
-        # Save the encoding to disk
-        with open(encoding_path, 'wb') as f:
-            pickle.dump(encoding, f)
+        # The encoding is stored in the row itself; encoding_path is only set
+        # for encodings of older versions that haven't been converted
+        encoding_blob = encode_face_encoding(encoding)
         
         # Save to database
         cursor = self.db_conn.cursor()
@@ -119,21 +95,21 @@ class FaceRecognitionUtil:
             top, right, bottom, left = location
             cursor.execute('''
             INSERT INTO face_encodings (
-                character_id, encoding_path, is_avatar, image_id, 
+                character_id, encoding_path, encoding, is_avatar, image_id, 
                 x, y, width, height, created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ) VALUES (?, '', ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
-                character_id, encoding_path, 1 if is_avatar else 0, image_id,
+                character_id, encoding_blob, 1 if is_avatar else 0, image_id,
                 left, top, right - left, bottom - top, now, now
             ))
         else:
             cursor.execute('''
             INSERT INTO face_encodings (
-                character_id, encoding_path, is_avatar, image_id, 
+                character_id, encoding_path, encoding, is_avatar, image_id, 
                 created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?)
+            ) VALUES (?, '', ?, ?, ?, ?, ?)
             ''', (
-                character_id, encoding_path, 1 if is_avatar else 0, image_id,
+                character_id, encoding_blob, 1 if is_avatar else 0, image_id,
                 now, now
             ))
         
@@ -149,42 +125,7 @@ class FaceRecognitionUtil:
         Returns:
             Dictionary mapping character IDs to lists of face encodings
         """
-        cursor = self.db_conn.cursor()
-        
-        if character_id:
-            cursor.execute('''
-            SELECT id, character_id, encoding_path
-            FROM face_encodings
-            WHERE character_id = ?
-            ''', (character_id,))
-        else:
-            cursor.execute('''
-            SELECT id, character_id, encoding_path
-            FROM face_encodings
-            ''')
-        
-        results = cursor.fetchall()
-        
-        # Group encodings by character
-        encodings_by_character = {}
-        for row in results:
-            row_dict = dict(row)
-            char_id = row_dict['character_id']
-            encoding_path = row_dict['encoding_path']
-            
-            # Load encoding from disk
-            try:
-                with open(encoding_path, 'rb') as f:
-                    encoding = pickle.load(f)
-                
-                if char_id not in encodings_by_character:
-                    encodings_by_character[char_id] = []
-                
-                encodings_by_character[char_id].append(encoding)
-            except (FileNotFoundError, pickle.PickleError) as e:
-                print(f"Error loading face encoding {encoding_path}: {e}")
-        
-        return encodings_by_character
+        return self.encoding_store.get_character_encodings(character_id)
     
     def identify_faces(self, image_path: str, tolerance: float = 0.6) -> List[Dict[str, Any]]:
         """Identify characters in an image based on face recognition.
@@ -200,10 +141,7 @@ class FaceRecognitionUtil:
                 'location': (top, right, bottom, left)
             }
         """
-        # Get face encodings for all characters
-        character_encodings = self.get_character_face_encodings()
-        
-        if not character_encodings:
+        if not len(self.encoding_store):
             return []
         
         # Extract faces from the image
@@ -217,33 +155,20 @@ class FaceRecognitionUtil:
         
         # For each face found in the image
         for face in faces:
-            face_encoding = face['encoding']
-            face_location = face['location']
-            
-            best_match = None
-            best_confidence = 0
+            # Distance of the closest encoding of each character
+            distances = self.encoding_store.get_closest_distances(face['encoding'])
+            if not distances:
+                continue
             
-            # Compare against each character's face encodings
-            for character_id, encodings in character_encodings.items():
-                # Calculate face distances
-                face_distances = face_recognition.face_distance(encodings, face_encoding)
-                
-                if len(face_distances) > 0:
-                    # Convert distance to confidence score (0-1)
-                    min_distance = min(face_distances)
-                    confidence = 1.0 - min(min_distance, 1.0)
-                    
-                    # If we found a better match and it's within tolerance
-                    if confidence > best_confidence and min_distance <= tolerance:
-                        best_match = character_id
-                        best_confidence = confidence
+            best_match = min(distances, key=distances.get)
+            min_distance = distances[best_match]
             
-            # If we found a match
-            if best_match:
+            # If the best match is within tolerance, convert distance to confidence score (0-1)
+            if min_distance <= tolerance:
                 recognition_results.append({
                     'character_id': best_match,
-                    'confidence': best_confidence,
-                    'location': face_location
+                    'confidence': 1.0 - min(min_distance, 1.0),
+                    'location': face['location']
                 })
         
         return recognition_results
@@ -0,0 +1,428 @@
+"""
+Character Feature Index Module.
+
+This module keeps the recognition features of characters (the rows of the
+image_features table) in NumPy arrays: one row of color histogram bins and
+one row of scalar features per feature set, with the character each belongs
+to. An image is scored against every feature set at once, with the same
+weighted similarity as ImageRecognitionUtil._calculate_similarity, and the
+best score of each character is taken with a grouped maximum.
+
+An index covers one story (or every story) and is updated in place when
+features are saved through ImageRecognitionUtil. Writes made elsewhere are
+noticed through the table's signature (row count and highest ID), which is
+checked before the index is used.
+
+Features are stored in a binary layout recorded in each row's format_version:
+the scalar features as one packed little-endian record (SCALAR_DTYPE) and the
+histogram as 64 little-endian float32 values, so a whole story is read into
+arrays with np.frombuffer. Rows saved as JSON text by older versions are
+still read; rows of unknown versions are skipped.
+
+Feature sets can also have a descriptor (see DESCRIPTOR_SIZE), stored as
+float32 values in the descriptor column: color histograms of a grid of image
+cells in HSV, followed by gradient orientation histograms of the same cells.
+score_cascade uses it to rerank the best characters of the cheap score, for
+as long as a time budget allows.
+"""
+
+import json
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+# Scalar features compared by the similarity score, with their weights
+SCALAR_FEATURES = ('aspect_ratio', 'brightness', 'colorfulness')
+SCALAR_WEIGHTS = np.array([0.1, 0.2, 0.2])
+# Differences are divided by these before being capped at 1
+SCALAR_SCALES = np.array([2.0, 1.0, 1.0])
+HISTOGRAM_WEIGHT = 0.5
+
+HISTOGRAM_BINS = 64
+
+# Layouts of the feature_data and color_histogram columns (image_features.format_version)
+FEATURE_FORMAT_JSON = 1  # JSON text
+FEATURE_FORMAT_BINARY = 2  # SCALAR_DTYPE record and float32 histogram
+CURRENT_FEATURE_FORMAT = FEATURE_FORMAT_BINARY
+
+SCALAR_DTYPE = np.dtype([
+    ('width', '<i4'),
+    ('height', '<i4'),
+    ('aspect_ratio', '<f8'),
+    ('brightness', '<f8'),
+    ('colorfulness', '<f8'),
+])
+HISTOGRAM_DTYPE = np.dtype('<f4')
+HISTOGRAM_BLOB_SIZE = HISTOGRAM_BINS * HISTOGRAM_DTYPE.itemsize
+
+# Descriptor layout: for each cell of a DESCRIPTOR_GRID x DESCRIPTOR_GRID grid
+# (row by row), an HSV histogram (hue, then saturation, then value), and then
+# for each cell a histogram of edge orientations with a last bin for pixels
+# that aren't on an edge. Every cell histogram sums to 1.
+DESCRIPTOR_GRID = 2
+HUE_BINS = 8
+SATURATION_BINS = 3
+VALUE_BINS = 3
+COLOR_CELL_BINS = HUE_BINS * SATURATION_BINS * VALUE_BINS
+ORIENTATION_BINS = 9
+GRADIENT_CELL_BINS = ORIENTATION_BINS + 1
+DESCRIPTOR_CELLS = DESCRIPTOR_GRID * DESCRIPTOR_GRID
+DESCRIPTOR_COLOR_SIZE = DESCRIPTOR_CELLS * COLOR_CELL_BINS
+DESCRIPTOR_SIZE = DESCRIPTOR_COLOR_SIZE + DESCRIPTOR_CELLS * GRADIENT_CELL_BINS
+DESCRIPTOR_BLOB_SIZE = DESCRIPTOR_SIZE * HISTOGRAM_DTYPE.itemsize
+
+# Weights of the color and gradient parts in the descriptor similarity
+DESCRIPTOR_COLOR_WEIGHT = 0.6
+DESCRIPTOR_GRADIENT_WEIGHT = 0.4
+# Weight of the descriptor similarity in the score of a reranked character
+DESCRIPTOR_WEIGHT = 0.5
+
+# Characters reranked with descriptors, and the time allowed for scoring
+CASCADE_TOP_K = 8
+CASCADE_BUDGET_MS = 25.0
+
+
+def encode_features(features: Dict[str, Any]) -> Tuple[bytes, bytes]:
+    """Encode image features in the current binary layout.
+
+    Args:
+        features: Image features dictionary ('features' and 'color_histogram')
+
+    Returns:
+        (feature_data, color_histogram) blobs
+    """
+    scalars = features['features']
+    record = np.array([(scalars['width'], scalars['height'], scalars['aspect_ratio'],
+                        scalars['brightness'], scalars['colorfulness'])], dtype=SCALAR_DTYPE)
+    histogram = np.asarray(features['color_histogram'], dtype=HISTOGRAM_DTYPE)
+    return record.tobytes(), histogram.tobytes()
+
+
+def encode_descriptor(features: Dict[str, Any]) -> Optional[bytes]:
+    """Encode the descriptor of image features, if they have one.
+
+    Args:
+        features: Image features dictionary
+
+    Returns:
+        Descriptor blob, or None if there is no descriptor of the current size
+    """
+    descriptor = features.get('descriptor')
+    if descriptor is None or len(descriptor) != DESCRIPTOR_SIZE:
+        return None
+    return np.asarray(descriptor, dtype=HISTOGRAM_DTYPE).tobytes()
+
+
+def descriptor_similarity(descriptor: np.ndarray, descriptors: np.ndarray) -> np.ndarray:
+    """Compare a descriptor with rows of descriptors.
+
+    Args:
+        descriptor: Descriptor of an image
+        descriptors: Descriptors to compare it with, one per row
+
+    Returns:
+        Similarity (0-1) with each row: the weighted histogram intersections
+        of the color and gradient parts, averaged over the cells
+    """
+    overlap = np.minimum(descriptors, descriptor)
+    color = overlap[:, :DESCRIPTOR_COLOR_SIZE].sum(axis=1) / DESCRIPTOR_CELLS
+    gradient = overlap[:, DESCRIPTOR_COLOR_SIZE:].sum(axis=1) / DESCRIPTOR_CELLS
+    return color * DESCRIPTOR_COLOR_WEIGHT + gradient * DESCRIPTOR_GRADIENT_WEIGHT
+
+
+def decode_features(feature_data: Any, color_histogram: Any, format_version: int) -> Optional[Dict[str, Any]]:
+    """Decode the stored features of one row.
+
+    Args:
+        feature_data: Stored scalar features
+        color_histogram: Stored color histogram
+        format_version: Layout the row was stored in
+
+    Returns:
+        Image features dictionary, or None if the row can't be read
+    """
+    if format_version == FEATURE_FORMAT_JSON:
+        try:
+            return {
+                'features': json.loads(feature_data),
+                'color_histogram': json.loads(color_histogram)
+            }
+        except (json.JSONDecodeError, TypeError) as e:
+            print(f"Error parsing feature data: {e}")
+            return None
+
+    if format_version == FEATURE_FORMAT_BINARY:
+        if len(feature_data) != SCALAR_DTYPE.itemsize or len(color_histogram) != HISTOGRAM_BLOB_SIZE:
+            return None
+        record = np.frombuffer(feature_data, dtype=SCALAR_DTYPE)[0]
+        return {
+            'features': {name: record[name].item() for name in SCALAR_DTYPE.names},
+            'color_histogram': np.frombuffer(color_histogram, dtype=HISTOGRAM_DTYPE).tolist()
+        }
+
+    # Written by a newer version of the application
+    return None
+
+
+def get_image_features_signature(conn: sqlite3.Connection) -> Tuple[int, int]:
+    """Get the number of feature rows and the highest feature ID.
+
+    Args:
+        conn: Database connection
+
+    Returns:
+        (row count, highest ID) tuple, which changes whenever rows are added or deleted
+    """
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*), COALESCE(MAX(id), 0) FROM image_features')
+    count, max_id = cursor.fetchone()
+    return count, max_id
+
+
+class CharacterFeatureIndex:
+    """Recognition features of characters, stored for vectorized scoring."""
+
+    def __init__(self, story_id: Optional[int] = None):
+        """Initialize an empty index.
+
+        Args:
+            story_id: Story whose characters the index covers, or None for all stories
+        """
+        self.story_id = story_id
+        self.feature_ids: List[int] = []
+        self.character_ids = np.zeros(0, dtype=np.int64)
+        self.histograms = np.zeros((0, HISTOGRAM_BINS), dtype=HISTOGRAM_DTYPE)
+        self.scalars = np.zeros((0, len(SCALAR_FEATURES)))
+        # Descriptors, with a flag for the feature sets that have one
+        self.descriptors = np.zeros((0, DESCRIPTOR_SIZE), dtype=HISTOGRAM_DTYPE)
+        self.has_descriptor = np.zeros(0, dtype=bool)
+        # Table signature the index was last brought up to date with
+        self.signature: Tuple[int, int] = (0, 0)
+        # Characters and the row of each feature set in them, for the grouped maximum
+        self._groups: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @classmethod
+    def build(cls, conn: sqlite3.Connection, story_id: Optional[int] = None) -> 'CharacterFeatureIndex':
+        """Build the index from the database.
+
+        Args:
+            conn: Database connection
+            story_id: Story whose characters to index, or None for all stories
+
+        Returns:
+            The index
+        """
+        index = cls(story_id)
+        index.signature = get_image_features_signature(conn)
+
+        cursor = conn.cursor()
+        if story_id is not None:
+            cursor.execute('''
+            SELECT f.id, f.character_id, f.feature_data, f.color_histogram, f.format_version, f.descriptor
+            FROM image_features f
+            JOIN characters c ON c.id = f.character_id
+            WHERE c.story_id = ?
+            ORDER BY f.id
+            ''', (story_id,))
+        else:
+            cursor.execute('''
+            SELECT id, character_id, feature_data, color_histogram, format_version, descriptor
+            FROM image_features
+            ORDER BY id
+            ''')
+
+        # Binary rows are gathered and read with one frombuffer call per column
+        binary_rows = []
+        other_rows = []
+        for row in cursor.fetchall():
+            if (row['format_version'] == FEATURE_FORMAT_BINARY
+                    and len(row['feature_data']) == SCALAR_DTYPE.itemsize
+                    and len(row['color_histogram']) == HISTOGRAM_BLOB_SIZE):
+                binary_rows.append(row)
+            else:
+                other_rows.append(row)
+
+        feature_ids = [row['id'] for row in binary_rows]
+        character_ids = [row['character_id'] for row in binary_rows]
+        records = np.frombuffer(b''.join(row['feature_data'] for row in binary_rows), dtype=SCALAR_DTYPE)
+        histograms = np.frombuffer(b''.join(row['color_histogram'] for row in binary_rows),
+                                   dtype=HISTOGRAM_DTYPE).reshape(-1, HISTOGRAM_BINS)
+        scalars = np.column_stack([records[name].astype(np.float64) for name in SCALAR_FEATURES])
+
+        # Rows in older layouts are decoded one by one
+        rows = list(binary_rows)
+        extra_histograms, extra_scalars = [], []
+        for row in other_rows:
+            features = decode_features(row['feature_data'], row['color_histogram'], row['format_version'])
+            if features is None:
+                continue
+            try:
+                scalar_row = [features['features'][name] for name in SCALAR_FEATURES]
+            except KeyError as e:
+                print(f"Error parsing feature data: {e}")
+                continue
+            if len(features['color_histogram']) != HISTOGRAM_BINS:
+                print(f"Skipping feature set {row['id']} with {len(features['color_histogram'])} histogram bins")
+                continue
+            feature_ids.append(row['id'])
+            character_ids.append(row['character_id'])
+            extra_histograms.append(features['color_histogram'])
+            extra_scalars.append(scalar_row)
+            rows.append(row)
+
+        if feature_ids:
+            index.feature_ids = feature_ids
+            index.character_ids = np.array(character_ids, dtype=np.int64)
+            if extra_histograms:
+                histograms = np.vstack([histograms, np.array(extra_histograms, dtype=HISTOGRAM_DTYPE)])
+                scalars = np.vstack([scalars, np.array(extra_scalars, dtype=np.float64)])
+            index.histograms = histograms
+            index.scalars = scalars
+
+            # Feature sets without a descriptor get a row of zeros
+            index.has_descriptor = np.array(
+                [row['descriptor'] is not None and len(row['descriptor']) == DESCRIPTOR_BLOB_SIZE for row in rows])
+            index.descriptors = np.zeros((len(rows), DESCRIPTOR_SIZE), dtype=HISTOGRAM_DTYPE)
+            if index.has_descriptor.any():
+                index.descriptors[index.has_descriptor] = np.frombuffer(
+                    b''.join(row['descriptor'] for row, found in zip(rows, index.has_descriptor) if found),
+                    dtype=HISTOGRAM_DTYPE).reshape(-1, DESCRIPTOR_SIZE)
+        return index
+
+    def add(self, feature_id: int, character_id: int, features: Dict[str, Any]) -> None:
+        """Add a feature set to the index.
+
+        Args:
+            feature_id: ID of the image_features row
+            character_id: ID of the character
+            features: Image features dictionary ('features' and 'color_histogram')
+        """
+        self.feature_ids.append(feature_id)
+        self.character_ids = np.append(self.character_ids, character_id)
+        self.histograms = np.vstack([self.histograms, np.asarray(features['color_histogram'], dtype=HISTOGRAM_DTYPE)])
+        self.scalars = np.vstack([self.scalars, [features['features'][name] for name in SCALAR_FEATURES]])
+        descriptor = features.get('descriptor')
+        has_descriptor = descriptor is not None and len(descriptor) == DESCRIPTOR_SIZE
+        self.has_descriptor = np.append(self.has_descriptor, has_descriptor)
+        self.descriptors = np.vstack([
+            self.descriptors,
+            np.asarray(descriptor if has_descriptor else np.zeros(DESCRIPTOR_SIZE), dtype=HISTOGRAM_DTYPE)
+        ])
+        self._groups = None
+
+    def snapshot(self) -> 'CharacterFeatureIndex':
+        """Get a copy of the index that later additions don't change.
+
+        The arrays are shared, since add() replaces them instead of changing
+        them, so this is cheap and the copy can be read on another thread.
+
+        Returns:
+            The copy
+        """
+        index = CharacterFeatureIndex(self.story_id)
+        index.feature_ids = list(self.feature_ids)
+        index.character_ids = self.character_ids
+        index.histograms = self.histograms
+        index.scalars = self.scalars
+        index.descriptors = self.descriptors
+        index.has_descriptor = self.has_descriptor
+        index.signature = self.signature
+        index._groups = self._groups
+        return index
+
+    def score(self, image_features: Dict[str, Any]) -> Dict[int, float]:
+        """Score an image against every character in the index.
+
+        Args:
+            image_features: Features of the image ('features' and 'color_histogram')
+
+        Returns:
+            Dictionary mapping character IDs to their best similarity (0-1)
+        """
+        if not self.feature_ids:
+            return {}
+
+        histogram = np.asarray(image_features['color_histogram'], dtype=np.float64)
+        scalars = np.array([image_features['features'][name] for name in SCALAR_FEATURES])
+
+        # Histogram intersection plus weighted, capped scalar differences
+        differences = np.minimum(np.abs(self.scalars - scalars) / SCALAR_SCALES, 1.0)
+        similarities = (1.0 - differences) @ SCALAR_WEIGHTS
+        similarities += np.minimum(self.histograms, histogram).sum(axis=1) * HISTOGRAM_WEIGHT
+
+        # Best feature set of each character
+        if self._groups is None:
+            self._groups = np.unique(self.character_ids, return_inverse=True)
+        character_ids, groups = self._groups
+        best = np.full(len(character_ids), -np.inf)
+        np.maximum.at(best, groups, similarities)
+        return dict(zip(character_ids.tolist(), best.tolist()))
+
+    def score_cascade(self, image_features: Dict[str, Any], top_k: int = CASCADE_TOP_K,
+                      budget_ms: Optional[float] = CASCADE_BUDGET_MS) -> Dict[int, float]:
+        """Score an image with score(), then rerank the best characters with descriptors.
+
+        The top_k characters of score() are reranked, best first, for as long
+        as the time since the call is within the budget. A reranked
+        character's score mixes its score() similarity with the best
+        descriptor similarity of its feature sets (DESCRIPTOR_WEIGHT).
+        Characters that aren't reranked (too far down, out of time, or without
+        descriptors) keep their score() similarity, but never above the lowest
+        reranked score: mixing in the descriptor usually lowers a score, so
+        otherwise an unchecked character would beat the checked ones.
+
+        Args:
+            image_features: Features of the image ('features', 'color_histogram'
+                and optionally 'descriptor')
+            top_k: Number of characters to rerank (0 to only use score())
+            budget_ms: Time allowed for scoring in milliseconds, or None for no limit
+
+        Returns:
+            Dictionary mapping character IDs to their similarity (0-1)
+        """
+        start = time.perf_counter()
+        scores = self.score(image_features)
+
+        descriptor = image_features.get('descriptor')
+        if not scores or not self.reranks(top_k) or descriptor is None or len(descriptor) != DESCRIPTOR_SIZE:
+            return scores
+
+        descriptor = np.asarray(descriptor, dtype=HISTOGRAM_DTYPE)
+        deadline = None if budget_ms is None else start + budget_ms / 1000.0
+        character_ids, groups = self._groups
+        group_of_character = {character_id: group for group, character_id in enumerate(character_ids.tolist())}
+
+        reranked = {}
+        for character_id in sorted(scores, key=scores.get, reverse=True)[:top_k]:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            rows = np.flatnonzero((groups == group_of_character[character_id]) & self.has_descriptor)
+            if not len(rows):
+                continue
+            best = float(descriptor_similarity(descriptor, self.descriptors[rows]).max())
+            reranked[character_id] = scores[character_id] * (1.0 - DESCRIPTOR_WEIGHT) + best * DESCRIPTOR_WEIGHT
+
+        if reranked:
+            # Just below the lowest reranked score, so reranked characters come first
+            ceiling = float(np.nextafter(min(reranked.values()), -np.inf))
+            for character_id, score in scores.items():
+                scores[character_id] = reranked.get(character_id, min(score, ceiling))
+        return scores
+
+    def reranks(self, top_k: int) -> bool:
+        """Check whether score_cascade reranks with top_k, so a query needs a descriptor.
+
+        Args:
+            top_k: Number of characters to rerank
+
+        Returns:
+            True if top_k is positive and some feature set has a descriptor
+        """
+        return top_k > 0 and bool(self.has_descriptor.any())
+
+    def __len__(self) -> int:
+        """Get the number of feature sets in the index."""
+        return len(self.feature_ids)
@@ -0,0 +1,169 @@
+"""
+Gallery Filter Module.
+
+This module provides an in-memory index of which characters are tagged on
+which images of a story, and evaluates character filter expressions against it.
+
+Each character maps to a bitset (a Python int) with one bit per image, in
+gallery order (newest first). AND/OR/NOT filters are then plain bitwise
+operations, so evaluating a filter or counting its matches does not touch the
+database once the index is built with two queries.
+
+Filter expressions are nested tuples:
+    ('char', character_id)
+    ('and', [expr, ...])
+    ('or', [expr, ...])
+    ('not', expr)
+"""
+
+import sqlite3
+from typing import Dict, List, Any, Optional, Tuple
+
+
+# Match modes for combining included characters
+MATCH_ALL = 'all'
+MATCH_ANY = 'any'
+
+
+def build_filter_expression(character_filters: List[Tuple[int, bool]],
+                            match_mode: str = MATCH_ALL) -> Optional[Tuple]:
+    """Build a filter expression from the gallery filter dialog's criteria.
+
+    Included characters are combined with AND (match_mode 'all') or OR
+    (match_mode 'any'). Every excluded character is always ANDed as NOT.
+
+    Args:
+        character_filters: List of (character_id, include) tuples
+        match_mode: MATCH_ALL or MATCH_ANY
+
+    Returns:
+        The filter expression, or None if there are no filters
+    """
+    included = [('char', character_id) for character_id, include in character_filters if include]
+    excluded = [('not', ('char', character_id)) for character_id, include in character_filters if not include]
+
+    terms = []
+    if included:
+        if match_mode == MATCH_ANY:
+            terms.append(('or', included))
+        else:
+            terms.extend(included)
+    terms.extend(excluded)
+
+    if not terms:
+        return None
+    if len(terms) == 1:
+        return terms[0]
+    return ('and', terms)
+
+
+class CharacterTagIndex:
+    """Per-story index of tagged characters, stored as image bitsets."""
+
+    def __init__(self, db_conn: sqlite3.Connection, story_id: int):
+        """Build the index for a story.
+
+        Args:
+            db_conn: SQLite database connection
+            story_id: ID of the story
+        """
+        self.conn = db_conn
+        self.story_id = story_id
+        self.images: List[sqlite3.Row] = []
+        self.character_bits: Dict[int, int] = {}
+        self.all_bits = 0
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """Reload the index from the database.
+
+        Uses one query for the images and one for all their character tags.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT id, filename, path, title, width, height, created_at
+        FROM images
+        WHERE story_id = ?
+        ORDER BY created_at DESC, id DESC
+        ''', (self.story_id,))
+        # Rows are only converted to dictionaries for images that match a filter
+        images = cursor.fetchall()
+        positions = {row[0]: position for position, row in enumerate(images)}
+
+        cursor.execute('''
+        SELECT t.image_id, t.character_id
+        FROM image_character_tags t
+        JOIN images i ON i.id = t.image_id
+        WHERE i.story_id = ?
+        ''', (self.story_id,))
+
+        character_positions: Dict[int, List[int]] = {}
+        for image_id, character_id in cursor.fetchall():
+            character_positions.setdefault(character_id, []).append(positions[image_id])
+
+        # Build each bitset in one go rather than OR-ing big ints row by row
+        byte_count = (len(images) + 7) // 8
+        character_bits: Dict[int, int] = {}
+        for character_id, character_image_positions in character_positions.items():
+            buffer = bytearray(byte_count)
+            for position in character_image_positions:
+                buffer[position >> 3] |= 1 << (position & 7)
+            character_bits[character_id] = int.from_bytes(buffer, 'little')
+
+        self.images = images
+        self.character_bits = character_bits
+        self.all_bits = (1 << len(images)) - 1
+
+    def evaluate(self, expression: Optional[Tuple]) -> int:
+        """Evaluate a filter expression.
+
+        Args:
+            expression: Filter expression, or None to match every image
+
+        Returns:
+            Bitset of matching image positions
+        """
+        if expression is None:
+            return self.all_bits
+
+        operator = expression[0]
+        if operator == 'char':
+            return self.character_bits.get(expression[1], 0)
+        if operator == 'not':
+            return self.all_bits & ~self.evaluate(expression[1])
+        if operator == 'and':
+            bits = self.all_bits
+            for term in expression[1]:
+                bits &= self.evaluate(term)
+                if not bits:
+                    break
+            return bits
+        if operator == 'or':
+            bits = 0
+            for term in expression[1]:
+                bits |= self.evaluate(term)
+            return bits
+
+        raise ValueError(f"Unknown filter operator: {operator}")
+
+    def count(self, expression: Optional[Tuple]) -> int:
+        """Count the images matching a filter expression."""
+        return bin(self.evaluate(expression)).count('1')
+
+    def matching_images(self, expression: Optional[Tuple]) -> List[Dict[str, Any]]:
+        """Get the images matching a filter expression, newest first.
+
+        Args:
+            expression: Filter expression, or None to match every image
+
+        Returns:
+            List of image dictionaries
+        """
+        bits = self.evaluate(expression)
+        # Bit i of the reversed binary string is image position i
+        flags = bin(bits)[:1:-1]
+        return [dict(self.images[position]) for position, flag in enumerate(flags) if flag == '1']
+
+    def character_count(self, character_id: int) -> int:
+        """Count the images a character is tagged in."""
+        return bin(self.character_bits.get(character_id, 0)).count('1')
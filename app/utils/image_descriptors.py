@@ -0,0 +1,271 @@
+"""
+Image Descriptors Module.
+
+This module finds images that look alike overall: other shots of the same
+location, the same lighting or the same scene, even when they are not
+near-duplicates.
+
+Each image gets a compact global descriptor: a colour histogram with 4x4x4
+RGB bins (as in ImageRecognitionUtil._calculate_color_histogram) for the
+whole image and for each cell of a 2x2 grid, so the layout of the colours
+counts as well as their amounts. The square root of the histograms is taken
+and the vector scaled to unit length, so the dot product of two descriptors
+is their similarity (1.0 for identical colour layouts).
+
+Descriptors are stored as float32 BLOBs. A story's descriptors are loaded
+into one NumPy matrix, so a top-k query is a single matrix-vector product.
+"""
+
+import os
+import sqlite3
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QImage, QImageReader
+
+from app.db_sqlite import get_story_image_descriptors, save_image_descriptors
+
+
+# Version of the descriptor layout; stored descriptors of other versions are recomputed
+DESCRIPTOR_VERSION = 1
+
+# Histogram bins per colour channel
+BINS_PER_CHANNEL = 4
+
+# Grid cells per side for the spatial histograms
+GRID_SIZE = 2
+
+# Number of values in a descriptor: one histogram for the whole image plus one per cell
+DESCRIPTOR_LENGTH = (1 + GRID_SIZE * GRID_SIZE) * BINS_PER_CHANNEL ** 3
+
+# Side the image is shrunk to before the histograms are counted
+DESCRIPTOR_IMAGE_SIZE = 64
+
+# Size images are read at when computing descriptors for existing images
+DESCRIPTOR_SOURCE_SIZE = 256
+
+# Number of results for a similarity query
+DEFAULT_TOP_K = 24
+
+
+def compute_descriptor(image: QImage) -> np.ndarray:
+    """Compute the global descriptor of an image.
+
+    Args:
+        image: The image
+
+    Returns:
+        Unit-length float32 vector of DESCRIPTOR_LENGTH values
+    """
+    small = image.scaled(
+        DESCRIPTOR_IMAGE_SIZE, DESCRIPTOR_IMAGE_SIZE,
+        Qt.AspectRatioMode.IgnoreAspectRatio,
+        Qt.TransformationMode.SmoothTransformation
+    ).convertToFormat(QImage.Format.Format_RGB32)
+
+    bits = small.constBits()
+    bits.setsize(small.sizeInBytes())
+    # Format_RGB32 pixels are native-endian 0xffRRGGBB words; rows are padded to 4 bytes
+    pixels = np.frombuffer(bits.asstring(), dtype=np.uint32).reshape(
+        DESCRIPTOR_IMAGE_SIZE, small.bytesPerLine() // 4)[:, :DESCRIPTOR_IMAGE_SIZE]
+
+    shift = 8 - (BINS_PER_CHANNEL - 1).bit_length()
+    red = ((pixels >> 16) & 0xff) >> shift
+    green = ((pixels >> 8) & 0xff) >> shift
+    blue = (pixels & 0xff) >> shift
+    bins = (red * BINS_PER_CHANNEL + green) * BINS_PER_CHANNEL + blue
+
+    bin_count = BINS_PER_CHANNEL ** 3
+    histograms = [np.bincount(bins.ravel(), minlength=bin_count)]
+    cell = DESCRIPTOR_IMAGE_SIZE // GRID_SIZE
+    for row in range(GRID_SIZE):
+        for column in range(GRID_SIZE):
+            cell_bins = bins[row * cell:(row + 1) * cell, column * cell:(column + 1) * cell]
+            histograms.append(np.bincount(cell_bins.ravel(), minlength=bin_count))
+
+    # Each histogram counts as much as the others, whatever its pixel count
+    descriptor = np.concatenate([histogram / histogram.sum() for histogram in histograms])
+    descriptor = np.sqrt(descriptor).astype(np.float32)
+    return descriptor / np.linalg.norm(descriptor)
+
+
+def compute_file_descriptor(image_path: str) -> Optional[np.ndarray]:
+    """Compute the descriptor of an image file, reading it at a reduced size.
+
+    Args:
+        image_path: Path to the image file
+
+    Returns:
+        The descriptor, or None if the file can't be read
+    """
+    reader = QImageReader(image_path)
+    size = reader.size()
+    if size.isValid() and max(size.width(), size.height()) > DESCRIPTOR_SOURCE_SIZE:
+        reader.setScaledSize(size.scaled(DESCRIPTOR_SOURCE_SIZE, DESCRIPTOR_SOURCE_SIZE,
+                                         Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return None
+    return compute_descriptor(image)
+
+
+def descriptor_to_blob(descriptor: np.ndarray) -> bytes:
+    """Encode a descriptor for storage."""
+    return np.asarray(descriptor, dtype='<f4').tobytes()
+
+
+def blob_to_descriptor(blob: bytes) -> Optional[np.ndarray]:
+    """Decode a stored descriptor.
+
+    Returns:
+        The descriptor, or None if the BLOB doesn't have the expected length
+    """
+    if blob is None or len(blob) != DESCRIPTOR_LENGTH * 4:
+        return None
+    return np.frombuffer(blob, dtype='<f4')
+
+
+class SimilarImageIndex:
+    """Top-k similarity search over the images of one story."""
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self.image_ids: List[int] = []
+        self.positions: Dict[int, int] = {}
+        self.matrix = np.zeros((0, DESCRIPTOR_LENGTH), dtype=np.float32)
+        # Rows of removed images stay in the matrix until it is rebuilt
+        self.active = np.zeros(0, dtype=bool)
+
+    @classmethod
+    def build(cls, conn: sqlite3.Connection, story_id: int,
+              progress_callback: Optional[Callable[[int, int], bool]] = None) -> 'SimilarImageIndex':
+        """Build the index for a story.
+
+        Images without a current descriptor get one computed from their
+        thumbnail (or the original if there is no thumbnail), which is saved.
+
+        Args:
+            conn: Database connection
+            story_id: ID of the story
+            progress_callback: Called with (done, total) while missing
+                descriptors are computed; returning False stops early
+
+        Returns:
+            The index
+        """
+        rows = get_story_image_descriptors(conn, story_id)
+        descriptors: Dict[int, np.ndarray] = {}
+        missing = []
+        for row in rows:
+            descriptor = None
+            if row['version'] == DESCRIPTOR_VERSION:
+                descriptor = blob_to_descriptor(row['descriptor'])
+            if descriptor is None:
+                missing.append(row)
+            else:
+                descriptors[row['id']] = descriptor
+
+        computed = []
+        for done, row in enumerate(missing):
+            if progress_callback is not None and progress_callback(done, len(missing)) is False:
+                break
+            thumbnail_path = os.path.join(os.path.dirname(row['path']), "thumbnails", row['filename'])
+            image_path = os.path.join(row['path'], row['filename'])
+            descriptor = compute_file_descriptor(thumbnail_path if os.path.exists(thumbnail_path) else image_path)
+            if descriptor is not None:
+                descriptors[row['id']] = descriptor
+                computed.append((row['id'], descriptor_to_blob(descriptor)))
+
+        if computed:
+            save_image_descriptors(conn, story_id, computed, DESCRIPTOR_VERSION)
+            print(f"Computed descriptors for {len(computed)} images")
+
+        index = cls()
+        index.image_ids = [row['id'] for row in rows if row['id'] in descriptors]
+        index.positions = {image_id: position for position, image_id in enumerate(index.image_ids)}
+        if index.image_ids:
+            index.matrix = np.vstack([descriptors[image_id] for image_id in index.image_ids])
+        index.active = np.ones(len(index.image_ids), dtype=bool)
+        return index
+
+    def add(self, image_id: int, descriptor: np.ndarray) -> None:
+        """Add an image to the index, or replace its descriptor.
+
+        Args:
+            image_id: ID of the image
+            descriptor: The image's descriptor
+        """
+        position = self.positions.get(image_id)
+        if position is not None:
+            self.matrix[position] = descriptor
+            self.active[position] = True
+            return
+        self.positions[image_id] = len(self.image_ids)
+        self.image_ids.append(image_id)
+        self.matrix = np.vstack([self.matrix, descriptor[np.newaxis, :]])
+        self.active = np.append(self.active, True)
+
+    def remove(self, image_id: int) -> None:
+        """Remove an image from the index.
+
+        Args:
+            image_id: ID of the image
+        """
+        position = self.positions.get(image_id)
+        if position is not None:
+            self.active[position] = False
+
+    def get_descriptor(self, image_id: int) -> Optional[np.ndarray]:
+        """Get the descriptor of an image in the index."""
+        position = self.positions.get(image_id)
+        if position is None or not self.active[position]:
+            return None
+        return self.matrix[position]
+
+    def find_similar(self, descriptor: np.ndarray, top_k: int = DEFAULT_TOP_K,
+                     exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Find the images most similar to a descriptor.
+
+        Args:
+            descriptor: Descriptor to search for
+            top_k: Maximum number of results
+            exclude: Image ID to leave out (e.g. the image itself)
+
+        Returns:
+            List of (image_id, similarity) tuples, most similar first
+        """
+        if not self.image_ids or top_k <= 0:
+            return []
+
+        scores = self.matrix @ descriptor
+        scores[~self.active] = -np.inf
+        if exclude is not None and exclude in self.positions:
+            scores[self.positions[exclude]] = -np.inf
+
+        count = min(top_k, len(scores))
+        # Select the top k without sorting every score, then sort just those
+        candidates = np.argpartition(-scores, count - 1)[:count]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [(self.image_ids[position], float(scores[position]))
+                for position in candidates if np.isfinite(scores[position])]
+
+    def find_similar_to_image(self, image_id: int, top_k: int = DEFAULT_TOP_K) -> List[Tuple[int, float]]:
+        """Find the images most similar to an image in the index.
+
+        Args:
+            image_id: ID of the image
+            top_k: Maximum number of results
+
+        Returns:
+            List of (image_id, similarity) tuples, most similar first; empty
+            if the image isn't in the index
+        """
+        descriptor = self.get_descriptor(image_id)
+        if descriptor is None:
+            return []
+        return self.find_similar(descriptor, top_k, exclude=image_id)
+
+    def __len__(self) -> int:
+        """Get the number of images in the index."""
+        return int(self.active.sum())
@@ -0,0 +1,280 @@
+"""
+Image Prefetcher Module.
+
+This module decodes the images next to the one being viewed ahead of time,
+so paging through a gallery with the arrow keys doesn't block on disk reads,
+image decoding and database lookups.
+
+Work runs on a small private QThreadPool. Workers decode into QImage (which,
+unlike QPixmap, is safe to use off the GUI thread) and read the image row,
+character tags and quick events over their own SQLite connection. Results are
+kept in a small LRU cache. When the user jumps elsewhere, queued work for
+images that are no longer neighbours is dropped.
+"""
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QImage
+
+from app.db_sqlite import get_image_character_tags, get_image_quick_events, get_quick_event_tagged_characters
+from app.utils.tiled_image import get_image_size, should_tile
+
+
+# Per-thread SQLite connections for worker threads (connections can't be shared across threads)
+_thread_local = threading.local()
+
+
+def get_database_path(db_conn: sqlite3.Connection) -> Optional[str]:
+    """Get the file path of a connection's main database.
+
+    Args:
+        db_conn: SQLite database connection
+
+    Returns:
+        The database file path, or None for in-memory databases
+    """
+    try:
+        for row in db_conn.execute("PRAGMA database_list").fetchall():
+            if row[1] == 'main':
+                return row[2] or None
+    except sqlite3.Error as e:
+        print(f"Error getting database path: {e}")
+    return None
+
+
+def get_worker_connection(db_path: str) -> sqlite3.Connection:
+    """Get this thread's SQLite connection to a database, opening it if needed.
+
+    Args:
+        db_path: Path to the database file
+
+    Returns:
+        A connection owned by the calling thread
+    """
+    connections = getattr(_thread_local, 'connections', None)
+    if connections is None:
+        connections = _thread_local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        connections[db_path] = conn
+    return conn
+
+
+def load_image_entry(conn: Optional[sqlite3.Connection], image_id: int,
+                     image_data: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Load everything the image viewer needs to show an image.
+
+    Args:
+        conn: Database connection owned by the calling thread, or None to skip
+            the database lookups (image_data must then be given)
+        image_id: ID of the image
+        image_data: Image row, if already known
+
+    Returns:
+        Dictionary with 'image_id', 'image_data', 'image' (QImage, or None for
+        images large enough to be shown in tiles), 'image_size' ((width, height)),
+        'tags', 'quick_events' and 'tagged_characters' (quick event ID ->
+        characters), or None if the image could not be loaded. 'tags' and
+        'quick_events' are None when conn is None.
+    """
+    if image_data is None:
+        if conn is None:
+            return None
+        row = conn.execute("SELECT * FROM images WHERE id = ?", (image_id,)).fetchone()
+        if not row:
+            return None
+        image_data = dict(row)
+
+    image_path = os.path.join(image_data['path'], image_data['filename'])
+    if not os.path.exists(image_path):
+        return None
+
+    # Very large images are rendered in tiles by the viewer, so don't decode them here
+    image = None
+    image_size = get_image_size(image_path)
+    if not (image_size.isValid() and should_tile(image_size.width(), image_size.height())):
+        image = QImage(image_path)
+        if image.isNull():
+            return None
+        image_size = image.size()
+
+    entry = {
+        'image_id': image_id,
+        'image_data': image_data,
+        'image': image,
+        'image_size': (image_size.width(), image_size.height()),
+        'tags': None,
+        'quick_events': None,
+        'tagged_characters': None
+    }
+
+    if conn is not None:
+        entry['tags'] = get_image_character_tags(conn, image_id)
+        entry['quick_events'] = get_image_quick_events(conn, image_id)
+        entry['tagged_characters'] = {
+            event['id']: get_quick_event_tagged_characters(conn, event['id'])
+            for event in entry['quick_events']
+        }
+
+    return entry
+
+
+class _PrefetchSignals(QObject):
+    """Signals for prefetch tasks (QRunnable can't define signals itself)."""
+
+    loaded = pyqtSignal(int, int, object)  # generation, image_id, entry (or None)
+
+
+class _PrefetchTask(QRunnable):
+    """Background task that loads one image entry."""
+
+    def __init__(self, prefetcher: 'ImagePrefetcher', generation: int, image_id: int,
+                 image_data: Optional[Dict[str, Any]]):
+        super().__init__()
+        self.prefetcher = prefetcher
+        self.generation = generation
+        self.image_id = image_id
+        self.image_data = image_data
+        self.signals = prefetcher.signals
+
+    def run(self) -> None:
+        """Load the entry unless the user has already moved away from it."""
+        if not self.prefetcher.is_wanted(self.generation, self.image_id):
+            self.signals.loaded.emit(self.generation, self.image_id, None)
+            return
+
+        entry = None
+        try:
+            conn = get_worker_connection(self.prefetcher.db_path) if self.prefetcher.db_path else None
+            entry = load_image_entry(conn, self.image_id, self.image_data)
+        except Exception as e:
+            print(f"Error prefetching image {self.image_id}: {e}")
+
+        self.signals.loaded.emit(self.generation, self.image_id, entry)
+
+
+class ImagePrefetcher(QObject):
+    """Decodes neighbouring images in the background for fast navigation."""
+
+    def __init__(self, db_conn: sqlite3.Connection, radius: int = 2, max_entries: int = 6, parent=None):
+        """Initialize the prefetcher.
+
+        Args:
+            db_conn: Database connection of the GUI thread
+            radius: How many images to prefetch on each side of the current one
+            max_entries: Maximum number of decoded images to keep
+            parent: Parent QObject
+        """
+        super().__init__(parent)
+        self.db_conn = db_conn
+        self.db_path = get_database_path(db_conn)
+        self.radius = radius
+        self.max_entries = max(max_entries, 2 * radius)
+
+        self.cache: 'OrderedDict[int, Dict[str, Any]]' = OrderedDict()
+        self.pending = set()
+        self.wanted = set()
+        self.generation = 0
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+
+        self.signals = _PrefetchSignals()
+        self.signals.loaded.connect(self._on_loaded)
+
+    def set_position(self, image_ids: List[int], index: Optional[int]) -> None:
+        """Tell the prefetcher which image is shown, and prefetch its neighbours.
+
+        Args:
+            image_ids: Image IDs in navigation order
+            index: Index of the image currently shown
+        """
+        if not image_ids or index is None:
+            return
+
+        # Nearest neighbours first, next before previous
+        neighbours = []
+        for distance in range(1, self.radius + 1):
+            for neighbour_index in (index + distance, index - distance):
+                if 0 <= neighbour_index < len(image_ids):
+                    neighbours.append(image_ids[neighbour_index])
+
+        # A new generation makes queued work for other images stale; those
+        # tasks return without decoding when they reach the front of the queue
+        self.generation += 1
+        self.wanted = set(neighbours)
+
+        for image_id in neighbours:
+            if image_id in self.cache:
+                self.cache.move_to_end(image_id)
+                continue
+            if image_id in self.pending:
+                continue
+            self._schedule(image_id)
+
+    def take(self, image_id: int) -> Optional[Dict[str, Any]]:
+        """Take a prefetched entry out of the cache.
+
+        The entry is removed so that edits made while it is shown are never
+        served from a stale copy later.
+
+        Args:
+            image_id: ID of the image
+
+        Returns:
+            The entry (see load_image_entry), or None if it isn't ready
+        """
+        return self.cache.pop(image_id, None)
+
+    def invalidate(self, image_id: Optional[int] = None) -> None:
+        """Drop cached data for an image, or for all images if image_id is None."""
+        if image_id is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(image_id, None)
+
+    def is_wanted(self, generation: int, image_id: int) -> bool:
+        """Check whether a task's result is still needed (safe to call from workers)."""
+        return generation == self.generation or image_id in self.wanted
+
+    def shutdown(self) -> None:
+        """Stop prefetching and drop all cached images."""
+        self.generation += 1
+        self.wanted = set()
+        self.pool.clear()
+        self.pool.waitForDone()
+        self.pending.clear()
+        self.cache.clear()
+
+    def _schedule(self, image_id: int) -> None:
+        """Queue a prefetch task for an image."""
+        image_data = None
+        if not self.db_path:
+            # In-memory databases can't be opened from another thread, so look the
+            # row up here and only decode in the background
+            row = self.db_conn.execute("SELECT * FROM images WHERE id = ?", (image_id,)).fetchone()
+            if not row:
+                return
+            image_data = dict(row)
+
+        self.pending.add(image_id)
+        self.pool.start(_PrefetchTask(self, self.generation, image_id, image_data))
+
+    def _on_loaded(self, generation: int, image_id: int, entry: Optional[Dict[str, Any]]) -> None:
+        """Store a finished entry if it is still wanted (runs on the GUI thread)."""
+        self.pending.discard(image_id)
+        if entry is None or image_id not in self.wanted:
+            return
+
+        self.cache[image_id] = entry
+        self.cache.move_to_end(image_id)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
@@ -3,17 +3,127 @@ Image recognition utility for suggesting character tags.
 
 This module provides a simplified image recognition system that doesn't require
 external dependencies like face_recognition.
+
+Avatar features record the avatar file they were extracted from (path,
+modification time and content hash), so update_character_image_database only
+processes characters whose avatar changed. CharacterFeatureUpdateJob runs that
+update for a story on a worker thread.
+
+Besides the color histogram and the scalar features, images get a descriptor
+(HSV histograms and gradient orientation histograms of a grid of cells, see
+feature_index.py), which identify_characters_in_image uses to rerank the best
+candidates within a time budget. Queries only compute it when it is used (see
+needs_descriptor).
+
+Features taken from a character tag's region record the tag in tag_id (and
+its image in image_id); see training_harvest.py.
 """
 
-from typing import List, Dict, Tuple, Optional, Any, Union
+from typing import List, Dict, Tuple, Optional, Any, Union, Callable
+import hashlib
 import os
 import sqlite3
-import json
+import threading
 from datetime import datetime
-from PyQt6.QtGui import QImage, QPixmap, qRgb, qRed, qGreen, qBlue
-from PyQt6.QtCore import QRect, QBuffer, QByteArray, QIODevice
+from PyQt6.QtGui import QImage, QPixmap
+from PyQt6.QtCore import QRect, QBuffer, QByteArray, QIODevice, QObject, QRunnable, QThreadPool, pyqtSignal
 import numpy as np
 
+from app.utils.feature_index import (
+    CharacterFeatureIndex, get_image_features_signature, encode_features, decode_features,
+    encode_descriptor, FEATURE_FORMAT_JSON, CURRENT_FEATURE_FORMAT, HISTOGRAM_BLOB_SIZE,
+    DESCRIPTOR_GRID, DESCRIPTOR_CELLS, DESCRIPTOR_BLOB_SIZE, HUE_BINS, SATURATION_BINS, VALUE_BINS,
+    COLOR_CELL_BINS, ORIENTATION_BINS, GRADIENT_CELL_BINS,
+    CASCADE_TOP_K, CASCADE_BUDGET_MS
+)
+from app.utils.image_prefetcher import get_database_path, get_worker_connection
+
+
+# Images larger than these are shrunk (ignoring aspect ratio) before the color
+# histogram and the brightness and colorfulness are calculated
+HISTOGRAM_IMAGE_SIZE = 100
+SCALAR_IMAGE_SIZE = 50
+DESCRIPTOR_IMAGE_SIZE = 48
+
+# Gradient magnitude (in 0-255 gray levels per pixel) from which a pixel is on an edge
+EDGE_THRESHOLD = 12.0
+
+
+def _image_channels(image: QImage, size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Get the red, green and blue channels of an image shrunk to fit a size.
+    
+    The pixels are read through a NumPy view of the 32-bit ARGB image buffer
+    instead of one pixel() call per pixel.
+    
+    Args:
+        image: QImage to read
+        size: Images wider or taller than this are scaled to size x size
+        
+    Returns:
+        (red, green, blue) integer arrays of shape (height, width)
+    """
+    if image.width() > size or image.height() > size:
+        image = image.scaled(size, size)
+    image = image.convertToFormat(QImage.Format.Format_ARGB32)
+    
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    pixels = np.frombuffer(bits, dtype=np.uint32).reshape(
+        image.height(), image.bytesPerLine() // 4)[:, :image.width()]
+    
+    # The channels are new arrays, so they stay valid after the image is freed
+    return (pixels >> 16) & 0xFF, (pixels >> 8) & 0xFF, pixels & 0xFF
+
+
+def compute_file_hash(path: str) -> str:
+    """Compute a content hash of a file.
+    
+    Args:
+        path: Path to the file
+        
+    Returns:
+        SHA-256 hex digest of the file's bytes
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def rank_character_scores(scores: Dict[int, float], characters: Dict[int, str], threshold: float,
+                          only_listed: bool = True) -> List[Dict[str, Any]]:
+    """Turn the scores of a feature index into ranked character suggestions.
+    
+    Args:
+        scores: Best similarity of each character (see CharacterFeatureIndex.score)
+        characters: Names of the characters by ID
+        threshold: Minimum similarity threshold (0-1)
+        only_listed: Whether to skip characters missing from characters
+        
+    Returns:
+        List of dicts with 'character_id', 'character_name' and 'similarity',
+        highest similarity first
+    """
+    results = []
+    for character_id, max_similarity in scores.items():
+        # Skip characters not in the current story
+        if only_listed and character_id not in characters:
+            continue
+        
+        # If the highest similarity is above threshold, add to results
+        if max_similarity >= threshold:
+            results.append({
+                'character_id': character_id,
+                'character_name': characters.get(character_id, f"Character {character_id}"),
+                'similarity': max_similarity
+            })
+    
+    # Sort by similarity (highest first)
+    results.sort(key=lambda x: x['similarity'], reverse=True)
+    
+    return results
+
 
 class ImageRecognitionUtil:
     """Utility for basic image recognition to suggest character tags."""
@@ -37,6 +147,13 @@ class ImageRecognitionUtil:
             
         os.makedirs(self.cache_dir, exist_ok=True)
         
+        # Feature indexes by story ID (None for all stories), built on first use
+        self.feature_indexes: Dict[Optional[int], CharacterFeatureIndex] = {}
+        
+        # Characters reranked with descriptors, and the time allowed for scoring an image
+        self.cascade_top_k = CASCADE_TOP_K
+        self.cascade_budget_ms: Optional[float] = CASCADE_BUDGET_MS
+        
         # Ensure image features table exists
         self._create_image_features_table()
     
@@ -49,10 +166,17 @@ class ImageRecognitionUtil:
             character_id INTEGER NOT NULL,
             image_id INTEGER,
             is_avatar INTEGER NOT NULL DEFAULT 0,
-            feature_data TEXT NOT NULL, 
-            color_histogram TEXT NOT NULL,
+            feature_data BLOB NOT NULL,
+            color_histogram BLOB NOT NULL,
             created_at TEXT NOT NULL,
             updated_at TEXT NOT NULL,
+            format_version INTEGER NOT NULL DEFAULT 1,
+            source_path TEXT,
+            source_mtime REAL,
+            source_hash TEXT,
+            descriptor BLOB,
+            tag_id INTEGER,
+            tag_region TEXT,
             FOREIGN KEY (character_id) REFERENCES characters (id) ON DELETE CASCADE,
             FOREIGN KEY (image_id) REFERENCES images (id) ON DELETE CASCADE
         )
@@ -62,8 +186,73 @@ class ImageRecognitionUtil:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_image_features_character_id ON image_features(character_id)')
         
         self.db_conn.commit()
+        
+        self._migrate_image_features_table()
+    
+    def _migrate_image_features_table(self) -> None:
+        """Convert features stored as JSON text to the binary layout.
+        
+        Tables created before the binary layout get a format_version column,
+        with every existing row marked as JSON.
+        """
+        cursor = self.db_conn.cursor()
+        
+        cursor.execute("PRAGMA table_info(image_features)")
+        column_names = [col['name'] for col in cursor.fetchall()]
+        if 'format_version' not in column_names:
+            print("Adding format_version column to image_features table")
+            cursor.execute(f'''
+            ALTER TABLE image_features
+            ADD COLUMN format_version INTEGER NOT NULL DEFAULT {FEATURE_FORMAT_JSON}
+            ''')
+            self.db_conn.commit()
+        
+        # Avatar file the features were extracted from, the descriptor, and the character tag and its region
+        for column, column_type in (('source_path', 'TEXT'), ('source_mtime', 'REAL'), ('source_hash', 'TEXT'),
+                                    ('descriptor', 'BLOB'), ('tag_id', 'INTEGER'), ('tag_region', 'TEXT')):
+            if column not in column_names:
+                print(f"Adding {column} column to image_features table")
+                cursor.execute(f'''
+                ALTER TABLE image_features
+                ADD COLUMN {column} {column_type}
+                ''')
+                self.db_conn.commit()
+        
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_image_features_tag_id ON image_features(tag_id)')
+        self.db_conn.commit()
+        
+        cursor.execute('''
+        SELECT id, feature_data, color_histogram
+        FROM image_features
+        WHERE format_version = ?
+        ''', (FEATURE_FORMAT_JSON,))
+        
+        converted = []
+        for row in cursor.fetchall():
+            # Unreadable rows are left as they are
+            features = decode_features(row['feature_data'], row['color_histogram'], FEATURE_FORMAT_JSON)
+            if features is None:
+                continue
+            try:
+                feature_data, color_histogram = encode_features(features)
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Error converting feature data {row['id']}: {e}")
+                continue
+            if len(color_histogram) != HISTOGRAM_BLOB_SIZE:
+                print(f"Skipping feature set {row['id']} with {len(features['color_histogram'])} histogram bins")
+                continue
+            converted.append((feature_data, color_histogram, CURRENT_FEATURE_FORMAT, row['id']))
+        
+        if converted:
+            cursor.executemany('''
+            UPDATE image_features
+            SET feature_data = ?, color_histogram = ?, format_version = ?
+            WHERE id = ?
+            ''', converted)
+            self.db_conn.commit()
+            print(f"Converted {len(converted)} image feature sets to the binary format")
     
-    def _calculate_color_histogram(self, image: QImage) -> List[int]:
+    def _calculate_color_histogram(self, image: QImage) -> List[float]:
         """Calculate color histogram for an image.
         
         Args:
@@ -72,56 +261,130 @@ class ImageRecognitionUtil:
         Returns:
             List of color histogram bins
         """
-        # Resize image for faster processing
-        if image.width() > 100 or image.height() > 100:
-            image = image.scaled(100, 100)
-            
+        red, green, blue = _image_channels(image, HISTOGRAM_IMAGE_SIZE)
+        
         # Create a histogram with 4x4x4 bins for R,G,B
-        histogram = [0] * 64  # 4^3 = 64 bins
-        
-        for y in range(image.height()):
-            for x in range(image.width()):
-                pixel = image.pixel(x, y)
-                r = qRed(pixel) // 64    # 0-3
-                g = qGreen(pixel) // 64   # 0-3
-                b = qBlue(pixel) // 64    # 0-3
-                
-                # Calculate bin index
-                bin_idx = r*16 + g*4 + b
-                histogram[bin_idx] += 1
+        bins = (red >> 6) * 16 + (green >> 6) * 4 + (blue >> 6)
+        histogram = np.bincount(bins.ravel(), minlength=64)
         
         # Normalize histogram
-        total_pixels = image.width() * image.height()
-        if total_pixels > 0:
-            histogram = [count / total_pixels for count in histogram]
-            
-        return histogram
+        return (histogram / max(1, bins.size)).tolist()
     
-    def _calculate_image_features(self, image: QImage) -> Dict[str, Any]:
+    def _calculate_image_features(self, image: QImage, with_descriptor: bool = True) -> Dict[str, Any]:
         """Calculate features for an image.
         
         Args:
             image: QImage to analyze
+            with_descriptor: Whether to calculate the descriptor
             
         Returns:
             Dictionary of image features
         """
         # Calculate color histogram
         color_histogram = self._calculate_color_histogram(image)
+        brightness, colorfulness = self._calculate_brightness_and_colorfulness(image)
         
         # Create simplified feature representation
         features = {
             "width": image.width(),
             "height": image.height(),
             "aspect_ratio": image.width() / max(1, image.height()),
-            "brightness": self._calculate_brightness(image),
-            "colorfulness": self._calculate_colorfulness(image)
+            "brightness": brightness,
+            "colorfulness": colorfulness
         }
         
-        return {
+        result = {
             "features": features,
             "color_histogram": color_histogram
         }
+        
+        # The descriptor takes longer than everything else; it is only
+        # needed for saved features and for queries that are reranked
+        if with_descriptor:
+            result["descriptor"] = self._calculate_descriptor(image)
+        return result
+    
+    def _calculate_descriptor(self, image: QImage) -> List[float]:
+        """Calculate the descriptor of an image.
+        
+        The image is divided into a grid of cells; each cell gets a histogram of
+        its pixels in HSV and a histogram of its edge orientations (see
+        feature_index.py for the layout).
+        
+        Args:
+            image: QImage to analyze
+            
+        Returns:
+            Descriptor values
+        """
+        red, green, blue = _image_channels(image, DESCRIPTOR_IMAGE_SIZE)
+        height, width = red.shape
+        red, green, blue = red.astype(np.float32), green.astype(np.float32), blue.astype(np.float32)
+        
+        # Cell of every pixel
+        cell_rows = np.arange(height) * DESCRIPTOR_GRID // max(1, height)
+        cell_columns = np.arange(width) * DESCRIPTOR_GRID // max(1, width)
+        cells = (cell_rows[:, None] * DESCRIPTOR_GRID + cell_columns[None, :]).ravel()
+        cell_sizes = np.maximum(np.bincount(cells, minlength=DESCRIPTOR_CELLS), 1)[:, None]
+        
+        # HSV bin of every pixel
+        max_rgb = np.maximum(np.maximum(red, green), blue)
+        delta = max_rgb - np.minimum(np.minimum(red, green), blue)
+        safe_delta = np.maximum(delta, 1)
+        hue = np.where(max_rgb == red, ((green - blue) / safe_delta) % 6,
+                       np.where(max_rgb == green, (blue - red) / safe_delta + 2, (red - green) / safe_delta + 4))
+        hue_bin = np.minimum((hue * (HUE_BINS / 6)).astype(np.int64), HUE_BINS - 1)
+        hue_bin[delta == 0] = 0
+        saturation_bin = np.minimum((delta * SATURATION_BINS / np.maximum(max_rgb, 1)).astype(np.int64),
+                                    SATURATION_BINS - 1)
+        value_bin = (max_rgb * (VALUE_BINS / 256)).astype(np.int64)
+        color_bins = ((hue_bin * SATURATION_BINS + saturation_bin) * VALUE_BINS + value_bin).ravel()
+        colors = np.bincount(cells * COLOR_CELL_BINS + color_bins, minlength=DESCRIPTOR_CELLS * COLOR_CELL_BINS)
+        colors = colors.reshape(DESCRIPTOR_CELLS, COLOR_CELL_BINS) / cell_sizes
+        
+        # Edge orientation (unsigned) of every pixel, or the last bin if it isn't on an edge.
+        # Each pixel uses the channel that changes most, so edges between colors
+        # of the same brightness are found too.
+        channels = np.stack([red, green, blue])
+        gradient_x = np.zeros_like(channels)
+        gradient_y = np.zeros_like(channels)
+        gradient_x[:, :, 1:-1] = (channels[:, :, 2:] - channels[:, :, :-2]) / 2
+        gradient_y[:, 1:-1, :] = (channels[:, 2:, :] - channels[:, :-2, :]) / 2
+        magnitudes = gradient_x * gradient_x + gradient_y * gradient_y
+        strongest = magnitudes.argmax(axis=0)[None]
+        gradient_x = np.take_along_axis(gradient_x, strongest, axis=0)[0]
+        gradient_y = np.take_along_axis(gradient_y, strongest, axis=0)[0]
+        orientation = np.arctan2(gradient_y, gradient_x) % np.pi
+        gradient_bins = np.minimum((orientation * (ORIENTATION_BINS / np.pi)).astype(np.int64), ORIENTATION_BINS - 1)
+        edges = np.take_along_axis(magnitudes, strongest, axis=0)[0] >= EDGE_THRESHOLD * EDGE_THRESHOLD
+        gradient_bins = np.where(edges, gradient_bins, ORIENTATION_BINS).ravel()
+        gradients = np.bincount(cells * GRADIENT_CELL_BINS + gradient_bins,
+                                minlength=DESCRIPTOR_CELLS * GRADIENT_CELL_BINS)
+        gradients = gradients.reshape(DESCRIPTOR_CELLS, GRADIENT_CELL_BINS) / cell_sizes
+        
+        return np.concatenate([colors.ravel(), gradients.ravel()]).tolist()
+    
+    def _calculate_brightness_and_colorfulness(self, image: QImage) -> Tuple[float, float]:
+        """Calculate average brightness and colorfulness of an image in one pass.
+        
+        Args:
+            image: QImage to analyze
+            
+        Returns:
+            (brightness, colorfulness) tuple, both 0-1
+        """
+        red, green, blue = _image_channels(image, SCALAR_IMAGE_SIZE)
+        pixel_count = max(1, red.size)
+        
+        brightness = float((red + green + blue).sum()) / (3 * 255) / pixel_count
+        
+        # Saturation is (max - min) / max, or 0 for black pixels
+        max_rgb = np.maximum(np.maximum(red, green), blue)
+        min_rgb = np.minimum(np.minimum(red, green), blue)
+        saturation = (max_rgb - min_rgb) / np.maximum(max_rgb, 1)
+        colorfulness = float(saturation.sum()) / pixel_count
+        
+        return brightness, colorfulness
     
     def _calculate_brightness(self, image: QImage) -> float:
         """Calculate average brightness of an image.
@@ -132,18 +395,7 @@ class ImageRecognitionUtil:
         Returns:
             Average brightness value 0-1
         """
-        # Resize for faster processing
-        if image.width() > 50 or image.height() > 50:
-            image = image.scaled(50, 50)
-            
-        total_brightness = 0
-        for y in range(image.height()):
-            for x in range(image.width()):
-                pixel = image.pixel(x, y)
-                brightness = (qRed(pixel) + qGreen(pixel) + qBlue(pixel)) / (3 * 255)
-                total_brightness += brightness
-        
-        return total_brightness / (image.width() * image.height())
+        return self._calculate_brightness_and_colorfulness(image)[0]
     
     def _calculate_colorfulness(self, image: QImage) -> float:
         """Calculate colorfulness of an image.
@@ -154,32 +406,14 @@ class ImageRecognitionUtil:
         Returns:
             Colorfulness score 0-1
         """
-        # Resize for faster processing
-        if image.width() > 50 or image.height() > 50:
-            image = image.scaled(50, 50)
-            
-        total_saturation = 0
-        for y in range(image.height()):
-            for x in range(image.width()):
-                pixel = image.pixel(x, y)
-                r, g, b = qRed(pixel), qGreen(pixel), qBlue(pixel)
-                # Calculate max and min RGB values
-                max_rgb = max(r, g, b)
-                min_rgb = min(r, g, b)
-                # Calculate saturation as (max - min) / max if max > 0
-                if max_rgb > 0:
-                    saturation = (max_rgb - min_rgb) / max_rgb
-                else:
-                    saturation = 0
-                total_saturation += saturation
-        
-        return total_saturation / (image.width() * image.height())
-    
-    def extract_features_from_path(self, image_path: str) -> Dict[str, Any]:
+        return self._calculate_brightness_and_colorfulness(image)[1]
+    
+    def extract_features_from_path(self, image_path: str, with_descriptor: bool = True) -> Dict[str, Any]:
         """Extract features from an image file.
         
         Args:
             image_path: Path to the image file
+            with_descriptor: Whether to calculate the descriptor (see needs_descriptor)
             
         Returns:
             Dictionary of image features
@@ -188,13 +422,14 @@ class ImageRecognitionUtil:
         if image.isNull():
             raise ValueError(f"Failed to load image from {image_path}")
         
-        return self._calculate_image_features(image)
+        return self._calculate_image_features(image, with_descriptor)
     
-    def extract_features_from_qimage(self, image: QImage) -> Dict[str, Any]:
+    def extract_features_from_qimage(self, image: QImage, with_descriptor: bool = True) -> Dict[str, Any]:
         """Extract features from a QImage.
         
         Args:
             image: QImage to analyze
+            with_descriptor: Whether to calculate the descriptor (see needs_descriptor)
             
         Returns:
             Dictionary of image features
@@ -202,21 +437,38 @@ class ImageRecognitionUtil:
         if image.isNull():
             raise ValueError("Cannot extract features from null image")
         
-        return self._calculate_image_features(image)
+        return self._calculate_image_features(image, with_descriptor)
     
-    def extract_features_from_pixmap(self, pixmap: QPixmap) -> Dict[str, Any]:
+    def extract_features_from_pixmap(self, pixmap: QPixmap, with_descriptor: bool = True) -> Dict[str, Any]:
         """Extract features from a QPixmap.
         
         Args:
             pixmap: QPixmap to analyze
+            with_descriptor: Whether to calculate the descriptor (see needs_descriptor)
             
         Returns:
             Dictionary of image features
         """
-        return self.extract_features_from_qimage(pixmap.toImage())
+        return self.extract_features_from_qimage(pixmap.toImage(), with_descriptor)
+    
+    def needs_descriptor(self, story_id: Optional[int] = None) -> bool:
+        """Check whether identifying characters in an image uses its descriptor.
+        
+        Queries can skip the descriptor when reranking is off or no feature
+        set of the story has one; saved features always need it.
+        
+        Args:
+            story_id: Story whose characters are identified, or None for all
+            
+        Returns:
+            True if the query's features should include the descriptor
+        """
+        return self.get_feature_index(story_id).reranks(self.cascade_top_k)
     
     def save_character_image_features(self, character_id: int, features: Dict[str, Any], 
-                                    is_avatar: bool = False, image_id: Optional[int] = None) -> int:
+                                    is_avatar: bool = False, image_id: Optional[int] = None,
+                                    source: Optional[Tuple[str, float, str]] = None,
+                                    tag_id: Optional[int] = None) -> int:
         """Save image features for a character.
         
         Args:
@@ -224,31 +476,117 @@ class ImageRecognitionUtil:
             features: Image features dictionary
             is_avatar: Whether this is from a character's avatar
             image_id: ID of the source image, if applicable
+            source: (path, modification time, content hash) of the source file, if applicable
+            tag_id: ID of the character tag whose region the features are from, if applicable
             
         Returns:
             ID of the saved features
         """
-        # Serialize features to JSON
-        feature_data = json.dumps(features["features"])
-        color_histogram = json.dumps(features["color_histogram"])
+        feature_id = self._insert_features(character_id, features, is_avatar, image_id, source, tag_id)
+        self.db_conn.commit()
+        self._add_to_feature_indexes(feature_id, character_id, features)
+        return feature_id
+    
+    def save_tagged_region_features(self, samples: List[Dict[str, Any]]) -> List[int]:
+        """Save the features of several character tag regions in one transaction.
+        
+        Args:
+            samples: Dictionaries with 'character_id', 'image_id', 'tag_id', 'features' and
+                optionally 'tag_region' (the tag's character and box when it was cropped)
+            
+        Returns:
+            IDs of the saved features, in the order of the samples
+        """
+        try:
+            feature_ids = [self._insert_features(sample['character_id'], sample['features'],
+                                                 image_id=sample['image_id'], tag_id=sample['tag_id'],
+                                                 tag_region=sample.get('tag_region'))
+                           for sample in samples]
+            self.db_conn.commit()
+        except Exception:
+            self.db_conn.rollback()
+            raise
+        
+        # Many rows at once; the indexes are rebuilt when next used
+        if feature_ids:
+            self.feature_indexes.clear()
+        return feature_ids
+    
+    def _insert_features(self, character_id: int, features: Dict[str, Any], is_avatar: bool = False,
+                         image_id: Optional[int] = None, source: Optional[Tuple[str, float, str]] = None,
+                         tag_id: Optional[int] = None, tag_region: Optional[str] = None) -> int:
+        """Insert a row of image features (without committing).
+        
+        Returns:
+            ID of the new row
+        """
+        # Serialize features to the binary layout
+        feature_data, color_histogram = encode_features(features)
+        descriptor = encode_descriptor(features)
         
         # Save to database
         cursor = self.db_conn.cursor()
         now = datetime.now().isoformat()
+        source_path, source_mtime, source_hash = source or (None, None, None)
         
         cursor.execute('''
         INSERT INTO image_features (
             character_id, image_id, is_avatar,
-            feature_data, color_histogram, created_at, updated_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            feature_data, color_histogram, created_at, updated_at, format_version,
+            source_path, source_mtime, source_hash, descriptor, tag_id, tag_region
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             character_id, image_id, 1 if is_avatar else 0,
-            feature_data, color_histogram, now, now
+            feature_data, color_histogram, now, now, CURRENT_FEATURE_FORMAT,
+            source_path, source_mtime, source_hash, descriptor, tag_id, tag_region
         ))
-        
-        self.db_conn.commit()
         return cursor.lastrowid
     
+    def get_feature_index(self, story_id: Optional[int] = None) -> CharacterFeatureIndex:
+        """Get the feature index of a story, building it if needed.
+        
+        The index is rebuilt if features were added or deleted without going
+        through this object.
+        
+        Args:
+            story_id: ID of the story, or None for all stories
+            
+        Returns:
+            The story's feature index
+        """
+        index = self.feature_indexes.get(story_id)
+        if index is None or index.signature != get_image_features_signature(self.db_conn):
+            index = CharacterFeatureIndex.build(self.db_conn, story_id)
+            self.feature_indexes[story_id] = index
+        return index
+    
+    def _add_to_feature_indexes(self, feature_id: int, character_id: int, features: Dict[str, Any]) -> None:
+        """Add newly saved features to the feature indexes that have been built.
+        
+        Args:
+            feature_id: ID of the saved features
+            character_id: ID of the character
+            features: Image features dictionary
+        """
+        if not self.feature_indexes:
+            return
+        
+        cursor = self.db_conn.cursor()
+        cursor.execute('SELECT story_id FROM characters WHERE id = ?', (character_id,))
+        row = cursor.fetchone()
+        story_id = row['story_id'] if row else None
+        signature = get_image_features_signature(self.db_conn)
+        
+        for index_story_id, index in list(self.feature_indexes.items()):
+            # Indexes can only be updated in place if this row is the only change since
+            # they were last brought up to date; others are rebuilt when next used
+            if signature != (index.signature[0] + 1, feature_id):
+                del self.feature_indexes[index_story_id]
+                continue
+            if index_story_id is None or index_story_id == story_id:
+                index.add(feature_id, character_id, features)
+            index.signature = signature
+    
     def get_character_image_features(self, character_id: int = None) -> Dict[int, List[Dict[str, Any]]]:
         """Get image features for characters.
         
@@ -262,13 +600,13 @@ class ImageRecognitionUtil:
         
         if character_id:
             cursor.execute('''
-            SELECT id, character_id, feature_data, color_histogram
+            SELECT id, character_id, feature_data, color_histogram, format_version
             FROM image_features
             WHERE character_id = ?
             ''', (character_id,))
         else:
             cursor.execute('''
-            SELECT id, character_id, feature_data, color_histogram
+            SELECT id, character_id, feature_data, color_histogram, format_version
             FROM image_features
             ''')
         
@@ -280,19 +618,16 @@ class ImageRecognitionUtil:
             row_dict = dict(row)
             char_id = row_dict['character_id']
             
-            try:
-                feature_data = json.loads(row_dict['feature_data'])
-                color_histogram = json.loads(row_dict['color_histogram'])
-                
-                if char_id not in features_by_character:
-                    features_by_character[char_id] = []
-                
-                features_by_character[char_id].append({
-                    'features': feature_data,
-                    'color_histogram': color_histogram
-                })
-            except json.JSONDecodeError as e:
-                print(f"Error parsing feature data: {e}")
+            features = decode_features(
+                row_dict['feature_data'], row_dict['color_histogram'], row_dict['format_version']
+            )
+            if features is None:
+                continue
+            
+            if char_id not in features_by_character:
+                features_by_character[char_id] = []
+            
+            features_by_character[char_id].append(features)
         
         return features_by_character
     
@@ -345,10 +680,9 @@ class ImageRecognitionUtil:
                 'similarity': score
             }
         """
-        # Get image features for all characters
-        character_features = self.get_character_image_features()
-        
-        if not character_features:
+        # Score the image against every feature set of the story's characters at once
+        index = self.get_feature_index(story_id)
+        if not len(index):
             return []
         
         # Get character names and filter by story_id if provided
@@ -360,48 +694,27 @@ class ImageRecognitionUtil:
             
         characters = {row['id']: row['name'] for row in cursor.fetchall()}
         
-        # Calculate similarity with each character's features
-        results = []
-        
-        for character_id, feature_list in character_features.items():
-            # Skip characters not in the current story if story_id is provided
-            if story_id is not None and character_id not in characters:
-                continue
-                
-            # Calculate similarity with each feature set
-            similarities = []
-            for features in feature_list:
-                similarity = self._calculate_similarity(image_features, features)
-                similarities.append(similarity)
-            
-            # Use the highest similarity score
-            if similarities:
-                max_similarity = max(similarities)
-                
-                # If similarity is above threshold, add to results
-                if max_similarity >= threshold:
-                    results.append({
-                        'character_id': character_id,
-                        'character_name': characters.get(character_id, f"Character {character_id}"),
-                        'similarity': max_similarity
-                    })
-        
-        # Sort by similarity (highest first)
-        results.sort(key=lambda x: x['similarity'], reverse=True)
-        
-        return results
+        scores = index.score_cascade(image_features, self.cascade_top_k, self.cascade_budget_ms)
+        return rank_character_scores(scores, characters, threshold, only_listed=story_id is not None)
     
-    def extract_features_from_avatar(self, character_id: int, avatar_path: str) -> bool:
+    def extract_features_from_avatar(self, character_id: int, avatar_path: str,
+                                     source_hash: Optional[str] = None) -> bool:
         """Extract and save image features from a character's avatar.
         
         Args:
             character_id: Character ID
             avatar_path: Path to the avatar image
+            source_hash: Content hash of the avatar file, if already computed
             
         Returns:
             True if successful, False otherwise
         """
         try:
+            # Record the file before reading it, so a later change is always noticed
+            source_mtime = os.stat(avatar_path).st_mtime
+            if source_hash is None:
+                source_hash = compute_file_hash(avatar_path)
+            
             # Extract features
             features = self.extract_features_from_path(avatar_path)
             
@@ -409,7 +722,8 @@ class ImageRecognitionUtil:
             self.save_character_image_features(
                 character_id=character_id,
                 features=features,
-                is_avatar=True
+                is_avatar=True,
+                source=(avatar_path, source_mtime, source_hash)
             )
             
             return True
@@ -438,6 +752,7 @@ class ImageRecognitionUtil:
         # Clear existing features if they exist
         cursor.execute('DELETE FROM image_features WHERE is_avatar = 1')
         self.db_conn.commit()
+        self.feature_indexes.clear()
         
         # Extract features from avatars
         success_count = 0
@@ -476,4 +791,181 @@ class ImageRecognitionUtil:
         print(f"- Features before: {count_before}, after: {count_after}")
         
         # Commit any pending changes
-        self.db_conn.commit() 
\ No newline at end of file
+        self.db_conn.commit() 
+    
+    def update_character_image_database(self, story_id: Optional[int] = None,
+                                        is_cancelled: Optional[Callable[[], bool]] = None) -> Dict[str, int]:
+        """Bring the avatar features of a story's characters up to date.
+        
+        Unlike build_character_image_database, only characters whose avatar
+        changed since their features were saved are processed. An avatar whose
+        path and modification time match the recorded ones is taken as
+        unchanged without being read; if only the time differs, the file's
+        content hash is compared before the avatar is decoded again. Avatar
+        features of characters without a readable avatar are removed.
+        
+        Args:
+            story_id: ID of the story, or None for all stories
+            is_cancelled: Called between characters; the update stops if it returns True
+            
+        Returns:
+            Summary with the number of characters 'checked', 'unchanged',
+            'updated' and 'removed', and of 'errors'
+        """
+        cursor = self.db_conn.cursor()
+        if story_id is not None:
+            cursor.execute('''
+            SELECT id, name, avatar_path FROM characters WHERE story_id = ?
+            ''', (story_id,))
+        else:
+            cursor.execute('SELECT id, name, avatar_path FROM characters')
+        characters = cursor.fetchall()
+        
+        # Recorded avatar features of each character
+        if story_id is not None:
+            cursor.execute('''
+            SELECT f.id, f.character_id, f.source_path, f.source_mtime, f.source_hash,
+                   LENGTH(f.descriptor) AS descriptor_size
+            FROM image_features f
+            JOIN characters c ON c.id = f.character_id
+            WHERE f.is_avatar = 1 AND c.story_id = ?
+            ''', (story_id,))
+        else:
+            cursor.execute('''
+            SELECT id, character_id, source_path, source_mtime, source_hash,
+                   LENGTH(descriptor) AS descriptor_size
+            FROM image_features
+            WHERE is_avatar = 1
+            ''')
+        recorded: Dict[int, List[sqlite3.Row]] = {}
+        for row in cursor.fetchall():
+            recorded.setdefault(row['character_id'], []).append(row)
+        
+        summary = {'checked': 0, 'unchanged': 0, 'updated': 0, 'removed': 0, 'errors': 0}
+        for character in characters:
+            if is_cancelled is not None and is_cancelled():
+                break
+            summary['checked'] += 1
+            character_id = character['id']
+            avatar_path = character['avatar_path']
+            rows = recorded.get(character_id, [])
+            
+            try:
+                stat = os.stat(avatar_path) if avatar_path else None
+            except OSError:
+                stat = None
+            if stat is None:
+                if rows:
+                    self._delete_avatar_features(rows)
+                    summary['removed'] += 1
+                continue
+            
+            # Features saved without a descriptor are extracted again
+            current = len(rows) == 1 and rows[0]['descriptor_size'] == DESCRIPTOR_BLOB_SIZE
+            if current and rows[0]['source_path'] == avatar_path and rows[0]['source_mtime'] == stat.st_mtime:
+                summary['unchanged'] += 1
+                continue
+            
+            try:
+                source_hash = compute_file_hash(avatar_path)
+                if current and rows[0]['source_hash'] == source_hash:
+                    # Touched or moved, but the same picture
+                    cursor.execute('''
+                    UPDATE image_features SET source_path = ?, source_mtime = ?, updated_at = ?
+                    WHERE id = ?
+                    ''', (avatar_path, stat.st_mtime, datetime.now().isoformat(), rows[0]['id']))
+                    self.db_conn.commit()
+                    summary['unchanged'] += 1
+                    continue
+                
+                print(f"Processing character: {character['name']} (ID: {character_id})")
+                features = self.extract_features_from_path(avatar_path)
+            except (OSError, ValueError) as e:
+                print(f"Error processing character {character['name']}: {e}")
+                summary['errors'] += 1
+                continue
+            
+            self._delete_avatar_features(rows)
+            self.save_character_image_features(
+                character_id=character_id,
+                features=features,
+                is_avatar=True,
+                source=(avatar_path, stat.st_mtime, source_hash)
+            )
+            summary['updated'] += 1
+        
+        self.db_conn.commit()
+        if summary['updated'] or summary['removed'] or summary['errors']:
+            print(f"Updated recognition database: {summary['updated']} updated, "
+                  f"{summary['removed']} removed, {summary['unchanged']} unchanged, {summary['errors']} errors")
+        return summary
+    
+    def _delete_avatar_features(self, rows: List[sqlite3.Row]) -> None:
+        """Delete avatar feature rows (without committing).
+        
+        Args:
+            rows: Rows with the 'id' of each feature set
+        """
+        if rows:
+            self.db_conn.executemany('DELETE FROM image_features WHERE id = ?', [(row['id'],) for row in rows])
+
+
+class _CharacterFeatureSignals(QObject):
+    """Signals for avatar feature jobs (QRunnable can't define signals itself)."""
+    
+    finished = pyqtSignal(object)  # summary of update_character_image_database
+
+
+class CharacterFeatureUpdateJob(QRunnable):
+    """Background job that brings the avatar features of a story up to date."""
+    
+    def __init__(self, db_conn: sqlite3.Connection, story_id: Optional[int], cache_dir: Optional[str] = None):
+        """Initialize the job.
+        
+        Args:
+            db_conn: Database connection of the GUI thread
+            story_id: ID of the story, or None for all stories
+            cache_dir: Feature cache directory (see ImageRecognitionUtil)
+        """
+        super().__init__()
+        self.setAutoDelete(False)
+        self.db_conn = db_conn
+        self.db_path = get_database_path(db_conn)
+        self.story_id = story_id
+        self.cache_dir = cache_dir
+        
+        self.signals = _CharacterFeatureSignals()
+        self._cancel_event = threading.Event()
+    
+    def start(self, pool: Optional[QThreadPool] = None) -> None:
+        """Start the job on a thread pool.
+        
+        In-memory databases can't be opened from another thread, so for those
+        the job runs right away on the calling thread.
+        
+        Args:
+            pool: Thread pool to use (the global pool if None)
+        """
+        if self.db_path:
+            (pool or QThreadPool.globalInstance()).start(self)
+        else:
+            self.run()
+    
+    def cancel(self) -> None:
+        """Ask the job to stop (safe to call from any thread)."""
+        self._cancel_event.set()
+    
+    def is_cancelled(self) -> bool:
+        """Check whether the job has been cancelled."""
+        return self._cancel_event.is_set()
+    
+    def run(self) -> None:
+        """Run the update and report the summary through the signal."""
+        try:
+            conn = get_worker_connection(self.db_path) if self.db_path else self.db_conn
+            recognition = ImageRecognitionUtil(conn, cache_dir=self.cache_dir)
+            summary = recognition.update_character_image_database(self.story_id, self.is_cancelled)
+        except Exception as e:
+            print(f"Error updating recognition database: {e}")
+            summary = {'checked': 0, 'unchanged': 0, 'updated': 0, 'removed': 0, 'errors': 1}
+        self.signals.finished.emit(summary)
@@ -0,0 +1,444 @@
+"""
+Ingest Pipeline Module.
+
+This module adds pasted and imported images to a story off the GUI thread.
+
+An image goes through a fixed series of stages:
+    decode -> hash/dedup -> encode original -> thumbnail -> DB insert -> recognition suggestions
+
+Each job runs on a worker thread with its own SQLite connection. It reports
+the stage it is in, emits the decoded image as soon as it is available (so
+the tagging dialog can open while the rest of the work continues), and can be
+cancelled between stages. Files written by a cancelled or failed job are
+removed again.
+
+Encoded sources (files, downloads) are stored with their original bytes and
+format. Only raw pixels, such as a clipboard image, are encoded, using the
+format and quality chosen in the settings.
+"""
+
+import hashlib
+import os
+import random
+import sqlite3
+import string
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, QSettings, QBuffer, QByteArray, QIODevice, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader
+
+from app.db_sqlite import create_image, find_image_by_content_hash, save_image_descriptors
+from app.utils.image_prefetcher import get_database_path, get_worker_connection
+from app.utils.image_descriptors import compute_descriptor, descriptor_to_blob, DESCRIPTOR_VERSION
+from app.utils.image_recognition_util import ImageRecognitionUtil
+from app.utils.perceptual_hash import compute_dhash, hash_to_hex
+
+
+# Pipeline stages, in order
+STAGE_DECODE = 0
+STAGE_HASH = 1
+STAGE_ENCODE = 2
+STAGE_THUMBNAIL = 3
+STAGE_INSERT = 4
+STAGE_RECOGNITION = 5
+
+STAGE_LABELS = [
+    "Decoding image...",
+    "Checking for duplicates...",
+    "Saving image...",
+    "Creating thumbnail...",
+    "Adding image to story...",
+    "Finding characters...",
+]
+
+# Largest thumbnail side in pixels
+THUMBNAIL_MAX_DIMENSION = 320
+
+# Formats that raw pixels can be encoded to: key -> (Qt format, extension, MIME type)
+ENCODE_FORMATS = {
+    'png': ("PNG", "png", "image/png"),
+    'jpeg': ("JPEG", "jpg", "image/jpeg"),
+    'webp': ("WEBP", "webp", "image/webp"),
+}
+
+# Source formats stored with their original bytes: Qt format -> (extension, MIME type)
+KEEP_FORMATS = {
+    'png': ("png", "image/png"),
+    'jpeg': ("jpg", "image/jpeg"),
+    'jpg': ("jpg", "image/jpeg"),
+    'gif': ("gif", "image/gif"),
+    'webp': ("webp", "image/webp"),
+    'bmp': ("bmp", "image/bmp"),
+    'tiff': ("tiff", "image/tiff"),
+    'tif': ("tiff", "image/tiff"),
+}
+
+# QSettings keys for encoding raw pixels
+ENCODE_FORMAT_SETTING = "clipboard_image_format"
+ENCODE_QUALITY_SETTING = "clipboard_image_quality"
+DEFAULT_ENCODE_FORMAT = 'png'
+DEFAULT_ENCODE_QUALITY = -1  # Qt's default for the format
+
+
+class IngestCancelled(Exception):
+    """Raised inside a job when it has been cancelled."""
+
+
+def compute_image_hash(image: QImage) -> str:
+    """Compute a content hash of an image's pixels.
+
+    The hash is taken over decoded pixels, so the same picture is recognised
+    whether it was pasted from the clipboard or loaded from a file.
+
+    Args:
+        image: The image
+
+    Returns:
+        SHA-256 hex digest
+    """
+    if image.format() != QImage.Format.Format_ARGB32:
+        image = image.convertToFormat(QImage.Format.Format_ARGB32)
+
+    digest = hashlib.sha256()
+    digest.update(f"{image.width()}x{image.height()}:".encode('ascii'))
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    digest.update(bits.asstring())
+    return digest.hexdigest()
+
+
+def generate_thumbnail(image: QImage, max_dimension: int = THUMBNAIL_MAX_DIMENSION) -> QImage:
+    """Generate a thumbnail from an image.
+
+    Args:
+        image: Original image
+        max_dimension: Maximum dimension (width or height) for the thumbnail
+
+    Returns:
+        Thumbnail image
+    """
+    if max(image.width(), image.height()) <= max_dimension:
+        # Image is already smaller than max dimension
+        return image.copy()
+
+    return image.scaled(
+        max_dimension,
+        max_dimension,
+        Qt.AspectRatioMode.KeepAspectRatio,
+        Qt.TransformationMode.SmoothTransformation
+    )
+
+
+def get_encode_settings() -> Tuple[str, int]:
+    """Get the format and quality used to encode raw pixels, from the settings.
+
+    Returns:
+        Tuple of (format key from ENCODE_FORMATS, quality from 0-100 or -1 for
+        the format's default). For PNG, which is lossless, lower quality means
+        stronger and slower compression.
+    """
+    settings = QSettings("ThePlotThickens", "ThePlotThickens")
+    encode_format = settings.value(ENCODE_FORMAT_SETTING, DEFAULT_ENCODE_FORMAT)
+    if encode_format not in ENCODE_FORMATS:
+        encode_format = DEFAULT_ENCODE_FORMAT
+    try:
+        quality = int(settings.value(ENCODE_QUALITY_SETTING, DEFAULT_ENCODE_QUALITY))
+    except (TypeError, ValueError):
+        quality = DEFAULT_ENCODE_QUALITY
+    return encode_format, max(-1, min(100, quality))
+
+
+def detect_image_format(data: bytes) -> Optional[str]:
+    """Detect the format of encoded image bytes from their content.
+
+    Args:
+        data: Encoded image bytes
+
+    Returns:
+        Qt format name such as 'jpeg' or 'png', or None if it isn't an image
+    """
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+    reader = QImageReader(buffer)
+    if not reader.canRead():
+        return None
+    return bytes(reader.format()).decode('ascii').lower() or None
+
+
+def store_original(image: QImage, data: Optional[bytes], images_folder: str,
+                   encode_format: str = DEFAULT_ENCODE_FORMAT, encode_quality: int = DEFAULT_ENCODE_QUALITY,
+                   written_files: Optional[List[str]] = None) -> Tuple[str, str, str]:
+    """Write an image's original file into a story's images folder.
+
+    Encoded bytes in a format from KEEP_FORMATS are written as they are.
+    Otherwise the pixels are encoded with the given format and quality.
+
+    Args:
+        image: The decoded image
+        data: The encoded source bytes, if any
+        images_folder: Folder to write to
+        encode_format: Format for raw pixels (key of ENCODE_FORMATS)
+        encode_quality: Quality for raw pixels (0-100, or -1 for the default)
+        written_files: List to append the written path to, for cleanup on failure
+
+    Returns:
+        Tuple of (filename, full path, MIME type)
+
+    Raises:
+        IOError: If the file could not be written
+    """
+    os.makedirs(images_folder, exist_ok=True)
+    source_format = detect_image_format(data) if data else None
+
+    if source_format in KEEP_FORMATS:
+        extension, mime_type = KEEP_FORMATS[source_format]
+        filename = make_image_filename(extension)
+        full_path = os.path.join(images_folder, filename)
+        if written_files is not None:
+            written_files.append(full_path)
+        with open(full_path, 'wb') as image_file:
+            image_file.write(data)
+    else:
+        qt_format, extension, mime_type = ENCODE_FORMATS.get(encode_format, ENCODE_FORMATS[DEFAULT_ENCODE_FORMAT])
+        filename = make_image_filename(extension)
+        full_path = os.path.join(images_folder, filename)
+        if written_files is not None:
+            written_files.append(full_path)
+        if not image.save(full_path, qt_format, encode_quality):
+            raise IOError("Failed to save image file.")
+
+    return filename, full_path, mime_type
+
+
+def make_image_filename(extension: str = "png") -> str:
+    """Generate a unique filename for a new story image.
+
+    Args:
+        extension: File extension without the dot
+
+    Returns:
+        Filename such as image_20240101120000_ab12cd.png
+    """
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    rand_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
+    return f"image_{timestamp}_{rand_suffix}.{extension}"
+
+
+class _IngestSignals(QObject):
+    """Signals for ingest jobs (QRunnable can't define signals itself)."""
+
+    stage_changed = pyqtSignal(int, str)  # stage, label
+    decoded = pyqtSignal(object)  # QImage
+    duplicate_found = pyqtSignal(int)  # ID of the existing image
+    perceptual_hash_computed = pyqtSignal(object)  # dHash (int), for near-duplicate warnings
+    completed = pyqtSignal(object)  # result dictionary
+    failed = pyqtSignal(str)  # error message
+    cancelled = pyqtSignal()
+
+
+class ImageIngestJob(QRunnable):
+    """Background job that adds one image to a story."""
+
+    def __init__(self, db_conn: sqlite3.Connection, story_id: int, images_folder: str,
+                 thumbnails_folder: str, image: Optional[QImage] = None,
+                 data: Optional[bytes] = None, skip_duplicates: bool = True,
+                 suggest_characters: bool = True, encode_format: str = DEFAULT_ENCODE_FORMAT,
+                 encode_quality: int = DEFAULT_ENCODE_QUALITY):
+        """Initialize the job.
+
+        Args:
+            db_conn: Database connection of the GUI thread
+            story_id: ID of the story to add the image to
+            images_folder: Folder for the original image
+            thumbnails_folder: Folder for the thumbnail
+            image: Already decoded image
+            data: Encoded image bytes. Decoded by the job if image is None, and
+                stored as they are if their format is in KEEP_FORMATS.
+            skip_duplicates: Stop without saving if the story already has this image
+            suggest_characters: Run the recognition suggestions stage
+            encode_format: Format for raw pixels (key of ENCODE_FORMATS)
+            encode_quality: Quality for raw pixels (0-100, or -1 for the default)
+        """
+        super().__init__()
+        self.setAutoDelete(False)
+        self.db_conn = db_conn
+        self.db_path = get_database_path(db_conn)
+        self.story_id = story_id
+        self.images_folder = images_folder
+        self.thumbnails_folder = thumbnails_folder
+        self.image = image
+        self.data = data
+        self.skip_duplicates = skip_duplicates
+        self.suggest_characters = suggest_characters
+        self.encode_format = encode_format if encode_format in ENCODE_FORMATS else DEFAULT_ENCODE_FORMAT
+        self.encode_quality = encode_quality
+
+        self.signals = _IngestSignals()
+        self._cancel_event = threading.Event()
+
+    def start(self, pool: Optional[QThreadPool] = None) -> None:
+        """Start the job on a thread pool.
+
+        In-memory databases can't be opened from another thread, so for those
+        the job runs right away on the calling thread.
+
+        Args:
+            pool: Thread pool to use (the global pool if None)
+        """
+        if self.db_path:
+            (pool or QThreadPool.globalInstance()).start(self)
+        else:
+            self.run()
+
+    def cancel(self) -> None:
+        """Ask the job to stop at the next stage boundary (safe to call from any thread)."""
+        self._cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        """Check whether the job has been cancelled."""
+        return self._cancel_event.is_set()
+
+    def run(self) -> None:
+        """Run all stages and report the outcome through the signals."""
+        try:
+            conn = get_worker_connection(self.db_path) if self.db_path else self.db_conn
+            result = self.process(conn)
+        except IngestCancelled:
+            self.signals.cancelled.emit()
+            return
+        except Exception as e:
+            print(f"Error ingesting image: {e}")
+            self.signals.failed.emit(str(e))
+            return
+
+        if result.get('duplicate_of'):
+            self.signals.duplicate_found.emit(result['duplicate_of'])
+        else:
+            self.signals.completed.emit(result)
+
+    def process(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+        """Run the pipeline stages.
+
+        Args:
+            conn: Database connection owned by the calling thread
+
+        Returns:
+            Result dictionary with 'image_id', 'filename', 'width', 'height',
+            'mime_type', 'file_size', 'content_hash', 'perceptual_hash',
+            'descriptor', 'duplicate_of' and 'suggestions'
+
+        Raises:
+            IngestCancelled: If the job was cancelled
+        """
+        result = {
+            'image_id': None,
+            'filename': None,
+            'width': None,
+            'height': None,
+            'mime_type': None,
+            'file_size': None,
+            'content_hash': None,
+            'perceptual_hash': None,
+            'descriptor': None,
+            'duplicate_of': None,
+            'suggestions': [],
+        }
+
+        # Decode
+        self._enter_stage(STAGE_DECODE)
+        image = self.image
+        if image is None:
+            image = QImage.fromData(self.data or b"")
+        if image is None or image.isNull():
+            raise ValueError("The data is not a valid image.")
+        result['width'] = image.width()
+        result['height'] = image.height()
+        self.signals.decoded.emit(image)
+
+        # Hash and look for duplicates
+        self._enter_stage(STAGE_HASH)
+        content_hash = compute_image_hash(image)
+        result['content_hash'] = content_hash
+        if self.skip_duplicates:
+            existing_id = find_image_by_content_hash(conn, self.story_id, content_hash)
+            if existing_id:
+                result['duplicate_of'] = existing_id
+                return result
+
+        # Reported early so the user can be warned about near-duplicates while tagging
+        result['perceptual_hash'] = compute_dhash(image)
+        self.signals.perceptual_hash_computed.emit(result['perceptual_hash'])
+
+        written_files: List[str] = []
+        try:
+            # Store the original: the source bytes if there are any, otherwise encode the pixels
+            self._enter_stage(STAGE_ENCODE)
+            filename, full_path, mime_type = store_original(
+                image, self.data, self.images_folder, self.encode_format, self.encode_quality, written_files
+            )
+            result['mime_type'] = mime_type
+            result['file_size'] = os.path.getsize(full_path)
+
+            # Thumbnail
+            self._enter_stage(STAGE_THUMBNAIL)
+            os.makedirs(self.thumbnails_folder, exist_ok=True)
+            thumbnail_path = os.path.join(self.thumbnails_folder, filename)
+            written_files.append(thumbnail_path)
+            if not generate_thumbnail(image).save(thumbnail_path, "PNG"):
+                raise IOError("Failed to save thumbnail.")
+
+            # Insert the row; past this point the image is part of the story
+            self._enter_stage(STAGE_INSERT)
+            image_id = create_image(
+                conn,
+                filename=filename,
+                path=self.images_folder,
+                story_id=self.story_id,
+                title="",
+                description="",
+                width=image.width(),
+                height=image.height(),
+                file_size=result['file_size'],
+                mime_type=result['mime_type'],
+                content_hash=content_hash,
+                perceptual_hash=hash_to_hex(result['perceptual_hash'])
+            )
+            if not image_id:
+                raise IOError("Failed to add image to database.")
+        except Exception:
+            for path in written_files:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+
+        result['image_id'] = image_id
+        result['filename'] = filename
+
+        # Global descriptor for similar-image search
+        result['descriptor'] = compute_descriptor(image)
+        save_image_descriptors(conn, self.story_id, [(image_id, descriptor_to_blob(result['descriptor']))],
+                               DESCRIPTOR_VERSION)
+
+        # Recognition suggestions are optional, so cancelling only skips them
+        if self.suggest_characters and not self.is_cancelled():
+            self._enter_stage(STAGE_RECOGNITION)
+            try:
+                recognition = ImageRecognitionUtil(conn)
+                features = recognition.extract_features_from_qimage(
+                    image, recognition.needs_descriptor(self.story_id))
+                result['suggestions'] = recognition.identify_characters_in_image(
+                    features, threshold=0.5, story_id=self.story_id
+                )
+            except Exception as e:
+                print(f"Error finding character suggestions: {e}")
+
+        return result
+
+    def _enter_stage(self, stage: int) -> None:
+        """Report a new stage, stopping first if the job was cancelled."""
+        if self.is_cancelled():
+            raise IngestCancelled()
+        self.signals.stage_changed.emit(stage, STAGE_LABELS[stage])
@@ -0,0 +1,305 @@
+"""
+Perceptual Hash Module.
+
+This module finds near-duplicate images: the same frame with a different
+subtitle, a slightly different crop, or a re-encoded copy.
+
+Each image gets a 64-bit difference hash (dHash): the image is shrunk to 9x8
+grey pixels and each bit records whether a pixel is brighter than its right
+neighbour. Similar pictures have hashes that differ in only a few bits, so
+the Hamming distance between two hashes measures how alike they look.
+
+A story's hashes are kept in a multi-index hash table, so looking up one
+image only checks a small set of candidates, and grouping a whole story
+doesn't compare every pair of images.
+"""
+
+import os
+import sqlite3
+from itertools import combinations
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QImage, QImageReader
+
+from app.db_sqlite import get_story_perceptual_hashes, update_image_perceptual_hashes
+
+
+# Hash edge; the hash has HASH_SIZE * HASH_SIZE bits
+HASH_SIZE = 8
+
+# Maximum Hamming distance (of 64 bits) for two images to count as near-duplicates
+NEAR_DUPLICATE_DISTANCE = 10
+
+# Size images are read at when computing hashes for existing images
+HASH_SOURCE_SIZE = 256
+
+
+def compute_dhash(image: QImage, hash_size: int = HASH_SIZE) -> int:
+    """Compute the difference hash of an image.
+
+    Args:
+        image: The image
+        hash_size: Hash edge (the hash has hash_size * hash_size bits)
+
+    Returns:
+        The hash as an integer
+    """
+    small = image.scaled(
+        hash_size + 1, hash_size,
+        Qt.AspectRatioMode.IgnoreAspectRatio,
+        Qt.TransformationMode.SmoothTransformation
+    ).convertToFormat(QImage.Format.Format_Grayscale8)
+
+    bits = small.constBits()
+    bits.setsize(small.sizeInBytes())
+    # Rows are padded to 4 bytes
+    pixels = np.frombuffer(bits.asstring(), dtype=np.uint8).reshape(hash_size, small.bytesPerLine())
+    pixels = pixels[:, :hash_size + 1]
+
+    difference = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(difference.flatten()).tobytes(), 'big')
+
+
+def hash_to_hex(hash_value: int) -> str:
+    """Format a hash for storage."""
+    return f"{hash_value:016x}"
+
+
+def hex_to_hash(text: str) -> int:
+    """Parse a stored hash."""
+    return int(text, 16)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Count the bits that differ between two hashes."""
+    return (a ^ b).bit_count()
+
+
+def compute_file_dhash(image_path: str) -> Optional[int]:
+    """Compute the difference hash of an image file, reading it at a reduced size.
+
+    Args:
+        image_path: Path to the image file
+
+    Returns:
+        The hash, or None if the file can't be read
+    """
+    reader = QImageReader(image_path)
+    size = reader.size()
+    if size.isValid() and max(size.width(), size.height()) > HASH_SOURCE_SIZE:
+        reader.setScaledSize(size.scaled(HASH_SOURCE_SIZE, HASH_SOURCE_SIZE, Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return None
+    return compute_dhash(image)
+
+
+class MultiIndexHashTable:
+    """Hamming-distance search over 64-bit hashes using multi-index hashing.
+
+    Each hash is split into four 16-bit chunks, and each chunk is indexed in
+    its own table. If two hashes differ in at most r bits, at least one of
+    their chunks differs in at most r // 4 bits (pigeonhole), so a search
+    only looks up the few chunk values within that small distance of the
+    query's chunks and then checks the full distance of the candidates.
+    """
+
+    CHUNK_COUNT = 4
+    CHUNK_BITS = 16
+
+    def __init__(self):
+        """Initialize an empty table."""
+        self.tables: List[Dict[int, List[Tuple[int, Any]]]] = [{} for _ in range(self.CHUNK_COUNT)]
+        self.size = 0
+        self._flip_masks: Dict[int, List[int]] = {}
+
+    def add(self, hash_value: int, item: Any) -> None:
+        """Add an item with its hash.
+
+        Args:
+            hash_value: The item's hash
+            item: The item (hashable, e.g. an image ID)
+        """
+        self.size += 1
+        for number, chunk in enumerate(self._chunks(hash_value)):
+            self.tables[number].setdefault(chunk, []).append((hash_value, item))
+
+    def search(self, hash_value: int, max_distance: int) -> List[Tuple[int, Any]]:
+        """Find the items whose hash is within a distance of a hash.
+
+        Args:
+            hash_value: Hash to search for
+            max_distance: Maximum Hamming distance
+
+        Returns:
+            List of (distance, item) tuples, closest first
+        """
+        masks = self._get_flip_masks(max_distance // self.CHUNK_COUNT)
+        seen = set()
+        results = []
+        for number, chunk in enumerate(self._chunks(hash_value)):
+            table = self.tables[number]
+            for mask in masks:
+                for candidate_hash, item in table.get(chunk ^ mask, ()):
+                    # The same entry can be found through several chunks
+                    key = (candidate_hash, item)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    distance = hamming_distance(hash_value, candidate_hash)
+                    if distance <= max_distance:
+                        results.append((distance, item))
+
+        results.sort(key=lambda result: result[0])
+        return results
+
+    def _chunks(self, hash_value: int) -> List[int]:
+        """Split a hash into its chunks."""
+        mask = (1 << self.CHUNK_BITS) - 1
+        return [(hash_value >> (number * self.CHUNK_BITS)) & mask for number in range(self.CHUNK_COUNT)]
+
+    def _get_flip_masks(self, radius: int) -> List[int]:
+        """Get every chunk-sized mask with at most radius bits set."""
+        masks = self._flip_masks.get(radius)
+        if masks is None:
+            masks = [0]
+            for bit_count in range(1, radius + 1):
+                masks.extend(sum(1 << bit for bit in bits)
+                             for bits in combinations(range(self.CHUNK_BITS), bit_count))
+            self._flip_masks[radius] = masks
+        return masks
+
+
+class NearDuplicateIndex:
+    """Near-duplicate lookup over the images of one story."""
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self.table = MultiIndexHashTable()
+        self.hashes: Dict[int, int] = {}
+
+    @classmethod
+    def build(cls, conn: sqlite3.Connection, story_id: int,
+              progress_callback: Optional[Callable[[int, int], bool]] = None) -> 'NearDuplicateIndex':
+        """Build the index for a story.
+
+        Images added before hashes were stored get one computed from their
+        thumbnail (or the original if there is no thumbnail), which is saved.
+
+        Args:
+            conn: Database connection
+            story_id: ID of the story
+            progress_callback: Called with (done, total) while missing hashes
+                are computed; returning False stops early
+
+        Returns:
+            The index
+        """
+        index = cls()
+        rows = get_story_perceptual_hashes(conn, story_id)
+        missing = [row for row in rows if not row['perceptual_hash']]
+
+        computed = []
+        for done, row in enumerate(missing):
+            if progress_callback is not None and progress_callback(done, len(missing)) is False:
+                break
+            thumbnail_path = os.path.join(os.path.dirname(row['path']), "thumbnails", row['filename'])
+            image_path = os.path.join(row['path'], row['filename'])
+            hash_value = compute_file_dhash(thumbnail_path if os.path.exists(thumbnail_path) else image_path)
+            if hash_value is not None:
+                row['perceptual_hash'] = hash_to_hex(hash_value)
+                computed.append((row['id'], row['perceptual_hash']))
+
+        if computed:
+            update_image_perceptual_hashes(conn, computed)
+            print(f"Computed perceptual hashes for {len(computed)} images")
+
+        for row in rows:
+            if row['perceptual_hash']:
+                index.add(row['id'], hex_to_hash(row['perceptual_hash']))
+        return index
+
+    def add(self, image_id: int, hash_value: int) -> None:
+        """Add an image to the index.
+
+        Args:
+            image_id: ID of the image
+            hash_value: The image's hash
+        """
+        if self.hashes.get(image_id) == hash_value:
+            return
+        self.hashes[image_id] = hash_value
+        self.table.add(hash_value, image_id)
+
+    def remove(self, image_id: int) -> None:
+        """Remove an image from the index.
+
+        Args:
+            image_id: ID of the image
+        """
+        # The table keeps the entry; lookups skip images that are no longer in hashes
+        self.hashes.pop(image_id, None)
+
+    def find(self, hash_value: int, max_distance: int = NEAR_DUPLICATE_DISTANCE,
+             exclude: Optional[int] = None) -> List[Tuple[int, int]]:
+        """Find the images that look like a hash.
+
+        Args:
+            hash_value: Hash to search for
+            max_distance: Maximum Hamming distance
+            exclude: Image ID to leave out (e.g. the image itself)
+
+        Returns:
+            List of (image_id, distance) tuples, closest first
+        """
+        results = []
+        for distance, image_id in self.table.search(hash_value, max_distance):
+            if image_id == exclude:
+                continue
+            # Skip removed images and stale entries of images whose hash changed
+            stored = self.hashes.get(image_id)
+            if stored is None or hamming_distance(stored, hash_value) != distance:
+                continue
+            results.append((image_id, distance))
+        return results
+
+    def find_groups(self, max_distance: int = NEAR_DUPLICATE_DISTANCE) -> List[List[int]]:
+        """Group the story's images into sets of near-duplicates.
+
+        Images are in the same group if they are connected by a chain of
+        near-duplicate pairs.
+
+        Args:
+            max_distance: Maximum Hamming distance of a near-duplicate pair
+
+        Returns:
+            Groups of two or more image IDs, newest (highest ID) first, with
+            the largest groups first
+        """
+        parent = {image_id: image_id for image_id in self.hashes}
+
+        def find_root(image_id: int) -> int:
+            while parent[image_id] != image_id:
+                parent[image_id] = parent[parent[image_id]]
+                image_id = parent[image_id]
+            return image_id
+
+        for image_id, hash_value in self.hashes.items():
+            for other_id, _ in self.find(hash_value, max_distance, exclude=image_id):
+                root, other_root = find_root(image_id), find_root(other_id)
+                if root != other_root:
+                    parent[other_root] = root
+
+        groups: Dict[int, List[int]] = {}
+        for image_id in self.hashes:
+            groups.setdefault(find_root(image_id), []).append(image_id)
+
+        result = [sorted(group, reverse=True) for group in groups.values() if len(group) > 1]
+        result.sort(key=lambda group: (-len(group), -group[0]))
+        return result
+
+    def __len__(self) -> int:
+        """Get the number of images in the index."""
+        return len(self.hashes)
@@ -0,0 +1,115 @@
+"""
+Region Recognition Module.
+
+This module recognizes characters in the regions drawn in
+RegionSelectionDialog on worker threads, so the dialog stays responsive
+while several regions are drawn in a row. Each region is one job: its
+features are extracted and scored against the story's feature index (see
+feature_index.py), and the ranked suggestions are sent back as soon as
+they are ready, in whatever order the regions finish.
+
+Jobs never touch the database. The feature index and the character names
+are taken on the GUI thread when a job is created, and the index is only
+read by the jobs. A cancelled job (e.g. of a region the user deleted) skips
+whatever work is left and reports no suggestions.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional
+
+from PyQt6.QtCore import QObject, QRunnable, QThread, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QImage
+
+from app.utils.feature_index import CharacterFeatureIndex
+from app.utils.image_recognition_util import ImageRecognitionUtil, rank_character_scores
+
+
+# Minimum similarity of the suggestions for a region (low, to catch more potential matches)
+REGION_THRESHOLD = 0.5
+
+# Regions recognized at the same time
+REGION_RECOGNITION_THREADS = max(1, min(4, QThread.idealThreadCount() - 1))
+
+
+def create_region_recognition_pool(parent: Optional[QObject] = None) -> QThreadPool:
+    """Create the thread pool region recognition jobs run on.
+
+    Args:
+        parent: Owner of the pool
+
+    Returns:
+        The thread pool
+    """
+    pool = QThreadPool(parent)
+    pool.setMaxThreadCount(REGION_RECOGNITION_THREADS)
+    return pool
+
+
+class _RegionRecognitionSignals(QObject):
+    """Signals for region recognition jobs (QRunnable can't define signals itself)."""
+
+    finished = pyqtSignal(object)  # suggestions (None if cancelled or failed)
+
+
+class RegionRecognitionJob(QRunnable):
+    """Background job that suggests characters for one image region."""
+
+    def __init__(self, region_image: QImage, recognition: ImageRecognitionUtil,
+                 index: CharacterFeatureIndex, characters: Dict[int, str],
+                 threshold: float = REGION_THRESHOLD):
+        """Initialize the job.
+
+        Args:
+            region_image: Image of the region
+            recognition: Recognition utility (only its feature extraction, which
+                doesn't touch the database, and its cascade settings are used)
+            index: Feature index of the story's characters
+            characters: Names of the story's characters by ID
+            threshold: Minimum similarity of the suggestions
+        """
+        super().__init__()
+        self.setAutoDelete(False)
+        self.region_image = region_image
+        self.recognition = recognition
+        self.index = index
+        self.characters = characters
+        self.threshold = threshold
+        self.error: Optional[str] = None
+
+        self.signals = _RegionRecognitionSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self) -> None:
+        """Ask the job to stop (safe to call from any thread)."""
+        self._cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        """Check whether the job has been cancelled."""
+        return self._cancel_event.is_set()
+
+    def run(self) -> None:
+        """Recognize the region and report the suggestions through the signal."""
+        suggestions = None
+        try:
+            suggestions = self.process()
+        except Exception as e:
+            print(f"Error during character recognition: {e}")
+            self.error = str(e)
+        self.signals.finished.emit(suggestions)
+
+    def process(self) -> Optional[List[Dict[str, Any]]]:
+        """Extract the region's features and rank the characters.
+
+        Returns:
+            Suggestions as returned by identify_characters_in_image, or None if cancelled
+        """
+        if self.is_cancelled():
+            return None
+        features = self.recognition.extract_features_from_qimage(
+            self.region_image, self.index.reranks(self.recognition.cascade_top_k))
+
+        if self.is_cancelled():
+            return None
+        scores = self.index.score_cascade(features, self.recognition.cascade_top_k,
+                                          self.recognition.cascade_budget_ms)
+        return rank_character_scores(scores, self.characters, self.threshold)
@@ -0,0 +1,276 @@
+"""
+Scene Grouping Module.
+
+This module computes how a story's gallery images are grouped into scenes.
+An image belongs to a scene either directly (scene_images) or through one of
+its quick events (quick_event_images + scene_quick_events). The whole mapping,
+including ordering keys and the set of ungrouped images, is computed with a
+fixed number of set-based queries regardless of how many images the story has.
+
+The gallery can also show the scene headers first, from a per-scene count of
+images, and look up the images of each scene once it's expanded.
+"""
+
+import sqlite3
+from typing import Dict, List, Any, Optional, Iterable
+
+
+# Fallback timestamp used when a scene has no quick events and no creation date
+DEFAULT_TIMESTAMP = '1970-01-01 00:00:00'
+
+# Membership of images in scenes, both direct and through quick events.
+# UNION removes duplicates when an image is linked to a scene both ways.
+_SCENE_MEMBERSHIP_SQL = '''
+SELECT m.image_id, e.id AS scene_id, e.title, e.sequence_number,
+       COALESCE(n.newest_timestamp, e.created_at, ?) AS newest_timestamp
+FROM (
+    SELECT si.image_id, si.scene_event_id
+    FROM scene_images si
+    JOIN images i ON i.id = si.image_id
+    WHERE i.story_id = ?
+    UNION
+    SELECT qei.image_id, sqe.scene_event_id
+    FROM quick_event_images qei
+    JOIN scene_quick_events sqe ON sqe.quick_event_id = qei.quick_event_id
+    JOIN images i ON i.id = qei.image_id
+    WHERE i.story_id = ?
+) m
+JOIN events e ON e.id = m.scene_event_id AND e.event_type = 'SCENE'
+LEFT JOIN (
+    SELECT sqe.scene_event_id, MAX(qe.created_at) AS newest_timestamp
+    FROM scene_quick_events sqe
+    JOIN quick_events qe ON qe.id = sqe.quick_event_id
+    GROUP BY sqe.scene_event_id
+) n ON n.scene_event_id = e.id
+'''
+
+# Number of images in each scene and the creation date of the newest one
+_SCENE_SUMMARY_SQL = '''
+SELECT e.id, e.title, e.sequence_number,
+       COUNT(*) AS image_count, MAX(m.created_at) AS newest_created_at
+FROM (
+    SELECT si.image_id, si.scene_event_id, i.created_at
+    FROM scene_images si
+    JOIN images i ON i.id = si.image_id
+    WHERE i.story_id = ?
+    UNION
+    SELECT qei.image_id, sqe.scene_event_id, i.created_at
+    FROM quick_event_images qei
+    JOIN scene_quick_events sqe ON sqe.quick_event_id = qei.quick_event_id
+    JOIN images i ON i.id = qei.image_id
+    WHERE i.story_id = ?
+) m
+JOIN events e ON e.id = m.scene_event_id AND e.event_type = 'SCENE'
+GROUP BY e.id
+'''
+
+# Condition on an image (aliased i) that is true when it isn't in any scene
+_UNGROUPED_CONDITION = '''
+NOT EXISTS (
+    SELECT 1
+    FROM scene_images si
+    JOIN events e ON e.id = si.scene_event_id AND e.event_type = 'SCENE'
+    WHERE si.image_id = i.id
+)
+AND NOT EXISTS (
+    SELECT 1
+    FROM quick_event_images qei
+    JOIN scene_quick_events sqe ON sqe.quick_event_id = qei.quick_event_id
+    JOIN events e ON e.id = sqe.scene_event_id AND e.event_type = 'SCENE'
+    WHERE qei.image_id = i.id
+)
+'''
+
+# Images of a single scene, both direct and through quick events
+_SCENE_IMAGE_IDS_SQL = '''
+SELECT si.image_id
+FROM scene_images si
+WHERE si.scene_event_id = ?
+UNION
+SELECT qei.image_id
+FROM scene_quick_events sqe
+JOIN quick_event_images qei ON qei.quick_event_id = sqe.quick_event_id
+WHERE sqe.scene_event_id = ?
+'''
+
+
+def get_story_gallery_images(conn: sqlite3.Connection, story_id: int) -> List[Dict[str, Any]]:
+    """Get the gallery images of a story, newest first.
+
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+
+    Returns:
+        List of image dictionaries with the columns needed by the gallery
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT id, filename, path, title, width, height, created_at
+    FROM images
+    WHERE story_id = ?
+    ORDER BY created_at DESC, id DESC
+    ''', (story_id,))
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def group_images_by_scene(conn: sqlite3.Connection, story_id: int,
+                          images: Optional[Iterable[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Group a story's images by scene.
+
+    Runs one query for the images (skipped when images are passed in) and one
+    query for all scene memberships with their scene metadata.
+
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        images: Optional pre-fetched (e.g. filtered) images to group. Each must
+            have at least 'id' and 'created_at'. When omitted, all images of
+            the story are loaded.
+
+    Returns:
+        Dictionary with:
+            'ungrouped': images not in any scene, newest first
+            'scenes': list of scene dictionaries (id, title, sequence_number,
+                newest_timestamp, images), highest sequence number first, each
+                with its images newest first
+            'image_count': number of images that were grouped
+    """
+    if images is None:
+        images = get_story_gallery_images(conn, story_id)
+    else:
+        images = [dict(image) for image in images]
+        # Keep the gallery order: newest first
+        images.sort(key=lambda image: (image.get('created_at') or DEFAULT_TIMESTAMP, image['id']), reverse=True)
+
+    images_by_id = {image['id']: image for image in images}
+
+    cursor = conn.cursor()
+    cursor.execute(_SCENE_MEMBERSHIP_SQL, (DEFAULT_TIMESTAMP, story_id, story_id))
+
+    scenes: Dict[int, Dict[str, Any]] = {}
+    image_scene_ids: Dict[int, set] = {}
+    for row in cursor.fetchall():
+        image_id = row['image_id']
+        if image_id not in images_by_id:
+            # Image was filtered out by the caller
+            continue
+        scene_id = row['scene_id']
+        if scene_id not in scenes:
+            scenes[scene_id] = {
+                'id': scene_id,
+                'title': row['title'],
+                'sequence_number': row['sequence_number'] or 0,
+                'newest_timestamp': row['newest_timestamp'],
+                'images': []
+            }
+        image_scene_ids.setdefault(image_id, set()).add(scene_id)
+
+    # Walk the images once in display order so every scene keeps that order
+    ungrouped = []
+    for image in images:
+        scene_ids = image_scene_ids.get(image['id'])
+        if not scene_ids:
+            ungrouped.append(image)
+            continue
+        for scene_id in scene_ids:
+            scenes[scene_id]['images'].append(image)
+
+    ordered_scenes = sorted(scenes.values(), key=lambda scene: (-scene['sequence_number'], scene['id']))
+
+    return {
+        'ungrouped': ungrouped,
+        'scenes': ordered_scenes,
+        'image_count': len(images)
+    }
+
+
+def get_scene_summaries(conn: sqlite3.Connection, story_id: int) -> Dict[str, Any]:
+    """Count the images of each scene of a story without grouping the images themselves.
+
+    Runs one aggregate query for the scenes and one for the ungrouped images.
+
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+
+    Returns:
+        Dictionary with:
+            'ungrouped': image_count and newest_created_at of the images not in any scene
+            'scenes': list of scene dictionaries (id, title, sequence_number,
+                image_count, newest_created_at), highest sequence number first,
+                for the scenes that have images
+    """
+    cursor = conn.cursor()
+    cursor.execute(_SCENE_SUMMARY_SQL, (story_id, story_id))
+    scenes = [dict(row) for row in cursor.fetchall()]
+    for scene in scenes:
+        scene['sequence_number'] = scene['sequence_number'] or 0
+    scenes.sort(key=lambda scene: (-scene['sequence_number'], scene['id']))
+
+    cursor.execute(f'''
+    SELECT COUNT(*) AS image_count, MAX(i.created_at) AS newest_created_at
+    FROM images i
+    WHERE i.story_id = ? AND {_UNGROUPED_CONDITION}
+    ''', (story_id,))
+
+    return {
+        'ungrouped': dict(cursor.fetchone()),
+        'scenes': scenes
+    }
+
+
+def get_section_images(conn: sqlite3.Connection, story_id: int,
+                       scene_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Get the gallery images of a single scene, or the images not in any scene, newest first.
+
+    Args:
+        conn: Database connection
+        story_id: ID of the story
+        scene_id: ID of the scene, or None for the ungrouped images
+
+    Returns:
+        List of image dictionaries with the columns needed by the gallery
+    """
+    cursor = conn.cursor()
+    if scene_id is None:
+        cursor.execute(f'''
+        SELECT i.id, i.filename, i.path, i.title, i.width, i.height, i.created_at
+        FROM images i
+        WHERE i.story_id = ? AND {_UNGROUPED_CONDITION}
+        ORDER BY i.created_at DESC, i.id DESC
+        ''', (story_id,))
+    else:
+        cursor.execute(f'''
+        SELECT i.id, i.filename, i.path, i.title, i.width, i.height, i.created_at
+        FROM images i
+        WHERE i.story_id = ? AND i.id IN ({_SCENE_IMAGE_IDS_SQL})
+        ORDER BY i.created_at DESC, i.id DESC
+        ''', (story_id, scene_id, scene_id))
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def get_scenes_for_image(conn: sqlite3.Connection, image_id: int) -> List[Dict[str, Any]]:
+    """Get the scenes a single image belongs to, directly or through its quick events.
+
+    Args:
+        conn: Database connection
+        image_id: ID of the image
+
+    Returns:
+        List of scene dictionaries with id, title and sequence_number
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    SELECT e.id, e.title, e.sequence_number
+    FROM events e
+    JOIN scene_images si ON e.id = si.scene_event_id
+    WHERE si.image_id = ? AND e.event_type = 'SCENE'
+    UNION
+    SELECT e.id, e.title, e.sequence_number
+    FROM events e
+    JOIN scene_quick_events sqe ON e.id = sqe.scene_event_id
+    JOIN quick_event_images qei ON qei.quick_event_id = sqe.quick_event_id
+    WHERE qei.image_id = ? AND e.event_type = 'SCENE'
+    ''', (image_id, image_id))
+    return [dict(row) for row in cursor.fetchall()]
@@ -0,0 +1,397 @@
+"""
+Storage Garbage Collector Module.
+
+This module finds and removes files that nothing in the database refers to
+any more: originals and thumbnails of deleted images, avatars that were
+replaced (e.g. the avatar_temp_<time>.png files written for new
+characters), and face encodings whose rows are gone.
+
+The database is read into sets of referenced paths, and the story folders
+are then scanned with os.scandir one entry at a time, so a large story is
+never listed into memory all at once. The job runs on a worker thread,
+reports progress as it goes and can be cancelled between entries. Files
+written in the last few minutes are never collected, so an image that is
+still being imported (its file is written before its row) is left alone,
+and each orphan is checked against the database again right before it is
+removed.
+
+Orphans can be moved to a trash folder inside the story folder (and inside
+the faces folder), from which they can be restored by hand until the trash
+is emptied, or deleted right away.
+"""
+
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Any, Iterator, Optional, Set, Tuple
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from app.utils.image_prefetcher import get_database_path, get_worker_connection
+
+
+# Kinds of files that are collected
+CATEGORY_IMAGES = 'images'
+CATEGORY_THUMBNAILS = 'thumbnails'
+CATEGORY_AVATARS = 'avatars'
+CATEGORY_FACES = 'faces'
+CATEGORIES = (CATEGORY_IMAGES, CATEGORY_THUMBNAILS, CATEGORY_AVATARS, CATEGORY_FACES)
+
+# What the job does with the orphans it finds
+ACTION_REPORT = 'report'
+ACTION_TRASH = 'trash'
+ACTION_DELETE = 'delete'
+
+# Folder (inside the story folder and the faces folder) that orphans are moved to
+TRASH_FOLDER_NAME = '.trash'
+
+# Files modified more recently than this are never collected
+GRACE_SECONDS = 600
+
+# Entries scanned between progress reports
+PROGRESS_INTERVAL = 500
+
+# Default face encoding folder (see FaceRecognitionUtil)
+DEFAULT_FACES_FOLDER = os.path.join(os.path.expanduser("~"), ".ThePlotThickens", "faces")
+
+
+def normalize_path(path: str) -> str:
+    """Normalize a path so paths written in different ways compare equal."""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def format_size(size: int) -> str:
+    """Format a byte count for display (e.g. '12.3 MB')."""
+    value = float(size)
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if value < 1024 or unit == "GB":
+            return f"{int(value)} {unit}" if unit == "bytes" else f"{value:.1f} {unit}"
+        value /= 1024
+
+
+def load_referenced_paths(conn: sqlite3.Connection) -> Dict[str, Set[str]]:
+    """Read the files the database refers to.
+
+    Images of every story are included, so a file is never collected just
+    because it belongs to another story.
+
+    Args:
+        conn: Database connection
+
+    Returns:
+        Dictionary mapping each category to a set of normalized paths. The
+        faces category is missing if the database has no face encodings table.
+    """
+    referenced = {category: set() for category in CATEGORIES}
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT path, filename FROM images")
+    for path, filename in cursor:
+        referenced[CATEGORY_IMAGES].add(normalize_path(os.path.join(path, filename)))
+        referenced[CATEGORY_THUMBNAILS].add(
+            normalize_path(os.path.join(os.path.dirname(path), "thumbnails", filename)))
+
+    cursor.execute("SELECT avatar_path FROM characters WHERE avatar_path IS NOT NULL AND avatar_path != ''")
+    for (avatar_path,) in cursor:
+        referenced[CATEGORY_AVATARS].add(normalize_path(avatar_path))
+
+    try:
+        # Encodings stored in the table have no file
+        cursor.execute("SELECT encoding_path FROM face_encodings WHERE encoding_path != ''")
+        for (encoding_path,) in cursor:
+            referenced[CATEGORY_FACES].add(normalize_path(encoding_path))
+    except sqlite3.OperationalError:
+        # Face recognition was never used with this database
+        del referenced[CATEGORY_FACES]
+
+    return referenced
+
+
+def iter_story_files(folder_path: str, faces_folder: Optional[str] = None) -> Iterator[Tuple[str, os.DirEntry]]:
+    """Scan the collectable folders one entry at a time.
+
+    Args:
+        folder_path: Story folder
+        faces_folder: Face encoding folder, or None to leave it out
+
+    Yields:
+        (category, entry) tuples for the regular files in each folder
+    """
+    folders = [(category, os.path.join(folder_path, category))
+               for category in (CATEGORY_IMAGES, CATEGORY_THUMBNAILS, CATEGORY_AVATARS)]
+    if faces_folder:
+        folders.append((CATEGORY_FACES, faces_folder))
+
+    for category, folder in folders:
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    try:
+                        if entry.is_file(follow_symlinks=False):
+                            yield category, entry
+                    except OSError:
+                        continue
+        except FileNotFoundError:
+            continue
+
+
+def get_trash_folders(folder_path: str, faces_folder: Optional[str] = None) -> List[str]:
+    """Get the trash folders of a story (and of the faces folder)."""
+    folders = [os.path.join(folder_path, TRASH_FOLDER_NAME)]
+    if faces_folder:
+        folders.append(os.path.join(faces_folder, TRASH_FOLDER_NAME))
+    return folders
+
+
+def get_trash_size(folder_path: str, faces_folder: Optional[str] = None) -> Tuple[int, int]:
+    """Count the files in a story's trash.
+
+    Args:
+        folder_path: Story folder
+        faces_folder: Face encoding folder, or None to leave it out
+
+    Returns:
+        (file count, total bytes)
+    """
+    count = 0
+    total = 0
+    for trash_folder in get_trash_folders(folder_path, faces_folder):
+        for folder, _, filenames in os.walk(trash_folder):
+            for filename in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(folder, filename))
+                    count += 1
+                except OSError:
+                    pass
+    return count, total
+
+
+def empty_trash(folder_path: str, faces_folder: Optional[str] = None) -> Tuple[int, int]:
+    """Permanently delete the files in a story's trash.
+
+    Args:
+        folder_path: Story folder
+        faces_folder: Face encoding folder, or None to leave it out
+
+    Returns:
+        (file count, total bytes) that were deleted
+    """
+    count, total = get_trash_size(folder_path, faces_folder)
+    for trash_folder in get_trash_folders(folder_path, faces_folder):
+        if os.path.isdir(trash_folder):
+            shutil.rmtree(trash_folder, ignore_errors=True)
+    print(f"Emptied trash: {count} files, {format_size(total)}")
+    return count, total
+
+
+class _StorageGCSignals(QObject):
+    """Signals for storage collection jobs (QRunnable can't define signals itself)."""
+
+    progress = pyqtSignal(object)  # summary so far (without the orphan list)
+    finished = pyqtSignal(object)  # final summary
+
+
+class StorageGCJob(QRunnable):
+    """Background job that finds orphaned files of a story and optionally removes them."""
+
+    def __init__(self, db_conn: sqlite3.Connection, folder_path: str, action: str = ACTION_REPORT,
+                 faces_folder: Optional[str] = DEFAULT_FACES_FOLDER,
+                 candidates: Optional[List[Dict[str, Any]]] = None,
+                 grace_seconds: float = GRACE_SECONDS):
+        """Initialize the job.
+
+        Args:
+            db_conn: Database connection of the GUI thread
+            folder_path: Story folder
+            action: ACTION_REPORT, ACTION_TRASH or ACTION_DELETE
+            faces_folder: Face encoding folder, or None to leave it out
+            candidates: Orphans from an earlier report to act on; the folders
+                are scanned if None
+            grace_seconds: Files modified more recently than this are kept
+        """
+        super().__init__()
+        self.setAutoDelete(False)
+        self.db_conn = db_conn
+        self.db_path = get_database_path(db_conn)
+        self.folder_path = folder_path
+        self.action = action
+        self.faces_folder = faces_folder
+        self.candidates = candidates
+        self.grace_seconds = grace_seconds
+
+        self.signals = _StorageGCSignals()
+        self._cancel_event = threading.Event()
+
+    def start(self, pool: Optional[QThreadPool] = None) -> None:
+        """Start the job on a thread pool.
+
+        In-memory databases can't be opened from another thread, so for those
+        the job runs right away on the calling thread.
+
+        Args:
+            pool: Thread pool to use (the global pool if None)
+        """
+        if self.db_path:
+            (pool or QThreadPool.globalInstance()).start(self)
+        else:
+            self.run()
+
+    def cancel(self) -> None:
+        """Ask the job to stop (safe to call from any thread)."""
+        self._cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        """Check whether the job has been cancelled."""
+        return self._cancel_event.is_set()
+
+    def run(self) -> None:
+        """Run the job and report the summary through the signals."""
+        try:
+            conn = get_worker_connection(self.db_path) if self.db_path else self.db_conn
+            summary = self.process(conn)
+        except Exception as e:
+            print(f"Error collecting storage: {e}")
+            summary = self._new_summary()
+            summary['errors'].append((self.folder_path, str(e)))
+        self.signals.finished.emit(summary)
+
+    def process(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+        """Find the orphans and act on them.
+
+        Args:
+            conn: Database connection owned by the calling thread
+
+        Returns:
+            Summary with 'scanned', 'orphans' (dictionaries with 'category',
+            'path', 'size' and 'modified'), 'categories' (category ->
+            {'count', 'bytes'}), 'reclaimable_bytes', 'collected',
+            'collected_bytes', 'trash_folder', 'errors' [(path, message)],
+            'elapsed' and 'cancelled'
+        """
+        start_time = time.perf_counter()
+        summary = self._new_summary()
+
+        if self.candidates is None:
+            self._scan(conn, summary)
+        else:
+            for orphan in self.candidates:
+                self._add_orphan(summary, orphan)
+
+        if self.action != ACTION_REPORT and not self.is_cancelled():
+            self._collect(conn, summary)
+
+        summary['cancelled'] = self.is_cancelled()
+        summary['elapsed'] = time.perf_counter() - start_time
+        return summary
+
+    def _scan(self, conn: sqlite3.Connection, summary: Dict[str, Any]) -> None:
+        """Diff the story folders against the database."""
+        referenced = load_referenced_paths(conn)
+        faces_folder = self.faces_folder if CATEGORY_FACES in referenced else None
+        cutoff = time.time() - self.grace_seconds
+
+        for category, entry in iter_story_files(self.folder_path, faces_folder):
+            if self.is_cancelled():
+                break
+            summary['scanned'] += 1
+            if summary['scanned'] % PROGRESS_INTERVAL == 0:
+                self._report_progress(summary)
+
+            if normalize_path(entry.path) in referenced[category]:
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if stat.st_mtime > cutoff:
+                continue
+            self._add_orphan(summary, {
+                'category': category,
+                'path': entry.path,
+                'size': stat.st_size,
+                'modified': stat.st_mtime,
+            })
+
+        self._report_progress(summary)
+
+    def _collect(self, conn: sqlite3.Connection, summary: Dict[str, Any]) -> None:
+        """Move the orphans to the trash or delete them."""
+        # Rows may have been added since the scan, so check again right before removing anything
+        referenced = load_referenced_paths(conn)
+        cutoff = time.time() - self.grace_seconds
+        batch_name = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        for orphan in summary['orphans']:
+            if self.is_cancelled():
+                break
+            path = orphan['path']
+            category = orphan['category']
+            if normalize_path(path) in referenced.get(category, ()):
+                continue
+            try:
+                if os.path.getmtime(path) > cutoff:
+                    continue
+                if self.action == ACTION_DELETE:
+                    os.remove(path)
+                else:
+                    os.replace(path, self._get_trash_path(orphan, batch_name))
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                summary['errors'].append((path, str(e)))
+                continue
+            summary['collected'] += 1
+            summary['collected_bytes'] += orphan['size']
+            if summary['collected'] % PROGRESS_INTERVAL == 0:
+                self._report_progress(summary)
+
+        if self.action == ACTION_TRASH:
+            summary['trash_folder'] = os.path.join(self.folder_path, TRASH_FOLDER_NAME)
+        print(f"Storage collection ({self.action}): {summary['collected']} files, "
+              f"{format_size(summary['collected_bytes'])}, {len(summary['errors'])} errors")
+
+    def _get_trash_path(self, orphan: Dict[str, Any], batch_name: str) -> str:
+        """Get the trash path for an orphan, creating its folder."""
+        if orphan['category'] == CATEGORY_FACES:
+            folder = os.path.join(os.path.dirname(orphan['path']), TRASH_FOLDER_NAME, batch_name)
+        else:
+            folder = os.path.join(self.folder_path, TRASH_FOLDER_NAME, batch_name, orphan['category'])
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, os.path.basename(orphan['path']))
+
+    @staticmethod
+    def _add_orphan(summary: Dict[str, Any], orphan: Dict[str, Any]) -> None:
+        """Add an orphan to a summary."""
+        summary['orphans'].append(orphan)
+        category = summary['categories'][orphan['category']]
+        category['count'] += 1
+        category['bytes'] += orphan['size']
+        summary['reclaimable_bytes'] += orphan['size']
+
+    def _report_progress(self, summary: Dict[str, Any]) -> None:
+        """Emit the summary so far, without copying the orphan list."""
+        report = {key: value for key, value in summary.items() if key not in ('orphans', 'errors')}
+        report['categories'] = {category: dict(totals) for category, totals in summary['categories'].items()}
+        report['orphan_count'] = len(summary['orphans'])
+        self.signals.progress.emit(report)
+
+    @staticmethod
+    def _new_summary() -> Dict[str, Any]:
+        """Create an empty summary."""
+        return {
+            'scanned': 0,
+            'orphans': [],
+            'categories': {category: {'count': 0, 'bytes': 0} for category in CATEGORIES},
+            'reclaimable_bytes': 0,
+            'collected': 0,
+            'collected_bytes': 0,
+            'trash_folder': None,
+            'errors': [],
+            'elapsed': 0.0,
+            'cancelled': False,
+        }
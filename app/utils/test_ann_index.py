@@ -0,0 +1,203 @@
+"""
+Test script for ann_index.py.
+
+This script checks that small indexes give exact results, that removed
+vectors are never returned and replaced ones are found at their new place,
+that a saved index is loaded without training it again (with vectors added
+since put into lists), that the face encoding store saves its trained index,
+and measures recall and query time against exact search at 10k and 100k
+vectors.
+"""
+
+import sys
+import os
+import tempfile
+import time
+from datetime import datetime
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import numpy as np
+
+from app.db_sqlite import initialize_database
+from app.utils.ann_index import IVFIndex, EXACT_SEARCH_LIMIT
+from app.utils.face_encoding_store import (
+    FaceEncodingStore, create_face_encodings_table, encode_face_encoding, ENCODING_SIZE, FACE_INDEX_NAME
+)
+
+
+def clustered_vectors(count: int, rng, per_cluster: int = 20, dimension: int = ENCODING_SIZE) -> np.ndarray:
+    """Create vectors in tight clusters, as face encodings of the same person are.
+
+    Cluster centers are about 1.1 apart, and vectors about 0.3 from the others of their cluster.
+    """
+    centers = rng.normal(0, 0.07, size=(max(1, count // per_cluster), dimension))
+    members = rng.integers(0, len(centers), size=count)
+    return (centers[members] + rng.normal(0, 0.02, size=(count, dimension))).astype(np.float32)
+
+
+def exact_search(vectors: np.ndarray, ids: np.ndarray, query: np.ndarray, k: int):
+    """Find the k closest vectors by comparing every one."""
+    distances = np.linalg.norm(vectors - query, axis=1)
+    nearest = np.argsort(distances)[:k]
+    return ids[nearest], distances[nearest]
+
+
+def test_small_index_is_exact():
+    """Below the exact limit, searches equal exact search."""
+    rng = np.random.default_rng(1)
+    vectors = clustered_vectors(1000, rng)
+    ids = np.arange(1000, 2000)
+    index = IVFIndex(ENCODING_SIZE)
+    index.add(ids, vectors)
+    assert not index.is_trained() and len(index) == 1000
+
+    for query in vectors[:20] + rng.normal(0, 0.01, size=(20, ENCODING_SIZE)):
+        found_ids, found_distances = index.search(query, 10)
+        expected_ids, expected_distances = exact_search(vectors, ids, query, 10)
+        assert list(found_ids) == list(expected_ids)
+        assert np.allclose(found_distances, expected_distances, atol=1e-6)
+
+    # Asking for more than there is returns everything
+    assert len(index.search(vectors[0], 5000)[0]) == 1000
+    assert len(IVFIndex(ENCODING_SIZE).search(vectors[0], 5)[0]) == 0
+
+
+def test_adds_and_removes():
+    """Removed vectors aren't found; replaced ones are found at their new place."""
+    rng = np.random.default_rng(2)
+    vectors = clustered_vectors(6000, rng)
+    ids = np.arange(6000)
+    index = IVFIndex(ENCODING_SIZE, exact_limit=2000)
+    index.add(ids[:1000], vectors[:1000])
+    assert not index.is_trained()
+    # Growing past the limit trains the index
+    index.add(ids[1000:], vectors[1000:])
+    assert index.is_trained() and not index.is_exact() and index.trained_size == 6000
+
+    # A vector finds itself
+    for row in rng.choice(6000, 50, replace=False):
+        assert index.search(vectors[row], 1)[0][0] == ids[row]
+
+    # Removed vectors are never returned
+    removed = ids[:2000]
+    assert index.remove(removed.tolist() + [10 ** 9]) == 2000
+    assert len(index) == 4000
+    for row in range(0, 2000, 40):
+        assert not np.isin(index.search(vectors[row], 10)[0], removed).any()
+
+    # Removing most of the vectors compacts the arrays
+    index.remove(ids[2000:3500].tolist())
+    assert index.size == len(index) == 2500
+    assert index.search(vectors[4000], 1)[0][0] == 4000
+
+    # Adding an ID again replaces its vector
+    index.add([4000], vectors[10:11])
+    assert len(index) == 2500
+    assert index.search(vectors[10], 1)[0][0] == 4000
+    assert index.search(vectors[4000], 1)[0][0] != 4000
+
+
+def test_save_and_load():
+    """A loaded index reuses the saved lists and puts vectors added since into lists."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn = initialize_database(os.path.join(folder, 'test.db'))
+        rng = np.random.default_rng(3)
+        vectors = clustered_vectors(8000, rng)
+        ids = np.arange(1, 8001)
+
+        index = IVFIndex(ENCODING_SIZE)
+        index.add(ids[:6000], vectors[:6000])
+        index.save(conn, 'test')
+
+        start = time.perf_counter()
+        loaded = IVFIndex.load(conn, 'test', ids, vectors)
+        load_time = time.perf_counter() - start
+        assert np.array_equal(loaded.centroids, index.centroids) and loaded.trained_size == 6000
+        assert np.array_equal(loaded.assignments[:6000], index.assignments[:6000])
+        for row in (0, 5999, 6000, 7999):
+            assert loaded.search(vectors[row], 1)[0][0] == ids[row]
+
+        start = time.perf_counter()
+        IVFIndex(ENCODING_SIZE).add(ids, vectors)
+        train_time = time.perf_counter() - start
+        print(f"8000 vectors: loading the saved index {load_time * 1000:.0f} ms, "
+              f"training a new one {train_time * 1000:.0f} ms")
+
+        # Without a saved index (or another dimension), the vectors are indexed from scratch
+        assert not IVFIndex.load(conn, 'other', ids[:100], vectors[:100]).is_trained()
+        assert IVFIndex.load(conn, 'test', ids[:10], vectors[:10, :64]).centroids is None
+
+        conn.close()
+
+
+def test_face_store_saves_index():
+    """The face encoding store saves its index once trained, and reloads it."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn = initialize_database(os.path.join(folder, 'test.db'))
+        create_face_encodings_table(conn)
+        rng = np.random.default_rng(4)
+        encodings = clustered_vectors(EXACT_SEARCH_LIMIT + 1000, rng)
+        now = datetime.now().isoformat()
+        conn.executemany("INSERT INTO face_encodings (character_id, encoding_path, encoding, created_at, updated_at) "
+                         "VALUES (?, '', ?, ?, ?)",
+                         [(number // 20 + 1, encode_face_encoding(encoding), now, now)
+                          for number, encoding in enumerate(encodings)])
+        conn.commit()
+
+        store = FaceEncodingStore(conn)
+        assert store.index.is_trained()
+        saved = conn.execute("SELECT trained_size FROM ann_indexes WHERE name = ?", (FACE_INDEX_NAME,)).fetchone()
+        assert saved[0] == len(encodings)
+
+        # Each face's own character is the closest
+        for number in range(0, len(encodings), 250):
+            distances = store.get_closest_distances(encodings[number])
+            assert min(distances, key=distances.get) == number // 20 + 1
+
+        reloaded = FaceEncodingStore(conn)
+        assert np.array_equal(reloaded.index.centroids, store.index.centroids)
+        conn.close()
+
+
+def test_recall_and_latency():
+    """Benchmark recall@10 and query time of the index against exact search."""
+    rng = np.random.default_rng(5)
+    for count in (10000, 100000):
+        vectors = clustered_vectors(count, rng)
+        ids = np.arange(count)
+        queries = vectors[rng.choice(count, 50, replace=False)] + rng.normal(0, 0.02, size=(50, ENCODING_SIZE))
+
+        start = time.perf_counter()
+        index = IVFIndex(ENCODING_SIZE)
+        index.add(ids, vectors)
+        build_time = time.perf_counter() - start
+
+        exact_time = ann_time = 0.0
+        found = 0
+        for query in queries:
+            start = time.perf_counter()
+            expected_ids, _ = exact_search(vectors, ids, query, 10)
+            exact_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            found_ids, _ = index.search(query, 10)
+            ann_time += time.perf_counter() - start
+            found += len(set(found_ids.tolist()) & set(expected_ids.tolist()))
+
+        recall = found / (10 * len(queries))
+        assert recall >= 0.9
+        print(f"{count} vectors: recall@10 {recall:.3f}, query {ann_time / len(queries) * 1000:.2f} ms "
+              f"(exact {exact_time / len(queries) * 1000:.2f} ms), "
+              f"{len(index.centroids)} lists, built in {build_time:.1f} s")
+
+
+if __name__ == "__main__":
+    print("=== Testing nearest neighbor index ===\n")
+    test_small_index_is_exact()
+    test_adds_and_removes()
+    test_save_and_load()
+    test_face_store_saves_index()
+    test_recall_and_latency()
+    print("\n=== All tests completed ===")
@@ -0,0 +1,200 @@
+"""
+Test script for auto_tag_backfill.py.
+
+This script checks that the backfill suggests the right characters in the
+right part of untagged images, skips tagged images, queues the images with
+suggestions for review without tagging them, resumes after the last saved
+batch (also after a stop in the middle of a run), records images it can't
+read as errors without getting stuck on them, and times a run at full speed
+and throttled.
+"""
+
+import sys
+import os
+import tempfile
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from PyQt6.QtCore import QCoreApplication, QRect, QThreadPool
+from PyQt6.QtGui import QImage, QColor, QPainter
+from PyQt6.QtWidgets import QApplication
+
+from app.db_sqlite import (
+    initialize_database, create_image, add_character_tag_to_image, get_tag_review_queue,
+    get_auto_tag_progress, get_tag_suggestions, delete_tag_suggestions, reset_auto_tag_progress
+)
+from app.utils.image_recognition_util import ImageRecognitionUtil
+from app.utils.auto_tag_backfill import AutoTagBackfillJob, propose_regions, REVIEW_REASON_AUTO_TAG
+
+# Queued signals from the worker thread need an application; a GUI one, since
+# tests collected after this one draw pixmaps in the same process
+app = QApplication.instance() or QApplication([])
+
+COLORS = ["#d02020", "#20a040", "#2040d0", "#e0c020"]
+
+
+def setup_story(folder: str, image_count: int):
+    """Create a story whose characters have plain colored avatars, and scenes of one character each.
+
+    The character of scene n is n % 4, standing in the left, middle or right third (n % 3).
+
+    Returns:
+        (connection, [character IDs], [image IDs])
+    """
+    conn = initialize_database(os.path.join(folder, 'test.db'))
+    images_folder = os.path.join(folder, 'images')
+    os.makedirs(images_folder)
+    conn.execute("INSERT INTO stories (id, title, folder_path) VALUES (1, 'Story', ?)", (folder,))
+
+    character_ids = []
+    for number, color in enumerate(COLORS):
+        avatar_path = os.path.join(folder, f"avatar_{number}.png")
+        avatar = QImage(120, 160, QImage.Format.Format_RGB32)
+        avatar.fill(QColor(color))
+        avatar.save(avatar_path, "PNG")
+        cursor = conn.execute("INSERT INTO characters (name, story_id, avatar_path) VALUES (?, 1, ?)",
+                              (f"Character {number}", avatar_path))
+        character_ids.append(cursor.lastrowid)
+    conn.commit()
+    ImageRecognitionUtil(conn).update_character_image_database(1)
+
+    image_ids = []
+    for number in range(image_count):
+        scene = QImage(900, 600, QImage.Format.Format_RGB32)
+        scene.fill(QColor("#808080"))
+        painter = QPainter(scene)
+        painter.fillRect(QRect((number % 3) * 300 + 20, 40, 260, 540), QColor(COLORS[number % 4]))
+        painter.end()
+        filename = f"scene_{number}.png"
+        scene.save(os.path.join(images_folder, filename), "PNG")
+        image_ids.append(create_image(conn, filename, images_folder, 1, width=900, height=600))
+    return conn, character_ids, image_ids
+
+
+def test_suggestions_are_queued_for_review():
+    """Scenes get a suggestion for their character, placed in the right third, and are queued."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn, character_ids, image_ids = setup_story(folder, 8)
+
+        # A tagged image is left alone; an image whose file is gone is an error
+        add_character_tag_to_image(conn, image_ids[0], character_ids[0], 0.5, 0.5)
+        os.remove(os.path.join(folder, 'images', 'scene_7.png'))
+
+        summary = AutoTagBackfillJob(conn, 1, batch_size=3, duty_cycle=1.0).process(conn)
+        assert summary['completed'] and not summary['cancelled']
+        assert summary['processed'] == 7 and summary['remaining'] == 0
+        assert len(summary['errors']) == 1 and summary['errors'][0][0].endswith('scene_7.png')
+
+        for number in range(1, 7):
+            suggestions = get_tag_suggestions(conn, image_ids[number])
+            assert suggestions, f"No suggestion for scene {number}"
+            best = suggestions[0]
+            assert best['character_id'] == character_ids[number % 4]
+            assert best['character_name'] == f"Character {number % 4}"
+            # The best region is the third the character stands in
+            assert int(best['x_position'] * 3) == number % 3 and best['width'] < 0.5
+            assert best['source'] == 'features'
+
+        # Suggestions are only queued, never tagged
+        assert conn.execute("SELECT COUNT(*) FROM image_character_tags").fetchone()[0] == 1
+        assert sorted(get_tag_review_queue(conn, 1)) == image_ids[1:7]
+        reasons = {row[0] for row in conn.execute("SELECT reason FROM tag_review_queue")}
+        assert reasons == {REVIEW_REASON_AUTO_TAG}
+
+        progress = get_auto_tag_progress(conn, 1)
+        assert progress == {'last_image_id': image_ids[7], 'processed': 7, 'suggested': 6}
+
+        # Dismissing a suggestion removes it
+        before = get_tag_suggestions(conn, image_ids[1])
+        delete_tag_suggestions(conn, suggestion_ids=[before[0]['id']])
+        assert [s['id'] for s in get_tag_suggestions(conn, image_ids[1])] == [s['id'] for s in before[1:]]
+        delete_tag_suggestions(conn, image_ids=[image_ids[2]])
+        assert get_tag_suggestions(conn, image_ids[2]) == []
+
+        conn.close()
+
+
+def test_resume():
+    """A run continues after the last saved batch; new images are picked up by the next run."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn, character_ids, image_ids = setup_story(folder, 10)
+
+        # Stopped after 4 images, in the middle of the second batch of 3
+        summary = AutoTagBackfillJob(conn, 1, batch_size=3, duty_cycle=1.0, max_images=4).process(conn)
+        assert summary['processed'] == 4 and not summary['completed'] and summary['remaining'] == 6
+        assert get_auto_tag_progress(conn, 1)['last_image_id'] == image_ids[3]
+
+        # A cancelled job saves nothing it hasn't finished
+        job = AutoTagBackfillJob(conn, 1, duty_cycle=1.0)
+        job.cancel()
+        assert job.process(conn)['processed'] == 0
+
+        summary = AutoTagBackfillJob(conn, 1, batch_size=3, duty_cycle=1.0).process(conn)
+        assert summary['processed'] == 6 and summary['completed']
+        suggested = conn.execute("SELECT COUNT(DISTINCT image_id), COUNT(*) FROM tag_suggestions").fetchone()
+        assert suggested[0] == 10
+
+        # Nothing is looked at twice
+        summary = AutoTagBackfillJob(conn, 1, duty_cycle=1.0).process(conn)
+        assert summary['processed'] == 0 and summary['completed']
+        assert conn.execute("SELECT COUNT(*) FROM tag_suggestions").fetchone()[0] == suggested[1]
+
+        # Starting over skips images that already have suggestions
+        reset_auto_tag_progress(conn, 1)
+        delete_tag_suggestions(conn, image_ids=[image_ids[5]])
+        summary = AutoTagBackfillJob(conn, 1, duty_cycle=1.0).process(conn)
+        assert summary['processed'] == 1 and get_tag_suggestions(conn, image_ids[5])
+
+        conn.close()
+
+
+def test_background_job():
+    """The job runs on a worker thread, reports progress per batch and its summary."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn, character_ids, image_ids = setup_story(folder, 5)
+        pool = QThreadPool()
+        progress = []
+        summaries = []
+
+        job = AutoTagBackfillJob(conn, 1, batch_size=2, duty_cycle=1.0)
+        job.signals.progress.connect(progress.append)
+        job.signals.finished.connect(summaries.append)
+        job.start(pool)
+        pool.waitForDone()
+        QCoreApplication.processEvents()
+
+        assert [report['processed'] for report in progress] == [2, 4, 5]
+        assert len(summaries) == 1 and summaries[0]['suggested'] == 5
+        assert len(get_tag_review_queue(conn, 1)) == 5
+        conn.close()
+
+
+def test_throttled_speed():
+    """Benchmark a run at full speed and throttled to half the CPU time."""
+    assert len(propose_regions()) == 9
+    with tempfile.TemporaryDirectory() as folder:
+        conn, character_ids, image_ids = setup_story(folder, 24)
+        timings = {}
+        for duty_cycle in (1.0, 0.5):
+            reset_auto_tag_progress(conn, 1)
+            delete_tag_suggestions(conn, image_ids=image_ids)
+            summary = AutoTagBackfillJob(conn, 1, duty_cycle=duty_cycle).process(conn)
+            assert summary['processed'] == 24
+            timings[duty_cycle] = summary
+
+        full, throttled = timings[1.0], timings[0.5]
+        assert throttled['elapsed'] >= throttled['busy'] * 1.8
+        print(f"24 images: full speed {full['processed'] / full['elapsed']:.1f} images/s; "
+              f"throttled to 50% {throttled['processed'] / throttled['elapsed']:.1f} images/s "
+              f"(working {throttled['busy'] / throttled['elapsed'] * 100:.0f}% of the time)")
+        conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Testing auto-tag backfill ===\n")
+    test_suggestions_are_queued_for_review()
+    test_resume()
+    test_background_job()
+    test_throttled_speed()
+    print("\n=== All tests completed ===")
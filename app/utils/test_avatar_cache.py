@@ -0,0 +1,183 @@
+"""
+Test script for avatar_cache.py.
+
+This script checks that avatars are scaled to fit their bounding size, that
+repeated tooltips are served without touching the database or the avatar
+files, that saving a new avatar over an old one is picked up after
+invalidating it, that the cache stays within its limits, and times hovering
+over a long character list with a cold and a warm cache.
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtGui import QImage, QColor
+from PyQt6.QtWidgets import QApplication
+
+from app.db_sqlite import initialize_database
+from app.utils.avatar_cache import AvatarCache, AVATAR_SIZE_TOOLTIP, AVATAR_SIZE_CARD
+
+# QPixmap needs a GUI application
+app = QApplication.instance() or QApplication([])
+
+
+def write_avatar(path: str, width: int, height: int, color: str) -> None:
+    """Write a plain avatar image."""
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    image.fill(QColor(color))
+    image.save(path, "PNG")
+
+
+def setup_characters(folder: str, count: int):
+    """Create a database with a story of characters, every other one with an avatar.
+
+    Returns:
+        (connection, list of (character ID, avatar path or None))
+    """
+    conn = initialize_database(os.path.join(folder, 'test.db'))
+    conn.execute("INSERT INTO stories (id, title, folder_path) VALUES (1, 'Test Story', ?)", (folder,))
+    avatars_folder = os.path.join(folder, 'avatars')
+    os.makedirs(avatars_folder, exist_ok=True)
+
+    characters = []
+    for number in range(1, count + 1):
+        avatar_path = None
+        if number % 2:
+            avatar_path = os.path.join(avatars_folder, f"avatar_{number}.png")
+            write_avatar(avatar_path, 400, 600, "#3366cc")
+        conn.execute("INSERT INTO characters (id, name, story_id, avatar_path) VALUES (?, ?, 1, ?)",
+                     (number, f"Character <{number}>", avatar_path))
+        characters.append((number, avatar_path))
+    conn.commit()
+    return conn, characters
+
+
+def test_scaled_sizes():
+    """Avatars keep their aspect ratio inside each bounding size."""
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'avatar.png')
+        write_avatar(path, 400, 600, "#cc3333")
+        cache = AvatarCache()
+
+        card = cache.get_pixmap(path, AVATAR_SIZE_CARD)
+        assert card.height() == 170 and abs(card.width() - 113) <= 1
+        tooltip = cache.get_pixmap(path, AVATAR_SIZE_TOOLTIP)
+        assert tooltip.height() == 160 and abs(tooltip.width() - 107) <= 1
+
+        # The same pixmap is returned again without reading the file
+        assert cache.get_pixmap(path, AVATAR_SIZE_CARD).cacheKey() == card.cacheKey()
+        assert (cache.hits, cache.misses) == (1, 2)
+
+        assert cache.get_pixmap(None) is None
+        assert cache.get_pixmap(os.path.join(folder, 'missing.png')) is None
+
+
+def test_tooltips_are_cached():
+    """A repeated tooltip runs no query; names are escaped; unknown characters get a plain name."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn, characters = setup_characters(folder, 4)
+        statements = []
+        conn.set_trace_callback(statements.append)
+        cache = AvatarCache()
+
+        tooltip = cache.get_tooltip_html(conn, 1)
+        assert "Character &lt;1&gt;" in tooltip and "data:image/png;base64," in tooltip
+        assert cache.get_tooltip_html(conn, 2) == "<b>Character &lt;2&gt;</b>"  # no avatar
+        assert cache.get_tooltip_html(conn, 3, "Chris") != cache.get_tooltip_html(conn, 3)
+        assert len(statements) == 1  # the whole story was read at once
+
+        assert cache.get_tooltip_html(conn, 1) == tooltip
+        assert len(statements) == 1
+
+        assert cache.get_tooltip_html(conn, 999) == "<b>Unknown</b>"
+        assert cache.get_tooltip_html(conn, 999) == "<b>Unknown</b>"
+        assert len(statements) == 2
+
+        conn.set_trace_callback(None)
+        conn.close()
+
+
+def test_invalidate_after_saving_avatar():
+    """A new avatar written over the old file is shown once it is invalidated."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn, characters = setup_characters(folder, 2)
+        cache = AvatarCache()
+        avatar_path = characters[0][1]
+
+        old_tooltip = cache.get_tooltip_html(conn, 1)
+        old_card = cache.get_pixmap(avatar_path, AVATAR_SIZE_CARD)
+        assert old_card.toImage().pixelColor(10, 10) == QColor("#3366cc")
+
+        write_avatar(avatar_path, 600, 400, "#22aa22")
+        assert cache.get_tooltip_html(conn, 1) == old_tooltip  # nothing is checked on disk
+
+        cache.invalidate(avatar_path=avatar_path)
+        new_card = cache.get_pixmap(avatar_path, AVATAR_SIZE_CARD)
+        assert (new_card.width(), new_card.height()) == (150, 100)
+        assert new_card.toImage().pixelColor(10, 10) == QColor("#22aa22")
+        assert cache.get_tooltip_html(conn, 1) != old_tooltip
+
+        # Renaming a character and invalidating it updates its tooltip
+        conn.execute("UPDATE characters SET name = 'Bea' WHERE id = 2")
+        conn.commit()
+        cache.invalidate(character_id=2)
+        assert cache.get_tooltip_html(conn, 2) == "<b>Bea</b>"
+
+        conn.close()
+
+
+def test_cache_limits():
+    """The least recently used entries are dropped first."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn, characters = setup_characters(folder, 10)
+        cache = AvatarCache(max_pixmaps=3, max_tooltips=2)
+
+        for character_id, _ in characters:
+            cache.get_tooltip_html(conn, character_id)
+        assert len(cache.tooltips) == 2 and len(cache.pixmaps) == 3
+        assert [key[0] for key in cache.tooltips] == [9, 10]
+
+        conn.close()
+
+
+def test_hover_speed():
+    """Benchmark hovering over every character of a long list, cold and warm."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn, characters = setup_characters(folder, 200)
+        statements = []
+        cache = AvatarCache()
+
+        start = time.perf_counter()
+        for character_id, _ in characters:
+            cache.get_tooltip_html(conn, character_id)
+        cold_time = time.perf_counter() - start
+
+        conn.set_trace_callback(statements.append)
+        start = time.perf_counter()
+        for character_id, _ in characters:
+            cache.get_tooltip_html(conn, character_id)
+        warm_time = time.perf_counter() - start
+        conn.set_trace_callback(None)
+
+        assert statements == []
+        print(f"200 character tooltips: first hover {cold_time * 1000:.0f} ms, "
+              f"cached {warm_time * 1000:.2f} ms")
+
+        conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Testing avatar cache ===\n")
+    test_scaled_sizes()
+    test_tooltips_are_cached()
+    test_invalidate_after_saving_avatar()
+    test_cache_limits()
+    test_hover_speed()
+    print("\n=== All tests completed ===")
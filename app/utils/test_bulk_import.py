@@ -0,0 +1,175 @@
+"""
+Test script for bulk_import.py.
+
+This script imports folders of generated images into a temporary story and
+checks the inserted rows and files, duplicate skipping (same pixels and files
+imported before), invalid files, the tag review queue, cancellation, and
+cleanup after a failed batch insert, and reports the import throughput.
+"""
+
+import sys
+import os
+import tempfile
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from PyQt6.QtCore import QRect
+from PyQt6.QtGui import QImage, QColor, QPainter
+
+from app.db_sqlite import initialize_database, get_tag_review_queue
+from app.utils.bulk_import import BulkImportJob, collect_image_files
+
+
+def create_test_folder(folder: str, count: int, offset: int = 0) -> None:
+    """Write a folder of distinct JPEG images, some in a subfolder."""
+    os.makedirs(os.path.join(folder, 'sub'), exist_ok=True)
+    for index in range(count):
+        number = index + offset
+        image = QImage(1280, 720, QImage.Format.Format_RGB32)
+        image.fill(QColor(40, 40, 40))
+        painter = QPainter(image)
+        painter.fillRect(QRect((number % 32) * 40, (number // 32) * 40, 40, 40), QColor(240, 200, 60))
+        painter.end()
+        subfolder = 'sub' if index % 4 == 0 else ''
+        assert image.save(os.path.join(folder, subfolder, f"image_{index + offset:03d}.jpg"), "JPEG", 90)
+
+
+def setup_test_db(folder: str):
+    """Create a database with one story in a temporary folder."""
+    conn = initialize_database(os.path.join(folder, 'test.db'))
+    conn.execute("INSERT INTO stories (id, title, folder_path) VALUES (1, 'Test Story', ?)", (folder,))
+    conn.commit()
+    return conn
+
+
+def run_import(conn, folder: str, paths, **kwargs):
+    """Run a bulk import on this thread and return its summary and progress reports."""
+    job = BulkImportJob(conn, 1, os.path.join(folder, 'images'), os.path.join(folder, 'thumbnails'),
+                        collect_image_files(paths), **kwargs)
+    reports = []
+    job.signals.progress.connect(reports.append)
+    return job.process(conn), reports
+
+
+def test_bulk_import_and_duplicates():
+    """Images are imported in batches; repeated files and pixels are skipped."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn = setup_test_db(folder)
+        source = os.path.join(folder, 'source')
+        create_test_folder(source, 40)
+
+        # A copy of one image under another name, and a file that isn't an image
+        with open(os.path.join(source, 'image_005.jpg'), 'rb') as original:
+            data = original.read()
+        with open(os.path.join(source, 'copy.jpg'), 'wb') as copy:
+            copy.write(data)
+        with open(os.path.join(source, 'broken.png'), 'wb') as broken:
+            broken.write(b"not an image")
+
+        summary, reports = run_import(conn, folder, [source], batch_size=16)
+        assert summary['total'] == 42
+        assert summary['imported'] == 40
+        assert summary['duplicates'] == 1
+        assert summary['failed'] == 1
+        assert summary['errors'][0][0].endswith('broken.png')
+        assert len(reports) == 42  # every file reports progress
+
+        rows = conn.execute("SELECT * FROM images WHERE story_id = 1").fetchall()
+        assert len(rows) == 40
+        for row in rows:
+            assert os.path.exists(os.path.join(row['path'], row['filename']))
+            assert os.path.exists(os.path.join(folder, 'thumbnails', row['filename']))
+            assert row['source_path'].startswith(source)
+            assert row['content_hash']
+        assert sorted(get_tag_review_queue(conn, 1)) == sorted(summary['image_ids'])
+
+        # Importing the folder again skips the files imported before without reading them
+        create_test_folder(source, 5, offset=100)
+        summary, _ = run_import(conn, folder, [source])
+        assert summary['imported'] == 5
+        assert summary['duplicates'] == 41
+        assert conn.execute("SELECT COUNT(*) FROM images").fetchone()[0] == 45
+
+        conn.close()
+
+
+def test_cancel():
+    """A cancelled import keeps the images it finished and stops the rest."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn = setup_test_db(folder)
+        source = os.path.join(folder, 'source')
+        create_test_folder(source, 60)
+
+        job = BulkImportJob(conn, 1, os.path.join(folder, 'images'), os.path.join(folder, 'thumbnails'),
+                            collect_image_files([source]), max_workers=2)
+        job.signals.progress.connect(lambda summary: job.cancel() if summary['processed'] == 5 else None)
+        summary = job.process(conn)
+
+        assert summary['cancelled']
+        assert 5 <= summary['imported'] < 60
+        assert conn.execute("SELECT COUNT(*) FROM images").fetchone()[0] == summary['imported']
+        # No files are left behind for images that weren't inserted
+        assert len(os.listdir(os.path.join(folder, 'images'))) == summary['imported']
+        print(f"Cancelled after {summary['imported']} of 60 images")
+
+        conn.close()
+
+
+def test_failed_batch_insert():
+    """A batch that can't be inserted leaves no files behind and can be imported again."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn = setup_test_db(folder)
+        source = os.path.join(folder, 'source')
+        create_test_folder(source, 12)
+
+        conn.execute('''
+        CREATE TEMP TRIGGER fail_image_insert BEFORE INSERT ON images
+        BEGIN SELECT RAISE(ABORT, 'database is full'); END
+        ''')
+        job = BulkImportJob(conn, 1, os.path.join(folder, 'images'), os.path.join(folder, 'thumbnails'),
+                            collect_image_files([source]), batch_size=5)
+        summary = job.process(conn)
+        assert summary['imported'] == 0 and summary['failed'] == 12 and summary['duplicates'] == 0
+        assert all('database is full' in message for _, message in summary['errors'])
+        assert os.listdir(os.path.join(folder, 'images')) == []
+        assert os.listdir(os.path.join(folder, 'thumbnails')) == []
+        # Their hashes are released, so other copies later in the run aren't taken for duplicates
+        assert not job._known_hashes
+
+        # The same job can import the files once inserting works again
+        conn.execute("DROP TRIGGER fail_image_insert")
+        summary = job.process(conn)
+        assert summary['imported'] == 12 and summary['duplicates'] == 0
+        assert len(os.listdir(os.path.join(folder, 'images'))) == 12
+
+        conn.close()
+
+
+def test_throughput():
+    """Benchmark parallel against single-threaded import."""
+    with tempfile.TemporaryDirectory() as folder:
+        source = os.path.join(folder, 'source')
+        create_test_folder(source, 48)
+
+        rates = {}
+        for workers in (1, 4):
+            story_folder = os.path.join(folder, f"story_{workers}")
+            os.makedirs(story_folder)
+            conn = setup_test_db(story_folder)
+            summary, _ = run_import(conn, story_folder, [source], max_workers=workers)
+            assert summary['imported'] == 48
+            rates[workers] = summary['images_per_second']
+            conn.close()
+
+        print(f"48 1280x720 JPEGs on {os.cpu_count()} CPUs: 1 worker {rates[1]:.1f} images/s, "
+              f"4 workers {rates[4]:.1f} images/s")
+
+
+if __name__ == "__main__":
+    print("=== Testing bulk import ===\n")
+    test_bulk_import_and_duplicates()
+    test_cancel()
+    test_failed_batch_insert()
+    test_throughput()
+    print("\n=== All tests completed ===")
@@ -0,0 +1,191 @@
+"""
+Test script for the incremental avatar feature update in image_recognition_util.py.
+
+This script checks that only characters whose avatar changed are processed
+again, that an avatar that was only touched is recognized by its content hash,
+that features of removed avatars are deleted and other stories are left
+alone, that the background job reports its summary, and times opening a story
+with the full rebuild and with the incremental update.
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from PyQt6.QtCore import QCoreApplication, QThreadPool
+from PyQt6.QtGui import QImage, QColor
+
+from app.db_sqlite import initialize_database
+from app.utils.image_recognition_util import ImageRecognitionUtil, CharacterFeatureUpdateJob
+
+# Queued signals from the worker thread need an application
+app = QCoreApplication.instance() or QCoreApplication([])
+
+
+def write_avatar(path: str, color: str) -> None:
+    """Write a plain avatar image."""
+    image = QImage(120, 160, QImage.Format.Format_RGB32)
+    image.fill(QColor(color))
+    image.save(path, "PNG")
+
+
+def setup_stories(folder: str, count: int):
+    """Create two stories of characters with avatars (and one without in the first story).
+
+    Returns:
+        (recognition utility, {character ID: avatar path} of the first story)
+    """
+    conn = initialize_database(os.path.join(folder, 'test.db'))
+    recognition = ImageRecognitionUtil(conn, cache_dir=folder)
+    avatars = {}
+    for story_id in (1, 2):
+        conn.execute("INSERT INTO stories (id, title, folder_path) VALUES (?, ?, ?)",
+                     (story_id, f"Story {story_id}", os.path.join(folder, f"story_{story_id}")))
+        for number in range(count):
+            avatar_path = os.path.join(folder, f"avatar_{story_id}_{number}.png")
+            write_avatar(avatar_path, QColor.fromHsv(number * 7 % 360, 200, 200).name())
+            cursor = conn.execute("INSERT INTO characters (name, story_id, avatar_path) VALUES (?, ?, ?)",
+                                  (f"Character {story_id}-{number}", story_id, avatar_path))
+            if story_id == 1:
+                avatars[cursor.lastrowid] = avatar_path
+    conn.execute("INSERT INTO characters (name, story_id) VALUES ('No Avatar', 1)")
+    conn.commit()
+    return recognition, avatars
+
+
+def count_avatar_features(recognition: ImageRecognitionUtil, story_id: int) -> int:
+    """Count the avatar feature rows of a story's characters."""
+    return recognition.db_conn.execute('''
+    SELECT COUNT(*) FROM image_features f JOIN characters c ON c.id = f.character_id
+    WHERE f.is_avatar = 1 AND c.story_id = ?
+    ''', (story_id,)).fetchone()[0]
+
+
+def test_only_changed_avatars_are_processed():
+    """Unchanged avatars aren't read; touched ones are hashed; changed ones are extracted again."""
+    with tempfile.TemporaryDirectory() as folder:
+        recognition, avatars = setup_stories(folder, 4)
+        character_ids = list(avatars)
+
+        summary = recognition.update_character_image_database(1)
+        assert (summary['checked'], summary['updated'], summary['unchanged']) == (5, 4, 0)
+        assert count_avatar_features(recognition, 1) == 4 and count_avatar_features(recognition, 2) == 0
+
+        # Nothing changed: no writes at all
+        statements = []
+        recognition.db_conn.set_trace_callback(statements.append)
+        summary = recognition.update_character_image_database(1)
+        recognition.db_conn.set_trace_callback(None)
+        assert (summary['updated'], summary['unchanged']) == (0, 4)
+        assert not [statement for statement in statements if not statement.lstrip().startswith('SELECT')]
+
+        # Touched but the same picture: only the recorded time changes
+        feature_id = recognition.db_conn.execute(
+            "SELECT id FROM image_features WHERE character_id = ?", (character_ids[0],)).fetchone()['id']
+        os.utime(avatars[character_ids[0]], (time.time() + 10, time.time() + 10))
+        summary = recognition.update_character_image_database(1)
+        assert (summary['updated'], summary['unchanged']) == (0, 4)
+        row = recognition.db_conn.execute(
+            "SELECT id, source_mtime FROM image_features WHERE character_id = ?", (character_ids[0],)).fetchone()
+        assert row['id'] == feature_id and row['source_mtime'] == os.stat(avatars[character_ids[0]]).st_mtime
+
+        # A new picture is extracted again and recognized
+        write_avatar(avatars[character_ids[1]], "#00ff00")
+        summary = recognition.update_character_image_database(1)
+        assert (summary['updated'], summary['unchanged']) == (1, 3)
+        green = recognition.extract_features_from_path(avatars[character_ids[1]])
+        best = recognition.identify_characters_in_image(green, threshold=0.99, story_id=1)
+        assert best[0]['character_id'] == character_ids[1]
+
+        # A character whose avatar was removed loses its features
+        recognition.db_conn.execute("UPDATE characters SET avatar_path = NULL WHERE id = ?", (character_ids[2],))
+        os.remove(avatars[character_ids[3]])
+        summary = recognition.update_character_image_database(1)
+        assert (summary['removed'], summary['unchanged']) == (2, 2)
+        assert count_avatar_features(recognition, 1) == 2
+
+        recognition.db_conn.close()
+
+
+def test_features_without_source_are_replaced():
+    """Avatar features saved before the source was recorded are extracted once more."""
+    with tempfile.TemporaryDirectory() as folder:
+        recognition, avatars = setup_stories(folder, 2)
+        for character_id, avatar_path in avatars.items():
+            recognition.save_character_image_features(
+                character_id, recognition.extract_features_from_path(avatar_path), is_avatar=True)
+
+        summary = recognition.update_character_image_database(1)
+        assert (summary['updated'], summary['unchanged']) == (2, 0)
+        assert count_avatar_features(recognition, 1) == 2
+        summary = recognition.update_character_image_database(1)
+        assert (summary['updated'], summary['unchanged']) == (0, 2)
+
+        # The full rebuild records the sources too
+        recognition.build_character_image_database()
+        summary = recognition.update_character_image_database(None)
+        assert (summary['updated'], summary['unchanged']) == (0, 4)
+
+        recognition.db_conn.close()
+
+
+def test_background_job():
+    """The job updates the story on a worker thread and reports its summary."""
+    with tempfile.TemporaryDirectory() as folder:
+        recognition, avatars = setup_stories(folder, 3)
+        pool = QThreadPool()
+        summaries = []
+
+        job = CharacterFeatureUpdateJob(recognition.db_conn, 1, cache_dir=folder)
+        job.signals.finished.connect(summaries.append)
+        job.start(pool)
+        pool.waitForDone()
+        QCoreApplication.processEvents()
+
+        assert len(summaries) == 1 and summaries[0]['updated'] == 3
+        assert count_avatar_features(recognition, 1) == 3
+
+        # A cancelled job stops before the first character
+        job = CharacterFeatureUpdateJob(recognition.db_conn, 2, cache_dir=folder)
+        job.signals.finished.connect(summaries.append)
+        job.cancel()
+        job.start(pool)
+        pool.waitForDone()
+        QCoreApplication.processEvents()
+        assert summaries[1]['checked'] == 0 and count_avatar_features(recognition, 2) == 0
+
+        recognition.db_conn.close()
+
+
+def test_story_switch_speed():
+    """Benchmark opening a story with the full rebuild and with the incremental update."""
+    with tempfile.TemporaryDirectory() as folder:
+        recognition, avatars = setup_stories(folder, 100)
+        recognition.update_character_image_database(1)
+
+        start = time.perf_counter()
+        recognition.build_character_image_database()
+        rebuild_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        summary = recognition.update_character_image_database(1)
+        update_time = time.perf_counter() - start
+
+        assert summary['updated'] == 0
+        print(f"Opening a story (200 avatars, 100 in the story): full rebuild {rebuild_time * 1000:.0f} ms, "
+              f"incremental update {update_time * 1000:.1f} ms")
+
+        recognition.db_conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Testing incremental avatar feature update ===\n")
+    test_only_changed_avatars_are_processed()
+    test_features_without_source_are_replaced()
+    test_background_job()
+    test_story_switch_speed()
+    print("\n=== All tests completed ===")
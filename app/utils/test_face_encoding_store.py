@@ -0,0 +1,197 @@
+"""
+Test script for face_encoding_store.py.
+
+This script checks that face encodings saved as pickle files by older
+versions are moved into the table (and their files are then collected by the
+storage cleanup), that the store finds the same closest encoding per
+character as comparing with each character's encodings one by one, that it
+reloads when encodings are added or deleted, and times loading and querying
+the encodings from pickle files and from the table.
+"""
+
+import sys
+import os
+import pickle
+import tempfile
+import time
+from datetime import datetime
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import numpy as np
+
+from app.db_sqlite import initialize_database
+from app.utils.face_encoding_store import (
+    FaceEncodingStore, create_face_encodings_table, encode_face_encoding, ENCODING_SIZE
+)
+from app.utils.storage_gc import load_referenced_paths, CATEGORY_FACES
+
+
+def create_legacy_table(conn) -> None:
+    """Create the face_encodings table as older versions did, without the encoding column."""
+    conn.execute('''
+    CREATE TABLE face_encodings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        character_id INTEGER NOT NULL,
+        encoding_path TEXT NOT NULL,
+        confidence REAL NOT NULL DEFAULT 1.0,
+        is_avatar INTEGER NOT NULL DEFAULT 0,
+        image_id INTEGER,
+        x INTEGER,
+        y INTEGER,
+        width INTEGER,
+        height INTEGER,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    ''')
+
+
+def save_legacy_encoding(conn, folder: str, number: int, character_id: int, encoding: np.ndarray) -> str:
+    """Save an encoding the way older versions did, as a pickle file."""
+    encoding_path = os.path.join(folder, f"face_{character_id}_{number}.pkl")
+    with open(encoding_path, 'wb') as f:
+        pickle.dump(encoding, f)
+    now = datetime.now().isoformat()
+    conn.execute("INSERT INTO face_encodings (character_id, encoding_path, created_at, updated_at) "
+                 "VALUES (?, ?, ?, ?)", (character_id, encoding_path, now, now))
+    return encoding_path
+
+
+def save_encoding(conn, character_id: int, encoding: np.ndarray) -> None:
+    """Save an encoding in the table, as FaceRecognitionUtil.save_face_encoding does."""
+    now = datetime.now().isoformat()
+    conn.execute("INSERT INTO face_encodings (character_id, encoding_path, encoding, created_at, updated_at) "
+                 "VALUES (?, '', ?, ?, ?)", (character_id, encode_face_encoding(encoding), now, now))
+
+
+def test_pickle_files_are_migrated():
+    """Pickled encodings move into the table; their files become unused."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn = initialize_database(os.path.join(folder, 'test.db'))
+        create_legacy_table(conn)
+        rng = np.random.default_rng(1)
+        encodings = rng.normal(0, 0.1, size=(3, ENCODING_SIZE))
+        paths = [save_legacy_encoding(conn, folder, number, number % 2 + 1, encoding)
+                 for number, encoding in enumerate(encodings)]
+
+        # An encoding whose file is gone stays as it is
+        missing_path = os.path.join(folder, "face_3_missing.pkl")
+        conn.execute("INSERT INTO face_encodings (character_id, encoding_path, created_at, updated_at) "
+                     "VALUES (3, ?, '', '')", (missing_path,))
+        conn.commit()
+
+        create_face_encodings_table(conn)
+        rows = conn.execute("SELECT encoding_path, encoding FROM face_encodings ORDER BY id").fetchall()
+        assert [row['encoding_path'] for row in rows] == ['', '', '', missing_path]
+        assert rows[3]['encoding'] is None
+        for row, encoding in zip(rows, encodings):
+            assert np.allclose(np.frombuffer(row['encoding'], dtype='<f4'), encoding, atol=1e-6)
+
+        # The files are left for the storage cleanup, which no longer sees them used
+        assert all(os.path.exists(path) for path in paths)
+        referenced = load_referenced_paths(conn)[CATEGORY_FACES]
+        assert not any(os.path.normcase(os.path.abspath(path)) in referenced for path in paths)
+
+        # Opening the table again converts nothing
+        create_face_encodings_table(conn)
+
+        store = FaceEncodingStore(conn)
+        assert len(store) == 3
+        by_character = store.get_character_encodings()
+        assert sorted(by_character) == [1, 2] and len(by_character[1]) == 2
+        assert list(store.get_character_encodings(2)) == [2]
+
+        conn.close()
+
+
+def test_closest_distances():
+    """The store's distances equal comparing with each character's encodings one by one."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn = initialize_database(os.path.join(folder, 'test.db'))
+        create_face_encodings_table(conn)
+        store = FaceEncodingStore(conn)
+        assert len(store) == 0 and store.get_closest_distances(np.zeros(ENCODING_SIZE)) == {}
+
+        rng = np.random.default_rng(2)
+        for character_id in range(1, 21):
+            for _ in range(rng.integers(1, 6)):
+                save_encoding(conn, character_id, rng.normal(0, 0.1, ENCODING_SIZE))
+        conn.commit()
+
+        face = rng.normal(0, 0.1, ENCODING_SIZE)
+        distances = store.get_closest_distances(face)
+        assert len(store) == conn.execute("SELECT COUNT(*) FROM face_encodings").fetchone()[0]
+        for character_id, encodings in store.get_character_encodings().items():
+            expected = min(np.linalg.norm(np.array(encodings) - face, axis=1))
+            assert abs(distances[character_id] - expected) < 1e-5
+
+        # Added and deleted encodings are picked up on the next query
+        save_encoding(conn, 99, face)
+        conn.commit()
+        assert store.get_closest_distances(face)[99] < 1e-6
+        conn.execute("DELETE FROM face_encodings WHERE character_id = 99")
+        conn.commit()
+        assert 99 not in store.get_closest_distances(face)
+
+        # A malformed encoding is rejected before it reaches the table
+        try:
+            encode_face_encoding(np.zeros(64))
+            assert False, "Expected ValueError"
+        except ValueError:
+            pass
+
+        conn.close()
+
+
+def test_load_and_query_speed():
+    """Benchmark loading and querying 2000 encodings from pickle files and from the table."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn = initialize_database(os.path.join(folder, 'test.db'))
+        create_legacy_table(conn)
+        rng = np.random.default_rng(3)
+        encodings = rng.normal(0, 0.1, size=(2000, ENCODING_SIZE))
+        for number, encoding in enumerate(encodings):
+            save_legacy_encoding(conn, folder, number, number // 10 + 1, encoding)
+        conn.commit()
+        face = rng.normal(0, 0.1, ENCODING_SIZE)
+
+        # What every query used to do: unpickle each file, then compare per character
+        start = time.perf_counter()
+        by_character = {}
+        for row in conn.execute("SELECT character_id, encoding_path FROM face_encodings"):
+            with open(row['encoding_path'], 'rb') as f:
+                by_character.setdefault(row['character_id'], []).append(pickle.load(f))
+        pickle_closest = {character_id: min(np.linalg.norm(np.array(character_encodings) - face, axis=1))
+                          for character_id, character_encodings in by_character.items()}
+        pickle_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        create_face_encodings_table(conn)
+        migrate_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store = FaceEncodingStore(conn)
+        load_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(20):
+            closest = store.get_closest_distances(face)
+        query_time = (time.perf_counter() - start) / 20
+
+        assert closest.keys() == pickle_closest.keys()
+        assert all(abs(closest[key] - pickle_closest[key]) < 1e-5 for key in closest)
+        print(f"2000 face encodings: query with pickle files {pickle_time * 1000:.0f} ms; "
+              f"one-time migration {migrate_time * 1000:.0f} ms, index load {load_time * 1000:.1f} ms, "
+              f"query {query_time * 1000:.2f} ms")
+
+        conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Testing face encoding store ===\n")
+    test_pickle_files_are_migrated()
+    test_closest_distances()
+    test_load_and_query_speed()
+    print("\n=== All tests completed ===")
@@ -0,0 +1,261 @@
+"""
+Test script for feature_index.py.
+
+This script checks that scoring an image against the feature index gives the
+same characters and similarities as comparing it with every stored feature
+set one by one, that the index only covers the requested story, that saved
+features are added in place while writes from elsewhere make it rebuild, and
+that features saved as JSON text are converted to the binary layout, and
+times a recognition query with and without the index and building the index
+from binary and from JSON rows.
+"""
+
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import numpy as np
+
+from app.db_sqlite import initialize_database
+from app.utils.image_recognition_util import ImageRecognitionUtil
+from app.utils.feature_index import (
+    CharacterFeatureIndex, encode_features, decode_features,
+    FEATURE_FORMAT_JSON, FEATURE_FORMAT_BINARY, SCALAR_DTYPE, HISTOGRAM_BLOB_SIZE
+)
+
+
+def random_features(rng: np.random.Generator):
+    """Create a random feature set like the ones extracted from images."""
+    histogram = rng.random(64) ** 4
+    histogram /= histogram.sum()
+    return {
+        'features': {
+            'width': 100,
+            'height': 100,
+            'aspect_ratio': float(rng.uniform(0.5, 2.0)),
+            'brightness': float(rng.random()),
+            'colorfulness': float(rng.random())
+        },
+        'color_histogram': histogram.tolist()
+    }
+
+
+def setup_story_features(folder: str, characters_per_story: int, sets_per_character: int, seed: int = 1):
+    """Create two stories whose characters have random features.
+
+    Returns:
+        (recognition utility, random generator)
+    """
+    conn = initialize_database(os.path.join(folder, 'test.db'))
+    rng = np.random.default_rng(seed)
+    recognition = ImageRecognitionUtil(conn, cache_dir=folder)
+    for story_id in (1, 2):
+        conn.execute("INSERT INTO stories (id, title, folder_path) VALUES (?, ?, ?)",
+                     (story_id, f"Story {story_id}", os.path.join(folder, f"story_{story_id}")))
+        for number in range(characters_per_story):
+            cursor = conn.execute("INSERT INTO characters (name, story_id) VALUES (?, ?)",
+                                  (f"Character {story_id}-{number}", story_id))
+            for _ in range(sets_per_character):
+                recognition.save_character_image_features(cursor.lastrowid, random_features(rng))
+    conn.commit()
+    return recognition, rng
+
+
+def reference_identify(recognition: ImageRecognitionUtil, image_features, threshold: float, story_id: int):
+    """Identify characters by scoring every stored feature set one by one, as before."""
+    cursor = recognition.db_conn.cursor()
+    cursor.execute('SELECT id FROM characters WHERE story_id = ?', (story_id,))
+    characters = {row['id'] for row in cursor.fetchall()}
+    results = {}
+    for character_id, feature_list in recognition.get_character_image_features().items():
+        if character_id not in characters:
+            continue
+        best = max(recognition._calculate_similarity(image_features, features) for features in feature_list)
+        if best >= threshold:
+            results[character_id] = best
+    return results
+
+
+def test_scores_match_pairwise():
+    """The vectorized scores equal the pairwise ones and only cover the story."""
+    with tempfile.TemporaryDirectory() as folder:
+        recognition, rng = setup_story_features(folder, 30, 4)
+
+        for _ in range(10):
+            query = random_features(rng)
+            expected = reference_identify(recognition, query, 0.6, 1)
+            found = recognition.identify_characters_in_image(query, threshold=0.6, story_id=1)
+            assert {result['character_id'] for result in found} == set(expected)
+            for result in found:
+                assert abs(result['similarity'] - expected[result['character_id']]) < 1e-12
+                assert result['character_name'].startswith("Character 1-")
+            similarities = [result['similarity'] for result in found]
+            assert similarities == sorted(similarities, reverse=True)
+
+        assert len(recognition.get_feature_index(1)) == 120
+        assert len(recognition.get_feature_index(None)) == 240
+        recognition.db_conn.close()
+
+
+def test_incremental_updates():
+    """Saved features are added in place; writes from elsewhere make the index rebuild."""
+    with tempfile.TemporaryDirectory() as folder:
+        recognition, rng = setup_story_features(folder, 3, 2)
+        story_index = recognition.get_feature_index(1)
+        other_index = recognition.get_feature_index(2)
+        character_id = recognition.db_conn.execute(
+            "SELECT id FROM characters WHERE story_id = 1 LIMIT 1").fetchone()['id']
+
+        # An exact copy of the new features scores 1.0 (up to the float32 histogram)
+        features = random_features(rng)
+        recognition.save_character_image_features(character_id, features)
+        assert recognition.get_feature_index(1) is story_index and len(story_index) == 7
+        assert recognition.get_feature_index(2) is other_index and len(other_index) == 6
+        best = recognition.identify_characters_in_image(features, threshold=0.99, story_id=1)
+        assert [result['character_id'] for result in best] == [character_id]
+        assert abs(best[0]['similarity'] - 1.0) < 1e-6
+
+        # Another utility (e.g. in an import worker) saves features too
+        other = ImageRecognitionUtil(recognition.db_conn, cache_dir=folder)
+        other.save_character_image_features(character_id, random_features(rng))
+        rebuilt = recognition.get_feature_index(1)
+        assert rebuilt is not story_index and len(rebuilt) == 8
+
+        # Rebuilding the avatar features drops every index
+        recognition.build_character_image_database()
+        assert recognition.feature_indexes == {}
+        assert len(recognition.get_feature_index(1)) == 8  # none of the characters have avatars
+
+        recognition.db_conn.close()
+
+
+def create_json_features_table(conn: sqlite3.Connection) -> None:
+    """Create the image_features table as it was before the binary layout."""
+    conn.execute('''
+    CREATE TABLE image_features (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        character_id INTEGER NOT NULL,
+        image_id INTEGER,
+        is_avatar INTEGER NOT NULL DEFAULT 0,
+        feature_data TEXT NOT NULL,
+        color_histogram TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    ''')
+
+
+def insert_json_features(conn: sqlite3.Connection, character_id: int, features) -> None:
+    """Insert a feature set as JSON text, as older versions did."""
+    conn.execute(
+        "INSERT INTO image_features (character_id, feature_data, color_histogram, created_at, updated_at) "
+        "VALUES (?, ?, ?, '', '')",
+        (character_id, json.dumps(features['features']), json.dumps(features['color_histogram']))
+    )
+
+
+def test_json_features_are_migrated():
+    """JSON rows are converted once; old and unknown layouts can coexist with binary rows."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn = initialize_database(os.path.join(folder, 'test.db'))
+        conn.execute("INSERT INTO stories (id, title, folder_path) VALUES (1, 'Story', ?)", (folder,))
+        conn.execute("INSERT INTO characters (id, name, story_id) VALUES (1, 'Alice', 1)")
+        create_json_features_table(conn)
+        rng = np.random.default_rng(3)
+        saved = [random_features(rng) for _ in range(5)]
+        for features in saved:
+            insert_json_features(conn, 1, features)
+        conn.execute("INSERT INTO image_features (character_id, feature_data, color_histogram, created_at, updated_at) "
+                     "VALUES (1, 'not json', '[]', '', '')")
+        conn.commit()
+
+        recognition = ImageRecognitionUtil(conn, cache_dir=folder)
+        rows = conn.execute("SELECT feature_data, color_histogram, format_version FROM image_features "
+                            "ORDER BY id").fetchall()
+        assert [row['format_version'] for row in rows] == [FEATURE_FORMAT_BINARY] * 5 + [FEATURE_FORMAT_JSON]
+        assert all(len(row['feature_data']) == SCALAR_DTYPE.itemsize and len(row['color_histogram']) == HISTOGRAM_BLOB_SIZE
+                   for row in rows[:5])
+
+        # Scalars are kept exactly, histograms as float32
+        for row, features in zip(rows, saved):
+            decoded = decode_features(row['feature_data'], row['color_histogram'], row['format_version'])
+            assert decoded['features'] == features['features']
+            assert np.allclose(decoded['color_histogram'], features['color_histogram'], rtol=1e-6, atol=0)
+        assert decode_features(*encode_features(saved[0]), FEATURE_FORMAT_BINARY)['features'] == saved[0]['features']
+
+        # A second start finds nothing left to convert
+        ImageRecognitionUtil(conn, cache_dir=folder)
+        assert conn.execute("SELECT COUNT(*) FROM image_features WHERE format_version = ?",
+                            (FEATURE_FORMAT_JSON,)).fetchone()[0] == 1
+
+        # An older version writes JSON and a newer one writes a layout this version doesn't know
+        insert_json_features(conn, 1, saved[0])
+        conn.execute("INSERT INTO image_features (character_id, feature_data, color_histogram, created_at, "
+                     "updated_at, format_version) VALUES (1, x'00', x'00', '', '', 99)")
+        conn.commit()
+        index = recognition.get_feature_index(1)
+        assert len(index) == 6
+        assert len(recognition.get_character_image_features(1)[1]) == 6
+        best = recognition.identify_characters_in_image(saved[0], threshold=0.99, story_id=1)
+        assert [result['character_id'] for result in best] == [1]
+
+        conn.close()
+
+
+def test_query_speed():
+    """Benchmark a recognition query with the index against parsing and scoring every row."""
+    with tempfile.TemporaryDirectory() as folder:
+        recognition, rng = setup_story_features(folder, 200, 10)
+        query = random_features(rng)
+
+        start = time.perf_counter()
+        expected = reference_identify(recognition, query, 0.5, 1)
+        loop_time = time.perf_counter() - start
+
+        recognition.get_feature_index(1)  # built once per story
+        start = time.perf_counter()
+        for _ in range(20):
+            found = recognition.identify_characters_in_image(query, threshold=0.5, story_id=1)
+        index_time = (time.perf_counter() - start) / 20
+
+        assert {result['character_id'] for result in found} == set(expected)
+        print(f"4000 feature sets (2000 in the story): pairwise {loop_time * 1000:.0f} ms, "
+              f"index {index_time * 1000:.2f} ms")
+
+        # Building the index from binary rows, against the same rows stored as JSON
+        start = time.perf_counter()
+        binary_index = CharacterFeatureIndex.build(recognition.db_conn, 1)
+        binary_time = time.perf_counter() - start
+
+        rows = recognition.db_conn.execute(
+            "SELECT id, feature_data, color_histogram FROM image_features").fetchall()
+        recognition.db_conn.executemany(
+            "UPDATE image_features SET feature_data = ?, color_histogram = ?, format_version = ? WHERE id = ?",
+            [(json.dumps(features['features']), json.dumps(features['color_histogram']), FEATURE_FORMAT_JSON, row['id'])
+             for row in rows
+             for features in [decode_features(row['feature_data'], row['color_histogram'], FEATURE_FORMAT_BINARY)]]
+        )
+        start = time.perf_counter()
+        json_index = CharacterFeatureIndex.build(recognition.db_conn, 1)
+        json_time = time.perf_counter() - start
+
+        assert np.array_equal(json_index.histograms, binary_index.histograms)
+        print(f"Building the index of 2000 feature sets: binary {binary_time * 1000:.1f} ms, "
+              f"JSON {json_time * 1000:.1f} ms")
+
+        recognition.db_conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Testing character feature index ===\n")
+    test_scores_match_pairwise()
+    test_incremental_updates()
+    test_json_features_are_migrated()
+    test_query_speed()
+    print("\n=== All tests completed ===")
@@ -0,0 +1,178 @@
+"""
+Test script for gallery_filter.py.
+
+This script checks the character tag index against a straightforward
+per-image evaluation of the filters, the filter presets stored in the
+database, and times filtering a large story.
+"""
+
+import sys
+import os
+import sqlite3
+import random
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.db_sqlite import (
+    create_tables, create_image_character_tags_table, create_gallery_filter_presets_table,
+    save_gallery_filter_preset, get_gallery_filter_presets, delete_gallery_filter_preset
+)
+from app.utils.gallery_filter import CharacterTagIndex, build_filter_expression, MATCH_ALL, MATCH_ANY
+
+
+def setup_test_db(image_count: int, character_count: int = 8, seed: int = 42) -> sqlite3.Connection:
+    """Set up an in-memory test database with randomly tagged images.
+
+    Args:
+        image_count: Number of images to create
+        character_count: Number of characters to create
+        seed: Random seed for the tags
+
+    Returns:
+        Database connection
+    """
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    create_tables(conn)
+    create_image_character_tags_table(conn)
+    create_gallery_filter_presets_table(conn)
+
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO stories (id, title, folder_path) VALUES (1, 'Test Story', '/tmp/story')")
+    for character_id in range(1, character_count + 1):
+        cursor.execute(
+            "INSERT INTO characters (id, name, story_id) VALUES (?, ?, 1)",
+            (character_id, f"Character {character_id}")
+        )
+
+    rng = random.Random(seed)
+    images = []
+    tags = []
+    for image_id in range(1, image_count + 1):
+        images.append((image_id, f"image_{image_id}.png", f"2024-01-01 00:00:{image_id % 60:02d}.{image_id:06d}"))
+        for character_id in rng.sample(range(1, character_count + 1), rng.randint(0, 3)):
+            tags.append((image_id, character_id))
+
+    cursor.executemany(
+        "INSERT INTO images (id, filename, path, story_id, created_at) VALUES (?, ?, '/tmp/story/images', 1, ?)",
+        images
+    )
+    cursor.executemany(
+        "INSERT INTO image_character_tags (created_at, updated_at, image_id, character_id, x_position, y_position, width, height) "
+        "VALUES ('2024-01-01', '2024-01-01', ?, ?, 0.5, 0.5, 0.1, 0.1)",
+        tags
+    )
+    conn.commit()
+    return conn
+
+
+def naive_filter(conn: sqlite3.Connection, character_filters: list, match_mode: str) -> list:
+    """Filter images by checking each image's tags one by one."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM images WHERE story_id = 1 ORDER BY created_at DESC, id DESC")
+    matches = []
+    for row in cursor.fetchall():
+        cursor2 = conn.cursor()
+        cursor2.execute("SELECT character_id FROM image_character_tags WHERE image_id = ?", (row['id'],))
+        tagged = {tag['character_id'] for tag in cursor2.fetchall()}
+
+        included = [character_id for character_id, include in character_filters if include]
+        excluded = [character_id for character_id, include in character_filters if not include]
+
+        if included:
+            if match_mode == MATCH_ANY and not any(c in tagged for c in included):
+                continue
+            if match_mode == MATCH_ALL and not all(c in tagged for c in included):
+                continue
+        if any(c in tagged for c in excluded):
+            continue
+        matches.append(row['id'])
+    return matches
+
+
+def test_index_matches_naive_filter():
+    """The bitset index should return the same images, in the same order, as a naive scan."""
+    conn = setup_test_db(500)
+    index = CharacterTagIndex(conn, 1)
+
+    cases = [
+        ([], MATCH_ALL),
+        ([(1, True)], MATCH_ALL),
+        ([(1, True), (2, True)], MATCH_ALL),
+        ([(1, True), (2, True)], MATCH_ANY),
+        ([(3, False)], MATCH_ALL),
+        ([(1, True), (4, True), (3, False), (5, False)], MATCH_ANY),
+        ([(99, True)], MATCH_ALL),
+    ]
+    for character_filters, match_mode in cases:
+        expression = build_filter_expression(character_filters, match_mode)
+        expected = naive_filter(conn, character_filters, match_mode)
+        result = [image['id'] for image in index.matching_images(expression)]
+        assert result == expected, (character_filters, match_mode)
+        assert index.count(expression) == len(expected)
+        print(f"{character_filters} ({match_mode}): {len(expected)} matches")
+
+    # Explicit NOT/OR/AND nesting
+    expression = ('and', [('or', [('char', 1), ('char', 2)]), ('not', ('and', [('char', 3), ('char', 4)]))])
+    expected = [image_id for image_id in naive_filter(conn, [(1, True), (2, True)], MATCH_ANY)
+                if image_id not in naive_filter(conn, [(3, True), (4, True)], MATCH_ALL)]
+    assert [image['id'] for image in index.matching_images(expression)] == expected
+
+    conn.close()
+
+
+def test_filter_presets():
+    """Presets should round-trip through the database and be replaced by name."""
+    conn = setup_test_db(10)
+
+    preset_id = save_gallery_filter_preset(conn, 1, "Leads", [(1, True), (2, False)], MATCH_ALL)
+    presets = get_gallery_filter_presets(conn, 1)
+    assert len(presets) == 1
+    assert presets[0]['character_filters'] == [(1, True), (2, False)]
+    assert presets[0]['match_mode'] == MATCH_ALL
+
+    # Saving again under the same name replaces the filters
+    same_id = save_gallery_filter_preset(conn, 1, "Leads", [(3, True)], MATCH_ANY)
+    assert same_id == preset_id
+    presets = get_gallery_filter_presets(conn, 1)
+    assert presets[0]['character_filters'] == [(3, True)]
+    assert presets[0]['match_mode'] == MATCH_ANY
+
+    assert delete_gallery_filter_preset(conn, preset_id)
+    assert get_gallery_filter_presets(conn, 1) == []
+
+    conn.close()
+
+
+def test_large_story_filter_speed():
+    """Benchmark building the index and filtering a 50,000 image story."""
+    conn = setup_test_db(50000, character_count=40)
+
+    start = time.perf_counter()
+    index = CharacterTagIndex(conn, 1)
+    build_time = time.perf_counter() - start
+
+    expression = build_filter_expression([(1, True), (2, True), (3, False)], MATCH_ANY)
+    start = time.perf_counter()
+    match_count = index.count(expression)
+    count_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matches = index.matching_images(expression)
+    match_time = time.perf_counter() - start
+
+    assert len(matches) == match_count
+    print(f"50000 images: index built in {build_time * 1000:.1f} ms, "
+          f"count in {count_time * 1000:.3f} ms, {match_count} matches listed in {match_time * 1000:.1f} ms")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Testing gallery filters ===\n")
+    test_index_matches_naive_filter()
+    test_filter_presets()
+    test_large_story_filter_speed()
+    print("\n=== All tests completed ===")
@@ -0,0 +1,291 @@
+"""
+Test script for the gallery's incremental updates.
+
+This script checks that inserting, removing and re-tagging single images in
+the gallery leaves the thumbnails in the same order as a full reload (newest
+first, ties broken by ID), with each thumbnail in its grid cell, that only
+the thumbnails near the visible area are shown, that scene sections are
+only created and looked up when they're expanded and scrolled near, and
+times inserting a thumbnail at the front of galleries of growing size.
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from PyQt6.QtCore import QSettings
+from PyQt6.QtGui import QImage, QColor
+from PyQt6.QtWidgets import QApplication
+
+from app.db_sqlite import initialize_database
+from app.utils.scene_grouping import get_story_gallery_images, get_section_images, group_images_by_scene
+from app.views.gallery_widget import GalleryWidget
+from app.views.gallery_widget_decision_points import apply_to_gallery_widget
+
+app = QApplication.instance() or QApplication([])
+apply_to_gallery_widget(GalleryWidget)
+
+
+def setup_story(folder: str):
+    """Create a story and the image file its images point to.
+
+    Returns:
+        (connection, images folder)
+    """
+    conn = initialize_database(os.path.join(folder, 'test.db'))
+    images_folder = os.path.join(folder, 'images')
+    os.makedirs(images_folder)
+    image = QImage(64, 48, QImage.Format.Format_RGB32)
+    image.fill(QColor("#4080c0"))
+    image.save(os.path.join(images_folder, 'image.png'), "PNG")
+    conn.execute("INSERT INTO stories (id, title, folder_path) VALUES (1, 'Story', ?)", (folder,))
+    conn.commit()
+    return conn, images_folder
+
+
+def insert_image(conn, images_folder: str, created_at: str) -> int:
+    """Add an image to the story's database and return its ID."""
+    cursor = conn.execute(
+        "INSERT INTO images (filename, path, title, story_id, created_at) VALUES ('image.png', ?, '', 1, ?)",
+        (images_folder, created_at)
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+
+def create_scene(conn, title: str, sequence_number: int) -> int:
+    """Add a scene to the story and return its ID."""
+    cursor = conn.execute(
+        "INSERT INTO events (title, story_id, event_type, sequence_number) VALUES (?, 1, 'SCENE', ?)",
+        (title, sequence_number)
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+
+def create_gallery(conn, scene_grouping: bool) -> GalleryWidget:
+    """Create a shown gallery for the story."""
+    gallery = GalleryWidget(conn)
+    gallery.resize(1200, 800)
+    gallery.show()
+    gallery.scene_grouping_mode = scene_grouping
+    gallery.set_story(1, {'id': 1, 'title': 'Story'})
+    app.processEvents()
+    return gallery
+
+
+def shown_images(gallery: GalleryWidget) -> dict:
+    """Get the image IDs of each section in display order, checking each thumbnail's cell.
+
+    Sections whose images haven't been looked up yet are looked up here, and
+    must match their summary.
+    """
+    app.processEvents()
+    sections = {}
+    for section in gallery.gallery_sections:
+        if section['summary'] is not None:
+            scene_id = None if section['key'] == 'ungrouped' else section['key']
+            images = get_section_images(gallery.db_conn, gallery.current_story_id, scene_id)
+            assert section['summary']['image_count'] == len(images)
+            assert section['summary']['newest_created_at'] == images[0]['created_at']
+            sections[section['key']] = [image['id'] for image in images]
+            continue
+        if section['grid'] is None:
+            sections[section['key']] = [image['id'] for image in section['pending']]
+            continue
+
+        layout = section['grid'].layout()
+        thumbnails = [thumbnail for _, thumbnail in section['entries']]
+        assert [layout.itemAt(i).widget() for i in range(layout.count())] == thumbnails
+
+        # Thumbnails fill the rows left to right, 5 per row; the ones shown are in their cell
+        columns, rows = {}, {}
+        for index, thumbnail in enumerate(thumbnails):
+            if not thumbnail.isHidden():
+                assert columns.setdefault(index % 5, thumbnail.x()) == thumbnail.x()
+                assert rows.setdefault(index // 5, thumbnail.y()) == thumbnail.y()
+        for positions in (columns, rows):
+            ordered = [positions[key] for key in sorted(positions)]
+            assert ordered == sorted(set(ordered))
+
+        sections[section['key']] = ([image['id'] for image, _ in section['entries']]
+                                    + [image['id'] for image in section['pending']])
+    return sections
+
+
+def reloaded_images(gallery: GalleryWidget) -> dict:
+    """Reload the gallery and get the image IDs of each section."""
+    gallery.load_images()
+    while gallery.section_load_timer.isActive():
+        app.processEvents()
+    return shown_images(gallery)
+
+
+def test_insert_and_remove_keep_reload_order():
+    """Single inserts and removals keep the order of a reload, ties broken by ID."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn, images_folder = setup_story(folder)
+        gallery = create_gallery(conn, scene_grouping=False)
+
+        # Several images share each timestamp, and they don't arrive in order
+        image_ids = []
+        for number in range(23):
+            image_id = insert_image(conn, images_folder, f"2024-01-01 00:00:{number * 7 % 5:02d}")
+            gallery.add_image_thumbnail(image_id)
+            image_ids.append(image_id)
+        expected = [image['id'] for image in get_story_gallery_images(conn, 1)]
+        assert shown_images(gallery) == {'classic': expected}
+
+        for image_id in image_ids[::3]:
+            conn.execute("DELETE FROM images WHERE id = ?", (image_id,))
+            conn.commit()
+            gallery.remove_image_thumbnail(image_id)
+        expected = [image['id'] for image in get_story_gallery_images(conn, 1)]
+        assert shown_images(gallery) == {'classic': expected}
+        assert gallery._count_gallery_images() == len(expected)
+        assert f"({len(expected)} images)" in gallery.status_label.text()
+
+        assert reloaded_images(gallery) == {'classic': expected}
+        gallery.close()
+        conn.close()
+        print(f"Classic view: {len(image_ids)} inserts and {len(image_ids[::3])} removals match a reload")
+
+
+def test_retag_moves_image_between_scenes():
+    """Re-tagging an image moves it to its new scene sections, in reload order."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn, images_folder = setup_story(folder)
+        first_scene = create_scene(conn, "First", 1)
+        second_scene = create_scene(conn, "Second", 2)
+        image_ids = [insert_image(conn, images_folder, f"2024-01-01 00:00:{number % 3:02d}") for number in range(12)]
+        for image_id in image_ids[:8]:
+            conn.execute("INSERT INTO scene_images (scene_event_id, image_id) VALUES (?, ?)",
+                         (first_scene if image_id % 2 else second_scene, image_id))
+        conn.commit()
+        gallery = create_gallery(conn, scene_grouping=True)
+        before = reloaded_images(gallery)
+        assert set(before) == {'ungrouped', first_scene, second_scene}
+
+        # Move an image to the other scene, add an ungrouped one to a scene,
+        # and empty the first scene
+        for image_id in image_ids[:8]:
+            conn.execute("UPDATE scene_images SET scene_event_id = ? WHERE image_id = ?", (second_scene, image_id))
+        conn.execute("INSERT INTO scene_images (scene_event_id, image_id) VALUES (?, ?)", (second_scene, image_ids[-1]))
+        conn.commit()
+        for image_id in image_ids[:8:2] + image_ids[1:8:2] + image_ids[-1:]:
+            gallery.refresh_image_thumbnail(image_id)
+        after = shown_images(gallery)
+        assert first_scene not in after
+        assert after == reloaded_images(gallery)
+        assert gallery._count_gallery_images() == len(image_ids)
+        gallery.close()
+        conn.close()
+        print(f"Scene view: re-tagging {len(image_ids[:8]) + 1} images matches a reload")
+
+
+def test_only_thumbnails_near_view_are_shown():
+    """Thumbnails far from the visible area stay hidden until they're scrolled near."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn, images_folder = setup_story(folder)
+        for number in range(300):
+            insert_image(conn, images_folder, f"2024-01-01 00:{number // 60:02d}:{number % 60:02d}")
+        gallery = create_gallery(conn, scene_grouping=False)
+        thumbnails = [thumbnail for _, thumbnail in gallery.gallery_sections[0]['entries']]
+        shown_images(gallery)
+        shown = [index for index, thumbnail in enumerate(thumbnails) if not thumbnail.isHidden()]
+        assert shown and shown[0] == 0 and len(shown) < len(thumbnails) // 2
+        assert shown == list(range(len(shown)))
+
+        scroll_bar = gallery.scroll_area.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.maximum())
+        shown_images(gallery)
+        assert thumbnails[0].isHidden() and not thumbnails[-1].isHidden()
+        viewport = gallery.scroll_area.viewport()
+        assert viewport.rect().contains(thumbnails[-1].mapTo(viewport, thumbnails[-1].rect().center()))
+        gallery.close()
+        conn.close()
+        print(f"Scrolling: {len(shown)} of {len(thumbnails)} thumbnails shown at a time")
+
+
+def test_scene_sections_are_loaded_when_scrolled_near():
+    """Scene sections show their headers from counts and are looked up once expanded and near the view."""
+    with tempfile.TemporaryDirectory() as folder:
+        # Keep the collapsed sections out of the user's settings
+        QSettings.setPath(QSettings.Format.NativeFormat, QSettings.Scope.UserScope, folder)
+        conn, images_folder = setup_story(folder)
+        for sequence_number in range(60):
+            scene_id = create_scene(conn, f"Scene {sequence_number}", sequence_number)
+            for number in range(3):
+                image_id = insert_image(conn, images_folder, f"2024-01-01 00:{sequence_number:02d}:{number:02d}")
+                conn.execute("INSERT INTO scene_images (scene_event_id, image_id) VALUES (?, ?)", (scene_id, image_id))
+        insert_image(conn, images_folder, "2023-01-01 00:00:00")
+        conn.commit()
+        grouping = group_images_by_scene(conn, 1)
+        expected = {'ungrouped': [image['id'] for image in grouping['ungrouped']]}
+        expected.update((scene['id'], [image['id'] for image in scene['images']]) for scene in grouping['scenes'])
+
+        gallery = create_gallery(conn, scene_grouping=True)
+        while gallery.section_load_timer.isActive():
+            app.processEvents()
+        sections = gallery.gallery_sections
+        laid_out = [section for section in sections if section['grid'] is not None]
+        assert sections[:len(laid_out)] == laid_out and len(laid_out) < len(sections) // 4
+        assert f"({len(get_story_gallery_images(conn, 1))} images)" in gallery.status_label.text()
+
+        # A collapsed section isn't looked up, even once it's scrolled past
+        collapsed = sections[len(sections) // 2]
+        gallery.on_section_collapse_toggled(collapsed['key'], True)
+        scroll_bar = gallery.scroll_area.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.maximum())
+        while gallery.section_load_timer.isActive():
+            app.processEvents()
+        assert all(section['grid'] is not None for section in sections)
+        assert collapsed['summary'] is not None and sections[-1]['summary'] is None
+        assert collapsed['separator'].summary.startswith("3 images")
+        loaded = sum(section['summary'] is None for section in sections)
+        assert loaded < len(sections) // 2
+        assert shown_images(gallery) == expected
+
+        gallery.on_section_collapse_toggled(collapsed['key'], False)
+        gallery.close()
+        conn.close()
+        print(f"Scene view: {len(laid_out)} of {len(sections)} sections laid out on load, "
+              f"{loaded} looked up after scrolling to the end")
+
+
+def test_insert_time_doesnt_grow_with_gallery():
+    """Benchmark: inserting a new image at the front doesn't re-place the other thumbnails."""
+    timings = {}
+    for image_count in (250, 1000):
+        with tempfile.TemporaryDirectory() as folder:
+            conn, images_folder = setup_story(folder)
+            for number in range(image_count):
+                insert_image(conn, images_folder, f"2024-01-01 00:{number // 60 % 60:02d}:{number % 60:02d}")
+            gallery = create_gallery(conn, scene_grouping=False)
+
+            start = time.perf_counter()
+            for number in range(10):
+                gallery.add_image_thumbnail(insert_image(conn, images_folder, f"2024-02-01 00:00:{number:02d}"))
+                app.processEvents()
+            timings[image_count] = (time.perf_counter() - start) / 10
+            gallery.close()
+            conn.close()
+        print(f"{image_count:5d} thumbnails: {timings[image_count] * 1000:.1f} ms per insert")
+
+    # Re-placing every cell made an insert grow with the square of the gallery size
+    assert timings[1000] < 0.25, timings
+    assert timings[1000] < 8 * timings[250] + 0.01, timings
+
+
+if __name__ == "__main__":
+    print("=== Testing gallery incremental updates ===\n")
+    test_insert_and_remove_keep_reload_order()
+    test_retag_moves_image_between_scenes()
+    test_only_thumbnails_near_view_are_shown()
+    test_scene_sections_are_loaded_when_scrolled_near()
+    test_insert_time_doesnt_grow_with_gallery()
+    print("\n=== All tests completed ===")
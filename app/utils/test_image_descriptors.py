@@ -0,0 +1,194 @@
+"""
+Test script for image_descriptors.py.
+
+This script checks that descriptors are colour histograms of the image and
+its grid cells, that resized and re-encoded copies score higher than other
+pictures, that top-k queries match a full sort, that missing and outdated
+descriptors are filled in when the index is built, and times a query over a
+large story against scoring each image separately.
+"""
+
+import sys
+import os
+import random
+import tempfile
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import numpy as np
+from PyQt6.QtCore import Qt, QBuffer, QIODevice
+from PyQt6.QtGui import QImage, QColor, QPainter, QLinearGradient, qRed, qGreen, qBlue
+
+from app.db_sqlite import (
+    initialize_database, create_image, get_story_image_descriptors, save_image_descriptors
+)
+from app.utils.image_descriptors import (
+    SimilarImageIndex, compute_descriptor, descriptor_to_blob, blob_to_descriptor,
+    DESCRIPTOR_LENGTH, DESCRIPTOR_VERSION, DESCRIPTOR_IMAGE_SIZE
+)
+
+
+def create_scene(seed: int, width: int = 640, height: int = 360) -> QImage:
+    """Paint a random scene of shapes over a gradient."""
+    rng = random.Random(seed)
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    painter = QPainter(image)
+    gradient = QLinearGradient(0, 0, width, height)
+    gradient.setColorAt(0, QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    gradient.setColorAt(1, QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    painter.fillRect(image.rect(), gradient)
+    painter.setPen(Qt.PenStyle.NoPen)
+    for _ in range(8):
+        painter.setBrush(QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        painter.drawEllipse(rng.randrange(width), rng.randrange(height),
+                            rng.randrange(40, 200), rng.randrange(40, 200))
+    painter.end()
+    return image
+
+
+def reencode(image: QImage, quality: int = 60) -> QImage:
+    """Round-trip an image through JPEG."""
+    buffer = QBuffer()
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, "JPEG", quality)
+    return QImage.fromData(buffer.data())
+
+
+def test_descriptor_is_color_histogram():
+    """The first part of the descriptor is the 4x4x4 histogram of the shrunk image."""
+    image = create_scene(1)
+    descriptor = compute_descriptor(image)
+    assert descriptor.dtype == np.float32 and descriptor.shape == (DESCRIPTOR_LENGTH,)
+    assert abs(float(np.linalg.norm(descriptor)) - 1.0) < 1e-5
+
+    # Count the histogram pixel by pixel, as ImageRecognitionUtil does
+    small = image.scaled(DESCRIPTOR_IMAGE_SIZE, DESCRIPTOR_IMAGE_SIZE,
+                         Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation)
+    histogram = [0] * 64
+    for y in range(small.height()):
+        for x in range(small.width()):
+            pixel = small.pixel(x, y)
+            histogram[(qRed(pixel) // 64) * 16 + (qGreen(pixel) // 64) * 4 + qBlue(pixel) // 64] += 1
+    expected = np.sqrt(np.array(histogram) / sum(histogram))
+    # Five equally weighted histograms, so the whole vector is scaled by sqrt(5)
+    assert np.allclose(descriptor[:64] * np.sqrt(5), expected, atol=1e-5)
+
+    # Round trip through storage
+    assert np.array_equal(blob_to_descriptor(descriptor_to_blob(descriptor)), descriptor)
+    assert blob_to_descriptor(b"\0" * 12) is None
+
+
+def test_copies_are_most_similar():
+    """Resized and re-encoded copies score higher than any other picture."""
+    original = compute_descriptor(create_scene(1))
+    copies = {
+        'jpeg': compute_descriptor(reencode(create_scene(1))),
+        'resized': compute_descriptor(create_scene(1).scaled(
+            320, 180, transformMode=Qt.TransformationMode.SmoothTransformation)),
+    }
+    others = [float(original @ compute_descriptor(create_scene(seed))) for seed in range(2, 22)]
+    for name, copy in copies.items():
+        similarity = float(original @ copy)
+        print(f"{name}: similarity {similarity:.3f}")
+        assert similarity > 0.95 and similarity > max(others), name
+    print(f"Other scenes: highest similarity {max(others):.3f}")
+
+
+def test_top_k_matches_full_sort():
+    """Queries return the same images, in the same order, as sorting every score."""
+    rng = np.random.default_rng(5)
+    vectors = rng.random((500, DESCRIPTOR_LENGTH), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    index = SimilarImageIndex()
+    for image_id, vector in enumerate(vectors, start=1):
+        index.add(image_id, vector)
+    assert len(index) == 500
+
+    for query_id in (1, 77, 500):
+        scores = vectors @ vectors[query_id - 1]
+        scores[query_id - 1] = -np.inf
+        expected = [int(position) + 1 for position in np.argsort(-scores)[:10]]
+        found = [image_id for image_id, _ in index.find_similar_to_image(query_id, top_k=10)]
+        assert found == expected
+
+    # Removed images are no longer found, and more results than images is fine
+    best = index.find_similar_to_image(1, top_k=1)[0][0]
+    index.remove(best)
+    assert best not in [image_id for image_id, _ in index.find_similar_to_image(1, top_k=10)]
+    assert len(index.find_similar_to_image(1, top_k=1000)) == 498
+    assert index.find_similar_to_image(best) == []
+
+
+def test_missing_descriptors_are_filled_in():
+    """Images without a current descriptor get one from their thumbnail when the index is built."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn = initialize_database(os.path.join(folder, 'test.db'))
+        conn.execute("INSERT INTO stories (id, title, folder_path) VALUES (1, 'Test Story', ?)", (folder,))
+        conn.commit()
+        images_folder = os.path.join(folder, 'images')
+        os.makedirs(images_folder)
+        os.makedirs(os.path.join(folder, 'thumbnails'))
+
+        image_ids = []
+        for number, seed in enumerate([1, 1, 5, 6]):
+            filename = f"image_{number}.png"
+            scene = create_scene(seed)
+            scene.save(os.path.join(images_folder, filename))
+            if number != 3:  # the last one only has its original
+                scene.scaled(320, 180, transformMode=Qt.TransformationMode.SmoothTransformation).save(
+                    os.path.join(folder, 'thumbnails', filename))
+            image_ids.append(create_image(conn, filename, images_folder, 1))
+
+        # One image has a descriptor of an older layout, which is recomputed
+        save_image_descriptors(conn, 1, [(image_ids[2], b"\0" * 16)], DESCRIPTOR_VERSION - 1)
+
+        index = SimilarImageIndex.build(conn, 1)
+        assert len(index) == 4
+        rows = get_story_image_descriptors(conn, 1)
+        assert all(row['version'] == DESCRIPTOR_VERSION for row in rows)
+        assert index.find_similar_to_image(image_ids[0], top_k=1)[0][0] == image_ids[1]
+
+        # A second build reads the stored descriptors without recomputing them
+        rebuilt = SimilarImageIndex.build(conn, 1, progress_callback=lambda done, total: False)
+        assert len(rebuilt) == 4
+
+        conn.close()
+
+
+def test_query_speed():
+    """Benchmark one matrix product against scoring each image separately."""
+    rng = np.random.default_rng(11)
+    vectors = rng.random((20000, DESCRIPTOR_LENGTH), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    index = SimilarImageIndex()
+    index.image_ids = list(range(len(vectors)))
+    index.positions = {image_id: image_id for image_id in index.image_ids}
+    index.matrix = vectors
+    index.active = np.ones(len(vectors), dtype=bool)
+
+    start = time.perf_counter()
+    for query_id in range(20):
+        matches = index.find_similar_to_image(query_id)
+    matrix_time = (time.perf_counter() - start) / 20
+
+    start = time.perf_counter()
+    scores = [(float(np.dot(vector, vectors[0])), image_id) for image_id, vector in enumerate(vectors) if image_id]
+    loop_matches = sorted(scores, reverse=True)[:len(matches)]
+    loop_time = time.perf_counter() - start
+
+    assert [image_id for image_id, _ in index.find_similar_to_image(0)] == [image_id for _, image_id in loop_matches]
+    print(f"20000 images: matrix query {matrix_time * 1000:.1f} ms, per-image loop {loop_time * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    print("=== Testing image descriptors ===\n")
+    test_descriptor_is_color_histogram()
+    test_copies_are_most_similar()
+    test_top_k_matches_full_sort()
+    test_missing_descriptors_are_filled_in()
+    test_query_speed()
+    print("\n=== All tests completed ===")
@@ -0,0 +1,167 @@
+"""
+Test script for the feature extraction in image_recognition_util.py.
+
+This script checks that the NumPy feature extraction gives the same color
+histogram, brightness and colorfulness as reading every pixel with pixel(),
+for several image formats and sizes, and times both on an image region.
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import numpy as np
+from PyQt6.QtCore import QRect
+from PyQt6.QtGui import QImage, qRed, qGreen, qBlue
+
+from app.utils.image_recognition_util import ImageRecognitionUtil
+
+
+def reference_histogram(image: QImage):
+    """Color histogram computed pixel by pixel, as before."""
+    if image.width() > 100 or image.height() > 100:
+        image = image.scaled(100, 100)
+    histogram = [0] * 64
+    for y in range(image.height()):
+        for x in range(image.width()):
+            pixel = image.pixel(x, y)
+            histogram[(qRed(pixel) // 64) * 16 + (qGreen(pixel) // 64) * 4 + qBlue(pixel) // 64] += 1
+    total_pixels = image.width() * image.height()
+    return [count / total_pixels for count in histogram]
+
+
+def reference_brightness(image: QImage) -> float:
+    """Average brightness computed pixel by pixel, as before."""
+    if image.width() > 50 or image.height() > 50:
+        image = image.scaled(50, 50)
+    total_brightness = 0
+    for y in range(image.height()):
+        for x in range(image.width()):
+            pixel = image.pixel(x, y)
+            total_brightness += (qRed(pixel) + qGreen(pixel) + qBlue(pixel)) / (3 * 255)
+    return total_brightness / (image.width() * image.height())
+
+
+def reference_colorfulness(image: QImage) -> float:
+    """Colorfulness computed pixel by pixel, as before."""
+    if image.width() > 50 or image.height() > 50:
+        image = image.scaled(50, 50)
+    total_saturation = 0
+    for y in range(image.height()):
+        for x in range(image.width()):
+            pixel = image.pixel(x, y)
+            r, g, b = qRed(pixel), qGreen(pixel), qBlue(pixel)
+            max_rgb = max(r, g, b)
+            total_saturation += (max_rgb - min(r, g, b)) / max_rgb if max_rgb > 0 else 0
+    return total_saturation / (image.width() * image.height())
+
+
+def random_image(width: int, height: int, image_format: QImage.Format, seed: int) -> QImage:
+    """Create an image of random pixels in a given format."""
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 2 ** 32, size=(height, width), dtype=np.uint32)
+    # Leave some pixels black, which have no saturation
+    pixels[::7, ::5] = 0xFF000000
+    image = QImage(pixels.tobytes(), width, height, width * 4, QImage.Format.Format_ARGB32).copy()
+    return image.convertToFormat(image_format)
+
+
+def create_util(folder: str) -> ImageRecognitionUtil:
+    """Create the utility with an in-memory database."""
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    return ImageRecognitionUtil(conn, cache_dir=folder)
+
+
+def test_features_match_pixel_loop():
+    """The NumPy features equal the pixel-by-pixel ones for several formats and sizes."""
+    with tempfile.TemporaryDirectory() as folder:
+        recognition = create_util(folder)
+        cases = [
+            (640, 480, QImage.Format.Format_RGB32),
+            (333, 97, QImage.Format.Format_ARGB32),
+            (120, 200, QImage.Format.Format_RGB888),
+            (75, 40, QImage.Format.Format_Grayscale8),
+            (30, 20, QImage.Format.Format_RGB32),  # smaller than both sizes, not scaled
+            (41, 101, QImage.Format.Format_RGB16),
+        ]
+        for seed, (width, height, image_format) in enumerate(cases):
+            image = random_image(width, height, image_format, seed)
+            features = recognition.extract_features_from_qimage(image)
+
+            assert features['color_histogram'] == reference_histogram(image), (width, height)
+            assert abs(features['features']['brightness'] - reference_brightness(image)) < 1e-12
+            assert abs(features['features']['colorfulness'] - reference_colorfulness(image)) < 1e-12
+            assert features['features']['width'] == width and features['features']['height'] == height
+
+        recognition.db_conn.close()
+
+
+def test_descriptor_only_when_needed():
+    """Queries skip the descriptor when reranking is off or no saved features have one."""
+    with tempfile.TemporaryDirectory() as folder:
+        recognition = create_util(folder)
+        image = random_image(120, 160, QImage.Format.Format_RGB32, 3)
+        assert 'descriptor' not in recognition.extract_features_from_qimage(image, with_descriptor=False)
+
+        # Nothing saved yet, so nothing to rerank against
+        recognition.db_conn.execute("CREATE TABLE characters (id INTEGER PRIMARY KEY, name TEXT, story_id INTEGER)")
+        recognition.db_conn.execute("INSERT INTO characters (id, name, story_id) VALUES (1, 'Character', 1)")
+        assert not recognition.needs_descriptor()
+        recognition.save_character_image_features(1, recognition.extract_features_from_qimage(image))
+        assert recognition.needs_descriptor()
+        recognition.cascade_top_k = 0
+        assert not recognition.needs_descriptor()
+
+        # Features without a descriptor still score the same
+        recognition.cascade_top_k = 8
+        with_descriptor = recognition.extract_features_from_qimage(image)
+        without = recognition.extract_features_from_qimage(image, with_descriptor=False)
+        index = recognition.get_feature_index()
+        assert index.score(with_descriptor) == index.score(without) == index.score_cascade(without)
+        recognition.db_conn.close()
+
+
+def test_region_speed():
+    """Benchmark extracting the features of a region, against the pixel loop."""
+    with tempfile.TemporaryDirectory() as folder:
+        recognition = create_util(folder)
+        image = random_image(1920, 1080, QImage.Format.Format_RGB32, 42)
+        region = image.copy(QRect(400, 200, 600, 500))
+
+        start = time.perf_counter()
+        for _ in range(3):
+            reference_histogram(region)
+            reference_brightness(region)
+            reference_colorfulness(region)
+        loop_time = (time.perf_counter() - start) / 3
+
+        # A query that isn't reranked skips the descriptor
+        start = time.perf_counter()
+        for _ in range(50):
+            recognition.extract_features_from_qimage(region, with_descriptor=False)
+        numpy_time = (time.perf_counter() - start) / 50
+
+        start = time.perf_counter()
+        for _ in range(50):
+            recognition.extract_features_from_qimage(region)
+        descriptor_time = (time.perf_counter() - start) / 50
+
+        print(f"Features of a 600x500 region: pixel loop {loop_time * 1000:.1f} ms, "
+              f"NumPy {numpy_time * 1000:.2f} ms ({loop_time / numpy_time:.0f}x faster), "
+              f"with the descriptor {descriptor_time * 1000:.2f} ms")
+
+        recognition.db_conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Testing image recognition features ===\n")
+    test_features_match_pixel_loop()
+    test_descriptor_only_when_needed()
+    test_region_speed()
+    print("\n=== All tests completed ===")
@@ -0,0 +1,173 @@
+"""
+Test script for ingest_pipeline.py.
+
+This script runs ingest jobs against a temporary story and checks the stage
+order, the saved files and database row, duplicate detection, cancellation,
+invalid input, and that encoded sources are stored without re-encoding.
+"""
+
+import sys
+import os
+import tempfile
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from PyQt6.QtCore import QBuffer, QIODevice
+from PyQt6.QtGui import QImage, QColor
+
+from app.db_sqlite import initialize_database
+from app.utils.ingest_pipeline import (
+    ImageIngestJob, STAGE_DECODE, STAGE_HASH, STAGE_ENCODE, STAGE_THUMBNAIL,
+    STAGE_INSERT, STAGE_RECOGNITION, THUMBNAIL_MAX_DIMENSION
+)
+
+
+def create_test_image(width: int = 800, height: int = 600, color: QColor = QColor(40, 80, 120)) -> QImage:
+    """Create a solid test image."""
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    image.fill(color)
+    return image
+
+
+def run_job(conn, folder: str, **kwargs):
+    """Run an ingest job on this thread and collect what it reported.
+
+    Returns:
+        Tuple of (job, events) where events is a list of (signal name, value)
+    """
+    job = ImageIngestJob(
+        conn, 1,
+        os.path.join(folder, 'images'),
+        os.path.join(folder, 'thumbnails'),
+        **kwargs
+    )
+    events = []
+    job.signals.stage_changed.connect(lambda stage, label: events.append(('stage', stage)))
+    job.signals.decoded.connect(lambda image: events.append(('decoded', image.size())))
+    job.signals.duplicate_found.connect(lambda image_id: events.append(('duplicate', image_id)))
+    job.signals.completed.connect(lambda result: events.append(('completed', result)))
+    job.signals.failed.connect(lambda message: events.append(('failed', message)))
+    job.signals.cancelled.connect(lambda: events.append(('cancelled', None)))
+    job.run()
+    return job, events
+
+
+def setup_test_db(folder: str):
+    """Create a database with one story in a temporary folder."""
+    conn = initialize_database(os.path.join(folder, 'test.db'))
+    conn.execute("INSERT INTO stories (id, title, folder_path) VALUES (1, 'Test Story', ?)", (folder,))
+    conn.commit()
+    return conn
+
+
+def test_pipeline_stages_and_duplicates():
+    """A new image goes through every stage; the same pixels again are a duplicate."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn = setup_test_db(folder)
+
+        _, events = run_job(conn, folder, image=create_test_image())
+        stages = [value for name, value in events if name == 'stage']
+        assert stages == [STAGE_DECODE, STAGE_HASH, STAGE_ENCODE, STAGE_THUMBNAIL, STAGE_INSERT, STAGE_RECOGNITION]
+        # The decoded image is reported before any saving happens
+        assert [name for name, _ in events].index('decoded') == 1
+
+        result = events[-1][1]
+        assert events[-1][0] == 'completed'
+        row = conn.execute("SELECT * FROM images WHERE id = ?", (result['image_id'],)).fetchone()
+        assert row['content_hash'] == result['content_hash']
+        assert (row['width'], row['height']) == (800, 600)
+        assert os.path.exists(os.path.join(folder, 'images', result['filename']))
+        thumbnail = QImage(os.path.join(folder, 'thumbnails', result['filename']))
+        assert max(thumbnail.width(), thumbnail.height()) == THUMBNAIL_MAX_DIMENSION
+
+        # The same picture from encoded bytes is found as a duplicate
+        data = QBuffer()
+        data.open(QIODevice.OpenModeFlag.WriteOnly)
+        create_test_image().save(data, "PNG")
+        _, events = run_job(conn, folder, data=bytes(data.data()))
+        assert events[-1] == ('duplicate', result['image_id'])
+        assert conn.execute("SELECT COUNT(*) FROM images").fetchone()[0] == 1
+
+        # Unless duplicates are allowed
+        _, events = run_job(conn, folder, data=bytes(data.data()), skip_duplicates=False)
+        assert events[-1][0] == 'completed'
+        assert conn.execute("SELECT COUNT(*) FROM images").fetchone()[0] == 2
+        print(f"Stages: {stages}, duplicate detected for image {result['image_id']}")
+
+        conn.close()
+
+
+def test_cancel_and_invalid_data():
+    """Cancelling before the insert leaves nothing behind; bad data fails cleanly."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn = setup_test_db(folder)
+
+        job = ImageIngestJob(conn, 1, os.path.join(folder, 'images'), os.path.join(folder, 'thumbnails'),
+                             image=create_test_image())
+        events = []
+        # Cancel once the thumbnail stage starts, after the original was written
+        job.signals.stage_changed.connect(lambda stage, label: job.cancel() if stage == STAGE_THUMBNAIL else None)
+        job.signals.completed.connect(lambda result: events.append('completed'))
+        job.signals.cancelled.connect(lambda: events.append('cancelled'))
+        job.run()
+
+        assert events == ['cancelled']
+        assert conn.execute("SELECT COUNT(*) FROM images").fetchone()[0] == 0
+        assert os.listdir(os.path.join(folder, 'images')) == []
+
+        _, events = run_job(conn, folder, data=b"not an image")
+        assert events[-1][0] == 'failed'
+        assert conn.execute("SELECT COUNT(*) FROM images").fetchone()[0] == 0
+
+        conn.close()
+
+
+def test_source_bytes_are_kept():
+    """Encoded sources keep their bytes and format; raw pixels use the chosen format."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn = setup_test_db(folder)
+
+        # A JPEG file is stored byte for byte
+        buffer = QBuffer()
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        create_test_image(1920, 1080, QColor(10, 200, 30)).save(buffer, "JPEG", 85)
+        jpeg_data = bytes(buffer.data())
+
+        _, events = run_job(conn, folder, data=jpeg_data)
+        result = events[-1][1]
+        assert result['filename'].endswith('.jpg')
+        with open(os.path.join(folder, 'images', result['filename']), 'rb') as image_file:
+            assert image_file.read() == jpeg_data
+        row = conn.execute("SELECT mime_type, file_size FROM images WHERE id = ?", (result['image_id'],)).fetchone()
+        assert row['mime_type'] == 'image/jpeg'
+        assert row['file_size'] == len(jpeg_data)
+
+        # For comparison, the size of the same picture re-encoded as PNG
+        png_buffer = QBuffer()
+        png_buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        QImage.fromData(jpeg_data).save(png_buffer, "PNG")
+        print(f"1920x1080 JPEG kept at {len(jpeg_data) // 1024} KB "
+              f"(as PNG: {png_buffer.data().size() // 1024} KB)")
+
+        # Raw pixels are encoded with the configured format and quality
+        _, events = run_job(conn, folder, image=create_test_image(640, 480, QColor(200, 10, 10)),
+                            encode_format='jpeg', encode_quality=70)
+        result = events[-1][1]
+        assert result['filename'].endswith('.jpg')
+        assert result['mime_type'] == 'image/jpeg'
+        stored = QImage(os.path.join(folder, 'images', result['filename']))
+        assert (stored.width(), stored.height()) == (640, 480)
+
+        _, events = run_job(conn, folder, image=create_test_image(640, 480, QColor(10, 10, 200)))
+        assert events[-1][1]['mime_type'] == 'image/png'
+
+        conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Testing ingest pipeline ===\n")
+    test_pipeline_stages_and_duplicates()
+    test_cancel_and_invalid_data()
+    test_source_bytes_are_kept()
+    print("\n=== All tests completed ===")
@@ -0,0 +1,190 @@
+"""
+Test script for perceptual_hash.py.
+
+This script checks that edited copies of a picture (changed subtitle, slight
+crop, JPEG re-encode) hash close to the original while other pictures don't,
+that indexed searches match a brute-force scan, that missing hashes are
+filled in from thumbnails, and times grouping a large story against
+comparing every pair.
+"""
+
+import sys
+import os
+import random
+import tempfile
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from PyQt6.QtCore import Qt, QBuffer, QIODevice, QRect
+from PyQt6.QtGui import QImage, QColor, QPainter, QLinearGradient
+
+from app.db_sqlite import initialize_database, create_image, get_story_perceptual_hashes
+from app.utils.perceptual_hash import (
+    MultiIndexHashTable, NearDuplicateIndex, compute_dhash, hamming_distance, hash_to_hex,
+    NEAR_DUPLICATE_DISTANCE
+)
+
+
+def create_scene(seed: int, subtitle: str = "", width: int = 1280, height: int = 720) -> QImage:
+    """Paint a random scene of shapes over a gradient, with an optional subtitle."""
+    rng = random.Random(seed)
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    painter = QPainter(image)
+    gradient = QLinearGradient(0, 0, width, height)
+    gradient.setColorAt(0, QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    gradient.setColorAt(1, QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    painter.fillRect(image.rect(), gradient)
+    for _ in range(12):
+        painter.setBrush(QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.drawEllipse(rng.randrange(width), rng.randrange(height),
+                            rng.randrange(80, 400), rng.randrange(80, 400))
+    if subtitle:
+        # A line of white glyph-sized blocks, different for each subtitle text
+        text_rng = random.Random(subtitle)
+        x = (width - len(subtitle) * 22) // 2
+        for character in subtitle:
+            if character != ' ':
+                painter.fillRect(QRect(x, height - 80 + text_rng.randrange(8), 16, 28 + text_rng.randrange(8)),
+                                 QColor(255, 255, 255))
+            x += 22
+    painter.end()
+    return image
+
+
+def reencode(image: QImage, quality: int = 60) -> QImage:
+    """Round-trip an image through JPEG."""
+    buffer = QBuffer()
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, "JPEG", quality)
+    return QImage.fromData(buffer.data())
+
+
+def test_near_duplicates_are_close():
+    """Edited copies are within the near-duplicate distance; other scenes aren't."""
+    original = create_scene(1, "Where were you last night?")
+    base_hash = compute_dhash(original)
+
+    variants = {
+        'subtitle': create_scene(1, "I was at the station."),
+        'crop': original.copy(QRect(25, 15, 1230, 690)),
+        'jpeg': reencode(original),
+        'resized': original.scaled(640, 360, transformMode=Qt.TransformationMode.SmoothTransformation),
+    }
+    for name, variant in variants.items():
+        distance = hamming_distance(base_hash, compute_dhash(variant))
+        print(f"{name}: distance {distance}")
+        assert distance <= NEAR_DUPLICATE_DISTANCE, name
+
+    others = [hamming_distance(base_hash, compute_dhash(create_scene(seed))) for seed in range(2, 12)]
+    print(f"Other scenes: closest distance {min(others)}")
+    assert min(others) > NEAR_DUPLICATE_DISTANCE
+
+
+def test_bk_tree_matches_brute_force():
+    """Table searches and groups find the same images as comparing every pair."""
+    rng = random.Random(7)
+    hashes = {}
+    # Clusters of near-identical hashes plus unrelated ones
+    for image_id in range(1, 2001):
+        if image_id % 5 == 0:
+            base = hashes[image_id - 1]
+            hashes[image_id] = base ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64))
+        else:
+            hashes[image_id] = rng.getrandbits(64)
+
+    index = NearDuplicateIndex()
+    for image_id, hash_value in hashes.items():
+        index.add(image_id, hash_value)
+
+    for query_id in rng.sample(sorted(hashes), 50):
+        expected = sorted(image_id for image_id, hash_value in hashes.items()
+                          if image_id != query_id
+                          and hamming_distance(hash_value, hashes[query_id]) <= NEAR_DUPLICATE_DISTANCE)
+        found = sorted(image_id for image_id, _ in index.find(hashes[query_id], exclude=query_id))
+        assert found == expected
+
+    groups = index.find_groups()
+    assert all(len(group) >= 2 for group in groups)
+    assert any(set(group) >= {4, 5} for group in groups)
+
+    # Removed images are no longer found
+    index.remove(5)
+    assert 5 not in [image_id for image_id, _ in index.find(hashes[5])]
+
+    table = MultiIndexHashTable()
+    table.add(0b1010, 'a')
+    table.add(0b1010, 'b')
+    table.add(0b0101, 'c')
+    assert sorted(table.search(0b1011, 1)) == [(1, 'a'), (1, 'b')]
+    # Differences spread over every chunk are still found
+    spread = (1 << 3) | (1 << 20) | (1 << 37) | (1 << 50) | (1 << 51)
+    table.add(spread, 'd')
+    assert (5, 'd') in table.search(0, 5)
+
+
+def test_missing_hashes_are_filled_in():
+    """Images stored without a hash get one from their thumbnail when the index is built."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn = initialize_database(os.path.join(folder, 'test.db'))
+        conn.execute("INSERT INTO stories (id, title, folder_path) VALUES (1, 'Test Story', ?)", (folder,))
+        conn.commit()
+        images_folder = os.path.join(folder, 'images')
+        os.makedirs(images_folder)
+        os.makedirs(os.path.join(folder, 'thumbnails'))
+
+        scenes = [create_scene(1, "Hello"), create_scene(1, "Goodbye"), create_scene(5)]
+        for number, scene in enumerate(scenes):
+            filename = f"image_{number}.png"
+            scene.save(os.path.join(images_folder, filename))
+            scene.scaled(320, 180, transformMode=Qt.TransformationMode.SmoothTransformation).save(
+                os.path.join(folder, 'thumbnails', filename))
+            create_image(conn, filename, images_folder, 1)
+        # One image already has its hash
+        create_image(conn, "stored.png", images_folder, 1,
+                     perceptual_hash=hash_to_hex(compute_dhash(create_scene(9))))
+
+        index = NearDuplicateIndex.build(conn, 1)
+        assert len(index) == 4
+        assert all(row['perceptual_hash'] for row in get_story_perceptual_hashes(conn, 1))
+        assert index.find_groups() == [[2, 1]]
+
+        conn.close()
+
+
+def test_report_speed():
+    """Benchmark grouping a large story against comparing every pair."""
+    rng = random.Random(3)
+    hashes = [rng.getrandbits(64) for _ in range(4000)]
+    for number in range(0, 4000, 10):
+        hashes[number] = hashes[number - 1] ^ (1 << rng.randrange(64))
+
+    start = time.perf_counter()
+    index = NearDuplicateIndex()
+    for image_id, hash_value in enumerate(hashes):
+        index.add(image_id, hash_value)
+    groups = index.find_groups()
+    indexed_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pairs = 0
+    for first in range(len(hashes)):
+        for second in range(first + 1, len(hashes)):
+            if hamming_distance(hashes[first], hashes[second]) <= NEAR_DUPLICATE_DISTANCE:
+                pairs += 1
+    brute_force_time = time.perf_counter() - start
+
+    print(f"4000 images: indexed grouping {indexed_time * 1000:.0f} ms ({len(groups)} groups), "
+          f"all pairs {brute_force_time * 1000:.0f} ms ({pairs} pairs)")
+    assert len(groups) >= 399
+
+
+if __name__ == "__main__":
+    print("=== Testing perceptual hashes ===\n")
+    test_near_duplicates_are_close()
+    test_bk_tree_matches_brute_force()
+    test_missing_hashes_are_filled_in()
+    test_report_speed()
+    print("\n=== All tests completed ===")
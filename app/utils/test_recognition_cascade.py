@@ -0,0 +1,219 @@
+"""
+Test script for the recognition cascade in feature_index.py.
+
+This script checks that descriptors are laid out as documented, that
+reranking with descriptors tells apart characters whose colors are the same
+but arranged differently (which the color histogram alone confuses), that
+the cascade falls back to the cheap score without descriptors or time, and
+times a recognition query with and without reranking.
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import numpy as np
+from PyQt6.QtCore import QRect
+from PyQt6.QtGui import QImage, QColor, QPainter
+
+from app.db_sqlite import initialize_database
+from app.utils.image_recognition_util import ImageRecognitionUtil
+from app.utils.feature_index import (
+    CharacterFeatureIndex, DESCRIPTOR_SIZE, DESCRIPTOR_CELLS, DESCRIPTOR_COLOR_SIZE,
+    COLOR_CELL_BINS, GRADIENT_CELL_BINS
+)
+
+
+def paint_character(kind: str, width: int = 120, height: int = 160, seed: int = 0) -> QImage:
+    """Paint a character of red and blue, arranged in one of several ways, with some noise."""
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    image.fill(QColor("#2040d0"))
+    painter = QPainter(image)
+    red = QColor("#d02020")
+    if kind == 'left':
+        painter.fillRect(QRect(0, 0, width // 2, height), red)
+    elif kind == 'right':
+        painter.fillRect(QRect(width // 2, 0, width - width // 2, height), red)
+    elif kind == 'top':
+        painter.fillRect(QRect(0, 0, width, height // 2), red)
+    elif kind == 'stripes':
+        for y in range(0, height, 8):
+            painter.fillRect(QRect(0, y, width, 4), red)
+    painter.end()
+
+    # Noise, so a query is never an exact copy of an avatar
+    pixels = np.frombuffer(image.constBits().asstring(image.sizeInBytes()), dtype=np.uint32)
+    pixels = pixels.reshape(height, image.bytesPerLine() // 4)[:, :width].copy()
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 16, size=pixels.shape, dtype=np.uint32)
+    pixels = pixels - noise - (noise << 8)
+    return QImage(pixels.tobytes(), width, height, width * 4, QImage.Format.Format_RGB32).copy()
+
+
+def setup_characters(folder: str, kinds):
+    """Create a story with one character per arrangement, with avatar features.
+
+    Returns:
+        (recognition utility, {kind: character ID})
+    """
+    conn = initialize_database(os.path.join(folder, 'test.db'))
+    recognition = ImageRecognitionUtil(conn, cache_dir=folder)
+    conn.execute("INSERT INTO stories (id, title, folder_path) VALUES (1, 'Story', ?)", (folder,))
+    character_ids = {}
+    for kind in kinds:
+        cursor = conn.execute("INSERT INTO characters (name, story_id) VALUES (?, 1)", (kind,))
+        character_ids[kind] = cursor.lastrowid
+        recognition.save_character_image_features(
+            cursor.lastrowid, recognition.extract_features_from_qimage(paint_character(kind)), is_avatar=True)
+    conn.commit()
+    return recognition, character_ids
+
+
+def test_descriptor_layout():
+    """Every cell histogram of the color and edge parts sums to 1."""
+    with tempfile.TemporaryDirectory() as folder:
+        recognition, _ = setup_characters(folder, [])
+        for image in (paint_character('stripes'), paint_character('left', 7, 3), QImage(1, 1, QImage.Format.Format_RGB32)):
+            descriptor = np.array(recognition.extract_features_from_qimage(image)['descriptor'])
+            assert descriptor.shape == (DESCRIPTOR_SIZE,)
+            colors = descriptor[:DESCRIPTOR_COLOR_SIZE].reshape(DESCRIPTOR_CELLS, COLOR_CELL_BINS)
+            gradients = descriptor[DESCRIPTOR_COLOR_SIZE:].reshape(DESCRIPTOR_CELLS, GRADIENT_CELL_BINS)
+            if image.width() >= 2 and image.height() >= 2:
+                assert np.allclose(colors.sum(axis=1), 1) and np.allclose(gradients.sum(axis=1), 1)
+
+        # A flat image has no edges; stripes have horizontal ones
+        flat = np.array(recognition.extract_features_from_qimage(paint_character('none'))['descriptor'])
+        stripes = np.array(recognition.extract_features_from_qimage(paint_character('stripes'))['descriptor'])
+        assert flat[DESCRIPTOR_COLOR_SIZE:].reshape(DESCRIPTOR_CELLS, -1)[:, -1].min() > 0.99
+        assert stripes[DESCRIPTOR_COLOR_SIZE:].reshape(DESCRIPTOR_CELLS, -1)[:, -1].max() < 0.9
+        recognition.db_conn.close()
+
+
+def test_cascade_tells_arrangements_apart():
+    """Reranking finds the right character where the color histogram can't."""
+    with tempfile.TemporaryDirectory() as folder:
+        kinds = ['left', 'right', 'top', 'stripes']
+        recognition, character_ids = setup_characters(folder, kinds)
+        index = recognition.get_feature_index(1)
+
+        coarse_correct = cascade_correct = 0
+        for seed, kind in enumerate(kinds * 3, start=1):
+            # A query of another size than the avatar
+            query = recognition.extract_features_from_qimage(paint_character(kind, 90, 150, seed))
+            coarse = index.score(query)
+            cascade = index.score_cascade(query, top_k=len(kinds), budget_ms=None)
+            coarse_correct += max(coarse, key=coarse.get) == character_ids[kind]
+            cascade_correct += max(cascade, key=cascade.get) == character_ids[kind]
+
+            found = recognition.identify_characters_in_image(query, threshold=0.0, story_id=1)
+            assert found[0]['character_id'] == character_ids[kind]
+
+        assert cascade_correct == len(kinds) * 3
+        assert coarse_correct < cascade_correct
+        print(f"Same colors, different arrangements: histogram {coarse_correct}/12 right, "
+              f"cascade {cascade_correct}/12 right")
+        recognition.db_conn.close()
+
+
+def test_cascade_fallbacks():
+    """Without descriptors, reranking or time, the cascade gives the cheap scores."""
+    with tempfile.TemporaryDirectory() as folder:
+        recognition, character_ids = setup_characters(folder, ['left', 'right', 'stripes'])
+        index = recognition.get_feature_index(1)
+        query = recognition.extract_features_from_qimage(paint_character('left', seed=5))
+        coarse = index.score(query)
+
+        assert index.score_cascade(query, top_k=0) == coarse
+        assert index.score_cascade(query, budget_ms=0) == coarse
+        assert index.score_cascade({key: query[key] for key in ('features', 'color_histogram')}) == coarse
+
+        # The reranked character stays first; the others keep at most their cheap score
+        reranked = index.score_cascade(query, top_k=1, budget_ms=None)
+        best = max(coarse, key=coarse.get)
+        assert max(reranked, key=reranked.get) == best and reranked[best] != coarse[best]
+        assert all(reranked[character_id] <= coarse[character_id] for character_id in coarse if character_id != best)
+
+        # A character whose features have no descriptor keeps its cheap score
+        all_reranked = index.score_cascade(query, top_k=3, budget_ms=None)
+        recognition.db_conn.execute("UPDATE image_features SET descriptor = NULL WHERE character_id = ?",
+                                    (character_ids['right'],))
+        rebuilt = CharacterFeatureIndex.build(recognition.db_conn, 1)
+        assert rebuilt.has_descriptor.sum() == 2
+        scores = rebuilt.score_cascade(query, top_k=3, budget_ms=None)
+        assert scores[character_ids['right']] <= coarse[character_ids['right']]
+        assert scores[character_ids['right']] < min(scores[character_ids[kind]] for kind in ('left', 'stripes'))
+        assert abs(scores[character_ids['left']] - all_reranked[character_ids['left']]) < 1e-6
+
+        # Added features keep their descriptor
+        rebuilt.add(10 ** 6, character_ids['right'], query)
+        assert rebuilt.has_descriptor[-1] and np.allclose(rebuilt.descriptors[-1], query['descriptor'])
+        recognition.db_conn.close()
+
+
+def test_partial_rerank():
+    """With fewer characters reranked than there are, the reranked ones still come first."""
+    with tempfile.TemporaryDirectory() as folder:
+        kinds = ['left', 'right', 'top', 'stripes']
+        recognition, character_ids = setup_characters(folder, kinds)
+        index = recognition.get_feature_index(1)
+
+        for seed, kind in enumerate(kinds * 3, start=1):
+            query = recognition.extract_features_from_qimage(paint_character(kind, 90, 150, seed))
+            coarse = index.score(query)
+            checked = sorted(coarse, key=coarse.get, reverse=True)[:2]
+            scores = index.score_cascade(query, top_k=2, budget_ms=None)
+            ranking = sorted(scores, key=scores.get, reverse=True)
+            assert sorted(ranking[:2]) == sorted(checked)
+            assert all(scores[character_id] <= coarse[character_id] for character_id in ranking[2:])
+
+            # The same goes for the ranked results of a query
+            recognition.cascade_top_k = 2
+            found = recognition.identify_characters_in_image(query, threshold=0.0, story_id=1)
+            assert sorted(result['character_id'] for result in found[:2]) == sorted(checked)
+        recognition.db_conn.close()
+
+
+def test_query_speed():
+    """Benchmark a recognition query with and without reranking, over 2000 feature sets."""
+    with tempfile.TemporaryDirectory() as folder:
+        recognition, character_ids = setup_characters(folder, [])
+        rng = np.random.default_rng(7)
+        base = recognition.extract_features_from_qimage(paint_character('stripes'))
+        for number in range(200):
+            cursor = recognition.db_conn.execute("INSERT INTO characters (name, story_id) VALUES (?, 1)",
+                                                 (f"Character {number}",))
+            for _ in range(10):
+                features = {
+                    'features': dict(base['features'], brightness=float(rng.random())),
+                    'color_histogram': (rng.random(64) / 32).tolist(),
+                    'descriptor': (rng.random(DESCRIPTOR_SIZE) / 40).tolist(),
+                }
+                recognition.save_character_image_features(cursor.lastrowid, features)
+        query = recognition.extract_features_from_qimage(paint_character('stripes', seed=3))
+        recognition.get_feature_index(1)
+
+        timings = {}
+        for top_k in (0, 8):
+            recognition.cascade_top_k = top_k
+            start = time.perf_counter()
+            for _ in range(20):
+                recognition.identify_characters_in_image(query, threshold=0.5, story_id=1)
+            timings[top_k] = (time.perf_counter() - start) / 20
+
+        print(f"Query over 2000 feature sets: histogram only {timings[0] * 1000:.2f} ms, "
+              f"reranking 8 characters {timings[8] * 1000:.2f} ms")
+        recognition.db_conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Testing recognition cascade ===\n")
+    test_descriptor_layout()
+    test_cascade_tells_arrangements_apart()
+    test_cascade_fallbacks()
+    test_partial_rerank()
+    test_query_speed()
+    print("\n=== All tests completed ===")
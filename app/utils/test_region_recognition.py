@@ -0,0 +1,184 @@
+"""
+Test script for region_recognition.py.
+
+This script checks that region jobs suggest the same characters as
+identify_characters_in_image, that several regions run at once and each
+reports exactly once, that cancelled jobs report no suggestions, that
+features saved while jobs run don't change their index, and times
+recognizing a batch of regions one after another on the calling thread and
+on the pool, and how long the calling thread is busy queueing them.
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from PyQt6.QtCore import QCoreApplication, QRect
+from PyQt6.QtGui import QImage, QColor, QPainter
+
+from app.db_sqlite import initialize_database
+from app.utils.image_recognition_util import ImageRecognitionUtil
+from app.utils.region_recognition import RegionRecognitionJob, REGION_THRESHOLD, create_region_recognition_pool
+
+# Queued signals from the worker threads need an application
+app = QCoreApplication.instance() or QCoreApplication([])
+
+COLORS = ["#d02020", "#20a040", "#2040d0", "#e0c020", "#a020c0", "#20c0c0"]
+
+
+def setup_characters(folder: str):
+    """Create a story whose characters have plain colored avatars.
+
+    Returns:
+        (recognition utility, {character ID: name})
+    """
+    conn = initialize_database(os.path.join(folder, 'test.db'))
+    recognition = ImageRecognitionUtil(conn, cache_dir=folder)
+    conn.execute("INSERT INTO stories (id, title, folder_path) VALUES (1, 'Story', ?)", (folder,))
+    characters = {}
+    for number, color in enumerate(COLORS):
+        avatar_path = os.path.join(folder, f"avatar_{number}.png")
+        image = QImage(120, 160, QImage.Format.Format_RGB32)
+        image.fill(QColor(color))
+        image.save(avatar_path, "PNG")
+        cursor = conn.execute("INSERT INTO characters (name, story_id, avatar_path) VALUES (?, 1, ?)",
+                              (f"Character {number}", avatar_path))
+        characters[cursor.lastrowid] = f"Character {number}"
+    conn.commit()
+    recognition.update_character_image_database(1)
+    return recognition, characters
+
+
+def create_scene() -> QImage:
+    """Create an image with a block of each avatar color, side by side."""
+    image = QImage(1200, 800, QImage.Format.Format_RGB32)
+    image.fill(QColor("#808080"))
+    painter = QPainter(image)
+    for number, color in enumerate(COLORS):
+        painter.fillRect(QRect(number * 200 + 20, 100, 160, 600), QColor(color))
+    painter.end()
+    return image
+
+
+def scene_regions(image: QImage):
+    """Crop a region around each block of the scene."""
+    return [image.copy(QRect(number * 200 + 10, 90, 180, 620)) for number in range(len(COLORS))]
+
+
+def run_jobs(jobs, pool) -> None:
+    """Start jobs and wait until all of them have reported."""
+    for job in jobs:
+        pool.start(job)
+    pool.waitForDone()
+    QCoreApplication.processEvents()
+
+
+def test_jobs_match_identify():
+    """Each region's suggestions equal identify_characters_in_image's, reported once per region."""
+    with tempfile.TemporaryDirectory() as folder:
+        recognition, characters = setup_characters(folder)
+        index = recognition.get_feature_index(1).snapshot()
+        pool = create_region_recognition_pool()
+        regions = scene_regions(create_scene())
+
+        results = {}
+        jobs = []
+        for number, region in enumerate(regions):
+            job = RegionRecognitionJob(region, recognition, index, characters)
+            job.signals.finished.connect(
+                lambda suggestions, number=number: results.setdefault(number, []).append(suggestions))
+            jobs.append(job)
+        run_jobs(jobs, pool)
+
+        assert sorted(results) == list(range(len(regions)))
+        for number, region in enumerate(regions):
+            assert len(results[number]) == 1
+            expected = recognition.identify_characters_in_image(
+                recognition.extract_features_from_qimage(region), threshold=REGION_THRESHOLD, story_id=1)
+            assert results[number][0] == expected
+            assert expected[0]['character_name'] == f"Character {number}"
+
+        recognition.db_conn.close()
+
+
+def test_cancelled_jobs_and_snapshots():
+    """Cancelled jobs report None; features saved meanwhile don't change a job's index."""
+    with tempfile.TemporaryDirectory() as folder:
+        recognition, characters = setup_characters(folder)
+        pool = create_region_recognition_pool()
+        region = scene_regions(create_scene())[0]
+
+        results = []
+        job = RegionRecognitionJob(region, recognition, recognition.get_feature_index(1).snapshot(), characters)
+        job.signals.finished.connect(results.append)
+        job.cancel()
+        run_jobs([job], pool)
+        assert results == [None] and job.error is None
+
+        # The region is saved for its character after the job's index was taken
+        snapshot = recognition.get_feature_index(1).snapshot()
+        character_id = next(iter(characters))
+        recognition.save_character_image_features(character_id, recognition.extract_features_from_qimage(region))
+        assert len(recognition.get_feature_index(1)) == len(snapshot) + 1
+
+        job = RegionRecognitionJob(region, recognition, snapshot, characters)
+        job.signals.finished.connect(results.append)
+        run_jobs([job], pool)
+        assert results[1][0]['similarity'] < 1.0 - 1e-6
+
+        # A failing job reports None with the error
+        job = RegionRecognitionJob(QImage(), recognition, snapshot, characters)
+        job.signals.finished.connect(results.append)
+        run_jobs([job], pool)
+        assert results[2] is None and job.error
+
+        recognition.db_conn.close()
+
+
+def test_region_batch_speed():
+    """Benchmark recognizing a batch of large regions one by one and on the pool."""
+    with tempfile.TemporaryDirectory() as folder:
+        recognition, characters = setup_characters(folder)
+        image = create_scene().scaled(4800, 3200)
+        regions = [image.copy(QRect(x * 800, y * 800, 1600, 1600)) for x in range(4) for y in range(3)]
+        index = recognition.get_feature_index(1).snapshot()
+        pool = create_region_recognition_pool()
+
+        start = time.perf_counter()
+        for region in regions:
+            recognition.identify_characters_in_image(
+                recognition.extract_features_from_qimage(region), threshold=REGION_THRESHOLD, story_id=1)
+        serial_time = time.perf_counter() - start
+
+        results = []
+        jobs = []
+        for region in regions:
+            job = RegionRecognitionJob(region, recognition, index, characters)
+            job.signals.finished.connect(results.append)
+            jobs.append(job)
+        start = time.perf_counter()
+        for job in jobs:
+            pool.start(job)
+        queue_time = time.perf_counter() - start
+        pool.waitForDone()
+        QCoreApplication.processEvents()
+        pool_time = time.perf_counter() - start
+
+        assert len(results) == len(regions) and all(result is not None for result in results)
+        print(f"{len(regions)} regions of 1600x1600: one by one {serial_time * 1000:.0f} ms, "
+              f"pool of {pool.maxThreadCount()} threads {pool_time * 1000:.0f} ms "
+              f"(calling thread busy for {queue_time * 1000:.2f} ms)")
+
+        recognition.db_conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Testing region recognition ===\n")
+    test_jobs_match_identify()
+    test_cancelled_jobs_and_snapshots()
+    test_region_batch_speed()
+    print("\n=== All tests completed ===")
@@ -0,0 +1,206 @@
+"""
+Test script for scene_grouping.py.
+
+This script checks that the scene grouping engine produces the same groups as
+the old per-image lookups and benchmarks the number of queries it runs as the
+number of images in a story grows, that the membership query looks up
+scene and quick event links through indexes instead of scanning them, and
+that the per-scene counts and per-scene image lookups agree with the grouping.
+"""
+
+import sys
+import os
+import sqlite3
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.db_sqlite import create_tables, get_image_quick_events, get_quick_event_scenes, get_image_scenes
+from app.utils.scene_grouping import (group_images_by_scene, get_scene_summaries, get_section_images,
+                                      _SCENE_MEMBERSHIP_SQL, _SCENE_IMAGE_IDS_SQL, DEFAULT_TIMESTAMP)
+
+
+def setup_test_db(image_count: int) -> sqlite3.Connection:
+    """Set up an in-memory test database with a story, scenes, quick events and images.
+
+    Every third image is linked directly to a scene, every fifth through a quick
+    event, and the rest stay ungrouped.
+
+    Args:
+        image_count: Number of images to create
+
+    Returns:
+        Database connection
+    """
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    create_tables(conn)
+
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO stories (id, title, folder_path) VALUES (1, 'Test Story', '/tmp/story')")
+    cursor.execute("INSERT INTO characters (id, name, story_id) VALUES (1, 'John Doe', 1)")
+
+    # Ten scenes with increasing sequence numbers
+    for scene_id in range(1, 11):
+        cursor.execute(
+            "INSERT INTO events (id, title, event_type, story_id, sequence_number, created_at) VALUES (?, ?, 'SCENE', 1, ?, ?)",
+            (scene_id, f"Scene {scene_id}", scene_id, f"2024-01-01 00:00:{scene_id:02d}")
+        )
+
+    for image_id in range(1, image_count + 1):
+        cursor.execute(
+            "INSERT INTO images (id, filename, path, title, story_id, created_at) VALUES (?, ?, '/tmp/story/images', '', 1, ?)",
+            (image_id, f"image_{image_id}.png", f"2024-02-01 {image_id // 3600:02d}:{image_id // 60 % 60:02d}:{image_id % 60:02d}")
+        )
+        scene_id = image_id % 10 + 1
+        if image_id % 3 == 0:
+            cursor.execute(
+                "INSERT INTO scene_images (scene_event_id, image_id) VALUES (?, ?)",
+                (scene_id, image_id)
+            )
+        if image_id % 5 == 0:
+            cursor.execute(
+                "INSERT INTO quick_events (id, text, character_id, created_at) VALUES (?, ?, 1, ?)",
+                (image_id, f"Quick event {image_id}", f"2024-03-01 00:00:{image_id % 60:02d}")
+            )
+            cursor.execute(
+                "INSERT INTO quick_event_images (quick_event_id, image_id) VALUES (?, ?)",
+                (image_id, image_id)
+            )
+            cursor.execute(
+                "INSERT INTO scene_quick_events (scene_event_id, quick_event_id) VALUES (?, ?)",
+                ((scene_id + 1) % 10 + 1, image_id)
+            )
+
+    conn.commit()
+    return conn
+
+
+def legacy_grouping(conn: sqlite3.Connection, image_ids: list) -> dict:
+    """Group images the way the gallery did before, with per-image lookups."""
+    image_scenes = {}
+    for image_id in image_ids:
+        for quick_event in get_image_quick_events(conn, image_id):
+            for scene in get_quick_event_scenes(conn, quick_event['id']):
+                image_scenes.setdefault(image_id, set()).add(scene['id'])
+        for scene in get_image_scenes(conn, image_id):
+            image_scenes.setdefault(image_id, set()).add(scene['id'])
+    return image_scenes
+
+
+def count_queries(conn: sqlite3.Connection, func, *args):
+    """Run a function and count the SQL statements it executes."""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        result = func(*args)
+    finally:
+        conn.set_trace_callback(None)
+    return result, len(statements)
+
+
+def test_grouping_matches_legacy():
+    """The engine should produce the same scene membership as the per-image lookups."""
+    conn = setup_test_db(200)
+    grouping = group_images_by_scene(conn, 1)
+
+    engine_scenes = {}
+    for scene in grouping['scenes']:
+        for image in scene['images']:
+            engine_scenes.setdefault(image['id'], set()).add(scene['id'])
+
+    expected = legacy_grouping(conn, list(range(1, 201)))
+    assert engine_scenes == expected
+
+    # Every image is either ungrouped or in at least one scene
+    ungrouped_ids = {image['id'] for image in grouping['ungrouped']}
+    assert ungrouped_ids.isdisjoint(engine_scenes.keys())
+    assert len(ungrouped_ids) + len(engine_scenes) == grouping['image_count'] == 200
+
+    # Scenes are ordered by sequence number, highest first, and images newest first
+    sequence_numbers = [scene['sequence_number'] for scene in grouping['scenes']]
+    assert sequence_numbers == sorted(sequence_numbers, reverse=True)
+    for scene in grouping['scenes']:
+        timestamps = [image['created_at'] for image in scene['images']]
+        assert timestamps == sorted(timestamps, reverse=True)
+        assert scene['newest_timestamp']
+
+    print(f"Grouping matches legacy lookups: {len(grouping['scenes'])} scenes, {len(ungrouped_ids)} ungrouped")
+    conn.close()
+
+
+def test_grouping_query_count_is_constant():
+    """Benchmark: the number of queries must not grow with the number of images."""
+    query_counts = []
+    for image_count in (100, 1000, 10000):
+        conn = setup_test_db(image_count)
+
+        start = time.perf_counter()
+        grouping, query_count = count_queries(conn, group_images_by_scene, conn, 1)
+        elapsed = time.perf_counter() - start
+
+        assert grouping['image_count'] == image_count
+        query_counts.append(query_count)
+        # Scanning the links for every image took over 10 seconds at 10000 images
+        assert elapsed < 2.0, f"Grouping {image_count} images took {elapsed:.2f} s"
+
+        if image_count <= 1000:
+            _, legacy_count = count_queries(conn, legacy_grouping, conn, list(range(1, image_count + 1)))
+            print(f"{image_count:6d} images: {query_count} queries, {elapsed * 1000:.1f} ms "
+                  f"(per-image lookups: {legacy_count} queries)")
+        else:
+            print(f"{image_count:6d} images: {query_count} queries, {elapsed * 1000:.1f} ms")
+
+        conn.close()
+
+    assert len(set(query_counts)) == 1, f"Query count grew with image count: {query_counts}"
+    assert query_counts[0] <= 2
+
+
+def test_membership_query_uses_indexes():
+    """The links of each image are found through an index, not by scanning the table."""
+    conn = setup_test_db(100)
+    plan = [row['detail'] for row in conn.execute(
+        'EXPLAIN QUERY PLAN ' + _SCENE_MEMBERSHIP_SQL, (DEFAULT_TIMESTAMP, 1, 1))]
+    conn.close()
+
+    for alias, index in (('si', 'idx_scene_images_image_id'), ('qei', 'idx_quick_event_images_image_id')):
+        steps = [step for step in plan if step.split()[1:2] == [alias]]
+        assert steps and all(step.startswith('SEARCH') and index in step for step in steps), plan
+
+
+def test_summaries_and_section_images_match_grouping():
+    """The per-scene counts and the images looked up per scene match the full grouping."""
+    conn = setup_test_db(200)
+    grouping = group_images_by_scene(conn, 1)
+    summaries, query_count = count_queries(conn, get_scene_summaries, conn, 1)
+    assert query_count == 2
+
+    assert [scene['id'] for scene in summaries['scenes']] == [scene['id'] for scene in grouping['scenes']]
+    for summary, scene in zip(summaries['scenes'], grouping['scenes']):
+        assert summary['image_count'] == len(scene['images'])
+        assert summary['newest_created_at'] == scene['images'][0]['created_at']
+        assert get_section_images(conn, 1, scene['id']) == scene['images']
+
+    ungrouped = get_section_images(conn, 1)
+    assert ungrouped == grouping['ungrouped']
+    assert summaries['ungrouped'] == {'image_count': len(ungrouped), 'newest_created_at': ungrouped[0]['created_at']}
+
+    # A scene's links are found through the unique indexes on the scene ID
+    plan = [row['detail'] for row in conn.execute(
+        'EXPLAIN QUERY PLAN SELECT i.id FROM images i WHERE i.story_id = ? AND i.id IN ('
+        + _SCENE_IMAGE_IDS_SQL + ')', (1, 1, 1))]
+    assert not any(step.startswith('SCAN') for step in plan), plan
+    conn.close()
+    print(f"Summaries match the grouping: {len(summaries['scenes'])} scenes, "
+          f"{summaries['ungrouped']['image_count']} ungrouped, {query_count} queries")
+
+
+if __name__ == "__main__":
+    print("=== Testing scene grouping ===\n")
+    test_grouping_matches_legacy()
+    test_grouping_query_count_is_constant()
+    test_membership_query_uses_indexes()
+    test_summaries_and_section_images_match_grouping()
+    print("\n=== All tests completed ===")
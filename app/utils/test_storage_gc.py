@@ -0,0 +1,185 @@
+"""
+Test script for storage_gc.py.
+
+This script builds a story folder with used and unused images, thumbnails,
+avatars and face encodings, and checks that only the unused ones are
+reported and collected, that recently written files and files that are used
+again by the time they are collected are kept, that the trash can be
+emptied, and reports the scan speed on a large folder.
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.db_sqlite import initialize_database, create_image
+from app.utils.storage_gc import (
+    StorageGCJob, empty_trash, get_trash_size,
+    ACTION_REPORT, ACTION_TRASH, ACTION_DELETE, CATEGORY_IMAGES, CATEGORY_THUMBNAILS,
+    CATEGORY_AVATARS, CATEGORY_FACES, TRASH_FOLDER_NAME
+)
+
+
+def write_file(path: str, size: int, age_seconds: float = 3600) -> None:
+    """Write a file of a given size, backdating its modification time."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as output:
+        output.write(b"x" * size)
+    modified = time.time() - age_seconds
+    os.utime(path, (modified, modified))
+
+
+def setup_story(folder: str):
+    """Create a database and a story folder with used and unused files.
+
+    Returns:
+        (connection, story folder, faces folder)
+    """
+    conn = initialize_database(os.path.join(folder, 'test.db'))
+    story_folder = os.path.join(folder, 'story')
+    faces_folder = os.path.join(folder, 'faces')
+    images_folder = os.path.join(story_folder, 'images')
+    conn.execute("INSERT INTO stories (id, title, folder_path) VALUES (1, 'Test Story', ?)", (story_folder,))
+
+    # Used: two images with thumbnails, one avatar, one face encoding
+    for name in ("used_1.png", "used_2.png"):
+        write_file(os.path.join(images_folder, name), 1000)
+        write_file(os.path.join(story_folder, 'thumbnails', name), 100)
+        create_image(conn, name, images_folder, 1)
+    avatar_path = os.path.join(story_folder, 'avatars', 'avatar_1.png')
+    write_file(avatar_path, 500)
+    conn.execute("INSERT INTO characters (id, name, story_id, avatar_path) VALUES (1, 'Alice', 1, ?)",
+                 (avatar_path,))
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS face_encodings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        character_id INTEGER NOT NULL,
+        encoding_path TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    ''')
+    encoding_path = os.path.join(faces_folder, 'face_1_a.pkl')
+    write_file(encoding_path, 50)
+    conn.execute("INSERT INTO face_encodings (character_id, encoding_path, created_at, updated_at) "
+                 "VALUES (1, ?, '', '')", (encoding_path,))
+    conn.commit()
+
+    # Unused: a deleted image and its thumbnail, a replaced avatar, an old encoding
+    write_file(os.path.join(images_folder, "deleted.png"), 2000)
+    write_file(os.path.join(story_folder, 'thumbnails', "deleted.png"), 200)
+    write_file(os.path.join(story_folder, 'avatars', 'avatar_temp_1700000000.png'), 400)
+    write_file(os.path.join(faces_folder, 'face_1_old.pkl'), 40)
+
+    # Unused but just written, e.g. an import in progress
+    write_file(os.path.join(images_folder, "importing.png"), 3000, age_seconds=5)
+
+    return conn, story_folder, faces_folder
+
+
+def test_report_and_trash():
+    """Only unused files are reported and moved; used and recent files stay."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn, story_folder, faces_folder = setup_story(folder)
+
+        report = StorageGCJob(conn, story_folder, ACTION_REPORT, faces_folder=faces_folder).process(conn)
+        assert report['scanned'] == 11
+        assert sorted(os.path.basename(orphan['path']) for orphan in report['orphans']) == [
+            'avatar_temp_1700000000.png', 'deleted.png', 'deleted.png', 'face_1_old.pkl']
+        assert report['categories'][CATEGORY_IMAGES] == {'count': 1, 'bytes': 2000}
+        assert report['categories'][CATEGORY_THUMBNAILS] == {'count': 1, 'bytes': 200}
+        assert report['categories'][CATEGORY_AVATARS] == {'count': 1, 'bytes': 400}
+        assert report['categories'][CATEGORY_FACES] == {'count': 1, 'bytes': 40}
+        assert report['reclaimable_bytes'] == 2640
+        assert report['collected'] == 0
+        assert os.path.exists(os.path.join(story_folder, 'images', 'deleted.png'))
+
+        # The avatar is used again before the orphans are collected
+        replaced_avatar = os.path.join(story_folder, 'avatars', 'avatar_temp_1700000000.png')
+        conn.execute("UPDATE characters SET avatar_path = ? WHERE id = 1", (replaced_avatar,))
+        conn.commit()
+
+        summary = StorageGCJob(conn, story_folder, ACTION_TRASH, faces_folder=faces_folder,
+                               candidates=report['orphans']).process(conn)
+        assert summary['collected'] == 3
+        assert summary['collected_bytes'] == 2240
+        assert os.path.exists(replaced_avatar)
+        assert not os.path.exists(os.path.join(story_folder, 'images', 'deleted.png'))
+        assert os.path.exists(os.path.join(story_folder, 'images', 'used_1.png'))
+        assert os.path.exists(os.path.join(story_folder, 'images', 'importing.png'))
+
+        # Trashed files can be restored by hand until the trash is emptied
+        trashed = [os.path.join(path, name) for path, _, names in os.walk(os.path.join(story_folder, TRASH_FOLDER_NAME))
+                   for name in names]
+        assert len(trashed) == 2 and any(os.sep + 'images' + os.sep in path for path in trashed)
+        assert get_trash_size(story_folder, faces_folder) == (3, 2240)
+
+        # The trash isn't scanned; only the avatar that was swapped out is unused now
+        report = StorageGCJob(conn, story_folder, ACTION_REPORT, faces_folder=faces_folder).process(conn)
+        assert [os.path.basename(orphan['path']) for orphan in report['orphans']] == ['avatar_1.png']
+
+        assert empty_trash(story_folder, faces_folder) == (3, 2240)
+        assert get_trash_size(story_folder, faces_folder) == (0, 0)
+
+        conn.close()
+
+
+def test_delete_and_cancel():
+    """Delete removes files for good; a cancelled scan stops early."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn, story_folder, faces_folder = setup_story(folder)
+
+        job = StorageGCJob(conn, story_folder, ACTION_REPORT, faces_folder=faces_folder)
+        job.cancel()
+        report = job.process(conn)
+        assert report['cancelled'] and report['scanned'] == 0
+
+        # Without a faces folder only the story folder is scanned
+        summary = StorageGCJob(conn, story_folder, ACTION_DELETE, faces_folder=None).process(conn)
+        assert summary['collected'] == 3
+        assert os.path.exists(os.path.join(faces_folder, 'face_1_old.pkl'))
+        assert get_trash_size(story_folder) == (0, 0)
+        assert sorted(os.listdir(os.path.join(story_folder, 'images'))) == ['importing.png', 'used_1.png', 'used_2.png']
+
+        conn.close()
+
+
+def test_scan_speed():
+    """Benchmark scanning a large story folder."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn = initialize_database(os.path.join(folder, 'test.db'))
+        images_folder = os.path.join(folder, 'images')
+        os.makedirs(images_folder)
+        conn.execute("INSERT INTO stories (id, title, folder_path) VALUES (1, 'Test Story', ?)", (folder,))
+        rows = []
+        for number in range(20000):
+            filename = f"image_{number:05d}.png"
+            open(os.path.join(images_folder, filename), 'wb').close()
+            if number % 10:
+                rows.append((filename, images_folder))
+        conn.executemany("INSERT INTO images (filename, path, story_id) VALUES (?, ?, 1)", rows)
+        conn.commit()
+
+        job = StorageGCJob(conn, folder, ACTION_REPORT, faces_folder=None, grace_seconds=0)
+        reports = []
+        job.signals.progress.connect(reports.append)
+        summary = job.process(conn)
+        assert summary['scanned'] == 20000
+        assert len(summary['orphans']) == 2000
+        assert len(reports) >= 40  # progress is reported while scanning
+        print(f"Scanned 20000 files in {summary['elapsed'] * 1000:.0f} ms "
+              f"({summary['scanned'] / summary['elapsed']:.0f} files/s)")
+
+        conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Testing storage garbage collection ===\n")
+    test_report_and_trash()
+    test_delete_and_cancel()
+    test_scan_speed()
+    print("\n=== All tests completed ===")
@@ -0,0 +1,123 @@
+"""
+Test script for thumbnail_captions.py.
+
+This script checks that the batched caption provider renders the same
+captions as the per-image lookups, runs a constant number of queries per
+load, and picks up quick event and character changes.
+"""
+
+import sys
+import os
+import sqlite3
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.db_sqlite import create_tables, get_image_quick_events, get_story_characters
+from app.utils.character_references import convert_char_refs_to_mentions
+from app.utils.thumbnail_captions import ThumbnailCaptionProvider
+
+
+def setup_test_db(image_count: int) -> sqlite3.Connection:
+    """Set up an in-memory test database where every other image has quick events.
+
+    Args:
+        image_count: Number of images to create
+
+    Returns:
+        Database connection
+    """
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    create_tables(conn)
+
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO stories (id, title, folder_path) VALUES (1, 'Test Story', '/tmp/story')")
+    cursor.execute("INSERT INTO characters (id, name, story_id) VALUES (1, 'John Doe', 1)")
+    cursor.execute("INSERT INTO characters (id, name, story_id) VALUES (2, 'Mary Smith', 1)")
+
+    for image_id in range(1, image_count + 1):
+        cursor.execute(
+            "INSERT INTO images (id, filename, path, story_id) VALUES (?, ?, '/tmp/story/images', 1)",
+            (image_id, f"image_{image_id}.png")
+        )
+        if image_id % 2 == 0:
+            # Two quick events; the one with the lower sequence number is the caption
+            for offset, sequence_number in ((0, 2), (1, 1)):
+                quick_event_id = image_id * 10 + offset
+                cursor.execute(
+                    "INSERT INTO quick_events (id, text, character_id, sequence_number, created_at, updated_at) "
+                    "VALUES (?, ?, 1, ?, '2024-01-01', '2024-01-01')",
+                    (quick_event_id, f"[char:1] met [char:2] (#{quick_event_id}) [char:99]", sequence_number)
+                )
+                cursor.execute(
+                    "INSERT INTO quick_event_images (quick_event_id, image_id) VALUES (?, ?)",
+                    (quick_event_id, image_id)
+                )
+
+    conn.commit()
+    return conn
+
+
+def legacy_caption(conn: sqlite3.Connection, image_id: int) -> str:
+    """Build a caption the way the gallery did before, with per-image queries."""
+    quick_events = get_image_quick_events(conn, image_id)
+    if not quick_events:
+        return ""
+    characters = get_story_characters(conn, 1)
+    return convert_char_refs_to_mentions(quick_events[0]['text'], characters)
+
+
+def test_captions_match_legacy():
+    """Batched captions should equal the per-image captions."""
+    conn = setup_test_db(50)
+    provider = ThumbnailCaptionProvider(conn, 1)
+    captions = provider.get_captions(range(1, 51))
+
+    for image_id in range(1, 51):
+        assert provider.get_caption(image_id) == legacy_caption(conn, image_id), image_id
+    assert len(captions) == 25
+    print(f"Example caption: {provider.get_caption(2)}")
+    conn.close()
+
+
+def test_query_count_and_invalidation():
+    """A load costs a fixed number of queries, and changes are picked up."""
+    conn = setup_test_db(1000)
+    provider = ThumbnailCaptionProvider(conn, 1)
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    provider.get_captions(range(1, 1001))
+    first_load = len(statements)
+
+    # Nothing changed: only the signature query runs
+    statements.clear()
+    assert not provider.refresh()
+    unchanged_load = len(statements)
+    conn.set_trace_callback(None)
+
+    print(f"1000 images: {first_load} queries for the first load, {unchanged_load} when unchanged")
+    assert first_load <= 4
+    assert unchanged_load == 1
+
+    # Renaming a character is picked up by the next refresh
+    conn.execute("UPDATE characters SET name = 'Johnny', updated_at = '2030-01-01' WHERE id = 1")
+    conn.commit()
+    assert provider.refresh()
+    assert provider.get_caption(2).startswith("@Johnny met @Mary Smith")
+
+    # Removing an image's quick events and invalidating just that image clears its caption
+    conn.execute("DELETE FROM quick_event_images WHERE image_id = 2")
+    conn.commit()
+    provider.invalidate(2)
+    assert provider.get_caption(2) == ""
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Testing thumbnail captions ===\n")
+    test_captions_match_legacy()
+    test_query_count_and_invalidation()
+    print("\n=== All tests completed ===")
@@ -0,0 +1,178 @@
+"""
+Test script for tiled_image.py.
+
+This script checks that tiles decoded from the pyramid match the same region
+of the fully decoded image, that the visible tiles cover the exposed area,
+that an image without region reads is decoded once, or within a memory cap, and
+times showing a tall strip fitted to a viewport against decoding it whole.
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from PyQt6.QtCore import Qt, QRect, QRectF
+from PyQt6.QtGui import QImage, QColor, QPainter, QLinearGradient
+
+from app.utils.tiled_image import TiledImageItem, should_tile, get_image_size
+
+
+def create_test_image(path: str, width: int, height: int) -> QImage:
+    """Create and save a gradient test image.
+
+    Args:
+        path: Where to save the image (format from the extension)
+        width: Image width
+        height: Image height
+
+    Returns:
+        The image that was saved
+    """
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    painter = QPainter(image)
+    gradient = QLinearGradient(0, 0, width, height)
+    gradient.setColorAt(0, QColor(255, 0, 0))
+    gradient.setColorAt(1, QColor(0, 0, 255))
+    painter.fillRect(image.rect(), gradient)
+    painter.end()
+    assert image.save(path)
+    return image
+
+
+def max_channel_difference(image: QImage, reference: QImage) -> int:
+    """Get the largest per-channel difference over a grid of sample points."""
+    difference = 0
+    for x in range(0, image.width(), max(1, image.width() // 8)):
+        for y in range(0, image.height(), max(1, image.height() // 8)):
+            a = QColor(image.pixel(x, y))
+            b = QColor(reference.pixel(x, y))
+            difference = max(difference, abs(a.red() - b.red()), abs(a.green() - b.green()),
+                             abs(a.blue() - b.blue()))
+    return difference
+
+
+def test_tiles_match_full_image():
+    """Every level's tiles should show the same pixels as the scaled original."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for extension in ('png', 'jpg'):
+            path = os.path.join(temp_dir, f"strip.{extension}")
+            original = create_test_image(path, 1500, 5000)
+
+            item = TiledImageItem(path)
+            assert item.image_size == get_image_size(path)
+            assert item.boundingRect() == QRectF(0, 0, 1500, 5000)
+
+            for level in range(item.max_level + 1):
+                for tile_x, tile_y in item.visible_tiles(level, item.boundingRect()):
+                    tile = item.tile_image(level, tile_x, tile_y)
+                    source_rect = item.tile_source_rect(level, tile_x, tile_y)
+                    reference = original.copy(source_rect).scaled(
+                        tile.size(), Qt.AspectRatioMode.IgnoreAspectRatio,
+                        Qt.TransformationMode.SmoothTransformation)
+                    assert not tile.isNull()
+                    assert max_channel_difference(tile, reference) <= 12, (extension, level, tile_x, tile_y)
+
+            print(f"{extension}: {item.max_level + 1} levels, region reads: {item.supports_region_reads}, "
+                  f"{item.decoded_tile_count} tiles checked")
+
+
+def test_level_and_tile_selection():
+    """The right level and only the tiles under the exposed area are picked."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "strip.png")
+        create_test_image(path, 1500, 5000)
+        item = TiledImageItem(path)
+
+        assert item.level_for_scale(2.0) == 0
+        assert item.level_for_scale(1.0) == 0
+        assert item.level_for_scale(0.5) == 1
+        assert item.level_for_scale(0.3) == 1
+        assert item.level_for_scale(0.01) == item.max_level
+
+        # The tiles of a level cover the whole image without overlap
+        for level in range(item.max_level + 1):
+            area = sum(item.tile_source_rect(level, x, y).width() * item.tile_source_rect(level, x, y).height()
+                       for x, y in item.visible_tiles(level, item.boundingRect()))
+            assert area == 1500 * 5000, level
+
+        # A small exposed area at full size only needs the tiles under it
+        tiles = item.visible_tiles(0, QRectF(600, 600, 100, 100))
+        assert tiles == [(1, 1)]
+        assert item.tile_source_rect(0, 1, 1) == QRect(512, 512, 512, 512)
+
+    assert should_tile(3840, 2160)
+    assert should_tile(800, 20000)
+    assert not should_tile(1920, 1080)
+
+
+def test_full_size_decoded_once():
+    """A PNG is decoded once while shown, or within a memory cap if it is too large to keep."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "strip.png")
+        original = create_test_image(path, 2000, 12000)
+
+        # Scroll down the whole strip at full size: every tile comes from one decode
+        item = TiledImageItem(path)
+        assert not item.supports_region_reads
+        tiles = item.visible_tiles(0, item.boundingRect())
+        for tile_x, tile_y in tiles:
+            tile = item.tile_image(0, tile_x, tile_y)
+            assert tile.size() == item.tile_source_rect(0, tile_x, tile_y).size()
+        assert item.full_decode_count == 1 and 0 in item.levels
+
+        # Zooming out uses level 1, which was built along the way
+        assert not item.tile_image(1, 0, 0).isNull()
+        assert item.full_decode_count == 1
+
+        # Hiding the item drops what was decoded
+        item.setVisible(False)
+        assert not item.levels and not item.tiles and not item.full_size_tiles
+
+        # Too large to keep: tiles cut from each decode fill the cap
+        cap = 16 * 2**20
+        item = TiledImageItem(path, full_size_cache_bytes=cap)
+        for tile_x, tile_y in tiles:
+            item.tile_image(0, tile_x, tile_y)
+            assert 0 not in item.levels
+            assert sum(image.sizeInBytes() for image in item.full_size_tiles.values()) <= cap
+        tile_bytes = original.sizeInBytes() // (original.width() * original.height()) * item.tile_size ** 2
+        assert item.full_decode_count <= len(tiles) // (cap // tile_bytes // 2) + 1
+        print(f"2000x12000 png: {len(tiles)} full-size tiles drawn with 1 decode, "
+              f"{item.full_decode_count} decodes under a {cap // 2**20} MB cap")
+
+
+def test_tall_strip_speed():
+    """Benchmark showing a tall strip fitted to a viewport against a full decode."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "strip.jpg")
+        create_test_image(path, 2000, 30000)
+
+        start = time.perf_counter()
+        full = QImage(path)
+        full_time = time.perf_counter() - start
+        assert not full.isNull()
+
+        # Fit 30000 px into a 900 px tall viewport
+        start = time.perf_counter()
+        item = TiledImageItem(path)
+        level = item.level_for_scale(900 / 30000)
+        tiles = [item.tile_image(level, x, y) for x, y in item.visible_tiles(level, item.boundingRect())]
+        tiled_time = time.perf_counter() - start
+
+        tile_bytes = sum(tile.sizeInBytes() for tile in tiles)
+        print(f"2000x30000 jpg: full decode {full_time * 1000:.1f} ms ({full.sizeInBytes() // 2**20} MB), "
+              f"fitted view {tiled_time * 1000:.1f} ms ({len(tiles)} tiles, {tile_bytes // 2**10} KB)")
+        assert tile_bytes < full.sizeInBytes() // 100
+
+
+if __name__ == "__main__":
+    print("=== Testing tiled images ===\n")
+    test_tiles_match_full_image()
+    test_level_and_tile_selection()
+    test_full_size_decoded_once()
+    test_tall_strip_speed()
+    print("\n=== All tests completed ===")
@@ -0,0 +1,279 @@
+"""
+Test script for training_harvest.py.
+
+This script checks that the regions of character tags are saved as samples
+with their image and tag, that near-identical regions and regions of
+characters with enough samples are skipped (and not cropped again), that
+samples follow their tags when tags are moved or deleted, that harvested
+samples let recognition find a character that looks unlike their avatar,
+and times a harvest with one and with several worker threads.
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from PyQt6.QtCore import QRect, QThreadPool
+from PyQt6.QtGui import QImage, QColor, QPainter
+from PyQt6.QtWidgets import QApplication
+
+from app.db_sqlite import (
+    initialize_database, create_image, add_character_tag_to_image, update_character_tag, remove_character_tag
+)
+from app.utils.image_recognition_util import ImageRecognitionUtil
+from app.utils.training_harvest import TrainingHarvestJob, create_harvest_tables, tag_region_rect, DEFAULT_WORKERS
+
+# Queued signals from the worker thread need an application; a GUI one, since
+# other tests draw pixmaps in the same process
+app = QApplication.instance() or QApplication([])
+
+# Hue of each character's clothes
+HUES = [0, 120, 240]
+
+
+def scene_color(character: int, number: int) -> QColor:
+    """Get the color a character wears in scene number (a different shade in each scene)."""
+    return QColor.fromHsv(HUES[character], 80 + (number % 6) * 35, 90 + (number % 5) * 40)
+
+
+def setup_story(folder: str, scene_count: int, repeat: int = 1):
+    """Create a story with three characters and scenes where each stands in a third and is tagged.
+
+    Avatars are gray, so they don't look like the characters in the scenes.
+
+    Args:
+        folder: Folder for the database and images
+        scene_count: Number of different scenes
+        repeat: Copies of each scene (copies give identical regions)
+
+    Returns:
+        (connection, [character IDs], [image IDs], {image ID: [tag IDs]})
+    """
+    conn = initialize_database(os.path.join(folder, 'test.db'))
+    images_folder = os.path.join(folder, 'images')
+    os.makedirs(images_folder)
+    conn.execute("INSERT INTO stories (id, title, folder_path) VALUES (1, 'Story', ?)", (folder,))
+
+    character_ids = []
+    for number in range(len(HUES)):
+        avatar_path = os.path.join(folder, f"avatar_{number}.png")
+        avatar = QImage(120, 160, QImage.Format.Format_RGB32)
+        avatar.fill(QColor(60 + number * 60, 60 + number * 60, 60 + number * 60))
+        avatar.save(avatar_path, "PNG")
+        cursor = conn.execute("INSERT INTO characters (name, story_id, avatar_path) VALUES (?, 1, ?)",
+                              (f"Character {number}", avatar_path))
+        character_ids.append(cursor.lastrowid)
+    conn.commit()
+    ImageRecognitionUtil(conn).update_character_image_database(1)
+
+    image_ids = []
+    tag_ids = {}
+    for number in range(scene_count * repeat):
+        scene_number = number % scene_count
+        filename = f"scene_{number}.jpg"
+        draw_scene(scene_number).save(os.path.join(images_folder, filename), "JPG", 95)
+        image_id = create_image(conn, filename, images_folder, 1, width=900, height=600)
+        image_ids.append(image_id)
+        tag_ids[image_id] = [add_character_tag_to_image(conn, image_id, character_ids[character],
+                                                         (character * 300 + 150) / 900, 0.5, 240 / 900, 0.9)
+                             for character in range(len(HUES))]
+    return conn, character_ids, image_ids, tag_ids
+
+
+def draw_scene(number: int) -> QImage:
+    """Draw a scene with the three characters side by side (the same number gives the same scene)."""
+    scene = QImage(900, 600, QImage.Format.Format_RGB32)
+    scene.fill(QColor("#404040"))
+    painter = QPainter(scene)
+    for character in range(len(HUES)):
+        painter.fillRect(QRect(character * 300 + 30, 30, 240, 540), scene_color(character, number))
+        # Dark trousers, longer in some scenes than in others
+        trousers = 120 + (number % 7) * 40
+        painter.fillRect(QRect(character * 300 + 30, 570 - trousers, 240, trousers), QColor("#202848"))
+        # A face in a fixed color
+        painter.fillRect(QRect(character * 300 + 110, 50, 80, 80), QColor("#e0b090"))
+    painter.end()
+    return scene
+
+
+def count_samples(conn, character_id=None) -> int:
+    """Count the harvested samples (of a character)."""
+    if character_id is None:
+        return conn.execute("SELECT COUNT(*) FROM image_features WHERE tag_id IS NOT NULL").fetchone()[0]
+    return conn.execute("SELECT COUNT(*) FROM image_features WHERE tag_id IS NOT NULL AND character_id = ?",
+                        (character_id,)).fetchone()[0]
+
+
+def test_harvest_with_provenance():
+    """Each tag region becomes a sample of its character, recorded with its image and tag."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn, character_ids, image_ids, tag_ids = setup_story(folder, 6)
+
+        # A tag too small to crop, and an image whose file is gone
+        small_tag = add_character_tag_to_image(conn, image_ids[0], character_ids[0], 0.5, 0.5, 0.005, 0.005)
+        missing_id = create_image(conn, 'missing.jpg', os.path.join(folder, 'images'), 1)
+        add_character_tag_to_image(conn, missing_id, character_ids[1], 0.5, 0.5, 0.2, 0.2)
+
+        summary = TrainingHarvestJob(conn, 1, workers=2, batch_size=4).process(conn)
+        assert summary['completed'] and summary['tags'] == 20
+        assert summary['added'] == 18 and summary['too_small'] == 1 and summary['duplicates'] == 0
+        assert len(summary['errors']) == 1 and summary['errors'][0][0].endswith('missing.jpg')
+
+        rows = conn.execute('''
+        SELECT f.character_id, f.image_id, f.tag_id, f.is_avatar, t.character_id AS tag_character_id,
+               t.image_id AS tag_image_id
+        FROM image_features f JOIN image_character_tags t ON t.id = f.tag_id
+        ''').fetchall()
+        assert len(rows) == 18
+        for row in rows:
+            assert row['character_id'] == row['tag_character_id'] and row['image_id'] == row['tag_image_id']
+            assert row['is_avatar'] == 0
+        harvested_tags = {row['tag_id'] for row in rows}
+        assert harvested_tags == {tag for tags in tag_ids.values() for tag in tags}
+
+        # The region of a tag is where the character stands
+        rect = tag_region_rect({'x_position': 0.5, 'y_position': 0.5, 'width': 240 / 900, 'height': 0.9}, 900, 600)
+        assert (rect.left(), rect.top(), rect.width(), rect.height()) == (330, 30, 240, 540)
+        assert tag_region_rect({'x_position': 0.0, 'y_position': 0.0, 'width': 0.2, 'height': 0.2}, 100, 100) \
+            == QRect(0, 0, 10, 10)
+
+        # A second run has nothing left to crop but the image that can't be read
+        summary = TrainingHarvestJob(conn, 1).process(conn)
+        assert summary['added'] == 0 and summary['images'] == 2
+        assert count_samples(conn) == 18
+        assert small_tag not in harvested_tags
+
+        conn.close()
+
+
+def test_duplicates_and_limit():
+    """Identical regions are saved once; a character gets at most max_samples."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn, character_ids, image_ids, tag_ids = setup_story(folder, 4, repeat=3)
+
+        summary = TrainingHarvestJob(conn, 1).process(conn)
+        assert summary['added'] == 12 and summary['duplicates'] == 24
+        for character_id in character_ids:
+            assert count_samples(conn, character_id) == 4
+        skipped = conn.execute("SELECT COUNT(*) FROM harvest_skipped_tags").fetchone()[0]
+        assert skipped == 24
+
+        # Skipped tags aren't cropped again
+        summary = TrainingHarvestJob(conn, 1).process(conn)
+        assert summary['tags'] == 0 and summary['images'] == 0
+
+    with tempfile.TemporaryDirectory() as folder:
+        conn, character_ids, image_ids, tag_ids = setup_story(folder, 12)
+        summary = TrainingHarvestJob(conn, 1, max_samples=5).process(conn)
+        assert summary['added'] == 15 and summary['capped'] == 21
+        for character_id in character_ids:
+            assert count_samples(conn, character_id) == 5
+            # Avatars aren't counted or removed
+            assert conn.execute("SELECT COUNT(*) FROM image_features WHERE is_avatar = 1 AND character_id = ?",
+                                (character_id,)).fetchone()[0] == 1
+
+        # Full characters' tags are skipped without being read
+        summary = TrainingHarvestJob(conn, 1, max_samples=5).process(conn)
+        assert summary['capped'] == 21 and summary['images'] == 0
+        conn.close()
+
+
+def test_samples_follow_tags():
+    """Samples of deleted, moved or reassigned tags are removed, and moved tags harvested again; note edits keep them."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn, character_ids, image_ids, tag_ids = setup_story(folder, 3, repeat=2)
+        TrainingHarvestJob(conn, 1).process(conn)
+        assert count_samples(conn) == 9
+
+        first_tags = tag_ids[image_ids[0]]
+        removed_tag, moved_tag = first_tags[0], first_tags[1]
+        # The copy of the first scene was skipped as a duplicate; moving its tag retries it
+        duplicate_tag = tag_ids[image_ids[3]][2]
+        assert conn.execute("SELECT 1 FROM harvest_skipped_tags WHERE tag_id = ?", (duplicate_tag,)).fetchone()
+
+        time.sleep(0.01)
+        remove_character_tag(conn, removed_tag)
+        update_character_tag(conn, moved_tag, width=120 / 900)
+        update_character_tag(conn, duplicate_tag, height=0.5)
+
+        # Editing only the note keeps a tag's sample, or its skip record
+        kept_tag, kept_skipped_tag = first_tags[2], tag_ids[image_ids[4]][0]
+        kept_sample = conn.execute("SELECT id FROM image_features WHERE tag_id = ?", (kept_tag,)).fetchone()[0]
+        update_character_tag(conn, kept_tag, note="Changed note")
+        update_character_tag(conn, kept_skipped_tag, note="Changed note")
+
+        summary = TrainingHarvestJob(conn, 1).process(conn)
+        assert summary['pruned'] == 2
+        assert summary['tags'] == 2 and summary['added'] == 2
+        assert not conn.execute("SELECT 1 FROM image_features WHERE tag_id = ?", (removed_tag,)).fetchone()
+        assert conn.execute("SELECT 1 FROM image_features WHERE tag_id = ?", (duplicate_tag,)).fetchone()
+        assert count_samples(conn) == 9
+        assert conn.execute("SELECT id FROM image_features WHERE tag_id = ?", (kept_tag,)).fetchone()[0] == kept_sample
+        assert conn.execute("SELECT 1 FROM harvest_skipped_tags WHERE tag_id = ?", (kept_skipped_tag,)).fetchone()
+        conn.close()
+
+
+def test_recognition_learns_from_tags():
+    """A character who looks unlike their avatar is recognized once their tags are harvested."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn, character_ids, image_ids, tag_ids = setup_story(folder, 6)
+        recognition = ImageRecognitionUtil(conn)
+
+        # A new scene, cropped to the second character
+        region = draw_scene(7).copy(QRect(330, 30, 240, 540))
+        features = recognition.extract_features_from_qimage(region)
+        before = recognition.identify_characters_in_image(features, threshold=0.0, story_id=1)
+        assert not recognition.identify_characters_in_image(features, threshold=0.6, story_id=1)
+
+        # On a worker thread, with its own connection
+        pool = QThreadPool()
+        job = TrainingHarvestJob(conn, 1)
+        progress = []
+        summaries = []
+        job.signals.progress.connect(progress.append)
+        job.signals.finished.connect(summaries.append)
+        job.start(pool)
+        pool.waitForDone()
+        app.processEvents()
+        assert len(summaries) == 1 and summaries[0]['added'] == 18 and progress[-1]['added'] == 18
+
+        after = recognition.identify_characters_in_image(features, threshold=0.6, story_id=1)
+        assert after and after[0]['character_id'] == character_ids[1]
+        print(f"Best match before the harvest: {before[0]['character_name']} ({before[0]['similarity']:.2f}), "
+              f"after: {after[0]['character_name']} ({after[0]['similarity']:.2f})")
+        conn.close()
+
+
+def test_harvest_speed():
+    """Benchmark harvesting 600 tags with one worker thread and with several."""
+    with tempfile.TemporaryDirectory() as folder:
+        conn, character_ids, image_ids, tag_ids = setup_story(folder, 200)
+        timings = {}
+        create_harvest_tables(conn)
+        for workers in (1, max(2, DEFAULT_WORKERS)):
+            conn.execute("DELETE FROM image_features WHERE tag_id IS NOT NULL")
+            conn.execute("DELETE FROM harvest_skipped_tags")
+            conn.commit()
+            summary = TrainingHarvestJob(conn, 1, workers=workers, max_samples=1000).process(conn)
+            assert summary['tags'] == 600 and summary['added'] + summary['duplicates'] == 600
+            timings[workers] = summary['elapsed']
+
+        single, parallel = timings[1], timings[max(2, DEFAULT_WORKERS)]
+        print(f"600 tags in 200 images: 1 thread {600 / single:.0f} tags/s, "
+              f"{max(2, DEFAULT_WORKERS)} threads {600 / parallel:.0f} tags/s ({single / parallel:.1f}x); "
+              f"{count_samples(conn)} samples kept")
+        conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Testing training harvest ===\n")
+    test_harvest_with_provenance()
+    test_duplicates_and_limit()
+    test_samples_follow_tags()
+    test_recognition_learns_from_tags()
+    test_harvest_speed()
+    print("\n=== All tests completed ===")
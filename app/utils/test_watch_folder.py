@@ -0,0 +1,190 @@
+"""
+Test script for watch_folder.py.
+
+This script watches a temporary folder and checks that files already there
+when the folder is set up are not imported, that new files are only imported
+once they stop changing, that broken files are not retried until they
+change, that a restarted monitor imports the files added while it was
+stopped but doesn't import or read anything twice, and reports the ingest
+latency.
+"""
+
+import sys
+import os
+import tempfile
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from PyQt6.QtCore import QCoreApplication
+from PyQt6.QtGui import QImage, QColor
+
+from app.db_sqlite import (
+    initialize_database, get_tag_review_queue, set_story_watch_folder, get_story_watch_folder,
+    get_watch_folder_files
+)
+from app.utils.watch_folder import WatchFolderMonitor
+
+
+def write_image(path: str, shade: int, age_seconds: float = 0) -> None:
+    """Write a solid PNG, optionally backdating its modification time."""
+    image = QImage(320, 240, QImage.Format.Format_RGB32)
+    image.fill(QColor(shade, 255 - shade, 80))
+    assert image.save(path, "PNG")
+    if age_seconds:
+        modified = time.time() - age_seconds
+        os.utime(path, (modified, modified))
+
+
+def create_monitor(conn, watched: str, story_folder: str) -> WatchFolderMonitor:
+    """Create a monitor with a short settle time."""
+    return WatchFolderMonitor(conn, 1, watched,
+                              os.path.join(story_folder, 'images'),
+                              os.path.join(story_folder, 'thumbnails'),
+                              settle_ms=200)
+
+
+def wait_for_imports(monitor: WatchFolderMonitor, timeout: float = 20.0) -> None:
+    """Process events until the monitor's import jobs have finished."""
+    app = QCoreApplication.instance()
+    deadline = time.time() + timeout
+    while (monitor.current_job is not None or monitor.ready) and time.time() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    app.processEvents()
+
+
+def scan(monitor: WatchFolderMonitor) -> None:
+    """Scan the watched folder and wait for the resulting imports."""
+    monitor.scan()
+    wait_for_imports(monitor)
+
+
+def setup_test_db(folder: str):
+    """Create a database with one story in a temporary folder."""
+    conn = initialize_database(os.path.join(folder, 'test.db'))
+    conn.execute("INSERT INTO stories (id, title, folder_path) VALUES (1, 'Test Story', ?)", (folder,))
+    conn.commit()
+    return conn
+
+
+def image_count(conn) -> int:
+    """Count the story's images."""
+    return conn.execute("SELECT COUNT(*) FROM images WHERE story_id = 1").fetchone()[0]
+
+
+def test_watch_folder():
+    """Files are imported once settled, only once, and across restarts."""
+    app = QCoreApplication.instance() or QCoreApplication([])
+
+    with tempfile.TemporaryDirectory() as folder:
+        watched = os.path.join(folder, 'screenshots')
+        os.makedirs(watched)
+        conn = setup_test_db(folder)
+
+        # Files that were there when the folder was set up are left alone
+        old_paths = {os.path.join(watched, f"old_{shade}.png") for shade in range(3)}
+        for shade, path in enumerate(sorted(old_paths)):
+            write_image(path, shade * 40, age_seconds=60)
+        set_story_watch_folder(conn, 1, watched)
+        monitor = create_monitor(conn, watched, folder)
+        batches = []
+        monitor.images_ingested.connect(batches.append)
+        assert monitor.start()
+        wait_for_imports(monitor)
+        assert image_count(conn) == 0 and not batches
+        assert get_watch_folder_files(conn, 1) == old_paths
+        assert get_story_watch_folder(conn, 1)['baseline_at'] is not None
+
+        # A new file waits until it stops changing
+        new_path = os.path.join(watched, "new.png")
+        write_image(new_path, 200)
+        scan(monitor)
+        assert image_count(conn) == 0 and new_path in monitor.pending
+
+        time.sleep(0.1)
+        write_image(new_path, 210)  # still being written
+        scan(monitor)
+        assert image_count(conn) == 0
+
+        time.sleep(0.3)
+        scan(monitor)
+        assert image_count(conn) == 1
+        assert len(get_tag_review_queue(conn, 1)) == 1
+        assert not monitor.pending
+
+        # A copy of an imported image is a duplicate, remembered for later starts
+        copy_path = os.path.join(watched, "copy.png")
+        write_image(copy_path, 210, age_seconds=30)
+        scan(monitor)
+        assert batches[-1]['duplicates'] == 1 and image_count(conn) == 1
+        assert copy_path in get_watch_folder_files(conn, 1)
+
+        # A broken file fails once and isn't retried until it changes
+        broken_path = os.path.join(watched, "broken.png")
+        with open(broken_path, 'wb') as broken:
+            broken.write(b"not an image")
+        modified = time.time() - 60
+        os.utime(broken_path, (modified, modified))
+        scan(monitor)
+        scan(monitor)
+        assert batches[-1]['failed'] == 1
+        assert sum(batch['failed'] for batch in batches) == 1
+        write_image(broken_path, 120, age_seconds=30)
+        scan(monitor)
+        assert image_count(conn) == 2
+
+        metrics = monitor.get_metrics()
+        assert metrics['ingested'] == 2
+        assert metrics['max_latency_ms'] >= 200  # the new file had to settle
+        print(f"Ingested {metrics['ingested']} in {metrics['batches']} batches over {metrics['scans']} scans, "
+              f"latency mean {metrics['mean_latency_ms']:.0f} ms, p95 {metrics['p95_latency_ms']:.0f} ms")
+        monitor.stop()
+
+        # After a restart only files added in the meantime are read and imported
+        write_image(os.path.join(watched, "while_closed.png"), 90, age_seconds=10)
+        monitor = create_monitor(conn, watched, folder)
+        batches = []
+        monitor.images_ingested.connect(batches.append)
+        assert monitor.start()
+        wait_for_imports(monitor)
+        assert image_count(conn) == 3
+        assert len(batches) == 1 and batches[0]['total'] == 1
+        monitor.stop()
+
+        # Watching another folder takes a new baseline
+        set_story_watch_folder(conn, 1, folder)
+        assert get_story_watch_folder(conn, 1)['baseline_at'] is None
+        assert get_watch_folder_files(conn, 1) == set()
+
+        conn.close()
+
+
+def test_story_folders_are_ignored():
+    """Watching a folder that contains the story's own images doesn't import them again."""
+    app = QCoreApplication.instance() or QCoreApplication([])
+
+    with tempfile.TemporaryDirectory() as folder:
+        conn = setup_test_db(folder)
+
+        write_image(os.path.join(folder, "shot.png"), 10, age_seconds=60)
+        monitor = WatchFolderMonitor(conn, 1, folder, os.path.join(folder, 'images'),
+                                     os.path.join(folder, 'thumbnails'), recursive=True, settle_ms=200)
+        assert monitor.start()
+        wait_for_imports(monitor)
+        assert image_count(conn) == 1
+        assert len(os.listdir(os.path.join(folder, 'images'))) == 1
+
+        scan(monitor)
+        assert image_count(conn) == 1
+        monitor.stop()
+
+        conn.close()
+
+
+if __name__ == "__main__":
+    print("=== Testing watch folder ===\n")
+    test_watch_folder()
+    test_story_folders_are_ignored()
+    print("\n=== All tests completed ===")
@@ -0,0 +1,158 @@
+"""
+Thumbnail Captions Module.
+
+This module provides the quick event captions shown under gallery thumbnails.
+Captions for a whole story are fetched with one query, rendered with a single
+shared character map, and cached until a quick event or character changes.
+"""
+
+import sqlite3
+from typing import Dict, Optional, Iterable, Tuple
+
+from app.utils.character_references import CHAR_REF_PATTERN
+
+
+class ThumbnailCaptionProvider:
+    """Batched, cached provider of quick event captions for one story's thumbnails."""
+
+    def __init__(self, db_conn: sqlite3.Connection, story_id: int):
+        """Initialize the caption provider.
+
+        Args:
+            db_conn: SQLite database connection
+            story_id: ID of the story
+        """
+        self.conn = db_conn
+        self.story_id = story_id
+        self.captions: Dict[int, str] = {}
+        self.character_names: Dict[int, str] = {}
+        self._signature: Optional[Tuple] = None
+
+    def refresh(self) -> bool:
+        """Reload the captions if quick events or characters changed since the last load.
+
+        Costs a single cheap aggregate query when nothing changed.
+
+        Returns:
+            True if the captions were reloaded
+        """
+        signature = self._get_signature()
+        if signature == self._signature:
+            return False
+
+        self._load_character_names()
+        self._load_captions()
+        self._signature = signature
+        return True
+
+    def invalidate(self, image_id: Optional[int] = None) -> None:
+        """Invalidate cached captions.
+
+        Args:
+            image_id: Image whose quick events changed. Its caption is reloaded
+                right away. If None, the whole cache is reloaded on the next
+                refresh().
+        """
+        if image_id is None:
+            self._signature = None
+            return
+
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT qe.text
+        FROM quick_event_images qei
+        JOIN quick_events qe ON qe.id = qei.quick_event_id
+        WHERE qei.image_id = ?
+        ORDER BY qe.sequence_number, qe.created_at
+        LIMIT 1
+        ''', (image_id,))
+        row = cursor.fetchone()
+
+        if row:
+            self.captions[image_id] = self.render(row['text'])
+        else:
+            self.captions.pop(image_id, None)
+
+    def get_caption(self, image_id: int) -> str:
+        """Get the caption for an image from the cache.
+
+        Args:
+            image_id: ID of the image
+
+        Returns:
+            The formatted text of the image's first quick event, or "" if it has none
+        """
+        return self.captions.get(image_id, "")
+
+    def get_captions(self, image_ids: Iterable[int]) -> Dict[int, str]:
+        """Get the captions for a page of images, refreshing the cache if needed.
+
+        Args:
+            image_ids: IDs of the images on the page
+
+        Returns:
+            Dictionary of image ID to caption for images that have one
+        """
+        self.refresh()
+        return {image_id: self.captions[image_id] for image_id in image_ids if image_id in self.captions}
+
+    def render(self, text: str) -> str:
+        """Convert [char:ID] references in a quick event to @mentions.
+
+        Equivalent to convert_char_refs_to_mentions, but reuses the provider's
+        character map instead of rebuilding it for every caption.
+
+        Args:
+            text: Quick event text
+
+        Returns:
+            Text with known character references shown as @mentions
+        """
+        if not text or not self.character_names:
+            return text
+
+        def replace_reference(match):
+            name = self.character_names.get(int(match.group(1)))
+            return f"@{name}" if name is not None else match.group(0)
+
+        return CHAR_REF_PATTERN.sub(replace_reference, text)
+
+    def _get_signature(self) -> Tuple:
+        """Get a cheap fingerprint of the data the captions depend on."""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT
+            (SELECT COUNT(*) FROM quick_event_images) AS association_count,
+            (SELECT MAX(id) FROM quick_event_images) AS association_max_id,
+            (SELECT COUNT(*) FROM quick_events) AS quick_event_count,
+            (SELECT MAX(updated_at) FROM quick_events) AS quick_event_updated,
+            (SELECT COUNT(*) FROM characters WHERE story_id = ?) AS character_count,
+            (SELECT MAX(updated_at) FROM characters WHERE story_id = ?) AS character_updated
+        ''', (self.story_id, self.story_id))
+        return tuple(cursor.fetchone())
+
+    def _load_character_names(self) -> None:
+        """Load the story's character names once for all captions."""
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT id, name FROM characters WHERE story_id = ?', (self.story_id,))
+        self.character_names = {row['id']: row['name'] for row in cursor.fetchall()}
+
+    def _load_captions(self) -> None:
+        """Load the first quick event of every image in the story with one query."""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+        SELECT qei.image_id, qe.text
+        FROM quick_event_images qei
+        JOIN quick_events qe ON qe.id = qei.quick_event_id
+        JOIN images i ON i.id = qei.image_id
+        WHERE i.story_id = ?
+        ORDER BY qei.image_id, qe.sequence_number, qe.created_at
+        ''', (self.story_id,))
+
+        captions: Dict[int, str] = {}
+        for row in cursor.fetchall():
+            # Rows are ordered so the first one per image is its first quick event
+            if row['image_id'] not in captions:
+                captions[row['image_id']] = self.render(row['text'])
+
+        self.captions = captions
@@ -0,0 +1,333 @@
+"""
+Tiled Image Module.
+
+This module renders very large images (4K+ screenshots, tall webtoon-style
+strips) in a QGraphicsScene without decoding and scaling the whole image for
+every paint.
+
+The image is split into a pyramid of levels: level 0 is the original size and
+each level above it is half the size of the one below. Each level is cut into
+fixed-size tiles. When the item is painted, only the tiles of the level that
+matches the current zoom and that cover the exposed area are drawn. Tiles are
+decoded on first use and kept in a small LRU cache.
+
+Formats whose reader can decode a region (JPEG) are read tile by tile with
+QImageReader clip/scaled reads. Other formats (PNG) have to be decoded whole,
+once: the full-size decode is kept while the item is shown, up to
+FULL_SIZE_CACHE_BYTES, and level 1 is built from it. A decode larger than
+that isn't kept; as many full-size tiles nearest the one asked for as fit in
+that memory are cut from it instead, and kept until drawn. Each level above 1
+is built from the level below when it is first needed. Everything decoded is
+dropped when the item is hidden or removed from its scene.
+
+The item is sized in original image pixels, so scene coordinates, and the
+normalized tag coordinates derived from them, are the same as for a plain
+pixmap item.
+"""
+
+import math
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from PyQt6.QtCore import Qt, QRect, QRectF, QSize
+from PyQt6.QtGui import QImage, QImageIOHandler, QImageReader, QPixmap
+from PyQt6.QtWidgets import QGraphicsItem
+
+
+# Images at least this large are shown with the tiled renderer
+TILED_MIN_PIXELS = 3840 * 2160
+TILED_MIN_SIDE = 8192
+
+# Tile edge in pixels of the level being drawn
+TILE_SIZE = 512
+
+# Maximum number of decoded tiles kept per image (512x512 ARGB is 1 MB each)
+MAX_CACHED_TILES = 64
+
+# Memory the full-size decode of an image without region reads may keep while shown
+FULL_SIZE_CACHE_BYTES = 256 * 2**20
+
+
+def get_image_size(image_path: str) -> QSize:
+    """Get an image's size from its header, without decoding it.
+
+    Args:
+        image_path: Path to the image file
+
+    Returns:
+        The image size, or an invalid QSize if it can't be read
+    """
+    return QImageReader(image_path).size()
+
+
+def should_tile(width: int, height: int) -> bool:
+    """Check whether an image is large enough to need the tiled renderer.
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+
+    Returns:
+        True if the image should be rendered in tiles
+    """
+    return width * height >= TILED_MIN_PIXELS or max(width, height) >= TILED_MIN_SIDE
+
+
+def read_image_region(image_path: str, source_rect: QRect, scaled_size: QSize) -> QImage:
+    """Decode part of an image file, scaled down.
+
+    Args:
+        image_path: Path to the image file
+        source_rect: Region to read, in original image pixels
+        scaled_size: Size to scale the region to
+
+    Returns:
+        The decoded region (null if it could not be read)
+    """
+    reader = QImageReader(image_path)
+    reader.setClipRect(source_rect)
+    reader.setScaledSize(scaled_size)
+    return reader.read()
+
+
+class TiledImageItem(QGraphicsItem):
+    """Graphics item that draws a large image from a lazily built tile pyramid."""
+
+    def __init__(self, image_path: str, size: Optional[QSize] = None, tile_size: int = TILE_SIZE,
+                 max_tiles: int = MAX_CACHED_TILES, full_size_cache_bytes: int = FULL_SIZE_CACHE_BYTES,
+                 parent=None):
+        """Initialize the tiled image item.
+
+        Args:
+            image_path: Path to the image file
+            size: Original image size, if already known
+            tile_size: Tile edge in pixels
+            max_tiles: Maximum number of decoded tiles to keep
+            full_size_cache_bytes: Memory the full-size decode may keep (no region reads)
+            parent: Parent graphics item
+        """
+        super().__init__(parent)
+        self.image_path = image_path
+        self.image_size = size if size is not None and size.isValid() else get_image_size(image_path)
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.full_size_cache_bytes = full_size_cache_bytes
+
+        width = max(1, self.image_size.width())
+        height = max(1, self.image_size.height())
+        # The top level fits in a single tile
+        self.max_level = max(0, math.ceil(math.log2(max(width, height) / tile_size)))
+
+        reader = QImageReader(image_path)
+        self.supports_region_reads = reader.supportsOption(QImageIOHandler.ImageOption.ClipRect)
+
+        self.tiles: 'OrderedDict[Tuple[int, int, int], QPixmap]' = OrderedDict()
+        # Decoded levels, and full-size tiles not drawn yet (no region reads)
+        self.levels: Dict[int, QImage] = {}
+        self.full_size_tiles: Dict[Tuple[int, int], QImage] = {}
+        self.full_decode_count = 0
+        self.decoded_tile_count = 0
+
+        # exposedRect tells paint() which part of the item needs drawing
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption, True)
+
+    def boundingRect(self) -> QRectF:
+        """Get the item's bounds, in original image pixels."""
+        return QRectF(0, 0, self.image_size.width(), self.image_size.height())
+
+    def level_for_scale(self, scale: float) -> int:
+        """Get the pyramid level to draw at a zoom factor.
+
+        Picks the smallest level that still has at least one image pixel per
+        screen pixel.
+
+        Args:
+            scale: Screen pixels per original image pixel
+
+        Returns:
+            Pyramid level (0 is full size)
+        """
+        if scale <= 0:
+            return self.max_level
+        if scale >= 1:
+            return 0
+        return min(self.max_level, int(math.floor(math.log2(1 / scale))))
+
+    def tile_source_rect(self, level: int, tile_x: int, tile_y: int) -> QRect:
+        """Get the region of the original image a tile covers.
+
+        Args:
+            level: Pyramid level
+            tile_x: Tile column
+            tile_y: Tile row
+
+        Returns:
+            The tile's region, in original image pixels
+        """
+        span = self.tile_size << level
+        rect = QRect(tile_x * span, tile_y * span, span, span)
+        return rect.intersected(QRect(0, 0, self.image_size.width(), self.image_size.height()))
+
+    def visible_tiles(self, level: int, exposed_rect: QRectF):
+        """Get the tiles of a level that intersect an area.
+
+        Args:
+            level: Pyramid level
+            exposed_rect: Area in original image pixels
+
+        Returns:
+            List of (tile_x, tile_y) tuples
+        """
+        area = exposed_rect.intersected(self.boundingRect())
+        if area.isEmpty():
+            return []
+
+        span = self.tile_size << level
+        first_x = int(area.left() // span)
+        first_y = int(area.top() // span)
+        last_x = int(math.ceil(area.right() / span)) - 1
+        last_y = int(math.ceil(area.bottom() / span)) - 1
+        return [(tile_x, tile_y)
+                for tile_y in range(first_y, last_y + 1)
+                for tile_x in range(first_x, last_x + 1)]
+
+    def tile_image(self, level: int, tile_x: int, tile_y: int) -> QImage:
+        """Decode one tile.
+
+        Args:
+            level: Pyramid level
+            tile_x: Tile column
+            tile_y: Tile row
+
+        Returns:
+            The tile at the level's resolution
+        """
+        source_rect = self.tile_source_rect(level, tile_x, tile_y)
+        factor = 1 << level
+        scaled_size = QSize(max(1, math.ceil(source_rect.width() / factor)),
+                            max(1, math.ceil(source_rect.height() / factor)))
+
+        self.decoded_tile_count += 1
+        if self.supports_region_reads:
+            return read_image_region(self.image_path, source_rect, scaled_size)
+        if level == 0:
+            return self._get_full_size_tile(tile_x, tile_y)
+
+        level_image = self._get_level_image(level)
+        return level_image.copy(QRect(source_rect.x() // factor, source_rect.y() // factor,
+                                      scaled_size.width(), scaled_size.height()))
+
+    def clear_cache(self) -> None:
+        """Drop all decoded tiles and pyramid levels."""
+        self.tiles.clear()
+        self.levels.clear()
+        self.full_size_tiles.clear()
+
+    def itemChange(self, change, value):
+        """Drop the decoded image data when the item is hidden or removed from its scene."""
+        if ((change == QGraphicsItem.GraphicsItemChange.ItemSceneHasChanged and value is None)
+                or (change == QGraphicsItem.GraphicsItemChange.ItemVisibleHasChanged and not value)):
+            self.clear_cache()
+        return super().itemChange(change, value)
+
+    def paint(self, painter, option, widget=None) -> None:
+        """Draw the tiles that cover the exposed area at the current zoom level."""
+        scale = option.levelOfDetailFromTransform(painter.worldTransform())
+        level = self.level_for_scale(scale)
+
+        for tile_x, tile_y in self.visible_tiles(level, option.exposedRect):
+            pixmap = self._get_tile(level, tile_x, tile_y)
+            if pixmap is None:
+                continue
+            painter.drawPixmap(QRectF(self.tile_source_rect(level, tile_x, tile_y)), pixmap,
+                               QRectF(pixmap.rect()))
+
+    def _get_tile(self, level: int, tile_x: int, tile_y: int) -> Optional[QPixmap]:
+        """Get a tile from the cache, decoding it if needed."""
+        key = (level, tile_x, tile_y)
+        pixmap = self.tiles.get(key)
+        if pixmap is not None:
+            self.tiles.move_to_end(key)
+            return pixmap
+
+        image = self.tile_image(level, tile_x, tile_y)
+        if image.isNull():
+            print(f"Error decoding tile {key} of {self.image_path}")
+            return None
+
+        pixmap = QPixmap.fromImage(image)
+        self.tiles[key] = pixmap
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+        return pixmap
+
+    def _get_full_size_tile(self, tile_x: int, tile_y: int) -> QImage:
+        """Get a full-size tile of an image without region reads, decoding the image if needed.
+
+        If the decode is too large to keep, the full-size tiles nearest this
+        one that fit in full_size_cache_bytes are cut from it and kept until
+        they are asked for.
+        """
+        source_rect = self.tile_source_rect(0, tile_x, tile_y)
+        full_image = self.levels.get(0)
+        if full_image is not None:
+            return full_image.copy(source_rect)
+
+        image = self.full_size_tiles.pop((tile_x, tile_y), None)
+        if image is not None:
+            return image
+
+        full_image = self._decode_full_size()
+        if full_image.isNull() or 0 in self.levels:
+            return full_image.copy(source_rect)
+
+        columns = math.ceil(self.image_size.width() / self.tile_size)
+        rows = math.ceil(self.image_size.height() / self.tile_size)
+        tile_bytes = self.tile_size * full_image.bytesPerLine() * self.tile_size // max(1, full_image.width())
+        # Nearest first, and of those the ones further down, where strips are scrolled to
+        nearest = sorted(((x, y) for y in range(rows) for x in range(columns)
+                          if (x, y) != (tile_x, tile_y) and (0, x, y) not in self.tiles),
+                         key=lambda tile: (max(abs(tile[0] - tile_x), abs(tile[1] - tile_y)),
+                                           (tile[1], tile[0]) < (tile_y, tile_x)))
+        self.full_size_tiles = {
+            tile: full_image.copy(self.tile_source_rect(0, *tile))
+            for tile in nearest[:max(1, self.full_size_cache_bytes // max(1, tile_bytes))]
+        }
+        return full_image.copy(source_rect)
+
+    def _decode_full_size(self) -> QImage:
+        """Decode the whole image, keep it if it fits, and build level 1 from it if it is missing."""
+        image = QImageReader(self.image_path).read()
+        self.full_decode_count += 1
+        if image.isNull():
+            return image
+        if image.sizeInBytes() <= self.full_size_cache_bytes:
+            self.levels[0] = image
+            self.full_size_tiles.clear()
+        if self.max_level >= 1 and 1 not in self.levels:
+            self.levels[1] = self._scale_to_level(image, 1)
+        return image
+
+    def _scale_to_level(self, image: QImage, level: int) -> QImage:
+        """Scale an image of the level below to a pyramid level."""
+        factor = 1 << level
+        return image.scaled(
+            max(1, math.ceil(self.image_size.width() / factor)),
+            max(1, math.ceil(self.image_size.height() / factor)),
+            Qt.AspectRatioMode.IgnoreAspectRatio,
+            Qt.TransformationMode.SmoothTransformation
+        )
+
+    def _get_level_image(self, level: int) -> QImage:
+        """Get a whole pyramid level above full size, building it from the level below if needed."""
+        image = self.levels.get(level)
+        if image is not None:
+            return image
+
+        if level == 1 and 0 not in self.levels:
+            self._decode_full_size()
+            return self.levels.get(1, QImage())
+
+        image = self._scale_to_level(self._get_level_image(level - 1), level)
+        self.levels[level] = image
+        return image
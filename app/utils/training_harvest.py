@@ -0,0 +1,449 @@
+"""
+Training Harvest Module.
+
+This module turns the character tags users have already placed on images
+into recognition samples. Recognition otherwise only learns from avatars and
+from regions added one at a time in the tagging dialog, while each tag's box
+already marks where a character is.
+
+TrainingHarvestJob crops the region of every tag that has no sample yet from
+its image and saves the features of the crop with the tag's image_id and
+tag_id. Images are read once for all their tags, at a reduced size, on a
+pool of worker threads; the features of each batch of images are saved in
+one transaction.
+
+To keep the feature index compact, a crop that is nearly identical to a
+sample the character already has (avatar, earlier region or harvested
+sample) isn't saved; such tags are recorded in harvest_skipped_tags so later
+runs don't crop them again. A character gets at most
+MAX_SAMPLES_PER_CHARACTER harvested samples.
+
+Samples follow their tags: samples and skip records store the character
+and box of their tag (tag_region), and before each run those of tags that
+were deleted, moved or given to another character since are removed, so
+those tags are harvested again. Other edits, such as a new note, keep them.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PyQt6.QtCore import QObject, QRect, QRunnable, QThreadPool, pyqtSignal
+
+from app.utils.auto_tag_backfill import read_scaled_image
+from app.utils.feature_index import (
+    CharacterFeatureIndex, descriptor_similarity, SCALAR_FEATURES, SCALAR_WEIGHTS, SCALAR_SCALES,
+    HISTOGRAM_WEIGHT, HISTOGRAM_BINS, HISTOGRAM_DTYPE, DESCRIPTOR_SIZE
+)
+from app.utils.image_prefetcher import get_database_path, get_worker_connection
+from app.utils.image_recognition_util import ImageRecognitionUtil
+
+
+# Images read and cropped per transaction
+BATCH_SIZE = 16
+
+# Worker threads reading and cropping images
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+# Images are read with their longest side reduced to this (features are
+# computed from at most 100x100 pixels, so crops keep enough detail)
+MAX_IMAGE_DIMENSION = 1024
+
+# Tag regions smaller than this (in pixels of the reduced image) are skipped
+MIN_REGION_SIZE = 8
+
+# Harvested samples kept per character (avatars and hand-added regions don't count)
+MAX_SAMPLES_PER_CHARACTER = 50
+
+# A crop is a duplicate of a sample of its character if both similarities reach these
+DUPLICATE_SIMILARITY = 0.98
+DUPLICATE_DESCRIPTOR_SIMILARITY = 0.95
+
+# The character and box of a tag t, as stored in tag_region. Built by SQLite
+# both when saving and when comparing, so the numbers are formatted the same
+TAG_REGION_SQL = "t.character_id || ':' || t.x_position || ',' || t.y_position || ',' || t.width || ',' || t.height"
+
+
+def create_harvest_tables(conn: sqlite3.Connection) -> None:
+    """Create the harvest_skipped_tags table if it doesn't exist.
+
+    It records tags whose region duplicates a sample of their character.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS harvest_skipped_tags (
+        tag_id INTEGER PRIMARY KEY,
+        skipped_at TEXT NOT NULL,
+        tag_region TEXT,
+        FOREIGN KEY (tag_id) REFERENCES image_character_tags (id) ON DELETE CASCADE
+    )
+    ''')
+
+    # Tables created before skip records stored the tag's region
+    cursor.execute("PRAGMA table_info(harvest_skipped_tags)")
+    if 'tag_region' not in [column['name'] for column in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE harvest_skipped_tags ADD COLUMN tag_region TEXT')
+    conn.commit()
+
+
+def prune_stale_samples(conn: sqlite3.Connection) -> int:
+    """Remove samples and skip records of tags deleted, moved or given to another character.
+
+    Records are compared with the tag's current character and box, so other
+    edits of a tag keep them. Records saved before regions were stored fall
+    back to the tag's modification time.
+
+    Args:
+        conn: Database connection
+
+    Returns:
+        Number of samples removed
+    """
+    cursor = conn.cursor()
+    cursor.execute(f'''
+    DELETE FROM image_features
+    WHERE tag_id IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM image_character_tags t
+        WHERE t.id = image_features.tag_id
+          AND t.character_id = image_features.character_id
+          AND (image_features.tag_region = {TAG_REGION_SQL}
+               OR (image_features.tag_region IS NULL AND t.updated_at <= image_features.created_at))
+    )
+    ''')
+    removed = cursor.rowcount
+    cursor.execute(f'''
+    DELETE FROM harvest_skipped_tags
+    WHERE NOT EXISTS (
+        SELECT 1 FROM image_character_tags t
+        WHERE t.id = harvest_skipped_tags.tag_id
+          AND (harvest_skipped_tags.tag_region = {TAG_REGION_SQL}
+               OR (harvest_skipped_tags.tag_region IS NULL AND t.updated_at <= harvest_skipped_tags.skipped_at))
+    )
+    ''')
+    conn.commit()
+    return removed
+
+
+def get_unharvested_tags(conn: sqlite3.Connection, story_id: Optional[int]) -> List[Dict[str, Any]]:
+    """Get the character tags that have no sample and weren't skipped.
+
+    Args:
+        conn: Database connection
+        story_id: Story of the images, or None for all stories
+
+    Returns:
+        Tag dictionaries with 'id', 'image_id', 'character_id', the region
+        ('x_position', 'y_position', 'width', 'height'), 'tag_region' (see
+        TAG_REGION_SQL) and the image's 'path' and 'filename', ordered by image
+    """
+    query = f'''
+    SELECT t.id, t.image_id, t.character_id, t.x_position, t.y_position, t.width, t.height,
+           {TAG_REGION_SQL} AS tag_region, i.path, i.filename
+    FROM image_character_tags t
+    JOIN images i ON i.id = t.image_id
+    WHERE NOT EXISTS (SELECT 1 FROM image_features f WHERE f.tag_id = t.id)
+      AND NOT EXISTS (SELECT 1 FROM harvest_skipped_tags s WHERE s.tag_id = t.id)
+    '''
+    parameters: Tuple = ()
+    if story_id is not None:
+        query += ' AND i.story_id = ?'
+        parameters = (story_id,)
+    query += ' ORDER BY t.image_id, t.id'
+    return [dict(row) for row in conn.execute(query, parameters).fetchall()]
+
+
+def get_harvested_counts(conn: sqlite3.Connection) -> Dict[int, int]:
+    """Get the number of harvested samples of each character."""
+    cursor = conn.execute('''
+    SELECT character_id, COUNT(*) AS count
+    FROM image_features
+    WHERE tag_id IS NOT NULL
+    GROUP BY character_id
+    ''')
+    return {row['character_id']: row['count'] for row in cursor.fetchall()}
+
+
+def tag_region_rect(tag: Dict[str, Any], width: int, height: int) -> QRect:
+    """Get the pixel rectangle of a tag's region, clipped to the image.
+
+    Tags store the center and size of their box as fractions of the image size.
+
+    Args:
+        tag: Tag dictionary
+        width: Width of the image in pixels
+        height: Height of the image in pixels
+
+    Returns:
+        The rectangle (empty if the box is outside the image)
+    """
+    left = int(round((tag['x_position'] - tag['width'] / 2) * width))
+    top = int(round((tag['y_position'] - tag['height'] / 2) * height))
+    right = int(round((tag['x_position'] + tag['width'] / 2) * width))
+    bottom = int(round((tag['y_position'] + tag['height'] / 2) * height))
+    left, top = max(0, left), max(0, top)
+    right, bottom = min(width, right), min(height, bottom)
+    return QRect(left, top, max(0, right - left), max(0, bottom - top))
+
+
+class _SampleSet:
+    """Samples of one character, for finding near-identical crops."""
+
+    def __init__(self):
+        """Initialize an empty set."""
+        self.histograms = np.zeros((0, HISTOGRAM_BINS), dtype=HISTOGRAM_DTYPE)
+        self.scalars = np.zeros((0, len(SCALAR_FEATURES)))
+        self.descriptors = np.zeros((0, DESCRIPTOR_SIZE), dtype=HISTOGRAM_DTYPE)
+        self.has_descriptor = np.zeros(0, dtype=bool)
+
+    @classmethod
+    def from_index(cls, index: CharacterFeatureIndex) -> Dict[int, '_SampleSet']:
+        """Split the samples of a feature index by character."""
+        sets = {}
+        for character_id in np.unique(index.character_ids).tolist():
+            rows = index.character_ids == character_id
+            sample_set = cls()
+            sample_set.histograms = index.histograms[rows]
+            sample_set.scalars = index.scalars[rows]
+            sample_set.descriptors = index.descriptors[rows]
+            sample_set.has_descriptor = index.has_descriptor[rows]
+            sets[character_id] = sample_set
+        return sets
+
+    def is_duplicate(self, features: Dict[str, Any]) -> bool:
+        """Check whether features are nearly identical to one of the samples.
+
+        Both the similarity used for scoring and, where the two have
+        descriptors, the descriptor similarity must reach their thresholds.
+        """
+        if not len(self.histograms):
+            return False
+        histogram = np.asarray(features['color_histogram'], dtype=np.float64)
+        scalars = np.array([features['features'][name] for name in SCALAR_FEATURES])
+        differences = np.minimum(np.abs(self.scalars - scalars) / SCALAR_SCALES, 1.0)
+        similarities = (1.0 - differences) @ SCALAR_WEIGHTS
+        similarities += np.minimum(self.histograms, histogram).sum(axis=1) * HISTOGRAM_WEIGHT
+        close = similarities >= DUPLICATE_SIMILARITY
+
+        descriptor = features.get('descriptor')
+        if close.any() and descriptor is not None and len(descriptor) == DESCRIPTOR_SIZE:
+            compared = close & self.has_descriptor
+            if compared.any():
+                close[compared] = descriptor_similarity(
+                    np.asarray(descriptor, dtype=HISTOGRAM_DTYPE), self.descriptors[compared]
+                ) >= DUPLICATE_DESCRIPTOR_SIMILARITY
+        return bool(close.any())
+
+    def add(self, features: Dict[str, Any]) -> None:
+        """Add the features of a saved sample."""
+        self.histograms = np.vstack([self.histograms, np.asarray(features['color_histogram'], dtype=HISTOGRAM_DTYPE)])
+        self.scalars = np.vstack([self.scalars, [features['features'][name] for name in SCALAR_FEATURES]])
+        descriptor = features.get('descriptor')
+        has_descriptor = descriptor is not None and len(descriptor) == DESCRIPTOR_SIZE
+        self.has_descriptor = np.append(self.has_descriptor, has_descriptor)
+        self.descriptors = np.vstack([
+            self.descriptors,
+            np.asarray(descriptor if has_descriptor else np.zeros(DESCRIPTOR_SIZE), dtype=HISTOGRAM_DTYPE)
+        ])
+
+
+class _TrainingHarvestSignals(QObject):
+    """Signals for training harvest jobs (QRunnable can't define signals itself)."""
+
+    progress = pyqtSignal(object)  # summary so far, after each batch
+    finished = pyqtSignal(object)  # final summary
+
+
+class TrainingHarvestJob(QRunnable):
+    """Background job that saves recognition samples from the regions of character tags."""
+
+    def __init__(self, db_conn: sqlite3.Connection, story_id: Optional[int], workers: int = DEFAULT_WORKERS,
+                 batch_size: int = BATCH_SIZE, max_samples: int = MAX_SAMPLES_PER_CHARACTER):
+        """Initialize the job.
+
+        Args:
+            db_conn: Database connection of the GUI thread
+            story_id: ID of the story, or None for all stories
+            workers: Threads reading and cropping images
+            batch_size: Images per transaction
+            max_samples: Harvested samples kept per character
+        """
+        super().__init__()
+        self.setAutoDelete(False)
+        self.db_conn = db_conn
+        self.db_path = get_database_path(db_conn)
+        self.story_id = story_id
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_samples = max_samples
+
+        self.signals = _TrainingHarvestSignals()
+        self._cancel_event = threading.Event()
+
+    def start(self, pool: Optional[QThreadPool] = None) -> None:
+        """Start the job on a thread pool.
+
+        In-memory databases can't be opened from another thread, so for those
+        the job runs right away on the calling thread.
+
+        Args:
+            pool: Thread pool to use (the global pool if None)
+        """
+        if self.db_path:
+            (pool or QThreadPool.globalInstance()).start(self)
+        else:
+            self.run()
+
+    def cancel(self) -> None:
+        """Stop after the current batch (safe to call from any thread)."""
+        self._cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        """Check whether the job has been cancelled."""
+        return self._cancel_event.is_set()
+
+    def run(self) -> None:
+        """Run the harvest and report the summary through the signal."""
+        try:
+            conn = get_worker_connection(self.db_path) if self.db_path else self.db_conn
+            summary = self.process(conn)
+        except Exception as e:
+            print(f"Error harvesting tagged regions: {e}")
+            summary = self._new_summary()
+            summary['errors'].append(('', str(e)))
+        self.signals.finished.emit(summary)
+
+    def process(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+        """Harvest the tags that have no sample yet.
+
+        Args:
+            conn: Database connection owned by the calling thread
+
+        Returns:
+            Summary with the number of 'tags' to harvest, 'images' read,
+            samples 'added', 'duplicates', tags skipped as 'capped' (their
+            character has enough samples) or 'too_small', samples 'pruned'
+            because their tag changed, 'errors' (list of (path, message)),
+            'elapsed', 'completed' and 'cancelled'
+        """
+        start_time = time.perf_counter()
+        summary = self._new_summary()
+
+        recognition = ImageRecognitionUtil(conn)
+        create_harvest_tables(conn)
+        summary['pruned'] = prune_stale_samples(conn)
+
+        counts = get_harvested_counts(conn)
+        tags = get_unharvested_tags(conn, self.story_id)
+        summary['tags'] = len(tags)
+
+        # Tags of characters that are already full aren't cropped
+        harvestable = []
+        for tag in tags:
+            if counts.get(tag['character_id'], 0) >= self.max_samples:
+                summary['capped'] += 1
+            else:
+                harvestable.append(tag)
+
+        # Group the tags by image, so each image is read once
+        images: List[List[Dict[str, Any]]] = []
+        for tag in harvestable:
+            if images and images[-1][0]['image_id'] == tag['image_id']:
+                images[-1].append(tag)
+            else:
+                images.append([tag])
+
+        sample_sets = _SampleSet.from_index(CharacterFeatureIndex.build(conn, self.story_id))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for start in range(0, len(images), self.batch_size):
+                if self.is_cancelled():
+                    break
+                batch = images[start:start + self.batch_size]
+                crops = executor.map(lambda image_tags: self._extract_tag_features(recognition, image_tags), batch)
+
+                samples = []
+                skipped = []
+                for image_tags, (tag_features, error) in zip(batch, crops):
+                    summary['images'] += 1
+                    if error:
+                        summary['errors'].append((os.path.join(image_tags[0]['path'], image_tags[0]['filename']), error))
+                        continue
+                    for tag, features in zip(image_tags, tag_features):
+                        character_id = tag['character_id']
+                        if features is None:
+                            summary['too_small'] += 1
+                            continue
+                        if counts.get(character_id, 0) >= self.max_samples:
+                            summary['capped'] += 1
+                            continue
+                        sample_set = sample_sets.setdefault(character_id, _SampleSet())
+                        if sample_set.is_duplicate(features):
+                            summary['duplicates'] += 1
+                            skipped.append(tag)
+                            continue
+                        sample_set.add(features)
+                        counts[character_id] = counts.get(character_id, 0) + 1
+                        samples.append({'character_id': character_id, 'image_id': tag['image_id'],
+                                        'tag_id': tag['id'], 'tag_region': tag['tag_region'],
+                                        'features': features})
+
+                recognition.save_tagged_region_features(samples)
+                if skipped:
+                    now = datetime.now().isoformat()
+                    conn.executemany('INSERT OR REPLACE INTO harvest_skipped_tags (tag_id, skipped_at, tag_region) '
+                                     'VALUES (?, ?, ?)', [(tag['id'], now, tag['tag_region']) for tag in skipped])
+                    conn.commit()
+                summary['added'] += len(samples)
+                summary['elapsed'] = time.perf_counter() - start_time
+                self.signals.progress.emit(dict(summary, errors=list(summary['errors'])))
+
+        summary['cancelled'] = self.is_cancelled()
+        summary['completed'] = not summary['cancelled']
+        summary['elapsed'] = time.perf_counter() - start_time
+        print(f"Harvested tagged regions: {summary['added']} added, {summary['duplicates']} duplicates, "
+              f"{summary['capped']} over the limit, {summary['pruned']} pruned, {len(summary['errors'])} errors")
+        return summary
+
+    @staticmethod
+    def _extract_tag_features(recognition: ImageRecognitionUtil,
+                              image_tags: List[Dict[str, Any]]) -> Tuple[List[Optional[Dict[str, Any]]], Optional[str]]:
+        """Read one image and extract the features of its tags' regions (runs on a worker thread).
+
+        Returns:
+            (features of each tag, or None for regions too small; error message or None)
+        """
+        image_path = os.path.join(image_tags[0]['path'], image_tags[0]['filename'])
+        picture = read_scaled_image(image_path, MAX_IMAGE_DIMENSION)
+        if picture.isNull():
+            return [], "Failed to read image"
+
+        tag_features = []
+        for tag in image_tags:
+            rect = tag_region_rect(tag, picture.width(), picture.height())
+            if rect.width() < MIN_REGION_SIZE or rect.height() < MIN_REGION_SIZE:
+                tag_features.append(None)
+                continue
+            tag_features.append(recognition.extract_features_from_qimage(picture.copy(rect)))
+        return tag_features, None
+
+    @staticmethod
+    def _new_summary() -> Dict[str, Any]:
+        """Create an empty summary."""
+        return {
+            'tags': 0,
+            'images': 0,
+            'added': 0,
+            'duplicates': 0,
+            'capped': 0,
+            'too_small': 0,
+            'pruned': 0,
+            'errors': [],
+            'elapsed': 0.0,
+            'completed': False,
+            'cancelled': False,
+        }
@@ -0,0 +1,380 @@
+"""
+Watch Folder Module.
+
+This module imports new images from a watched folder (for example a game's
+screenshot folder) into a story automatically.
+
+A QFileSystemWatcher reports changes to the folder, so nothing runs while the
+folder is quiet. If the folder can't be watched (e.g. some network drives) it
+is polled instead. Bursts of changes are coalesced into one scan, and new
+files are only imported once their size and modification time have stopped
+changing for a short settle time, so half-written screenshots are not picked
+up. Settled files are imported in batches with a BulkImportJob, which
+deduplicates them, writes thumbnails and inserts the rows.
+
+The files a story has already imported are read from the images table
+(source_path), so files added while the application was closed are picked up
+on the next start, and files imported before are never imported twice. The
+files already in a folder when it is set up as the story's watch folder (its
+baseline), and files skipped as duplicates, are recorded in
+watch_folder_files, so they are neither imported nor read again after a
+restart.
+"""
+
+import os
+import sqlite3
+import time
+from collections import deque
+from typing import Dict, List, Any, Optional, Set
+
+from PyQt6.QtCore import QObject, QFileSystemWatcher, QThreadPool, QTimer, pyqtSignal
+
+from app.db_sqlite import (
+    get_story_source_paths, get_story_watch_folder, get_watch_folder_files, add_watch_folder_files
+)
+from app.utils.bulk_import import BulkImportJob, IMAGE_EXTENSIONS
+from app.utils.ingest_pipeline import DEFAULT_ENCODE_FORMAT, DEFAULT_ENCODE_QUALITY
+from app.utils.storage_gc import TRASH_FOLDER_NAME
+
+
+# Delay after a change before the folder is scanned, so bursts are coalesced
+SCAN_DELAY_MS = 300
+
+# Time a file's size and modification time must stay unchanged before it is imported
+SETTLE_MS = 1000
+
+# Poll interval for folders that can't be watched
+POLL_INTERVAL_MS = 5000
+
+# Maximum number of files per import job
+MAX_BATCH_FILES = 200
+
+# Number of recent ingest latencies kept for the metrics
+LATENCY_HISTORY = 500
+
+# Reason stored in the tag review queue
+REVIEW_REASON_WATCH_FOLDER = 'watch_folder'
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    """Get a percentile of a list of values (nearest rank)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+class WatchFolderMonitor(QObject):
+    """Imports new images from a folder into a story as they appear."""
+
+    # Emitted with the import summary after each batch (see BulkImportJob.process)
+    images_ingested = pyqtSignal(object)
+
+    def __init__(self, db_conn: sqlite3.Connection, story_id: int, folder_path: str,
+                 images_folder: str, thumbnails_folder: str, recursive: bool = False,
+                 scan_delay_ms: int = SCAN_DELAY_MS, settle_ms: int = SETTLE_MS,
+                 poll_interval_ms: int = POLL_INTERVAL_MS,
+                 encode_format: str = DEFAULT_ENCODE_FORMAT,
+                 encode_quality: int = DEFAULT_ENCODE_QUALITY,
+                 pool: Optional[QThreadPool] = None, parent=None):
+        """Initialize the monitor.
+
+        Args:
+            db_conn: Database connection
+            story_id: ID of the story to import into
+            folder_path: Folder to watch
+            images_folder: Story images folder
+            thumbnails_folder: Story thumbnails folder
+            recursive: Whether subfolders are watched too
+            scan_delay_ms: Delay after a change before scanning
+            settle_ms: Time a file must stay unchanged before it is imported
+            poll_interval_ms: Poll interval if the folder can't be watched
+            encode_format: Format for files that can't be kept as they are
+            encode_quality: Quality for files that can't be kept as they are
+            pool: Thread pool for the import jobs (the global pool if None)
+            parent: Parent object
+        """
+        super().__init__(parent)
+        self.db_conn = db_conn
+        self.story_id = story_id
+        self.folder_path = os.path.abspath(folder_path)
+        self.images_folder = images_folder
+        self.thumbnails_folder = thumbnails_folder
+        self.recursive = recursive
+        self.settle_seconds = settle_ms / 1000
+        self.encode_format = encode_format
+        self.encode_quality = encode_quality
+        self.pool = pool
+
+        # The story's own folders (and its storage trash) are never imported from
+        self.excluded_folders = [os.path.abspath(images_folder) + os.sep,
+                                 os.path.abspath(thumbnails_folder) + os.sep,
+                                 os.path.join(os.path.dirname(os.path.abspath(images_folder)),
+                                              TRASH_FOLDER_NAME) + os.sep]
+
+        self.known_paths: set = set()                       # imported, duplicate or queued
+        self.pending: Dict[str, Dict[str, Any]] = {}        # seen but not settled yet
+        self.failed: Dict[str, tuple] = {}                  # path -> signature that failed
+        self.ready: Set[str] = set()                        # settled, waiting for a job
+        self.detected_at: Dict[str, float] = {}             # path -> first seen
+        self.current_job: Optional[BulkImportJob] = None
+        self.current_files: Set[str] = set()
+        self.running = False
+
+        # Metrics
+        self.scan_count = 0
+        self.batch_count = 0
+        self.ingested_count = 0
+        self.latencies: deque = deque(maxlen=LATENCY_HISTORY)
+        self.last_batch: Optional[Dict[str, Any]] = None
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.schedule_scan)
+
+        self.scan_timer = QTimer(self)
+        self.scan_timer.setSingleShot(True)
+        self.scan_timer.setInterval(scan_delay_ms)
+        self.scan_timer.timeout.connect(self.scan)
+
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(settle_ms)
+        self.settle_timer.timeout.connect(self.scan)
+
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(poll_interval_ms)
+        self.poll_timer.timeout.connect(self.scan)
+
+    def start(self) -> bool:
+        """Start watching, and pick up files added while the monitor was stopped.
+
+        On the first start after the story's watch folder was set up, the
+        files already in it are recorded as its baseline instead of being
+        imported.
+
+        Returns:
+            False if the folder doesn't exist
+        """
+        if not os.path.isdir(self.folder_path):
+            print(f"Watch folder not found: {self.folder_path}")
+            return False
+
+        self.running = True
+        self.known_paths = get_story_source_paths(self.db_conn, self.story_id)
+        self.known_paths |= get_watch_folder_files(self.db_conn, self.story_id)
+
+        config = get_story_watch_folder(self.db_conn, self.story_id)
+        if config is not None and config['baseline_at'] is None:
+            baseline = [path for path in self._list_files() if path not in self.known_paths]
+            add_watch_folder_files(self.db_conn, self.story_id, baseline, baseline=True)
+            self.known_paths.update(baseline)
+
+        if not self._watch_directories():
+            print(f"Can't watch {self.folder_path}, polling every {self.poll_timer.interval()} ms")
+            self.poll_timer.start()
+
+        self.scan()
+        return True
+
+    def stop(self) -> None:
+        """Stop watching and cancel the running import."""
+        self.running = False
+        self.scan_timer.stop()
+        self.settle_timer.stop()
+        self.poll_timer.stop()
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+        if self.current_job is not None:
+            self.current_job.cancel()
+
+    def schedule_scan(self, *args) -> None:
+        """Scan the folder after a short delay (restarted by further changes)."""
+        if self.running:
+            self.scan_timer.start()
+
+    def scan(self) -> None:
+        """Look for new files, and import the ones that have settled."""
+        if not self.running:
+            return
+        self.scan_count += 1
+        now = time.time()
+
+        if self.recursive:
+            self._watch_directories()
+
+        current_paths = set()
+        for path in self._list_files():
+            current_paths.add(path)
+            if path in self.known_paths or path in self.ready or path in self.current_files:
+                continue
+
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+
+            # Failed files are retried only once they change
+            if self.failed.get(path) == signature:
+                continue
+
+            previous = self.pending.get(path)
+            if previous is None:
+                self.detected_at.setdefault(path, now)
+                changed_at = min(stat.st_mtime, now)
+            elif previous['signature'] != signature:
+                changed_at = now
+            else:
+                changed_at = previous['changed_at']
+
+            if stat.st_size > 0 and now - changed_at >= self.settle_seconds and self._can_read(path):
+                self.pending.pop(path, None)
+                self.ready.add(path)
+            else:
+                self.pending[path] = {'signature': signature, 'changed_at': changed_at}
+
+        # Forget files that were removed before they settled
+        for path in list(self.pending):
+            if path not in current_paths:
+                del self.pending[path]
+                self.detected_at.pop(path, None)
+
+        if self.pending:
+            self.settle_timer.start()
+
+        self._start_next_batch()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get ingest statistics.
+
+        Latency is measured from when a file was first seen to when its row
+        was inserted, so it includes the settle time.
+
+        Returns:
+            Dictionary with 'scans', 'batches', 'ingested', 'pending',
+            'queued', 'mean_latency_ms', 'p95_latency_ms', 'max_latency_ms'
+            and 'last_batch' (the last import summary)
+        """
+        latencies = list(self.latencies)
+        return {
+            'scans': self.scan_count,
+            'batches': self.batch_count,
+            'ingested': self.ingested_count,
+            'pending': len(self.pending),
+            'queued': len(self.ready) + len(self.current_files),
+            'mean_latency_ms': 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            'p95_latency_ms': 1000 * _percentile(latencies, 0.95),
+            'max_latency_ms': 1000 * max(latencies) if latencies else 0.0,
+            'last_batch': self.last_batch,
+        }
+
+    def _start_next_batch(self) -> None:
+        """Start an import job for the settled files if none is running."""
+        if self.current_job is not None or not self.ready or not self.running:
+            return
+
+        batch = sorted(self.ready)[:MAX_BATCH_FILES]
+        self.current_files = set(batch)
+        self.ready -= self.current_files
+
+        job = BulkImportJob(
+            self.db_conn,
+            self.story_id,
+            self.images_folder,
+            self.thumbnails_folder,
+            batch,
+            encode_format=self.encode_format,
+            encode_quality=self.encode_quality,
+            review_reason=REVIEW_REASON_WATCH_FOLDER
+        )
+        job.signals.finished.connect(self._on_batch_finished)
+        self.current_job = job
+        job.start(self.pool)
+
+    def _on_batch_finished(self, summary: Dict[str, Any]) -> None:
+        """Record the outcome of an import job and start the next one."""
+        now = time.time()
+        self.current_job = None
+
+        if summary['cancelled']:
+            # Only stop() cancels; start() reloads the imported files from the database
+            self.current_files = set()
+            return
+
+        # Duplicates are remembered across restarts, so they aren't read again
+        if summary['duplicate_paths']:
+            add_watch_folder_files(self.db_conn, self.story_id, summary['duplicate_paths'])
+
+        failed_paths = {path for path, _ in summary['errors']}
+        for path in self.current_files:
+            if path in failed_paths:
+                try:
+                    stat = os.stat(path)
+                    self.failed[path] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    pass
+            else:
+                self.known_paths.add(path)
+                self.failed.pop(path, None)
+                detected_at = self.detected_at.pop(path, None)
+                if detected_at is not None:
+                    self.latencies.append(now - detected_at)
+
+        self.batch_count += 1
+        self.ingested_count += summary['imported']
+        self.last_batch = summary
+        self.current_files = set()
+
+        print(f"Watch folder: {summary['imported']} imported, {summary['duplicates']} duplicates, "
+              f"{summary['failed']} failed ({summary['images_per_second']:.1f} images/s)")
+
+        self.images_ingested.emit(summary)
+        self._start_next_batch()
+
+    def _list_files(self) -> List[str]:
+        """List the image files in the watched folder."""
+        files = []
+        if self.recursive:
+            for folder, _, filenames in os.walk(self.folder_path):
+                files.extend(os.path.join(folder, filename) for filename in filenames)
+        else:
+            try:
+                files = [os.path.join(self.folder_path, filename) for filename in os.listdir(self.folder_path)]
+            except OSError as e:
+                print(f"Error listing watch folder: {e}")
+                return []
+
+        return [
+            path for path in files
+            if path.lower().endswith(IMAGE_EXTENSIONS)
+            and not os.path.basename(path).startswith('.')
+            and not any(path.startswith(folder) for folder in self.excluded_folders)
+        ]
+
+    def _watch_directories(self) -> bool:
+        """Add the watched folder (and its subfolders if recursive) to the watcher.
+
+        Returns:
+            False if the folder itself can't be watched
+        """
+        folders = [self.folder_path]
+        if self.recursive:
+            folders.extend(folder for folder, _, _ in os.walk(self.folder_path)
+                           if folder != self.folder_path
+                           and not any((folder + os.sep).startswith(excluded) for excluded in self.excluded_folders))
+
+        watched = set(self.watcher.directories())
+        new_folders = [folder for folder in folders if folder not in watched]
+        if new_folders:
+            self.watcher.addPaths(new_folders)
+        return self.folder_path in self.watcher.directories()
+
+    @staticmethod
+    def _can_read(path: str) -> bool:
+        """Check that a file can be opened (writers may still hold a lock on it)."""
+        try:
+            with open(path, 'rb'):
+                return True
+        except OSError:
+            return False
@@ -25,6 +25,7 @@ from app.utils.character_completer import CharacterCompleter
 
 # Import the centralized character reference functions
 from app.utils.character_references import convert_mentions_to_char_refs, convert_char_refs_to_mentions
+from app.utils.avatar_cache import get_avatar_cache
 
 from app.db_sqlite import (
     get_character, get_story, get_character_quick_events,
@@ -1482,6 +1483,8 @@ class CharacterDialog(QDialog):
             pixmap = QPixmap(self.avatar_path)
             saved = pixmap.save(avatar_path, "PNG")
             print(f"DEBUG: Avatar saved successfully: {saved}")
+            # The file may replace an avatar that is cached under the same path
+            get_avatar_cache().invalidate(avatar_path=abs_avatar_path, character_id=self.character_id)
             print(f"DEBUG: Final avatar path stored in DB: {abs_avatar_path}")
             return abs_avatar_path
         
@@ -1491,6 +1494,7 @@ class CharacterDialog(QDialog):
             print("DEBUG: Saving pixmap from avatar_preview")
             saved = pixmap.save(avatar_path, "PNG")
             print(f"DEBUG: Avatar saved successfully: {saved}")
+            get_avatar_cache().invalidate(avatar_path=abs_avatar_path, character_id=self.character_id)
             print(f"DEBUG: Final avatar path stored in DB: {abs_avatar_path}")
             return abs_avatar_path
         
@@ -1565,6 +1569,9 @@ class CharacterDialog(QDialog):
             )
             print(f"DEBUG: Character {self.character_id} updated successfully")
         
+        # The name or avatar shown in cached tooltips may have changed
+        get_avatar_cache().invalidate(character_id=self.character_id)
+        
         # Emit the character_updated signal
         self.character_updated.emit(self.character_id, character_data)
         
@@ -10,12 +10,10 @@ This widget displays a gallery of images for a story.
 import os
 import sys
 import time
+import bisect
 import io
 import re
 import pickle
-import string
-import random
-import base64
 import urllib.parse
 import tempfile
 from pathlib import Path
@@ -33,17 +31,18 @@ from PyQt6.QtWidgets import (
     QGroupBox, QGraphicsView, QGraphicsScene, QGraphicsRectItem, 
     QGraphicsPixmapItem, QGraphicsItem, QGraphicsTextItem, QProgressDialog,
     QStyleFactory, QMainWindow, QStatusBar, QToolTip, QRadioButton,
-    QSpinBox, QLineEdit, QAbstractItemView, QDialogButtonBox
+    QSpinBox, QLineEdit, QAbstractItemView, QDialogButtonBox, QLayout, QLayoutItem, QWidgetItem
 )
 from PyQt6.QtCore import (
-    Qt, QSize, pyqtSignal, QByteArray, QUrl, QBuffer, QIODevice, 
+    Qt, QSize, pyqtSignal, QUrl, QBuffer, QIODevice, 
     QPoint, QRect, QRectF, QPointF, QRegularExpression, QSortFilterProxyModel,
-    QTimer
+    QTimer, QThreadPool, QSettings
 )
 from PyQt6.QtGui import (
     QPixmap, QImage, QColor, QBrush, QPen, QPainter, QFont, 
     QPalette, QCursor, QIcon, QAction, QTransform, QClipboard, QImageReader,
-    QTextCursor, QStandardItemModel, QStandardItem, QKeySequence, QShortcut
+    QTextCursor, QStandardItemModel, QStandardItem, QKeySequence, QShortcut,
+    QDragEnterEvent, QDropEvent
 )
 from PyQt6.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply
 
@@ -58,14 +57,41 @@ from app.db_sqlite import (
     add_character_tag_to_image, update_character_tag, remove_character_tag,
     get_image_character_tags, create_quick_event, get_next_quick_event_sequence_number,
     get_quick_event_characters, get_quick_event_tagged_characters,
-    search_quick_events, get_story_folder_paths, create_image,
-    process_quick_event_character_tags, get_quick_event_scenes,
+    search_quick_events, get_story_folder_paths,
+    process_quick_event_character_tags,
     add_image_to_scene, remove_image_from_scene, get_scene_images, get_image_scenes,
-    update_character_last_tagged, get_characters_by_last_tagged
+    update_character_last_tagged, get_characters_by_last_tagged,
+    get_tag_review_queue, remove_images_from_tag_review_queue,
+    get_story_watch_folder, set_story_watch_folder, remove_story_watch_folder,
+    delete_image_descriptors, get_tag_suggestions, delete_tag_suggestions
 )
 
 # Import our image recognition utility
-from app.utils.image_recognition_util import ImageRecognitionUtil
+from app.utils.image_recognition_util import ImageRecognitionUtil, CharacterFeatureUpdateJob
+from app.utils.region_recognition import RegionRecognitionJob, create_region_recognition_pool
+from app.utils.gallery_filter import CharacterTagIndex, build_filter_expression, MATCH_ALL, MATCH_ANY
+from app.utils.thumbnail_captions import ThumbnailCaptionProvider
+from app.utils.image_prefetcher import ImagePrefetcher, load_image_entry
+from app.utils.tiled_image import TiledImageItem, get_image_size, should_tile
+from app.utils.ingest_pipeline import (
+    ImageIngestJob, generate_thumbnail, get_encode_settings, STAGE_LABELS, STAGE_INSERT
+)
+from app.utils.bulk_import import BulkImportJob, collect_image_files
+from app.utils.auto_tag_backfill import AutoTagBackfillJob
+from app.utils.watch_folder import WatchFolderMonitor
+from app.utils.perceptual_hash import NearDuplicateIndex
+from app.utils.image_descriptors import SimilarImageIndex
+from app.utils.avatar_cache import get_avatar_cache
+from app.utils.scene_grouping import (group_images_by_scene, get_scenes_for_image, get_story_gallery_images,
+                                      get_scene_summaries, get_section_images)
+
+# Estimated height of a row of thumbnails, used to reserve space for sections
+# whose thumbnails haven't been created yet
+ESTIMATED_THUMBNAIL_ROW_HEIGHT = 210
+
+# Estimated height of a section's separator and the spacing after it, used
+# to reserve space for sections whose widgets haven't been created yet
+ESTIMATED_SECTION_HEADER_HEIGHT = 50
 
 class ThumbnailWidget(QFrame):
     """Widget for displaying a thumbnail image with basic controls."""
@@ -256,17 +282,28 @@ class ThumbnailWidget(QFrame):
 
 
 class SeparatorWidget(QFrame):
-    """Widget for displaying a separator with a title between image groups."""
+    """Widget for displaying a separator with a title between image groups.
+    
+    A collapsible separator is the header of a gallery section: it shows an
+    arrow and a summary of the section's images, and collapses or expands the
+    section when clicked.
+    """
     
+    collapse_toggled = pyqtSignal(bool)  # Signal emitted when clicked (True if now collapsed)
     
-    def __init__(self, title: str, parent=None) -> None:
+    def __init__(self, title: str, parent=None, collapsible: bool = False) -> None:
         """Initialize the separator widget.
         
         Args:
             title: Title text to display
             parent: Parent widget
+            collapsible: Whether clicking the separator collapses its section
         """
         super().__init__(parent)
+        self.title = title
+        self.collapsible = collapsible
+        self.collapsed = False
+        self.summary = ""
         
         # Visual styling
         self.setFrameShape(QFrame.Shape.Box)
@@ -291,9 +328,230 @@ class SeparatorWidget(QFrame):
         self.title_label.setStyleSheet("color: white; font-size: 14px; font-weight: bold;")
         self.layout.addWidget(self.title_label)
         
+        if collapsible:
+            self.setCursor(Qt.CursorShape.PointingHandCursor)
+            self.setToolTip("Click to collapse or expand")
+            self.update_title()
+        
         # Set size policy - Expanding horizontally, fixed vertically
         self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         self.setMinimumHeight(40)
+    
+    def set_summary(self, image_count: int, newest_timestamp: Optional[str]) -> None:
+        """Show the number of images in the section and when the newest was added.
+        
+        Args:
+            image_count: Number of images in the section
+            newest_timestamp: Creation timestamp of the newest image
+        """
+        summary = f"{image_count} image{'s' if image_count != 1 else ''}"
+        if newest_timestamp:
+            summary += f", newest {newest_timestamp[:16]}"
+        if summary != self.summary:
+            self.summary = summary
+            self.update_title()
+    
+    def set_collapsed(self, collapsed: bool) -> None:
+        """Show the separator as collapsed or expanded.
+        
+        Args:
+            collapsed: Whether the section is collapsed
+        """
+        if collapsed != self.collapsed:
+            self.collapsed = collapsed
+            self.update_title()
+    
+    def update_title(self) -> None:
+        """Update the title label with the arrow and summary."""
+        text = self.title
+        if self.summary:
+            text += f"  ({self.summary})"
+        if self.collapsible:
+            text = ("\u25B6 " if self.collapsed else "\u25BC ") + text
+        self.title_label.setText(text)
+    
+    def mousePressEvent(self, event) -> None:
+        """Collapse or expand the section when a collapsible separator is clicked."""
+        if self.collapsible and event.button() == Qt.MouseButton.LeftButton:
+            self.set_collapsed(not self.collapsed)
+            self.collapse_toggled.emit(self.collapsed)
+        else:
+            super().mousePressEvent(event)
+
+
+class ThumbnailGridLayout(QLayout):
+    """Layout that puts thumbnails in rows of equal-width columns, in list order.
+    
+    A thumbnail is inserted or removed at its index in the list, so the
+    thumbnails after it flow to their next cell without being taken out of
+    the layout and added again as in a QGridLayout.
+    
+    Given the viewport of the scroll area the grid is in, only the cells
+    within a screen of the visible area are shown and moved to their cell;
+    the others stay hidden until they're scrolled near, so inserting a
+    thumbnail at the front of a large grid doesn't move every widget.
+    """
+    
+    def __init__(self, parent=None, viewport: Optional[QWidget] = None, columns: int = 5,
+                 spacing: int = 10) -> None:
+        """Initialize the layout.
+        
+        Args:
+            parent: Widget the thumbnails are laid out in
+            viewport: Viewport of the scroll area the grid is in, or None to show every cell
+            columns: Number of thumbnails per row
+            spacing: Space between cells
+        """
+        super().__init__(parent)
+        self.viewport = viewport
+        self.columns = columns
+        self.cells: List[QLayoutItem] = []
+        # Preferred height of each cell, and the height and top of each row
+        self.cell_heights: List[int] = []
+        self.row_heights: List[int] = []
+        self.row_tops: List[int] = []
+        self.sizes_stale = False
+        self.rows_stale = False
+        self.area = QRect()
+        self.shown_widgets: Set[QWidget] = set()
+        self.changing_visibility = False
+        self.setContentsMargins(0, 0, 0, 0)
+        self.setSpacing(spacing)
+    
+    def insertWidget(self, index: int, widget: QWidget) -> None:
+        """Insert a widget at a position in the list of cells."""
+        self.addChildWidget(widget)
+        self._insert_cell(index, QWidgetItem(widget))
+    
+    def addItem(self, item: QLayoutItem) -> None:
+        """Append an item (used by addWidget)."""
+        self._insert_cell(len(self.cells), item)
+    
+    def count(self) -> int:
+        """Get the number of cells."""
+        return len(self.cells)
+    
+    def itemAt(self, index: int) -> Optional[QLayoutItem]:
+        """Get the item of a cell."""
+        return self.cells[index] if 0 <= index < len(self.cells) else None
+    
+    def takeAt(self, index: int) -> Optional[QLayoutItem]:
+        """Remove a cell; the cells after it move back one position."""
+        if not 0 <= index < len(self.cells):
+            return None
+        item = self.cells.pop(index)
+        del self.cell_heights[index]
+        self.shown_widgets.discard(item.widget())
+        self.rows_stale = True
+        super().invalidate()
+        return item
+    
+    def invalidate(self) -> None:
+        """Read the shown cells' sizes again on the next layout, since one of them may have changed."""
+        # Showing or hiding cells here doesn't change their size
+        if not self.changing_visibility:
+            self.sizes_stale = True
+        super().invalidate()
+    
+    def expandingDirections(self) -> Qt.Orientation:
+        """The cells don't grow beyond their rows."""
+        return Qt.Orientation(0)
+    
+    def sizeHint(self) -> QSize:
+        """Get the size the rows need, with cells at their preferred width."""
+        return self._size(self.cells[0].widget().sizeHint().width() if self.cells else 0)
+    
+    def minimumSize(self) -> QSize:
+        """Get the size the rows need, with cells at their minimum width."""
+        return self._size(self.cells[0].widget().minimumSizeHint().width() if self.cells else 0)
+    
+    def setGeometry(self, rect: QRect) -> None:
+        """Lay the shown cells out in the new area."""
+        super().setGeometry(rect)
+        self.area = rect.marginsRemoved(self.contentsMargins())
+        self.update_shown_cells()
+    
+    def update_shown_cells(self) -> None:
+        """Show the cells within a screen of the visible area in their cells, and hide the others."""
+        self._update_rows()
+        rows = range(len(self.row_heights))
+        grid = self.parentWidget()
+        if self.viewport is not None and grid is not None and self.viewport.isAncestorOf(grid):
+            height = self.viewport.height()
+            top = -grid.mapTo(self.viewport, QPoint(0, 0)).y() - self.contentsMargins().top()
+            first_row = max(0, bisect.bisect_right(self.row_tops, top - height) - 1)
+            rows = range(first_row, max(first_row, bisect.bisect_right(self.row_tops, top + 2 * height)))
+        first, last = rows.start * self.columns, min(rows.stop * self.columns, len(self.cells))
+        widgets = [cell.widget() for cell in self.cells[first:last]]
+        shown = set(widgets)
+        newly_shown = shown - self.shown_widgets
+        self.changing_visibility = True
+        try:
+            for widget in self.shown_widgets - shown:
+                widget.hide()
+            for widget in newly_shown:
+                widget.show()
+        finally:
+            self.changing_visibility = False
+        self.shown_widgets = shown
+        
+        # Hidden cells don't report size changes, so only the shown ones can
+        # have changed since they were read, and the ones just shown
+        for index, widget in enumerate(widgets, first):
+            if self.sizes_stale or widget in newly_shown:
+                height = widget.sizeHint().height()
+                if height != self.cell_heights[index]:
+                    self.cell_heights[index] = height
+                    self.rows_stale = True
+        self.sizes_stale = False
+        if self.rows_stale:
+            self._update_rows()
+            # The grid's size changed
+            super().invalidate()
+        
+        spacing = self.spacing()
+        column_width = (self.area.width() - spacing * (self.columns - 1)) / self.columns
+        for index, widget in enumerate(widgets, first):
+            row, column = divmod(index, self.columns)
+            left = round(column * (column_width + spacing))
+            right = round(column * (column_width + spacing) + column_width)
+            widget.setGeometry(QRect(self.area.x() + left, self.area.y() + self.row_tops[row],
+                                     right - left, self.row_heights[row]))
+    
+    def _insert_cell(self, index: int, item: QLayoutItem) -> None:
+        """Insert a cell, hidden until it's laid out near the visible area."""
+        widget = item.widget()
+        self.changing_visibility = True
+        try:
+            widget.hide()
+        finally:
+            self.changing_visibility = False
+        self.cells.insert(index, item)
+        self.cell_heights.insert(index, widget.sizeHint().height())
+        self.rows_stale = True
+        super().invalidate()
+    
+    def _size(self, cell_width: int) -> QSize:
+        """Get the size of the rows for a cell width, including the margins."""
+        self._update_rows()
+        margins = self.contentsMargins()
+        spacing = self.spacing()
+        height = self.row_tops[-1] + self.row_heights[-1] if self.row_heights else 0
+        return QSize(cell_width * self.columns + spacing * (self.columns - 1) + margins.left() + margins.right(),
+                     height + margins.top() + margins.bottom())
+    
+    def _update_rows(self) -> None:
+        """Recompute the height of each row (its tallest cell) and the top of each row."""
+        if not self.rows_stale:
+            return
+        self.rows_stale = False
+        self.row_heights = [max(self.cell_heights[start:start + self.columns])
+                            for start in range(0, len(self.cells), self.columns)]
+        self.row_tops = []
+        top = 0
+        for height in self.row_heights:
+            self.row_tops.append(top)
+            top += height + self.spacing()
 
 
 class QuickEventSelectionDialog(QDialog):
@@ -1173,7 +1431,7 @@ class QuickEventEditor(QDialog):
 class ImageDetailDialog(QDialog):
     """Dialog for viewing image details and managing associated quick events."""
     
-    def __init__(self, db_conn, image_id: int, image_data: Dict[str, Any], pixmap: QPixmap, parent=None, 
+    def __init__(self, db_conn, image_id: int, image_data: Dict[str, Any], pixmap: Optional[QPixmap], parent=None, 
                  gallery_images: List[int] = None, current_index: int = None):
         """Initialize the image detail dialog.
         
@@ -1181,7 +1439,7 @@ class ImageDetailDialog(QDialog):
             db_conn: Database connection
             image_id: ID of the image
             image_data: Dictionary with image data
-            pixmap: QPixmap of the image
+            pixmap: QPixmap of the image, or None for a large image that is shown in tiles
             parent: Parent widget
             gallery_images: List of image IDs in the gallery for navigation
             current_index: Current index in the gallery image list
@@ -1201,12 +1459,20 @@ class ImageDetailDialog(QDialog):
         self.gallery_images = gallery_images or []
         self.current_index = current_index
         
+        # Images shown in this dialog (used to clear the tag review queue)
+        self.viewed_image_ids = {image_id}
+        
         # Get the story ID for this image
         self.story_id = image_data.get('story_id')
         
         # Cache image dimensions
-        self.image_width = pixmap.width()
-        self.image_height = pixmap.height()
+        if pixmap is not None:
+            self.image_width = pixmap.width()
+            self.image_height = pixmap.height()
+        else:
+            image_size = get_image_size(self.get_image_path())
+            self.image_width = image_size.width()
+            self.image_height = image_size.height()
         
         # Log original dimensions
         print(f"Original image dimensions: {self.image_width}x{self.image_height}")
@@ -1226,6 +1492,11 @@ class ImageDetailDialog(QDialog):
         
         self.load_quick_events()
         self.load_character_tags()
+        
+        # Decode the neighbouring images in the background for fast navigation
+        self.prefetcher = ImagePrefetcher(self.db_conn, parent=self)
+        self.prefetcher.set_position(self.gallery_images, self.current_index)
+        self.finished.connect(self.prefetcher.shutdown)
     
     def statusBar(self):
         """Get the status bar.
@@ -1235,6 +1506,21 @@ class ImageDetailDialog(QDialog):
         """
         return self.status_bar
     
+    def get_image_path(self) -> str:
+        """Get the file path of the current image.
+        
+        Returns:
+            Path to the image file
+        """
+        return os.path.join(self.image_data['path'], self.image_data['filename'])
+    
+    def show_current_image(self):
+        """Show the current image in the image view, in tiles if it has no pixmap."""
+        if self.pixmap is None:
+            self.image_view.set_tiled_image(self.get_image_path(), self.image_width, self.image_height)
+        else:
+            self.image_view.set_image(self.pixmap, self.image_width, self.image_height)
+    
     def setup_shortcuts(self):
         """Setup keyboard shortcuts for the dialog."""
         from PyQt6.QtGui import QKeySequence, QShortcut
@@ -1295,49 +1581,48 @@ class ImageDetailDialog(QDialog):
             # Get the new image ID
             new_image_id = self.gallery_images[self.current_index]
             
-            # Get image data from database
-            cursor = self.db_conn.cursor()
-            cursor.execute("SELECT * FROM images WHERE id = ?", (new_image_id,))
-            image_data = cursor.fetchone()
-            
-            if not image_data:
-                self.status_bar.showMessage(f"Error: Image with ID {new_image_id} not found.", 5000)
-                return
+            # Use the prefetched image and data if ready, otherwise load synchronously
+            entry = self.prefetcher.take(new_image_id)
+            if entry is None:
+                entry = load_image_entry(self.db_conn, new_image_id)
                 
-            image_data = dict(image_data)
-            
-            # Load the image
-            image_path = os.path.join(image_data['path'], image_data['filename'])
-            if not os.path.exists(image_path):
-                self.status_bar.showMessage(f"Error: Image file not found at {image_path}", 5000)
-                return
-                
-            pixmap = QPixmap(image_path)
-            if pixmap.isNull():
-                self.status_bar.showMessage(f"Error: Failed to load image from {image_path}", 5000)
+            if entry is None:
+                self.status_bar.showMessage(f"Error: Failed to load image {new_image_id}", 5000)
                 return
+            
+            image_data = entry['image_data']
+            # Large images have no decoded image; they are shown in tiles
+            pixmap = None
+            if entry['image'] is not None:
+                pixmap = QPixmap.fromImage(entry['image'])
+                if pixmap.isNull():
+                    self.status_bar.showMessage(f"Error: Failed to load image {new_image_id}", 5000)
+                    return
                 
             # Update the dialog with new image data
             self.image_id = new_image_id
+            self.viewed_image_ids.add(new_image_id)
             self.image_data = image_data
             self.orig_pixmap = pixmap
             self.pixmap = pixmap
-            self.image_width = pixmap.width()
-            self.image_height = pixmap.height()
+            self.image_width, self.image_height = entry['image_size']
             
             # Update the window title
             self.setWindowTitle(image_data.get('title') or f"Image {new_image_id}")
             
             # Update the image view
-            self.image_view.set_image(pixmap, self.image_width, self.image_height)
+            self.show_current_image()
             
             # Update navigation buttons
             self.prev_button.setEnabled(self.can_navigate_previous())
             self.next_button.setEnabled(self.can_navigate_next())
             
-            # Reload quick events and character tags
-            self.load_quick_events()
-            self.load_character_tags()
+            # Reload quick events and character tags (from the prefetched data if present)
+            self.load_quick_events(entry.get('quick_events'), entry.get('tagged_characters'))
+            self.load_character_tags(entry.get('tags'))
+            
+            # Start decoding the new neighbours
+            self.prefetcher.set_position(self.gallery_images, self.current_index)
             
             # Show success message
             self.status_bar.showMessage(f"Loaded image {self.current_index + 1} of {len(self.gallery_images)}", 3000)
@@ -1483,7 +1768,7 @@ class ImageDetailDialog(QDialog):
         # Use original pixmap directly - don't scale it
         # This ensures coordinates match exactly with the source image
         print(f"INIT_UI: Setting image with dimensions {self.image_width}x{self.image_height}")
-        self.image_view.set_image(self.pixmap, self.image_width, self.image_height)
+        self.show_current_image()
         
         # Connect signals
         self.image_view.tag_added.connect(self.add_character_tag)
@@ -1561,6 +1846,21 @@ class ImageDetailDialog(QDialog):
         self.remove_tag_button.clicked.connect(self.remove_selected_tag)
         tags_layout.addWidget(self.remove_tag_button)
         
+        # Tags suggested by auto-tagging, until they are accepted or dismissed
+        tags_layout.addWidget(QLabel("Suggested Tags:"))
+        self.suggestions_list = QListWidget()
+        self.suggestions_list.setSelectionMode(QListWidget.SelectionMode.SingleSelection)
+        tags_layout.addWidget(self.suggestions_list)
+        
+        suggestion_buttons_layout = QHBoxLayout()
+        accept_suggestion_button = QPushButton("Accept Suggestion")
+        accept_suggestion_button.clicked.connect(self.accept_tag_suggestion)
+        suggestion_buttons_layout.addWidget(accept_suggestion_button)
+        dismiss_suggestion_button = QPushButton("Dismiss Suggestion")
+        dismiss_suggestion_button.clicked.connect(self.dismiss_tag_suggestion)
+        suggestion_buttons_layout.addWidget(dismiss_suggestion_button)
+        tags_layout.addLayout(suggestion_buttons_layout)
+        
         self.tab_widget.addTab(tags_tab, "Character Tags")
         
         # Add tabs to main layout
@@ -1630,14 +1930,20 @@ class ImageDetailDialog(QDialog):
         else:
             self.statusBar().showMessage("")
             
-    def load_character_tags(self):
-        """Load character tags for this image."""
+    def load_character_tags(self, tags: Optional[List[Dict[str, Any]]] = None):
+        """Load character tags for this image.
+        
+        Args:
+            tags: Already loaded tags (e.g. prefetched), or None to query them
+        """
         try:
             # Import the function to get image character tags
             from app.db_sqlite import get_image_character_tags
             
             # Fetch tags from the database using the correct function
-            self.character_tags = get_image_character_tags(self.db_conn, self.image_id)
+            if tags is None:
+                tags = get_image_character_tags(self.db_conn, self.image_id)
+            self.character_tags = tags
             
             # Add them to the image view
             self.image_view.set_tags(self.character_tags)
@@ -1645,10 +1951,56 @@ class ImageDetailDialog(QDialog):
             # Update the character tags list
             self.update_character_tags_list()
             
+            self.load_tag_suggestions()
+            
         except Exception as e:
             print(f"Error loading character tags: {e}")
             QMessageBox.warning(self, "Error", f"Failed to load character tags: {str(e)}")
     
+    def load_tag_suggestions(self):
+        """Show the tags suggested for this image by auto-tagging."""
+        self.suggestions_list.clear()
+        for suggestion in get_tag_suggestions(self.db_conn, self.image_id):
+            item = QListWidgetItem(
+                f"{suggestion['character_name']} ({int(suggestion['similarity'] * 100)}% match, "
+                f"{int(suggestion['x_position'] * 100)}%, {int(suggestion['y_position'] * 100)}%)"
+            )
+            item.setData(Qt.ItemDataRole.UserRole, suggestion)
+            self.suggestions_list.addItem(item)
+    
+    def accept_tag_suggestion(self):
+        """Tag the character of the selected suggestion where it was suggested."""
+        item = self.suggestions_list.currentItem()
+        if not item:
+            return
+        suggestion = item.data(Qt.ItemDataRole.UserRole)
+        
+        tag_id = add_character_tag_to_image(
+            self.db_conn,
+            self.image_id,
+            suggestion['character_id'],
+            suggestion['x_position'],
+            suggestion['y_position'],
+            suggestion['width'],
+            suggestion['height'],
+            "Accepted suggestion"
+        )
+        if not tag_id:
+            QMessageBox.warning(self, "Error", "Failed to add character tag.")
+            return
+        
+        update_character_last_tagged(self.db_conn, self.story_id, suggestion['character_id'])
+        delete_tag_suggestions(self.db_conn, suggestion_ids=[suggestion['id']])
+        self.load_character_tags()
+    
+    def dismiss_tag_suggestion(self):
+        """Drop the selected suggestion."""
+        item = self.suggestions_list.currentItem()
+        if not item:
+            return
+        delete_tag_suggestions(self.db_conn, suggestion_ids=[item.data(Qt.ItemDataRole.UserRole)['id']])
+        self.load_tag_suggestions()
+    
     def save_all_tag_crops(self):
         """Save crops of all tag rectangles for debugging."""
         # for tag in self.character_tags:
@@ -1802,11 +2154,20 @@ class ImageDetailDialog(QDialog):
                 print(f"Error removing character tag: {e}")
                 QMessageBox.warning(self, "Error", f"Failed to remove character tag: {str(e)}")
     
-    def load_quick_events(self):
-        """Load quick events associated with this image."""
+    def load_quick_events(self, quick_events: Optional[List[Dict[str, Any]]] = None,
+                          tagged_characters: Optional[Dict[int, List[Dict[str, Any]]]] = None):
+        """Load quick events associated with this image.
+        
+        Args:
+            quick_events: Already loaded quick events (e.g. prefetched), or None to query them
+            tagged_characters: Already loaded tagged characters per quick event ID
+        """
         try:
             # Load quick events for this image
-            self.quick_events = get_image_quick_events(self.db_conn, self.image_id)
+            if quick_events is None:
+                quick_events = get_image_quick_events(self.db_conn, self.image_id)
+                tagged_characters = None
+            self.quick_events = quick_events
             
             # Load all characters for this story if not already loaded
             if not self.characters and self.story_id:
@@ -1815,7 +2176,10 @@ class ImageDetailDialog(QDialog):
             # Load tagged characters for each quick event
             for event in self.quick_events:
                 try:
-                    tagged_chars = get_quick_event_tagged_characters(self.db_conn, event['id'])
+                    if tagged_characters is not None and event['id'] in tagged_characters:
+                        tagged_chars = tagged_characters[event['id']]
+                    else:
+                        tagged_chars = get_quick_event_tagged_characters(self.db_conn, event['id'])
                     # Add any characters not already in self.characters
                     for char in tagged_chars:
                         if not any(c['id'] == char['id'] for c in self.characters):
@@ -2396,6 +2760,141 @@ class TagPositionDialog(QDialog):
         return (x_position, y_position, width, height)
 
 
+class NearDuplicateReportDialog(QDialog):
+    """Dialog listing groups of near-identical images in a story."""
+    
+    # Emitted with the image IDs of a group the user wants to look at
+    group_activated = pyqtSignal(list)
+    
+    def __init__(self, db_conn, groups: List[List[int]], image_count: int, elapsed: float, parent=None):
+        """Initialize the report dialog.
+        
+        Args:
+            db_conn: Database connection
+            groups: Groups of near-duplicate image IDs, newest first
+            image_count: Number of images that were compared
+            elapsed: Seconds it took to find the groups
+            parent: Parent widget
+        """
+        super().__init__(parent)
+        self.db_conn = db_conn
+        self.groups = groups
+        
+        self.setWindowTitle("Near-Duplicate Images")
+        self.resize(500, 400)
+        
+        layout = QVBoxLayout(self)
+        
+        hidden = sum(len(group) - 1 for group in groups)
+        summary = QLabel(f"{len(groups)} groups of near-identical images ({hidden} extra copies) "
+                         f"among {image_count} images, found in {elapsed * 1000:.0f} ms.\n"
+                         f"Double-click a group to step through its images.")
+        summary.setWordWrap(True)
+        layout.addWidget(summary)
+        
+        self.group_list = QListWidget()
+        self.group_list.setIconSize(QSize(64, 64))
+        self.group_list.itemDoubleClicked.connect(self.on_group_double_clicked)
+        layout.addWidget(self.group_list)
+        
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        layout.addWidget(close_button)
+        
+        self.populate_groups()
+    
+    def populate_groups(self):
+        """Fill the list with one row per group, showing its newest image."""
+        cursor = self.db_conn.cursor()
+        for number, group in enumerate(self.groups):
+            cursor.execute('''
+            SELECT filename, path, title FROM images WHERE id = ?
+            ''', (group[0],))
+            row = cursor.fetchone()
+            
+            item = QListWidgetItem(f"Group {number + 1}: {len(group)} images "
+                                   f"(IDs {', '.join(str(image_id) for image_id in group[:8])}"
+                                   f"{', ...' if len(group) > 8 else ''})")
+            item.setData(Qt.ItemDataRole.UserRole, number)
+            if row:
+                thumbnail_path = os.path.join(os.path.dirname(row['path']), "thumbnails", row['filename'])
+                if os.path.exists(thumbnail_path):
+                    item.setIcon(QIcon(thumbnail_path))
+            self.group_list.addItem(item)
+    
+    def on_group_double_clicked(self, item: QListWidgetItem):
+        """Open the images of a group."""
+        self.group_activated.emit(self.groups[item.data(Qt.ItemDataRole.UserRole)])
+
+
+class SimilarImagesDialog(QDialog):
+    """Dialog listing the images that look most like a given image."""
+    
+    # Emitted with the ID of the image the user wants to look at
+    image_activated = pyqtSignal(int)
+    
+    def __init__(self, db_conn, image_id: int, matches: List[Tuple[int, float]], image_count: int,
+                 elapsed: float, parent=None):
+        """Initialize the dialog.
+        
+        Args:
+            db_conn: Database connection
+            image_id: ID of the image that was searched for
+            matches: (image_id, similarity) tuples, most similar first
+            image_count: Number of images that were compared
+            elapsed: Seconds the search took
+            parent: Parent widget
+        """
+        super().__init__(parent)
+        self.db_conn = db_conn
+        self.image_id = image_id
+        self.matches = matches
+        
+        self.setWindowTitle("Similar Images")
+        self.resize(500, 500)
+        
+        layout = QVBoxLayout(self)
+        
+        summary = QLabel(f"The {len(matches)} images most like image {image_id}, "
+                         f"out of {image_count} images, found in {elapsed * 1000:.1f} ms.\n"
+                         f"Double-click an image to open it.")
+        summary.setWordWrap(True)
+        layout.addWidget(summary)
+        
+        self.image_list = QListWidget()
+        self.image_list.setIconSize(QSize(64, 64))
+        self.image_list.itemDoubleClicked.connect(self.on_image_double_clicked)
+        layout.addWidget(self.image_list)
+        
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        layout.addWidget(close_button)
+        
+        self.populate_images()
+    
+    def populate_images(self):
+        """Fill the list with one row per match."""
+        cursor = self.db_conn.cursor()
+        for match_id, similarity in self.matches:
+            cursor.execute('''
+            SELECT filename, path, title FROM images WHERE id = ?
+            ''', (match_id,))
+            row = cursor.fetchone()
+            
+            title = row['title'] if row and row['title'] else f"Image {match_id}"
+            item = QListWidgetItem(f"{title} ({similarity * 100:.0f}% similar)")
+            item.setData(Qt.ItemDataRole.UserRole, match_id)
+            if row:
+                thumbnail_path = os.path.join(os.path.dirname(row['path']), "thumbnails", row['filename'])
+                if os.path.exists(thumbnail_path):
+                    item.setIcon(QIcon(thumbnail_path))
+            self.image_list.addItem(item)
+    
+    def on_image_double_clicked(self, item: QListWidgetItem):
+        """Open the image of a row."""
+        self.image_activated.emit(item.data(Qt.ItemDataRole.UserRole))
+
+
 class GalleryWidget(QWidget):
     """Widget for managing and displaying a story's image gallery."""
     
@@ -2413,9 +2912,27 @@ class GalleryWidget(QWidget):
         self.thumbnails: Dict[int, ThumbnailWidget] = {}
         self.selected_thumbnails = set()  # Set of selected image IDs
         
+        # Display model: ordered sections of (image, thumbnail) entries, so
+        # single images can be inserted or removed without a full reload
+        self.gallery_sections: List[Dict[str, Any]] = []
+        # IDs of the images in the gallery, including those without thumbnails yet
+        self.gallery_image_ids = set()
+        
+        # Keys of the collapsed sections of the current story (saved in QSettings)
+        self.collapsed_section_keys = set()
+        
+        # Creates the thumbnails of sections that have been scrolled into view
+        self.section_load_timer = QTimer(self)
+        self.section_load_timer.setSingleShot(True)
+        self.section_load_timer.setInterval(0)
+        self.section_load_timer.timeout.connect(self._load_visible_sections)
+        
         # Create image recognition utility
         self.image_recognition = ImageRecognitionUtil(db_conn)
         
+        # Cached quick event captions for the current story's thumbnails
+        self.caption_provider: Optional[ThumbnailCaptionProvider] = None
+        
         # Flag to track NSFW mode
         self.nsfw_mode = False
         
@@ -2425,9 +2942,38 @@ class GalleryWidget(QWidget):
         # Flag to track scene grouping mode
         self.scene_grouping_mode = False
         
+        # How included characters in the gallery filters are combined
+        self.filter_match_mode = MATCH_ALL
+        
         # Initialize network manager for downloading images
         self.network_manager = None
         
+        # Background image ingest: worker pool and state of the running jobs
+        self.ingest_pool = QThreadPool(self)
+        self.ingest_pool.setMaxThreadCount(2)
+        self.ingest_jobs: List[Dict[str, Any]] = []
+        self.bulk_import_state: Optional[Dict[str, Any]] = None
+        
+        # Avatar feature updates for recognition (kept until they finish)
+        self.character_feature_jobs: List[CharacterFeatureUpdateJob] = []
+        
+        # Auto-tagging backfill, on its own single thread so it never holds up imports
+        self.auto_tag_pool = QThreadPool(self)
+        self.auto_tag_pool.setMaxThreadCount(1)
+        self.auto_tag_job: Optional[AutoTagBackfillJob] = None
+        
+        # Imports new images from the story's watch folder, if it has one
+        self.watch_folder_monitor: Optional[WatchFolderMonitor] = None
+        
+        # Perceptual hashes of the current story's images (built on first use)
+        self.near_duplicate_index: Optional[NearDuplicateIndex] = None
+        
+        # Colour layout descriptors of the current story's images (built on first use)
+        self.similar_image_index: Optional[SimilarImageIndex] = None
+        
+        # Flag to show only the newest image of each group of near-duplicates
+        self.collapse_near_duplicates = False
+        
         # Print for debugging
         print("Initializing GalleryWidget and setting up UI components")
         
@@ -2460,6 +3006,41 @@ class GalleryWidget(QWidget):
         self.import_button.setEnabled(False)  # Disabled until a story is selected
         button_layout.addWidget(self.import_button)
         
+        # Create bulk import button (files or a whole folder)
+        self.bulk_import_button = QPushButton("Bulk Import...")
+        self.bulk_import_button.setToolTip("Import many images at once without tagging them "
+                                           "(you can also drop files or folders on the gallery)")
+        bulk_import_menu = QMenu(self.bulk_import_button)
+        bulk_import_menu.addAction("Files...", self.bulk_import_files)
+        bulk_import_menu.addAction("Folder...", self.bulk_import_folder)
+        bulk_import_menu.addSeparator()
+        bulk_import_menu.addAction("Watch Folder...", self.choose_watch_folder)
+        self.stop_watching_action = bulk_import_menu.addAction("Stop Watching Folder", self.stop_watch_folder)
+        self.stop_watching_action.setEnabled(False)
+        self.bulk_import_button.setMenu(bulk_import_menu)
+        self.bulk_import_button.setEnabled(False)  # Disabled until a story is selected
+        button_layout.addWidget(self.bulk_import_button)
+        
+        # Create tag review button for images added without tagging
+        self.review_tags_button = QPushButton("Review Tags (0)")
+        self.review_tags_button.setToolTip("Review character tags of bulk imported images and auto-tag suggestions")
+        self.review_tags_button.clicked.connect(self.review_tag_queue)
+        self.review_tags_button.setEnabled(False)  # Disabled until there are images to review
+        button_layout.addWidget(self.review_tags_button)
+        
+        # Create auto-tag button to suggest tags for untagged images in the background
+        self.auto_tag_button = QPushButton("Auto-Tag")
+        self.auto_tag_button.setToolTip("Suggest character tags for untagged images in the background "
+                                        "(suggestions are added to the tag review)")
+        self.auto_tag_button.clicked.connect(self.toggle_auto_tagging)
+        self.auto_tag_button.setEnabled(False)  # Disabled until a story is selected
+        button_layout.addWidget(self.auto_tag_button)
+        
+        # Shows the watched folder and how quickly its images are imported
+        self.watch_folder_label = QLabel()
+        self.watch_folder_label.setVisible(False)
+        button_layout.addWidget(self.watch_folder_label)
+        
         # Create debug button
         self.debug_button = QPushButton("Debug Clipboard")
         self.debug_button.setToolTip("Show clipboard contents for debugging")
@@ -2494,6 +3075,13 @@ class GalleryWidget(QWidget):
         self.clear_filters_button.setEnabled(False)  # Disabled until filters are applied
         button_layout.addWidget(self.clear_filters_button)
         
+        # Add near-duplicate report button
+        self.near_duplicates_button = QPushButton("Near-Duplicates...")
+        self.near_duplicates_button.setToolTip("List groups of near-identical images in the story")
+        self.near_duplicates_button.clicked.connect(self.show_near_duplicate_report)
+        self.near_duplicates_button.setEnabled(False)  # Disabled until a story is selected
+        button_layout.addWidget(self.near_duplicates_button)
+        
         # Add spacer to push buttons to the left
         button_layout.addStretch()
         
@@ -2509,6 +3097,12 @@ class GalleryWidget(QWidget):
         self.scene_grouping_checkbox.stateChanged.connect(self.on_scene_grouping_toggle)
         button_layout.addWidget(self.scene_grouping_checkbox)
         
+        # Add near-duplicate collapsing checkbox
+        self.collapse_duplicates_checkbox = QCheckBox("Collapse Near-Duplicates")
+        self.collapse_duplicates_checkbox.setToolTip("Show only the newest image of each group of near-identical images")
+        self.collapse_duplicates_checkbox.stateChanged.connect(self.on_collapse_near_duplicates_toggle)
+        button_layout.addWidget(self.collapse_duplicates_checkbox)
+        
         # Add button layout to main layout
         main_layout.addLayout(button_layout)
         
@@ -2563,9 +3157,19 @@ class GalleryWidget(QWidget):
         # Set fixed column width for the grid layout (5 columns)
         self.thumbnails_container.setMinimumWidth(5 * 200)  # 5 thumbnails of 170px + spacing
         
+        # Reserves the space of the sections after the ones laid out so far
+        self.sections_spacer = QWidget(self.thumbnails_container)
+        self.sections_spacer.setVisible(False)
+        
         # Add container to scroll area
         self.scroll_area.setWidget(self.thumbnails_container)
         
+        # Scene sections create their thumbnails when they are scrolled into view
+        self.scroll_area.verticalScrollBar().valueChanged.connect(lambda value: self.section_load_timer.start())
+        self.scroll_area.verticalScrollBar().rangeChanged.connect(lambda minimum, maximum: self.section_load_timer.start())
+        # Thumbnail grids only show the thumbnails near the visible area
+        self.scroll_area.verticalScrollBar().valueChanged.connect(lambda value: self._update_shown_thumbnails())
+        
         # Add scroll area to main layout
         main_layout.addWidget(self.scroll_area)
         
@@ -2573,6 +3177,9 @@ class GalleryWidget(QWidget):
         self.status_label = QLabel("No story selected")
         self.status_label.setAlignment(Qt.AlignmentFlag.AlignLeft)
         main_layout.addWidget(self.status_label)
+        
+        # Accept image files and folders dropped on the gallery
+        self.setAcceptDrops(True)
     
     def _create_nsfw_placeholder(self) -> QPixmap:
         """Create a placeholder pixmap for NSFW content."""
@@ -2619,6 +3226,151 @@ class GalleryWidget(QWidget):
         # Reload images with new grouping layout
         self.load_images()
     
+    def on_collapse_near_duplicates_toggle(self, state: int) -> None:
+        """Handle near-duplicate collapsing toggle state change.
+        
+        Args:
+            state: Qt.CheckState value
+        """
+        self.collapse_near_duplicates = (state == 2)  # Qt.CheckState.Checked is 2
+        
+        # Reload images, keeping any active filters
+        if getattr(self, 'active_filters', None):
+            self.apply_filters()
+        else:
+            self.load_images()
+    
+    def get_near_duplicate_index(self) -> NearDuplicateIndex:
+        """Get the near-duplicate index of the current story, building it if needed.
+        
+        Returns:
+            The index
+        """
+        if self.near_duplicate_index is None:
+            self.near_duplicate_index = self._build_story_index(
+                NearDuplicateIndex.build, "Computing image hashes...", "Near-Duplicates")
+        return self.near_duplicate_index
+    
+    def get_similar_image_index(self) -> SimilarImageIndex:
+        """Get the similar-image index of the current story, building it if needed.
+        
+        Returns:
+            The index
+        """
+        if self.similar_image_index is None:
+            self.similar_image_index = self._build_story_index(
+                SimilarImageIndex.build, "Computing image descriptors...", "Similar Images")
+        return self.similar_image_index
+    
+    def _build_story_index(self, build, label: str, title: str):
+        """Build an index of the current story, with a progress dialog if many images need work.
+        
+        Args:
+            build: The index's build classmethod (conn, story_id, progress_callback)
+            label: Progress dialog text
+            title: Progress dialog title
+            
+        Returns:
+            The index
+        """
+        progress = None
+        
+        def on_progress(done: int, total: int) -> bool:
+            # Only images added before the index data was stored need work here
+            nonlocal progress
+            if progress is None and total >= 50:
+                progress = QProgressDialog(label, "Cancel", 0, total, self)
+                progress.setWindowTitle(title)
+                progress.setWindowModality(Qt.WindowModality.WindowModal)
+                progress.setMinimumDuration(500)
+            if progress is not None:
+                progress.setValue(done)
+                if progress.wasCanceled():
+                    return False
+            return True
+        
+        index = build(self.db_conn, self.current_story_id, on_progress)
+        if progress is not None:
+            progress.close()
+            progress.deleteLater()
+        return index
+    
+    def _collapse_near_duplicate_images(self, images: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keep only the first image (in display order) of each group of near-duplicates.
+        
+        Args:
+            images: Image data dictionaries in display order
+            
+        Returns:
+            The remaining images; each has 'hidden_near_duplicates' with the
+            IDs of the images it stands for
+        """
+        try:
+            groups = self.get_near_duplicate_index().find_groups()
+        except Exception as e:
+            print(f"Error grouping near-duplicates: {e}")
+            return images
+        
+        group_of = {}
+        for group_number, group in enumerate(groups):
+            for image_id in group:
+                group_of[image_id] = group_number
+        
+        kept = []
+        representatives: Dict[int, Dict[str, Any]] = {}
+        for image in images:
+            group_number = group_of.get(image['id'])
+            if group_number is None:
+                kept.append(image)
+            elif group_number not in representatives:
+                image = dict(image)
+                image['hidden_near_duplicates'] = []
+                representatives[group_number] = image
+                kept.append(image)
+            else:
+                representatives[group_number]['hidden_near_duplicates'].append(image['id'])
+        return kept
+    
+    def show_near_duplicate_report(self) -> None:
+        """Show the groups of near-identical images in the story."""
+        if not self.current_story_id:
+            return
+        
+        start_time = time.perf_counter()
+        index = self.get_near_duplicate_index()
+        groups = index.find_groups()
+        elapsed = time.perf_counter() - start_time
+        print(f"Near-duplicate report: {len(groups)} groups among {len(index)} images in {elapsed * 1000:.0f} ms")
+        
+        dialog = NearDuplicateReportDialog(self.db_conn, groups, len(index), elapsed, self)
+        dialog.group_activated.connect(lambda group: self.open_image_detail(group[0], group))
+        dialog.exec()
+    
+    def show_similar_images(self, image_id: int) -> None:
+        """Show the images of the story that look most like an image.
+        
+        Args:
+            image_id: ID of the image
+        """
+        if not self.current_story_id:
+            return
+        
+        index = self.get_similar_image_index()
+        start_time = time.perf_counter()
+        matches = index.find_similar_to_image(image_id)
+        elapsed = time.perf_counter() - start_time
+        print(f"Similar images for {image_id}: {len(matches)} of {len(index)} images in {elapsed * 1000:.1f} ms")
+        
+        if not matches:
+            QMessageBox.information(self, "Similar Images", "No similar images were found for this image.")
+            return
+        
+        # The dialog navigates from the image through its matches, most similar first
+        navigation_ids = [image_id] + [match_id for match_id, _ in matches]
+        dialog = SimilarImagesDialog(self.db_conn, image_id, matches, len(index), elapsed, self)
+        dialog.image_activated.connect(lambda match_id: self.open_image_detail(match_id, navigation_ids))
+        dialog.exec()
+    
     def update_thumbnail_visibility(self) -> None:
         """Update all thumbnails based on NSFW mode."""
         print(f"Updating thumbnail visibility for {len(self.thumbnails)} thumbnails")
@@ -2684,8 +3436,15 @@ class GalleryWidget(QWidget):
             story_id: ID of the story
             story_data: Data of the story
         """
+        # Auto-tagging only runs for the story it was started in
+        self.stop_auto_tagging()
+        
         self.current_story_id = story_id
         self.current_story_data = story_data
+        self.caption_provider = ThumbnailCaptionProvider(self.db_conn, story_id)
+        self.near_duplicate_index = None
+        self.similar_image_index = None
+        self.collapsed_section_keys = self._load_collapsed_section_keys()
         
         # Enable buttons
         self.paste_button.setEnabled(True)
@@ -2694,6 +3453,13 @@ class GalleryWidget(QWidget):
         self.filters_button.setEnabled(True)  # Enable the filters button
         self.clear_filters_button.setEnabled(False)  # Disable until filters are applied
         self.decision_points_button.setEnabled(True)  # Enable the decision points button
+        self.bulk_import_button.setEnabled(True)
+        self.near_duplicates_button.setEnabled(True)
+        self.auto_tag_button.setEnabled(True)
+        self.update_review_tags_button()
+        
+        # Watch the new story's folder instead of the previous story's
+        self.start_watch_folder()
         
         # Initialize active_filters if needed
         if not hasattr(self, 'active_filters'):
@@ -2702,15 +3468,36 @@ class GalleryWidget(QWidget):
         # Update status
         self.status_label.setText(f"Gallery for: {story_data['title']}")
         
-        # Build the image recognition database for this story's characters
-        try:
-            self.image_recognition.build_character_image_database()
-        except Exception as e:
-            print(f"Warning: Failed to build image recognition database: {e}")
+        # Update the recognition features of this story's changed avatars
+        self.start_character_feature_update()
         
         # Load images
         self.load_images()
     
+    def start_character_feature_update(self) -> None:
+        """Update the avatar features of the current story's characters in the background."""
+        # Only the current story's update is worth finishing
+        for job in self.character_feature_jobs:
+            job.cancel()
+        
+        job = CharacterFeatureUpdateJob(self.db_conn, self.current_story_id, self.image_recognition.cache_dir)
+        job.signals.finished.connect(
+            lambda summary, job=job: self.on_character_feature_update_finished(job, summary))
+        self.character_feature_jobs.append(job)
+        job.start(self.ingest_pool)
+    
+    def on_character_feature_update_finished(self, job: CharacterFeatureUpdateJob, summary: Dict[str, int]) -> None:
+        """Forget a finished avatar feature update.
+        
+        Args:
+            job: The finished job
+            summary: Summary of the update
+        """
+        if job in self.character_feature_jobs:
+            self.character_feature_jobs.remove(job)
+        if summary['errors']:
+            print(f"Warning: {summary['errors']} avatars could not be processed for recognition")
+    
     def load_images(self) -> None:
         """Load images for the current story."""
         if not self.current_story_id:
@@ -2719,26 +3506,23 @@ class GalleryWidget(QWidget):
         # Clear existing thumbnails
         self.clear_thumbnails()
         
-        # Get images from database
-        cursor = self.db_conn.cursor()
-        cursor.execute(
-            "SELECT id, filename, path, title, width, height FROM images WHERE story_id = ? ORDER BY created_at DESC",
-            (self.current_story_id,)
-        )
-        images = cursor.fetchall()
+        # Reload thumbnail captions only if quick events or characters changed
+        self.caption_provider.refresh()
+        
+        # Get images from database (newest first)
+        images = get_story_gallery_images(self.db_conn, self.current_story_id)
+        if self.collapse_near_duplicates:
+            images = self._collapse_near_duplicate_images(images)
         
         if not self.scene_grouping_mode:
             # Classic view - no scene grouping
             self._display_images_classic_view(images)
         else:
             # Scene grouping view
-            self._display_images_with_scene_grouping(images)
+            self._display_images_with_scene_grouping(images, whole_story=not self.collapse_near_duplicates)
             
         # Update status
-        if images:
-            self.status_label.setText(f"Gallery for: {self.current_story_data['title']} ({len(images)} images)")
-        else:
-            self.status_label.setText(f"Gallery for: {self.current_story_data['title']} (No images)")
+        self._update_image_count_status()
             
         # Ensure the container is properly sized
         self.thumbnails_container.adjustSize()
@@ -2749,278 +3533,640 @@ class GalleryWidget(QWidget):
         Args:
             images: List of image data dictionaries
         """
+        # A single section without a separator holds every image
+        section = self._add_gallery_section('classic', None, (0, 0))
+        
         # Create thumbnails
-        for i, image in enumerate(images):
-            image_id = image['id']
-            
-            # Get thumbnail pixmap
-            pixmap = self._get_image_thumbnail_pixmap(image)
-            if pixmap.isNull():
-                continue
-                
-            # Create thumbnail widget
-            row = i // 5  # 5 thumbnails per row
-            col = i % 5
-            thumbnail = ThumbnailWidget(image_id, pixmap, image['title'])
-            thumbnail.clicked.connect(self.on_thumbnail_clicked)
-            thumbnail.delete_requested.connect(self.on_delete_image)
-            thumbnail.checkbox_toggled.connect(self.on_thumbnail_checkbox_toggled)
-            
-            # Add to layout
-            self.thumbnails_layout.addWidget(thumbnail, row, col)
-            self.thumbnails[image_id] = thumbnail
-            
-            # Load quick events for this image
-            self._set_thumbnail_quick_event_text(thumbnail, image_id)
+        self._display_image_list(section, [dict(image) for image in images])
         
-        # Ensure columns have equal width
-        for col in range(5):
-            self.thumbnails_layout.setColumnStretch(col, 1)
+        self._relayout_thumbnails()
     
-    def _display_images_with_scene_grouping(self, images: List[Dict[str, Any]]) -> None:
+    def _display_images_with_scene_grouping(self, images: List[Dict[str, Any]], whole_story: bool = False) -> None:
         """Display images grouped by scenes.
         
         Args:
             images: List of image data dictionaries
+            whole_story: Whether images are all the images of the story, so
+                each section can look up its own images when it's shown
         """
         if not images:
             return
-            
-        # Convert images from sqlite3.Row objects to dictionaries
-        images_dict = []
+        
+        # Ungrouped images come first, followed by scenes with the highest
+        # sequence number (newest scenes) first. The section sort keys keep
+        # that order when sections are added or removed incrementally later.
+        # Widgets and thumbnails are only created once a section is scrolled
+        # into view, so stories with many scenes open quickly.
+        self.gallery_image_ids.update(image['id'] for image in images)
+        if whole_story:
+            # Show the headers from the image count of each scene; a section's
+            # images are looked up once it's expanded and scrolled into view
+            summaries = get_scene_summaries(self.db_conn, self.current_story_id)
+            if summaries['ungrouped']['image_count']:
+                self._add_ungrouped_section()['summary'] = summaries['ungrouped']
+            for scene in summaries['scenes']:
+                section = self._add_scene_section(scene['id'], scene['title'], scene['sequence_number'])
+                section['summary'] = {'image_count': scene['image_count'],
+                                      'newest_created_at': scene['newest_created_at']}
+            self._relayout_thumbnails()
+            self.section_load_timer.start()
+            return
+        
+        # Compute the whole scene -> images mapping of the given images with a
+        # fixed number of queries
+        grouping = group_images_by_scene(self.db_conn, self.current_story_id, images)
+        if grouping['ungrouped']:
+            self._add_ungrouped_section()['pending'] = grouping['ungrouped']
+        
+        for scene in grouping['scenes']:
+            section = self._add_scene_section(scene['id'], scene['title'], scene['sequence_number'])
+            section['pending'] = scene['images']
+        
+        self._relayout_thumbnails()
+        self.section_load_timer.start()
+    
+    def _display_image_list(self, section: Dict[str, Any], images: List[Dict[str, Any]]) -> None:
+        """Create thumbnails for a list of images and append them to a gallery section.
+        
+        Args:
+            section: Gallery section the thumbnails belong to
+            images: List of image data dictionaries, already in display order
+        """
+        self._create_section_widgets(section)
+        layout = section['grid'].layout()
         for image in images:
-            image_dict = dict(image)
-            images_dict.append(image_dict)
+            thumbnail = self._create_thumbnail_widget(image)
+            if thumbnail:
+                section['entries'].append((image, thumbnail))
+                layout.addWidget(thumbnail)
+                self.gallery_image_ids.add(image['id'])
+    
+    def _create_thumbnail_widget(self, image: Dict[str, Any]) -> Optional[ThumbnailWidget]:
+        """Create and wire up a thumbnail widget for an image.
         
-        # Replace the original images list with our dictionary version
-        images = images_dict
+        Args:
+            image: Image data dictionary
             
-        # Get all scenes in this story
-        cursor = self.db_conn.cursor()
-        cursor.execute(
-            "SELECT id, title, sequence_number FROM events WHERE story_id = ? AND event_type = 'SCENE' ORDER BY sequence_number DESC",
-            (self.current_story_id,)
-        )
-        scenes = cursor.fetchall()
+        Returns:
+            The thumbnail widget, or None if the thumbnail could not be loaded
+        """
+        image_id = image['id']
+        pixmap = self._get_image_thumbnail_pixmap(image)
+        if pixmap.isNull():
+            return None
         
-        # First, obtain creation timestamps for all images
-        for image in images:
-            cursor.execute(
-                "SELECT created_at FROM images WHERE id = ?",
-                (image['id'],)
-            )
-            result = cursor.fetchone()
-            if result:
-                image['created_at'] = result['created_at']
-            else:
-                image['created_at'] = '1970-01-01 00:00:00'  # Default fallback
+        thumbnail = ThumbnailWidget(image_id, pixmap, image['title'])
+        if image.get('hidden_near_duplicates'):
+            thumbnail.setToolTip(f"{len(image['hidden_near_duplicates'])} near-duplicate image(s) hidden")
+        thumbnail.clicked.connect(self.on_thumbnail_clicked)
+        thumbnail.delete_requested.connect(self.on_delete_image)
+        thumbnail.checkbox_toggled.connect(self.on_thumbnail_checkbox_toggled)
+        self.thumbnails[image_id] = thumbnail
         
-        # Sort images by creation timestamp (newest first)
-        images.sort(key=lambda x: x['created_at'], reverse=True)
+        # Load quick events for this image
+        self._set_thumbnail_quick_event_text(thumbnail, image_id)
+        return thumbnail
+    
+    def _add_gallery_section(self, key: Any, title: Optional[str], sort_key: Tuple) -> Dict[str, Any]:
+        """Add a section to the gallery display model.
+        
+        Sections are kept ordered by sort_key. Each section holds its
+        separator widget (if it has a title), its (image, thumbnail)
+        entries in display order, the grid widget the thumbnails are laid
+        out in (in the same order), and the images whose thumbnails haven't been created yet
+        ('pending'). Sections with a title can be collapsed.
         
-        # If we have no scenes defined, treat all images as orphans
-        if not scenes:
-            row = 0
-            separator = SeparatorWidget("Ungrouped")
-            self.thumbnails_layout.addWidget(separator, row, 0, 1, 5)  # Span all 5 columns
-            row += 1
+        The separator and grid are only created once the section is laid out
+        (see _create_section_widgets). A section whose images haven't been
+        looked up yet has a 'summary' with their image_count and
+        newest_created_at instead.
+        
+        Args:
+            key: Unique key of the section ('classic', 'ungrouped' or a scene ID)
+            title: Separator title, or None for a section without a separator
+            sort_key: Key used to order sections
             
-            self._display_image_list(images, row)
+        Returns:
+            The section dictionary
+        """
+        section = {
+            'key': key,
+            'title': title,
+            'sort_key': sort_key,
+            'separator': None,
+            'placeholder': None,
+            'collapsed': title is not None and str(key) in self.collapsed_section_keys,
+            'entries': [],
+            'pending': [],
+            'grid': None,
+            'shown': None,
+            'summary': None
+        }
+        
+        # Insert at the sorted position; a full load adds the sections in order
+        position = len(self.gallery_sections)
+        if position and self.gallery_sections[-1]['sort_key'] > sort_key:
+            position = 0
+            while position < len(self.gallery_sections) and self.gallery_sections[position]['sort_key'] <= sort_key:
+                position += 1
+        self.gallery_sections.insert(position, section)
+        return section
+    
+    def _create_section_widgets(self, section: Dict[str, Any]) -> None:
+        """Create a section's separator (if it has a title) and thumbnail grid, if not done yet."""
+        if section['grid'] is not None:
             return
         
-        # Get all quick event associations for all images
-        image_ids = [image['id'] for image in images]
-        image_quick_events = {}
-        for image_id in image_ids:
-            quick_events = get_image_quick_events(self.db_conn, image_id)
-            if quick_events:
-                image_quick_events[image_id] = quick_events
-        
-        # Find scenes for each image through:
-        # 1. Quick events associated with the image that are in scenes
-        # 2. Direct image-scene associations
-        image_scenes = {}
-        
-        # First, process indirect associations via quick events
-        for image_id, quick_events in image_quick_events.items():
-            for quick_event in quick_events:
-                scenes_for_quick_event = get_quick_event_scenes(self.db_conn, quick_event['id'])
-                if scenes_for_quick_event:
-                    # Associate image with all scenes containing the quick event
-                    if image_id not in image_scenes:
-                        image_scenes[image_id] = set()
-                    for scene in scenes_for_quick_event:
-                        image_scenes[image_id].add((scene['id'], scene['title'], scene['sequence_number']))
-        
-        # Second, process direct image-scene associations
-        for image_id in image_ids:
-            direct_scenes = get_image_scenes(self.db_conn, image_id)
-            if direct_scenes:
-                if image_id not in image_scenes:
-                    image_scenes[image_id] = set()
-                for scene in direct_scenes:
-                    image_scenes[image_id].add((scene['id'], scene['title'], scene['sequence_number']))
-        
-        # Group images by scene
-        scene_images = {}
-        orphan_images = []
+        key = section['key']
+        if section['title'] is not None:
+            separator = SeparatorWidget(section['title'], collapsible=True)
+            separator.set_collapsed(section['collapsed'])
+            separator.collapse_toggled.connect(
+                lambda collapsed, key=key: self.on_section_collapse_toggled(key, collapsed))
+            section['separator'] = separator
+        
+        # Each section has its own grid, so adding or removing a thumbnail
+        # only moves the cells after it in its section
+        grid = QWidget()
+        ThumbnailGridLayout(grid, self.scroll_area.viewport())
+        section['grid'] = grid
+    
+    def _add_ungrouped_section(self) -> Dict[str, Any]:
+        """Add the "Ungrouped" section shown at the top of the scene view."""
+        return self._add_gallery_section('ungrouped', "Ungrouped", (0, 0))
+    
+    def _add_scene_section(self, scene_id: int, title: str, sequence_number: int) -> Dict[str, Any]:
+        """Add a scene section, ordered by sequence number (highest first)."""
+        return self._add_gallery_section(scene_id, title, (1, -(sequence_number or 0)))
+    
+    def _find_gallery_section(self, key: Any) -> Optional[Dict[str, Any]]:
+        """Find a gallery section by its key."""
+        for section in self.gallery_sections:
+            if section['key'] == key:
+                return section
+        return None
+    
+    def _relayout_thumbnails(self) -> None:
+        """Position the existing separators, thumbnail grids and placeholders in the gallery.
         
-        for image in images:
-            image_id = image['id']
-            if image_id in image_scenes:
-                for scene_id, scene_title, sequence_number in image_scenes[image_id]:
-                    if scene_id not in scene_images:
-                        scene_images[scene_id] = {
-                            'title': scene_title,
-                            'sequence_number': sequence_number,
-                            'images': [],
-                            # Get the newest creation timestamp for any quick event in this scene
-                            'newest_timestamp': self._get_scene_newest_timestamp(scene_id)
-                        }
-                    scene_images[scene_id]['images'].append(image)
-            else:
-                # Image not associated with a scene
-                orphan_images.append(image)
+        This only moves widgets that already exist; no images are decoded and
+        no database queries are run.
+        """
+        self.thumbnails_container.setUpdatesEnabled(False)
+        self._place_sections()
+        self.thumbnails_container.setUpdatesEnabled(True)
+        self.thumbnails_container.adjustSize()
+    
+    def _relayout_section(self, section: Dict[str, Any]) -> None:
+        """Update a section after a thumbnail was inserted or removed, or it was collapsed.
         
-        # If we have no images in any scenes, treat all images as orphans
-        if not scene_images:
-            row = 0
-            separator = SeparatorWidget("Ungrouped")
-            self.thumbnails_layout.addWidget(separator, row, 0, 1, 5)  # Span all 5 columns
-            row += 1
-            
-            self._display_image_list(orphan_images, row)
-            return
+        The section's grid moves its own cells. The sections themselves are
+        only laid out again if the section's grid or placeholder appeared or
+        disappeared.
         
-        # Now create a chronological display order with scenes and ungrouped images interspersed
-        # Create a new display order with scenes only
-        display_order = []
+        Args:
+            section: Gallery section that changed
+        """
+        if section['grid'] is None:
+            # The section is in the spacer, unless sections after it are laid out
+            position = next(i for i, other in enumerate(self.gallery_sections) if other is section)
+            if all(other['grid'] is None for other in self.gallery_sections[position:]):
+                self._place_sections_spacer()
+            else:
+                self._place_sections()
+        elif section['shown'] != self._shown_parts(section):
+            self._place_sections()
+        else:
+            if section['separator'] is not None:
+                self._update_section_header(section)
+            if section['placeholder'] is not None:
+                section['placeholder'].setFixedHeight(self._placeholder_height(section))
+    
+    def _place_sections(self) -> None:
+        """Position each section's separator, thumbnail grid and placeholder in the gallery.
         
-        # Sort scenes by sequence number (highest first = newest scenes first)
-        sorted_scenes = sorted(
-            scene_images.items(),
-            key=lambda x: x[1]['sequence_number'],
-            reverse=True
-        )
+        Only the sections up to the last one whose widgets were created are
+        laid out; a spacer reserves the space of the sections after it.
+        """
+        # Take every item out of the layout without deleting the widgets
+        while self.thumbnails_layout.count():
+            self.thumbnails_layout.takeAt(0)
         
-        # Add all scenes in order of sequence number (highest first)
-        for scene_id, scene_data in sorted_scenes:
-            display_order.append(('scene', scene_id))
+        # Sections added before the last laid out one are laid out too
+        laid_out = 0
+        for index, section in enumerate(self.gallery_sections):
+            if section['grid'] is not None:
+                laid_out = index + 1
         
-        # Now, place unassigned images in a separate group at the top
-        if orphan_images:
-            # Sort orphaned images by creation timestamp (newest first)
-            orphan_images.sort(key=lambda x: x['created_at'], reverse=True)
-            # Insert the ungrouped section at the beginning of display_order
-            display_order.insert(0, ('ungrouped', orphan_images))
-            
-        # Now display everything according to our calculated order
         row = 0
-        for item_type, item_data in display_order:
-            if item_type == 'scene':
-                scene_id = item_data
-                scene_data = scene_images[scene_id]
-                
-                # Add a separator for this scene
-                separator = SeparatorWidget(scene_data['title'])
-                self.thumbnails_layout.addWidget(separator, row, 0, 1, 5)  # Span all 5 columns
+        for section in self.gallery_sections[:laid_out]:
+            self._create_section_widgets(section)
+            if section['separator'] is not None:
+                self._update_section_header(section)
+                self.thumbnails_layout.addWidget(section['separator'], row, 0, 1, 5)  # Span all 5 columns
+                # Show new widgets now rather than on the next event, so the
+                # layout counts them when the gallery is sized
+                section['separator'].setVisible(True)
                 row += 1
-                
-                # Display this scene's images
-                row = self._display_image_list(scene_data['images'], row)
-                
-                # Add some spacing
+            
+            # Thumbnails of collapsed sections are kept, just hidden
+            shows_grid, shows_placeholder = section['shown'] = self._shown_parts(section)
+            section['grid'].setVisible(shows_grid)
+            if shows_grid:
+                self.thumbnails_layout.addWidget(section['grid'], row, 0, 1, 5)
                 row += 1
             
-            elif item_type == 'ungrouped':
-                ungrouped_images = item_data
-                if ungrouped_images:
-                    # Add separator for ungrouped images
-                    separator = SeparatorWidget("Ungrouped")
-                    self.thumbnails_layout.addWidget(separator, row, 0, 1, 5)  # Span all 5 columns
-                    row += 1
-                    
-                    # Display ungrouped images
-                    row = self._display_image_list(ungrouped_images, row)
-                    
-                    # Add some spacing
-                    row += 1
+            # Reserve the space of thumbnails that haven't been created yet
+            placeholder = section['placeholder']
+            if shows_placeholder:
+                if placeholder is None:
+                    placeholder = QWidget()
+                    section['placeholder'] = placeholder
+                placeholder.setFixedHeight(self._placeholder_height(section))
+                self.thumbnails_layout.addWidget(placeholder, row, 0, 1, 5)
+                placeholder.setVisible(True)
+                row += 1
+            elif placeholder is not None:
+                placeholder.setVisible(False)
+            
+            # Leave a spacer row after grouped sections
+            if section['title'] is not None:
+                row += 1
+        
+        self.thumbnails_layout.addWidget(self.sections_spacer, row, 0, 1, 5)
+        self._place_sections_spacer()
         
         # Ensure columns have equal width
         for col in range(5):
             self.thumbnails_layout.setColumnStretch(col, 1)
     
+    def _place_sections_spacer(self) -> None:
+        """Size the spacer after the laid out sections to the estimated height of the others."""
+        height = 0
+        for section in self.gallery_sections:
+            if section['grid'] is None:
+                height += self._estimated_section_height(section)
+        self.sections_spacer.setFixedHeight(height)
+        self.sections_spacer.setVisible(height > 0)
+    
+    def _estimated_section_height(self, section: Dict[str, Any]) -> int:
+        """Get the estimated height of a section whose widgets haven't been created yet."""
+        height = ESTIMATED_SECTION_HEADER_HEIGHT if section['title'] is not None else 0
+        if self._has_unloaded_images(section) and not section['collapsed']:
+            height += self._placeholder_height(section) + self.thumbnails_layout.verticalSpacing()
+        return height
+    
+    def _update_shown_thumbnails(self) -> None:
+        """Show the thumbnails of each expanded section that are near the visible area."""
+        for section in self.gallery_sections:
+            if section['shown'] and section['shown'][0]:
+                section['grid'].layout().update_shown_cells()
+    
+    def _shown_parts(self, section: Dict[str, Any]) -> Tuple[bool, bool]:
+        """Check whether a section shows its thumbnail grid and its placeholder."""
+        return (bool(section['entries']) and not section['collapsed'],
+                self._has_unloaded_images(section) and not section['collapsed'])
+    
+    def _has_unloaded_images(self, section: Dict[str, Any]) -> bool:
+        """Check whether a section has images whose thumbnails haven't been created yet."""
+        return bool(section['pending']) or bool(section['summary'] and section['summary']['image_count'])
+    
+    def _placeholder_height(self, section: Dict[str, Any]) -> int:
+        """Get the estimated height of the thumbnails a section hasn't created yet."""
+        image_count = len(section['pending'])
+        if section['summary'] is not None:
+            image_count += section['summary']['image_count']
+        return ESTIMATED_THUMBNAIL_ROW_HEIGHT * ((image_count + 4) // 5)
+    
+    def _update_section_header(self, section: Dict[str, Any]) -> None:
+        """Show a section's image count and newest image date in its separator."""
+        if section['summary'] is not None:
+            section['separator'].set_summary(section['summary']['image_count'],
+                                             section['summary']['newest_created_at'])
+            return
+        images = [entry[0] for entry in section['entries'][:1]] + section['pending'][:1]
+        newest = max((image.get('created_at') or '' for image in images), default='')
+        section['separator'].set_summary(len(section['entries']) + len(section['pending']), newest)
+    
+    def _count_gallery_images(self) -> int:
+        """Count the distinct images in the gallery, including those of collapsed sections."""
+        return len(self.gallery_image_ids)
+    
+    def _materialize_section(self, section: Dict[str, Any]) -> None:
+        """Look up a section's images if needed and create the thumbnails of its pending images."""
+        if section['summary'] is not None:
+            scene_id = None if section['key'] == 'ungrouped' else section['key']
+            section['pending'] = get_section_images(self.db_conn, self.current_story_id, scene_id)
+            section['summary'] = None
+        images, section['pending'] = section['pending'], []
+        self._display_image_list(section, images)
+        if section['placeholder'] is not None:
+            self.thumbnails_layout.removeWidget(section['placeholder'])
+            section['placeholder'].deleteLater()
+            section['placeholder'] = None
+    
+    def _load_visible_sections(self) -> None:
+        """Create the widgets and thumbnails of sections that are in or near the visible area."""
+        if not any(section['grid'] is None or (self._has_unloaded_images(section) and not section['collapsed'])
+                   for section in self.gallery_sections):
+            return
+        
+        # Lay the widgets out now, sized as the scroll area will size them, so
+        # the placeholders and the spacer have their final positions
+        viewport_height = max(self.scroll_area.viewport().height(), ESTIMATED_THUMBNAIL_ROW_HEIGHT)
+        self._activate_thumbnails_layout(viewport_height)
+        
+        # Load one screen around the visible area so scrolling doesn't show empty space
+        top = self.scroll_area.verticalScrollBar().value() - viewport_height
+        bottom = self.scroll_area.verticalScrollBar().value() + 2 * viewport_height
+        
+        # Lay out the sections in the spacer down to the end of that area
+        loaded = False
+        if self.sections_spacer.isVisibleTo(self.thumbnails_container):
+            y = self.sections_spacer.y()
+            for section in self.gallery_sections:
+                if section['grid'] is None and y < bottom:
+                    self._create_section_widgets(section)
+                    y += self._estimated_section_height(section)
+                    loaded = True
+            if loaded:
+                self._place_sections()
+                self._activate_thumbnails_layout(viewport_height)
+        
+        for section in self.gallery_sections:
+            placeholder = section['placeholder']
+            if not self._has_unloaded_images(section) or section['collapsed'] or placeholder is None:
+                continue
+            if placeholder.y() < bottom and placeholder.y() + placeholder.height() > top:
+                self._materialize_section(section)
+                loaded = True
+        
+        if loaded:
+            self._relayout_thumbnails()
+            # Sections further down may have moved into view if estimates were too high
+            self.section_load_timer.start()
+    
+    def _activate_thumbnails_layout(self, viewport_height: int) -> None:
+        """Lay the gallery's widgets out now, sized as the scroll area will size them."""
+        self.thumbnails_container.resize(
+            self.thumbnails_container.width(),
+            max(viewport_height, self.thumbnails_layout.minimumSize().height())
+        )
+        self.thumbnails_layout.activate()
     
-    def _get_scene_newest_timestamp(self, scene_id: int) -> str:
-        """Get the newest timestamp for any quick event in a scene.
+    def on_section_collapse_toggled(self, key: Any, collapsed: bool) -> None:
+        """Collapse or expand a gallery section and remember it for the story.
         
         Args:
-            scene_id: ID of the scene
-            
-        Returns:
-            Timestamp string of the newest quick event
+            key: Key of the section
+            collapsed: Whether the section is now collapsed
         """
+        section = self._find_gallery_section(key)
+        if section is None:
+            return
+        
+        section['collapsed'] = collapsed
+        if collapsed:
+            self.collapsed_section_keys.add(str(key))
+        else:
+            self.collapsed_section_keys.discard(str(key))
+        self._save_collapsed_section_keys()
+        
+        self._relayout_section(section)
+        self._load_visible_sections()
+    
+    def _load_collapsed_section_keys(self) -> set:
+        """Load the keys of the current story's collapsed sections from the settings."""
+        settings = QSettings("ThePlotThickens", "ThePlotThickens")
+        keys = settings.value(f"gallery/collapsed_sections/{self.current_story_id}", [], type=list)
+        return set(str(key) for key in keys)
+    
+    def _save_collapsed_section_keys(self) -> None:
+        """Save the keys of the current story's collapsed sections to the settings."""
+        if not self.current_story_id:
+            return
+        settings = QSettings("ThePlotThickens", "ThePlotThickens")
+        key = f"gallery/collapsed_sections/{self.current_story_id}"
+        if self.collapsed_section_keys:
+            settings.setValue(key, sorted(self.collapsed_section_keys))
+        else:
+            settings.remove(key)
+    
+    def _update_image_count_status(self) -> None:
+        """Update the status label with the number of images shown."""
+        if not self.current_story_data:
+            return
+        
+        image_count = self._count_gallery_images()
+        if image_count:
+            self.status_label.setText(f"Gallery for: {self.current_story_data['title']} ({image_count} images)")
+        else:
+            self.status_label.setText(f"Gallery for: {self.current_story_data['title']} (No images)")
+    
+    def add_image_thumbnail(self, image_id: int) -> None:
+        """Insert a single image into the gallery without reloading it.
+        
+        The image is placed at its sorted position (newest first) in the
+        classic view, or in each of its scene sections when grouping by scene.
+        
+        Args:
+            image_id: ID of the image to add
+        """
+        if not self.current_story_id:
+            return
+        
+        # Filtered views are rebuilt by the filter so the new image is only
+        # shown if it matches
+        if getattr(self, 'active_filters', None):
+            self.apply_filters()
+            return
+        
         cursor = self.db_conn.cursor()
-        cursor.execute("""
-            SELECT MAX(qe.created_at) as newest_timestamp
-            FROM quick_events qe
-            JOIN scene_quick_events sqe ON qe.id = sqe.quick_event_id
-            WHERE sqe.scene_event_id = ?
-        """, (scene_id,))
-        
-        result = cursor.fetchone()
-        if result and result['newest_timestamp']:
-            return result['newest_timestamp']
+        cursor.execute(
+            "SELECT id, filename, path, title, width, height, created_at FROM images WHERE id = ? AND story_id = ?",
+            (image_id, self.current_story_id)
+        )
+        row = cursor.fetchone()
+        if not row:
+            return
+        image = dict(row)
+        
+        # The image may already have quick events (e.g. chosen while tagging a paste)
+        self.caption_provider.invalidate(image_id)
+        
+        # Work out which sections the image belongs to
+        target_sections = []
+        if not self.scene_grouping_mode:
+            section = self._find_gallery_section('classic')
+            if section is None:
+                section = self._add_gallery_section('classic', None, (0, 0))
+            target_sections.append(section)
         else:
-            # If no quick events found, use scene creation date
-            cursor.execute("""
-                SELECT created_at FROM events
-                WHERE id = ?
-            """, (scene_id,))
+            scenes = get_scenes_for_image(self.db_conn, image_id)
+            if not scenes:
+                section = self._find_gallery_section('ungrouped')
+                if section is None:
+                    section = self._add_ungrouped_section()
+                target_sections.append(section)
+            for scene in scenes:
+                section = self._find_gallery_section(scene['id'])
+                if section is None:
+                    section = self._add_scene_section(scene['id'], scene['title'], scene['sequence_number'])
+                target_sections.append(section)
+        
+        changed = []
+        # Images are ordered newest first (created_at DESC, id DESC), so a new
+        # image usually lands at the front
+        key = self._gallery_order_key(image)
+        for section in target_sections:
+            if section['summary'] is not None:
+                # The section's images haven't been looked up yet, so it will
+                # find the new image then; its summary is refreshed below
+                self.gallery_image_ids.add(image_id)
+                continue
+            
+            if section['pending'] or section['grid'] is None:
+                # The section's thumbnails haven't been created yet
+                pending = section['pending']
+                position = 0
+                while position < len(pending) and self._gallery_order_key(pending[position]) > key:
+                    position += 1
+                pending.insert(position, image)
+                self.gallery_image_ids.add(image_id)
+                changed.append(section)
+                continue
             
-            result = cursor.fetchone()
-            if result and result['created_at']:
-                return result['created_at']
+            thumbnail = self._create_thumbnail_widget(image)
+            if not thumbnail:
+                break
             
-            # Last resort fallback
-            return '1970-01-01 00:00:00'
+            entries = section['entries']
+            position = 0
+            while position < len(entries) and self._gallery_order_key(entries[position][0]) > key:
+                position += 1
+            entries.insert(position, (image, thumbnail))
+            section['grid'].layout().insertWidget(position, thumbnail)
+            self.gallery_image_ids.add(image_id)
+            changed.append(section)
+        
+        # The grids move only the cells after the new thumbnails; drop
+        # sections that ended up without thumbnails
+        self._update_changed_sections(changed)
+        self._update_image_count_status()
     
-    def _display_image_list(self, images: List[Dict[str, Any]], start_row: int) -> int:
-        """Display a list of images starting at the specified row.
+    def remove_image_thumbnail(self, image_id: int) -> None:
+        """Remove a single image from the gallery without reloading it.
         
         Args:
-            images: List of image data dictionaries
-            start_row: Starting row index
-            
+            image_id: ID of the image to remove
+        """
+        changed = []
+        for section in self.gallery_sections:
+            entries = section['entries']
+            position = next((i for i, (image, _) in enumerate(entries) if image['id'] == image_id), None)
+            if position is not None:
+                _, thumbnail = entries.pop(position)
+                section['grid'].layout().takeAt(position)
+                thumbnail.deleteLater()
+            pending = [image for image in section['pending'] if image['id'] != image_id]
+            if position is not None or len(pending) != len(section['pending']):
+                changed.append(section)
+            section['pending'] = pending
+        
+        self.gallery_image_ids.discard(image_id)
+        self.thumbnails.pop(image_id, None)
+        if image_id in self.selected_thumbnails:
+            self.selected_thumbnails.discard(image_id)
+            self.batch_panel.setVisible(bool(self.selected_thumbnails))
+        
+        self._update_changed_sections(changed)
+        self._update_image_count_status()
+    
+    def _update_changed_sections(self, changed: List[Dict[str, Any]]) -> None:
+        """Lay out the sections a thumbnail was inserted into or removed from.
+        
+        Args:
+            changed: Sections that changed
+        """
+        changed = changed + self._refresh_section_summaries()
+        if self._remove_empty_sections():
+            self._place_sections()
+        for section in changed:
+            if any(section is other for other in self.gallery_sections):
+                self._relayout_section(section)
+        if any(section['pending'] for section in changed):
+            self.section_load_timer.start()
+    
+    def _refresh_section_summaries(self) -> List[Dict[str, Any]]:
+        """Count the images of the sections whose images haven't been looked up again.
+        
         Returns:
-            The next available row index
+            The sections whose summary changed
         """
-        row = start_row
-        for i, image in enumerate(images):
-            image_id = image['id']
-            pixmap = self._get_image_thumbnail_pixmap(image)
-            if pixmap.isNull():
+        if not any(section['summary'] is not None for section in self.gallery_sections):
+            return []
+        
+        summaries = get_scene_summaries(self.db_conn, self.current_story_id)
+        summaries_by_key = {scene['id']: scene for scene in summaries['scenes']}
+        summaries_by_key['ungrouped'] = summaries['ungrouped']
+        
+        changed = []
+        for section in self.gallery_sections:
+            if section['summary'] is None:
                 continue
-                
-            col = i % 5
-            if col == 0 and i > 0:
-                row += 1
-                
-            thumbnail = ThumbnailWidget(image_id, pixmap, image['title'])
-            thumbnail.clicked.connect(self.on_thumbnail_clicked)
-            thumbnail.delete_requested.connect(self.on_delete_image)
-            thumbnail.checkbox_toggled.connect(self.on_thumbnail_checkbox_toggled)
-            
-            self.thumbnails_layout.addWidget(thumbnail, row, col)
-            self.thumbnails[image_id] = thumbnail
-            
-            self._set_thumbnail_quick_event_text(thumbnail, image_id)
+            summary = summaries_by_key.get(section['key'], {})
+            summary = {'image_count': summary.get('image_count', 0),
+                       'newest_created_at': summary.get('newest_created_at')}
+            if summary != section['summary']:
+                section['summary'] = summary
+                changed.append(section)
+        return changed
+    
+    @staticmethod
+    def _gallery_order_key(image: Dict[str, Any]) -> Tuple[str, int]:
+        """Get the key images are ordered by in the gallery, highest (newest) first."""
+        return (image.get('created_at') or '', image['id'])
+    
+    def refresh_image_thumbnail(self, image_id: int) -> None:
+        """Repaint a single image after its quick events, tags or scenes changed.
         
-        # Move to next row for future content
-        if images and len(images) % 5 != 0:
-            row += 1
-            
-        return row
+        In the classic view only the caption is updated. In the scene view
+        the image is re-placed, since its scene membership may have changed.
+        
+        Args:
+            image_id: ID of the image to refresh
+        """
+        self.caption_provider.invalidate(image_id)
+        
+        if self.scene_grouping_mode and not getattr(self, 'active_filters', None):
+            self.remove_image_thumbnail(image_id)
+            self.add_image_thumbnail(image_id)
+            return
+        
+        for section in self.gallery_sections:
+            for image, thumbnail in section['entries']:
+                if image['id'] == image_id:
+                    self._set_thumbnail_quick_event_text(thumbnail, image_id)
+    
+    def _remove_empty_sections(self) -> bool:
+        """Remove grouped sections (and their separators) that have no thumbnails left.
+        
+        Returns:
+            True if any section was removed
+        """
+        remaining = []
+        for section in self.gallery_sections:
+            if (not section['entries'] and not self._has_unloaded_images(section)
+                    and section['title'] is not None):
+                for widget in (section['separator'], section['grid'], section['placeholder']):
+                    if widget is not None:
+                        self.thumbnails_layout.removeWidget(widget)
+                        widget.deleteLater()
+            else:
+                remaining.append(section)
+        removed = len(remaining) != len(self.gallery_sections)
+        self.gallery_sections = remaining
+        return removed
     
     def _get_image_thumbnail_pixmap(self, image: Dict[str, Any]) -> QPixmap:
         """Get the thumbnail pixmap for an image.
@@ -3069,32 +4215,25 @@ class GalleryWidget(QWidget):
             thumbnail: The thumbnail widget
             image_id: ID of the image
         """
-        try:
-            quick_events = get_image_quick_events(self.db_conn, image_id)
-            if quick_events:
-                # Get all characters to format mentions
-                characters = get_story_characters(self.db_conn, self.current_story_id)
-                
-                # Format the first quick event's text
-                first_event = quick_events[0]
-                formatted_text = convert_char_refs_to_mentions(first_event['text'], characters)
-                
-                # Set the quick event text on the thumbnail
-                thumbnail.set_quick_event_text(formatted_text)
-        except Exception as e:
-            print(f"Error loading quick events for image {image_id}: {e}")
+        # Captions are batch-loaded per story by the caption provider
+        thumbnail.set_quick_event_text(self.caption_provider.get_caption(image_id))
     
     def clear_thumbnails(self) -> None:
         """Clear all thumbnails and separators."""
-        # Remove all widgets from layout
-        for i in reversed(range(self.thumbnails_layout.count())):
-            widget = self.thumbnails_layout.itemAt(i).widget()
-            if widget:
-                self.thumbnails_layout.removeWidget(widget)
-                widget.deleteLater()
+        # Remove all widgets from layout; the grids hold the thumbnails
+        while self.thumbnails_layout.count():
+            self.thumbnails_layout.takeAt(0)
+        for section in self.gallery_sections:
+            for widget in (section['separator'], section['grid'], section['placeholder']):
+                if widget is not None:
+                    widget.deleteLater()
+        
+        self.sections_spacer.setVisible(False)
         
-        # Clear thumbnails dictionary and selected thumbnails set
+        # Clear thumbnails dictionary, display sections and selected thumbnails set
         self.thumbnails.clear()
+        self.gallery_sections = []
+        self.gallery_image_ids.clear()
         self.selected_thumbnails.clear()
         
         # Hide batch operations panel
@@ -3124,6 +4263,15 @@ class GalleryWidget(QWidget):
         print(f"Clipboard formats: {formats}")
         
         if mime_data.hasImage():
+            # Keep the encoded bytes if the source application provided them
+            # (image/png is skipped: Qt synthesizes it from raw pixels on most platforms)
+            for encoded_format in ("image/jpeg", "image/webp", "image/gif"):
+                if mime_data.hasFormat(encoded_format):
+                    encoded_data = bytes(mime_data.data(encoded_format))
+                    if encoded_data:
+                        self.save_image_to_story(data=encoded_data)
+                        return
+            
             # Get image from clipboard
             image = clipboard.image()
             
@@ -3142,11 +4290,11 @@ class GalleryWidget(QWidget):
                 # Check if it's an image file by extension
                 image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.webp']
                 if any(file_path.lower().endswith(ext) for ext in image_extensions):
-                    # Try to load the image from the file
+                    # Hand the file's bytes to the ingest job, which keeps them as they are
                     try:
-                        image = QImage(file_path)
-                        if not image.isNull():
-                            self.save_image_to_story(image)
+                        if QImageReader(file_path).canRead():
+                            with open(file_path, 'rb') as image_file:
+                                self.save_image_to_story(data=image_file.read())
                         else:
                             self.show_error("Invalid Image", f"Could not load image from {file_path}")
                     except Exception as e:
@@ -3210,9 +4358,9 @@ class GalleryWidget(QWidget):
                 image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.webp']
                 if any(text.lower().endswith(ext) for ext in image_extensions):
                     try:
-                        image = QImage(text)
-                        if not image.isNull():
-                            self.save_image_to_story(image)
+                        if QImageReader(text).canRead():
+                            with open(text, 'rb') as image_file:
+                                self.save_image_to_story(data=image_file.read())
                         else:
                             self.show_error("Invalid Image", f"Could not load image from {text}")
                     except Exception as e:
@@ -3256,10 +4404,11 @@ class GalleryWidget(QWidget):
             # Read the image data
             image_data = reply.readAll()
             
-            # Create QImage from data
-            image = QImage()
-            if image.loadFromData(image_data):
-                self.save_image_to_story(image)
+            # Check the data is an image without decoding it; the ingest job decodes it
+            buffer = QBuffer(image_data)
+            buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+            if QImageReader(buffer).canRead():
+                self.save_image_to_story(data=bytes(image_data))
             else:
                 self.show_error("Invalid Image", "The downloaded data is not a valid image.")
         else:
@@ -3282,32 +4431,352 @@ class GalleryWidget(QWidget):
         )
         
         if file_path:
-            # Load image
-            image = QImage(file_path)
-            if not image.isNull():
-                # Save image
-                self.save_image_to_story(image)
+            # Check the file is an image without decoding it; the ingest job decodes it
+            if QImageReader(file_path).canRead():
+                with open(file_path, 'rb') as image_file:
+                    self.save_image_to_story(data=image_file.read())
             else:
                 self.show_error("Invalid Image", "The selected file is not a valid image.")
     
-    def save_image_to_story(self, image: QImage) -> None:
+    def bulk_import_files(self) -> None:
+        """Import several image files without the tagging dialog."""
+        if not self.current_story_id:
+            return
+        
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self,
+            "Bulk Import Images",
+            "",
+            "Image Files (*.png *.jpg *.jpeg *.bmp *.gif *.webp *.tif *.tiff)"
+        )
+        
+        if file_paths:
+            self.start_bulk_import(file_paths)
+    
+    def bulk_import_folder(self) -> None:
+        """Import all images in a folder and its subfolders without the tagging dialog."""
+        if not self.current_story_id:
+            return
+        
+        folder = QFileDialog.getExistingDirectory(self, "Bulk Import Folder")
+        
+        if folder:
+            self.start_bulk_import([folder])
+    
+    def dragEnterEvent(self, event: QDragEnterEvent) -> None:
+        """Handle drag enter event.
+        
+        Args:
+            event: Drag enter event
+        """
+        # Accept local files and folders once a story is selected
+        if self.current_story_id and event.mimeData().hasUrls():
+            if any(url.isLocalFile() for url in event.mimeData().urls()):
+                event.acceptProposedAction()
+    
+    def dropEvent(self, event: QDropEvent) -> None:
+        """Handle drop event.
+        
+        A single image file is added with the tagging dialog, like a pasted
+        image. Several files or a folder are bulk imported.
+        
+        Args:
+            event: Drop event
+        """
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        if not paths:
+            return
+        event.acceptProposedAction()
+        
+        if len(paths) == 1 and os.path.isfile(paths[0]):
+            if QImageReader(paths[0]).canRead():
+                with open(paths[0], 'rb') as image_file:
+                    self.save_image_to_story(data=image_file.read())
+            else:
+                self.show_error("Invalid Image", "The dropped file is not a valid image.")
+            return
+        
+        self.start_bulk_import(paths)
+    
+    def start_bulk_import(self, paths: List[str]) -> None:
+        """Import image files and folders in the background.
+        
+        Images are added without the tagging dialog and queued for tag review.
+        
+        Args:
+            paths: Image files and folders to import
+        """
+        if not self.current_story_id or not self.current_story_data:
+            self.show_error("No Story Selected", "Please select a story before adding images.")
+            return
+        
+        if self.bulk_import_state is not None:
+            self.show_error("Import Running", "Please wait for the current bulk import to finish.")
+            return
+        
+        file_paths = collect_image_files(paths)
+        if not file_paths:
+            self.show_error("No Images", "No image files were found to import.")
+            return
+        
+        path_lookup = get_story_folder_paths(self.current_story_data)
+        if not path_lookup or not path_lookup.get('images_folder') or not path_lookup.get('thumbnails_folder'):
+            self.show_error("Error", "Could not determine story image folders.")
+            return
+        
+        encode_format, encode_quality = get_encode_settings()
+        job = BulkImportJob(
+            self.db_conn,
+            self.current_story_id,
+            path_lookup['images_folder'],
+            path_lookup['thumbnails_folder'],
+            file_paths,
+            encode_format=encode_format,
+            encode_quality=encode_quality
+        )
+        
+        progress = QProgressDialog(f"Importing {len(file_paths)} images...", "Cancel", 0, len(file_paths), self)
+        progress.setWindowTitle("Bulk Import")
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(500)  # Show after 500ms delay
+        progress.setAutoClose(False)
+        progress.setValue(0)
+        progress.canceled.connect(job.cancel)
+        
+        state = {'job': job, 'story_id': self.current_story_id, 'progress': progress}
+        self.bulk_import_state = state
+        self.bulk_import_button.setEnabled(False)
+        
+        job.signals.progress.connect(lambda summary: self._on_bulk_import_progress(state, summary))
+        job.signals.finished.connect(lambda summary: self._on_bulk_import_finished(state, summary))
+        job.start(self.ingest_pool)
+    
+    def _on_bulk_import_progress(self, state: Dict[str, Any], summary: Dict[str, Any]) -> None:
+        """Show bulk import progress."""
+        progress = state['progress']
+        if progress is None:
+            return
+        progress.setValue(summary['processed'])
+        progress.setLabelText(
+            f"Imported {summary['imported']} of {summary['total']} images "
+            f"({summary['images_per_second']:.1f}/s)\n"
+            f"Skipped duplicates: {summary['duplicates']}, failed: {summary['failed']}"
+        )
+    
+    def _on_bulk_import_finished(self, state: Dict[str, Any], summary: Dict[str, Any]) -> None:
+        """Reload the gallery and show what a bulk import did."""
+        if state['progress'] is not None:
+            # Closing a progress dialog emits canceled, which must not cancel the job
+            state['progress'].canceled.disconnect()
+            state['progress'].close()
+            state['progress'].deleteLater()
+            state['progress'] = None
+        self.bulk_import_state = None
+        self.bulk_import_button.setEnabled(self.current_story_id is not None)
+        
+        print(f"Bulk import: {summary['imported']} imported, {summary['duplicates']} duplicates, "
+              f"{summary['failed']} failed in {summary['elapsed']:.1f}s "
+              f"({summary['images_per_second']:.1f} images/s)")
+        
+        if state['story_id'] != self.current_story_id:
+            return
+        
+        if summary['imported']:
+            self.near_duplicate_index = None
+            self.similar_image_index = None
+            self.load_images()
+        self.update_review_tags_button()
+        
+        message = (f"Imported {summary['imported']} of {summary['total']} images "
+                   f"in {summary['elapsed']:.1f} seconds ({summary['images_per_second']:.1f} images/s).\n"
+                   f"Skipped duplicates: {summary['duplicates']}")
+        if summary['cancelled']:
+            message = "The import was cancelled.\n" + message
+        if summary['failed']:
+            failed_files = "\n".join(f"{os.path.basename(path)}: {error}"
+                                     for path, error in summary['errors'][:10])
+            message += f"\nFailed: {summary['failed']}\n\n{failed_files}"
+        if summary['imported']:
+            message += "\n\nUse \"Review Tags\" to tag characters in the new images."
+        
+        QMessageBox.information(self, "Bulk Import", message)
+    
+    def choose_watch_folder(self) -> None:
+        """Pick a folder whose new images are imported into the story automatically."""
+        if not self.current_story_id:
+            return
+        
+        current = get_story_watch_folder(self.db_conn, self.current_story_id)
+        folder = QFileDialog.getExistingDirectory(
+            self,
+            "Watch Folder",
+            current['folder_path'] if current else ""
+        )
+        if not folder:
+            return
+        
+        set_story_watch_folder(self.db_conn, self.current_story_id, folder)
+        self.start_watch_folder()
+    
+    def stop_watch_folder(self) -> None:
+        """Stop importing images from the story's watch folder."""
+        if self.current_story_id:
+            remove_story_watch_folder(self.db_conn, self.current_story_id)
+        self.start_watch_folder()
+    
+    def start_watch_folder(self) -> None:
+        """Start watching the current story's watch folder, if it has one."""
+        if self.watch_folder_monitor is not None:
+            self.watch_folder_monitor.stop()
+            self.watch_folder_monitor.deleteLater()
+            self.watch_folder_monitor = None
+        self.watch_folder_label.setVisible(False)
+        self.stop_watching_action.setEnabled(False)
+        
+        if not self.current_story_id or not self.current_story_data:
+            return
+        
+        config = get_story_watch_folder(self.db_conn, self.current_story_id)
+        if not config or not config['enabled']:
+            return
+        self.stop_watching_action.setEnabled(True)
+        
+        path_lookup = get_story_folder_paths(self.current_story_data)
+        if not path_lookup or not path_lookup.get('images_folder') or not path_lookup.get('thumbnails_folder'):
+            return
+        
+        encode_format, encode_quality = get_encode_settings()
+        monitor = WatchFolderMonitor(
+            self.db_conn,
+            self.current_story_id,
+            config['folder_path'],
+            path_lookup['images_folder'],
+            path_lookup['thumbnails_folder'],
+            recursive=config['recursive'],
+            encode_format=encode_format,
+            encode_quality=encode_quality,
+            pool=self.ingest_pool,
+            parent=self
+        )
+        monitor.images_ingested.connect(self._on_watch_folder_ingested)
+        self.watch_folder_monitor = monitor
+        
+        self.watch_folder_label.setText(f"Watching: {os.path.basename(config['folder_path'])}")
+        self.watch_folder_label.setToolTip(config['folder_path'])
+        self.watch_folder_label.setVisible(True)
+        
+        if not monitor.start():
+            self.watch_folder_label.setText(f"Watch folder missing: {os.path.basename(config['folder_path'])}")
+    
+    def _on_watch_folder_ingested(self, summary: Dict[str, Any]) -> None:
+        """Show images imported from the watch folder."""
+        monitor = self.watch_folder_monitor
+        if monitor is None or monitor.story_id != self.current_story_id:
+            return
+        
+        if summary['image_ids']:
+            self.near_duplicate_index = None
+            self.similar_image_index = None
+        for image_id in summary['image_ids']:
+            self.add_image_thumbnail(image_id)
+        self.update_review_tags_button()
+        
+        metrics = monitor.get_metrics()
+        self.watch_folder_label.setText(
+            f"Watching: {os.path.basename(monitor.folder_path)} "
+            f"({metrics['ingested']} imported, {metrics['mean_latency_ms'] / 1000:.1f}s avg)"
+        )
+        self.watch_folder_label.setToolTip(
+            f"{monitor.folder_path}\n"
+            f"Imported: {metrics['ingested']} in {metrics['batches']} batches\n"
+            f"Latency: mean {metrics['mean_latency_ms']:.0f} ms, p95 {metrics['p95_latency_ms']:.0f} ms, "
+            f"max {metrics['max_latency_ms']:.0f} ms\n"
+            f"Waiting for writes to finish: {metrics['pending']}"
+        )
+    
+    def update_review_tags_button(self) -> None:
+        """Show the number of images waiting for tag review."""
+        count = len(get_tag_review_queue(self.db_conn, self.current_story_id)) if self.current_story_id else 0
+        self.review_tags_button.setText(f"Review Tags ({count})")
+        self.review_tags_button.setEnabled(count > 0)
+    
+    def review_tag_queue(self) -> None:
+        """Step through the images waiting for tag review in the image detail dialog."""
+        if not self.current_story_id:
+            return
+        
+        image_ids = get_tag_review_queue(self.db_conn, self.current_story_id)
+        if not image_ids:
+            self.update_review_tags_button()
+            return
+        
+        # Images the user looked at count as reviewed
+        viewed_image_ids = self.open_image_detail(image_ids[0], image_ids)
+        if viewed_image_ids:
+            remove_images_from_tag_review_queue(self.db_conn, list(viewed_image_ids))
+        self.update_review_tags_button()
+    
+    def toggle_auto_tagging(self) -> None:
+        """Start the auto-tagging backfill of the current story, or stop it if it's running."""
+        if self.auto_tag_job is not None:
+            self.stop_auto_tagging()
+            return
+        if not self.current_story_id:
+            return
+        
+        # The backfill resumes after the last image it saved suggestions for
+        job = AutoTagBackfillJob(self.db_conn, self.current_story_id)
+        job.signals.progress.connect(lambda summary, job=job: self._on_auto_tag_progress(job, summary))
+        job.signals.finished.connect(lambda summary, job=job: self._on_auto_tag_finished(job, summary))
+        self.auto_tag_job = job
+        self.auto_tag_button.setText("Stop Auto-Tag")
+        job.start(self.auto_tag_pool)
+    
+    def stop_auto_tagging(self) -> None:
+        """Stop the auto-tagging backfill; the images it has finished keep their suggestions."""
+        if self.auto_tag_job is not None:
+            self.auto_tag_job.cancel()
+            self.auto_tag_job = None
+        self.auto_tag_button.setText("Auto-Tag")
+    
+    def _on_auto_tag_progress(self, job: AutoTagBackfillJob, summary: Dict[str, Any]) -> None:
+        """Show auto-tagging progress and the new images to review."""
+        if job is not self.auto_tag_job:
+            return
+        self.auto_tag_button.setText(f"Stop Auto-Tag ({summary['processed']} checked)")
+        self.update_review_tags_button()
+    
+    def _on_auto_tag_finished(self, job: AutoTagBackfillJob, summary: Dict[str, Any]) -> None:
+        """Report what an auto-tagging run did."""
+        print(f"Auto-tagging: {summary['processed']} images checked, {summary['suggested']} with suggestions, "
+              f"{summary['remaining']} left, {len(summary['errors'])} errors in {summary['elapsed']:.1f}s")
+        if job is not self.auto_tag_job:
+            return
+        self.auto_tag_job = None
+        self.auto_tag_button.setText("Auto-Tag")
+        self.update_review_tags_button()
+        if summary['completed']:
+            self.status_label.setText(f"Auto-tagging finished: {summary['suggested']} images have suggestions "
+                                      f"to review")
+    
+    def save_image_to_story(self, image: Optional[QImage] = None, data: Optional[bytes] = None) -> None:
         """Save image to story folder and database.
         
+        The image is saved by a background ingest job. The character
+        recognition dialog opens as soon as the decoded image is available,
+        and the tags chosen in it are saved once the image row exists.
+        
         Args:
             image: The image to save
+            data: Encoded image bytes, decoded in the background (used if image is None)
         """
         if not self.current_story_id or not self.current_story_data:
             self.show_error("No Story Selected", "Please select a story before adding images.")
             return
             
         try:
-            # Generate a unique filename
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            rand_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
-            filename = f"image_{timestamp}_{rand_suffix}.png"
-            
             # Get story folder paths
-            from app.db_sqlite import get_story_folder_paths, create_image, add_character_tag_to_image
+            from app.db_sqlite import get_story_folder_paths
             
             # Get story folder paths using the correct function signature
             path_lookup = get_story_folder_paths(self.current_story_data)
@@ -3316,113 +4785,226 @@ class GalleryWidget(QWidget):
             if not path_lookup or not path_lookup.get('images_folder') or not path_lookup.get('thumbnails_folder'):
                 self.show_error("Error", "Could not determine story image folders.")
                 return
+            
+            # Encoded sources keep their bytes; raw pixels use the configured format
+            encode_format, encode_quality = get_encode_settings()
+            job = ImageIngestJob(
+                self.db_conn,
+                self.current_story_id,
+                path_lookup['images_folder'],
+                path_lookup['thumbnails_folder'],
+                image=image,
+                data=data,
+                encode_format=encode_format,
+                encode_quality=encode_quality
+            )
+            self.start_ingest_job(job)
+            
+        except Exception as e:
+            self.show_error("Error", f"Failed to save image: {str(e)}")
+            print(f"Error saving image: {e}")
+    
+    def start_ingest_job(self, job: ImageIngestJob) -> None:
+        """Start an ingest job and connect it to the progress and tagging UI.
+        
+        Args:
+            job: The ingest job
+        """
+        state = {
+            'job': job,
+            'story_id': job.story_id,
+            'progress': None,
+            'region_dialog': None,
+            'dialog_closed': False,
+            'tag_data': None,
+            'result': None,
+            'near_duplicates': [],
+        }
+        self.ingest_jobs.append(state)
+        
+        # Progress until the image is decoded; after that the tagging dialog shows it
+        progress = QProgressDialog("Preparing image...", "Cancel", 0, len(STAGE_LABELS), self)
+        progress.setWindowTitle("Adding Image")
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(500)  # Show after 500ms delay
+        progress.setAutoClose(False)
+        progress.setValue(0)
+        progress.canceled.connect(job.cancel)
+        state['progress'] = progress
+        
+        job.signals.stage_changed.connect(lambda stage, label: self._on_ingest_stage_changed(state, stage, label))
+        job.signals.decoded.connect(lambda image: self._on_ingest_decoded(state, image))
+        job.signals.duplicate_found.connect(lambda image_id: self._on_ingest_duplicate(state, image_id))
+        job.signals.perceptual_hash_computed.connect(
+            lambda hash_value: self._on_ingest_perceptual_hash(state, hash_value))
+        job.signals.completed.connect(lambda result: self._on_ingest_completed(state, result))
+        job.signals.failed.connect(lambda message: self._on_ingest_failed(state, message))
+        job.signals.cancelled.connect(lambda: self._on_ingest_cancelled(state))
+        
+        job.start(self.ingest_pool)
+    
+    def _close_ingest_progress(self, state: Dict[str, Any]) -> None:
+        """Close an ingest job's progress dialog if it is still open."""
+        if state['progress'] is not None:
+            # Closing a progress dialog emits canceled, which must not cancel the job
+            state['progress'].canceled.disconnect()
+            state['progress'].close()
+            state['progress'].deleteLater()
+            state['progress'] = None
+    
+    def _on_ingest_stage_changed(self, state: Dict[str, Any], stage: int, label: str) -> None:
+        """Show an ingest job's current stage."""
+        if state['progress'] is not None:
+            state['progress'].setLabelText(label)
+            state['progress'].setValue(stage)
+        if state['region_dialog'] is not None:
+            state['region_dialog'].set_ingest_status(stage, label)
+    
+    def _on_ingest_decoded(self, state: Dict[str, Any], image: QImage) -> None:
+        """Open the character recognition dialog for a decoded image.
+        
+        Runs while the rest of the pipeline continues in the background.
+        """
+        self._close_ingest_progress(state)
+        if state['job'].is_cancelled():
+            return
+        
+        region_dialog = RegionSelectionDialog(self.db_conn, image, state['story_id'], self)
+        region_dialog.set_ingest_job(state['job'])
+        state['region_dialog'] = region_dialog
+        if state['near_duplicates']:
+            region_dialog.set_near_duplicates(state['near_duplicates'])
+        if state['result'] is not None:
+            region_dialog.set_ingest_result(state['result'])
+        
+        if region_dialog.exec():
+            state['tag_data'] = region_dialog.get_selected_character_data()
+        
+        state['region_dialog'] = None
+        state['dialog_closed'] = True
+        self._finish_ingest_if_done(state)
+    
+    def _on_ingest_duplicate(self, state: Dict[str, Any], image_id: int) -> None:
+        """Tell the user the image is already in the story."""
+        self._close_ingest_progress(state)
+        if state['region_dialog'] is not None:
+            state['region_dialog'].reject()
+        self._end_ingest(state)
+        
+        QMessageBox.information(
+            self,
+            "Duplicate Image",
+            "This image is already in the story, so it was not added again."
+        )
+        if image_id in self.thumbnails:
+            self.thumbnails[image_id].setFocus()
+    
+    def _on_ingest_perceptual_hash(self, state: Dict[str, Any], hash_value: int) -> None:
+        """Warn if the image being added looks like one already in the story."""
+        if state['story_id'] != self.current_story_id:
+            return
+        try:
+            state['near_duplicates'] = self.get_near_duplicate_index().find(hash_value)
+        except Exception as e:
+            print(f"Error looking for near-duplicates: {e}")
+            return
+        if state['near_duplicates'] and state['region_dialog'] is not None:
+            state['region_dialog'].set_near_duplicates(state['near_duplicates'])
+    
+    def _on_ingest_completed(self, state: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """Store an ingest job's result, and save tags if the dialog is already closed."""
+        self._close_ingest_progress(state)
+        state['result'] = result
+        if state['region_dialog'] is not None:
+            state['region_dialog'].set_ingest_result(result)
+        
+        # No dialog was opened (e.g. the job was cancelled after decoding)
+        if state['region_dialog'] is None and not state['dialog_closed']:
+            state['dialog_closed'] = True
+        self._finish_ingest_if_done(state)
+    
+    def _on_ingest_failed(self, state: Dict[str, Any], message: str) -> None:
+        """Report a failed ingest job."""
+        self._close_ingest_progress(state)
+        if state['region_dialog'] is not None:
+            state['region_dialog'].reject()
+        self._end_ingest(state)
+        self.show_error("Save Failed", f"Failed to save image: {message}")
+    
+    def _on_ingest_cancelled(self, state: Dict[str, Any]) -> None:
+        """Clean up after a cancelled ingest job."""
+        self._close_ingest_progress(state)
+        if state['region_dialog'] is not None:
+            state['region_dialog'].reject()
+        self._end_ingest(state)
+    
+    def _end_ingest(self, state: Dict[str, Any]) -> None:
+        """Forget a finished ingest job."""
+        if state in self.ingest_jobs:
+            self.ingest_jobs.remove(state)
+    
+    def _finish_ingest_if_done(self, state: Dict[str, Any]) -> None:
+        """Save the chosen tags and show the image once both the job and the dialog are done."""
+        result = state['result']
+        if result is None or not state['dialog_closed'] or state not in self.ingest_jobs:
+            return
+        self._end_ingest(state)
+        
+        image_id = result['image_id']
+        if state['tag_data']:
+            self.save_region_selection_data(image_id, state['tag_data'])
+        
+        # Insert the new image into the gallery (if the story is still shown)
+        if state['story_id'] == self.current_story_id:
+            if self.near_duplicate_index is not None and result.get('perceptual_hash') is not None:
+                self.near_duplicate_index.add(image_id, result['perceptual_hash'])
+            if self.similar_image_index is not None and result.get('descriptor') is not None:
+                self.similar_image_index.add(image_id, result['descriptor'])
+            self.add_image_thumbnail(image_id)
+    
+    def save_region_selection_data(self, image_id: int, result_data: Dict[str, Any]) -> None:
+        """Save the character tags and quick event chosen in the recognition dialog.
+        
+        Args:
+            image_id: ID of the image
+            result_data: Data from RegionSelectionDialog.get_selected_character_data()
+        """
+        from app.db_sqlite import add_character_tag_to_image
+        
+        character_data = result_data.get('characters', [])
+        quick_event_id = result_data.get('quick_event_id')
+        
+        try:
+            # Process each selected character
+            for character in character_data:
+                character_id = character['character_id']
+                region = character['region']
                 
-            # Create paths
-            images_path = path_lookup['images_folder']
-            thumbnails_path = path_lookup['thumbnails_folder']
-            
-            # Ensure directories exist
-            os.makedirs(images_path, exist_ok=True)
-            os.makedirs(thumbnails_path, exist_ok=True)
-            
-            # Save original image
-            full_path = os.path.join(images_path, filename)
-            if not image.save(full_path, "PNG"):
-                self.show_error("Save Failed", "Failed to save image file.")
-                return
-                
-            # Generate and save thumbnail
-            thumbnail = self._generate_thumbnail(image)
-            thumbnail_path = os.path.join(thumbnails_path, filename)
-            if not thumbnail.save(thumbnail_path, "PNG"):
-                self.show_error("Save Failed", "Failed to save thumbnail.")
-                os.remove(full_path)  # Clean up the original file
-                return
+                # Debug info
+                print(f"Adding tag for {character['character_name']} at position: ", 
+                      f"x={region['x']}, y={region['y']}, width={region['width']}, height={region['height']}")
                 
-            # Save to database
-            image_id = create_image(
-                self.db_conn,
-                filename=filename,
-                path=images_path,
-                story_id=self.current_story_id,
-                title="",  # Default empty title
-                description="",  # Default empty description
-                width=image.width(),
-                height=image.height()
-            )
-            
-            if not image_id:
-                self.show_error("Database Error", "Failed to add image to database.")
-                # Clean up files
-                os.remove(full_path)
-                os.remove(thumbnail_path)
-                return
+                # Add the character tag to the image with the region coordinates
+                # The x and y values from region are already the center point
+                tag_id = add_character_tag_to_image(
+                    self.db_conn,
+                    image_id,
+                    character_id,
+                    region['x'],  # Already center X (normalized)
+                    region['y'],  # Already center Y (normalized)
+                    region['width'],  # Width (normalized)
+                    region['height'],  # Height (normalized)
+                    f"Auto-detected with {int(character['similarity'] * 100)}% confidence"
+                )
                 
-            # Run face detection to find possible character regions
-            # Use a progress dialog for longer operations
-            progress_dialog = QProgressDialog(
-                "Analyzing image for character recognition...",
-                "Cancel", 0, 100, self
-            )
-            progress_dialog.setWindowTitle("Character Recognition")
-            progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
-            progress_dialog.setMinimumDuration(500)  # Show after 500ms delay
-            progress_dialog.setValue(0)
-            
-            # Allow some processing before showing the dialog
-            QApplication.processEvents()
-            
-            # Do character recognition 
-            region_dialog = RegionSelectionDialog(self.db_conn, image, self.current_story_id, self, image_id=image_id)
-            
-            progress_dialog.setValue(100)
-            progress_dialog.close()
-            
-            if region_dialog.exec():
-                # Get selected character data and quick event information
-                result_data = region_dialog.get_selected_character_data()
-                character_data = result_data.get('characters', [])
-                quick_event_id = result_data.get('quick_event_id')
+                print(f"Successfully added tag with ID: {tag_id}")
                 
-                if character_data:
-                    try:
-                        # Process each selected character
-                        for character in character_data:
-                            character_id = character['character_id']
-                            region = character['region']
-                            
-                            # Debug info
-                            print(f"Adding tag for {character['character_name']} at position: ", 
-                                  f"x={region['x']}, y={region['y']}, width={region['width']}, height={region['height']}")
-                            
-                            # Add the character tag to the image with the region coordinates
-                            # The x and y values from region are already the center point
-                            tag_id = add_character_tag_to_image(
-                                self.db_conn,
-                                image_id,
-                                character_id,
-                                region['x'],  # Already center X (normalized)
-                                region['y'],  # Already center Y (normalized)
-                                region['width'],  # Width (normalized)
-                                region['height'],  # Height (normalized)
-                                f"Auto-detected with {int(character['similarity'] * 100)}% confidence"
-                            )
-                            
-                            print(f"Successfully added tag with ID: {tag_id}")
-                            
-                        # If a quick event was selected, associate it with the image
-                        if quick_event_id:
-                            self.associate_quick_event_with_image(image_id, quick_event_id)
-                    except Exception as e:
-                        print(f"Error saving character tags: {e}")
-                        self.show_error("Error", f"Error saving character tags: {str(e)}")
-            
-            # Reload images to show the new one
-            self.load_images()
-            
+            # If a quick event was selected, associate it with the image
+            if quick_event_id:
+                self.associate_quick_event_with_image(image_id, quick_event_id)
         except Exception as e:
-            self.show_error("Error", f"Failed to save image: {str(e)}")
-            print(f"Error saving image: {e}")
+            print(f"Error saving character tags: {e}")
+            self.show_error("Error", f"Error saving character tags: {str(e)}")
     
     def associate_quick_event_with_image(self, image_id: int, quick_event_id: int) -> None:
         """Associate a quick event with an image.
@@ -3460,35 +5042,7 @@ class GalleryWidget(QWidget):
         Returns:
             Thumbnail image
         """
-        # Get original dimensions
-        width = image.width()
-        height = image.height()
-        
-        # Calculate new dimensions while maintaining aspect ratio
-        if width > height:
-            # Landscape orientation
-            if width > max_dimension:
-                new_width = max_dimension
-                new_height = int(height * (max_dimension / width))
-            else:
-                # Image is already smaller than max dimension
-                return image.copy()
-        else:
-            # Portrait orientation
-            if height > max_dimension:
-                new_height = max_dimension
-                new_width = int(width * (max_dimension / height))
-            else:
-                # Image is already smaller than max dimension
-                return image.copy()
-        
-        # Create scaled image with smooth transformation
-        return image.scaled(
-            new_width, 
-            new_height,
-            Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.SmoothTransformation
-        )
+        return generate_thumbnail(image, max_dimension)
     
     def on_thumbnail_clicked(self, image_id: int) -> None:
         """Handle thumbnail click event.
@@ -3496,6 +5050,19 @@ class GalleryWidget(QWidget):
         Args:
             image_id: ID of the clicked image
         """
+        self.open_image_detail(image_id)
+    
+    def open_image_detail(self, image_id: int, gallery_image_ids: Optional[List[int]] = None) -> Set[int]:
+        """Show an image in the image detail dialog.
+        
+        Args:
+            image_id: ID of the image to show first
+            gallery_image_ids: Image IDs to navigate through (all of the story's
+                images, newest first, if None)
+            
+        Returns:
+            IDs of the images that were shown in the dialog
+        """
         try:
             # Get image data
             cursor = self.db_conn.cursor()
@@ -3507,7 +5074,7 @@ class GalleryWidget(QWidget):
             
             if not image_data:
                 self.show_error("Image Not Found", f"Image with ID {image_id} not found.")
-                return
+                return set()
             
             image_data = dict(image_data)
             
@@ -3516,27 +5083,31 @@ class GalleryWidget(QWidget):
             
             if not os.path.exists(image_path):
                 self.show_error("Image Not Found", f"Image file not found at {image_path}")
-                return
-            
-            # Load image
-            pixmap = QPixmap(image_path)
-            
-            if pixmap.isNull():
-                self.show_error("Image Load Failed", f"Failed to load image from {image_path}")
-                return
+                return set()
+            
+            # Load image. Very large images are shown in tiles by the dialog
+            # instead of being decoded in full here.
+            pixmap = None
+            image_size = get_image_size(image_path)
+            if not (image_size.isValid() and should_tile(image_size.width(), image_size.height())):
+                pixmap = QPixmap(image_path)
+                
+                if pixmap.isNull():
+                    self.show_error("Image Load Failed", f"Failed to load image from {image_path}")
+                    return set()
             
             # Get all image IDs in the gallery for navigation
-            gallery_image_ids = []
             current_index = None
             
-            # Get all images for the current story sorted by creation date (newest first)
-            cursor.execute('''
-            SELECT id FROM images
-            WHERE story_id = ?
-            ORDER BY created_at DESC
-            ''', (self.current_story_id,))
-            
-            gallery_image_ids = [row['id'] for row in cursor.fetchall()]
+            if gallery_image_ids is None:
+                # Get all images for the current story sorted by creation date (newest first)
+                cursor.execute('''
+                SELECT id FROM images
+                WHERE story_id = ?
+                ORDER BY created_at DESC
+                ''', (self.current_story_id,))
+                
+                gallery_image_ids = [row['id'] for row in cursor.fetchall()]
             
             # Find the index of the current image
             try:
@@ -3568,8 +5139,16 @@ class GalleryWidget(QWidget):
             
             dialog.exec()
             
+            # Tags and quick events may have been edited in the dialog
+            for viewed_image_id in dialog.viewed_image_ids:
+                self.refresh_image_thumbnail(viewed_image_id)
+            
+            return dialog.viewed_image_ids
+            
         except Exception as e:
             self.show_error("Error", f"An error occurred: {str(e)}")
+        
+        return set()
     
     def on_thumbnail_context_menu(self, position: QPoint, thumbnail: ThumbnailWidget) -> None:
         """Show context menu when right-clicking on a thumbnail.
@@ -3585,6 +5164,7 @@ class GalleryWidget(QWidget):
         view_action = menu.addAction("View Image")
         tag_action = menu.addAction("Tag Characters")
         quick_events_action = menu.addAction("Quick Events")
+        similar_action = menu.addAction("Find Similar Images")
         menu.addSeparator()
         delete_action = menu.addAction("Delete Image")
         
@@ -3632,6 +5212,8 @@ class GalleryWidget(QWidget):
             self.open_image_for_tagging(image_id)
         elif selected_action == quick_events_action:
             self.open_quick_event_dialog(image_id)
+        elif selected_action == similar_action:
+            self.show_similar_images(image_id)
         elif selected_action == delete_action:
             self.on_delete_image(image_id)
         else:
@@ -3651,8 +5233,8 @@ class GalleryWidget(QWidget):
                             # Remove image from scene
                             remove_image_from_scene(self.db_conn, scene_id, image_id)
                     
-                    # Reload the gallery to reflect changes
-                    self.load_images()
+                    # Re-place the image to reflect changes
+                    self.refresh_image_thumbnail(image_id)
                     break
     
     def open_quick_event_dialog(self, image_id: int) -> None:
@@ -3687,8 +5269,8 @@ class GalleryWidget(QWidget):
                 if qe_id not in current_ids:
                     associate_quick_event_with_image(self.db_conn, qe_id, image_id)
             
-            # Reload images to reflect changes
-            self.load_images()
+            # Repaint the thumbnail to reflect changes
+            self.refresh_image_thumbnail(image_id)
     
     def on_delete_image(self, image_id: int) -> None:
         """Handle image deletion.
@@ -3736,16 +5318,17 @@ class GalleryWidget(QWidget):
                 # Delete from database
                 cursor.execute("DELETE FROM images WHERE id = ?", (image_id,))
                 self.db_conn.commit()
+                remove_images_from_tag_review_queue(self.db_conn, [image_id])
+                delete_tag_suggestions(self.db_conn, image_ids=[image_id])
+                delete_image_descriptors(self.db_conn, [image_id])
+                if self.near_duplicate_index is not None:
+                    self.near_duplicate_index.remove(image_id)
+                if self.similar_image_index is not None:
+                    self.similar_image_index.remove(image_id)
                 
-                # Remove thumbnail
-                if image_id in self.thumbnails:
-                    thumbnail = self.thumbnails[image_id]
-                    self.thumbnails_layout.removeWidget(thumbnail)
-                    thumbnail.deleteLater()
-                    del self.thumbnails[image_id]
-                
-                # Reload images to update layout
-                self.load_images()
+                # Remove thumbnail and close the gap in the layout
+                self.remove_image_thumbnail(image_id)
+                self.update_review_tags_button()
                 
                 # Make sure the paste button is enabled and set focus back to the gallery widget
                 if self.current_story_id:
@@ -3979,7 +5562,8 @@ class GalleryWidget(QWidget):
         
         try:
             # Extract image features
-            features = self.image_recognition.extract_features_from_qimage(image)
+            features = self.image_recognition.extract_features_from_qimage(
+                image, self.image_recognition.needs_descriptor(self.current_story_id))
             
             # Get character suggestions
             character_suggestions = self.image_recognition.identify_characters_in_image(
@@ -4137,10 +5721,17 @@ class GalleryWidget(QWidget):
                         f"{success_count} images moved to '{scene_title}'. {error_count} errors occurred."
                     )
                 
-                # Clear selections and refresh gallery
+                # Clear selections and re-place the moved images
+                moved_image_ids = list(self.selected_thumbnails)
+                for image_id in moved_image_ids:
+                    thumbnail = self.thumbnails.get(image_id)
+                    if thumbnail:
+                        thumbnail.checkbox.setChecked(False)
                 self.selected_thumbnails.clear()
                 self.batch_panel.setVisible(False)
-                self.load_images()
+                if self.scene_grouping_mode:
+                    for image_id in moved_image_ids:
+                        self.refresh_image_thumbnail(image_id)
 
     def show_filters_dialog(self):
         """Show the gallery filters dialog."""
@@ -4156,6 +5747,7 @@ class GalleryWidget(QWidget):
         
         # Set the current filters
         dialog.character_filters = self.active_filters.copy() if hasattr(self, 'active_filters') else []
+        dialog.match_mode = self.filter_match_mode
         
         # Populate the filter list with current filters
         dialog.populate_filter_list()
@@ -4164,6 +5756,7 @@ class GalleryWidget(QWidget):
         if dialog.exec():
             # Get the filters
             self.active_filters = dialog.get_character_filters()
+            self.filter_match_mode = dialog.get_match_mode()
             
             # Apply the filters
             self.apply_filters()
@@ -4178,38 +5771,14 @@ class GalleryWidget(QWidget):
             self.load_images()
             return
             
-        # Get all images
-        from app.db_sqlite import get_story_images, get_image_character_tags
-            
         try:
-            # Get all images for the story
-            all_images = get_story_images(self.db_conn, self.current_story_id)
-            filtered_images = []
-            
-            # For each image, check if it matches the filters
-            for image in all_images:
-                # Get character tags for this image
-                tags = get_image_character_tags(self.db_conn, image['id'])
-                tagged_character_ids = [tag['character_id'] for tag in tags]
-                
-                # Check if image satisfies filter conditions
-                satisfies_filters = True
-                
-                for character_id, include in self.active_filters:
-                    if include:
-                        # Must include this character
-                        if character_id not in tagged_character_ids:
-                            satisfies_filters = False
-                            break
-                    else:
-                        # Must exclude this character
-                        if character_id in tagged_character_ids:
-                            satisfies_filters = False
-                            break
-                
-                # If image satisfies all filters, add it to the filtered list
-                if satisfies_filters:
-                    filtered_images.append(image)
+            # Evaluate the filters against a bitset index built with one query
+            tag_index = CharacterTagIndex(self.db_conn, self.current_story_id)
+            expression = build_filter_expression(self.active_filters, self.filter_match_mode)
+            filtered_images = tag_index.matching_images(expression)
+            if self.collapse_near_duplicates:
+                filtered_images = self._collapse_near_duplicate_images(filtered_images)
+            self.caption_provider.refresh()
             
             # Clear all existing thumbnails
             self.clear_thumbnails()
@@ -4246,9 +5815,9 @@ class GalleryWidget(QWidget):
         
         # Update status to reflect no filters
         if hasattr(self, 'current_story_data') and self.current_story_data:
-            self.status_label.setText(f"Gallery for: {self.current_story_data['title']} ({len(self.thumbnails)} images)")
+            self.status_label.setText(f"Gallery for: {self.current_story_data['title']} ({self._count_gallery_images()} images)")
         else:
-            self.status_label.setText(f"Gallery: {len(self.thumbnails)} images")
+            self.status_label.setText(f"Gallery: {self._count_gallery_images()} images")
         
         # Disable clear button
         self.clear_filters_button.setEnabled(False)
@@ -4264,7 +5833,7 @@ class GalleryWidget(QWidget):
         exclude_count = sum(1 for _, include in self.active_filters if not include)
         
         # Get the number of images
-        visible_count = len(self.thumbnails) if self.thumbnails else 0
+        visible_count = self._count_gallery_images()
         
         # Create filter status
         filter_parts = []
@@ -4275,6 +5844,8 @@ class GalleryWidget(QWidget):
             
         if filter_parts:
             filter_text = f"Filters active: {', '.join(filter_parts)}"
+            if include_count > 1 and self.filter_match_mode == MATCH_ANY:
+                filter_text += " (any)"
             self.status_label.setText(f"Gallery: {visible_count} images • {filter_text}")
 
 
@@ -4312,9 +5883,23 @@ class RegionSelectionDialog(QDialog):
         # Image recognition utility
         self.image_recognition = ImageRecognitionUtil(db_conn)
         
+        # Regions are recognized in the background (jobs are kept until they report)
+        self.recognition_pool = create_region_recognition_pool(self)
+        self.recognition_jobs: List[RegionRecognitionJob] = []
+        self.finished.connect(self.cancel_region_recognition)
+        
         # Set image_id - try multiple sources
         self.image_id = image_id
         
+        # Navigation data (set by callers that allow paging through the gallery)
+        self.gallery_images: List[int] = []
+        self.current_index: Optional[int] = None
+        self.prefetcher: Optional[ImagePrefetcher] = None
+        
+        # Background job still saving this image, if the dialog was opened while importing
+        self.ingest_job: Optional[ImageIngestJob] = None
+        self.image_suggestions: List[Dict[str, Any]] = []
+        
         # If image_id is not provided directly, try to get it from parent
         if not self.image_id:
             if parent and hasattr(parent, 'image_id'):
@@ -4388,7 +5973,10 @@ class RegionSelectionDialog(QDialog):
         self.load_image_at_current_index()
     
     def load_image_at_current_index(self):
-        """Load the image at the current index."""
+        """Load the image at the current index.
+        
+        Switching images discards the regions drawn on the previous one.
+        """
         if not self.gallery_images or self.current_index is None:
             return
             
@@ -4396,55 +5984,47 @@ class RegionSelectionDialog(QDialog):
             # Get the new image ID
             new_image_id = self.gallery_images[self.current_index]
             
-            # Get image data from database
-            cursor = self.db_conn.cursor()
-            cursor.execute("SELECT * FROM images WHERE id = ?", (new_image_id,))
-            image_data = cursor.fetchone()
-            
-            if not image_data:
-                self.status_bar.showMessage(f"Error: Image with ID {new_image_id} not found.", 5000)
-                return
-                
-            image_data = dict(image_data)
-            
-            # Load the image
-            image_path = os.path.join(image_data['path'], image_data['filename'])
-            if not os.path.exists(image_path):
-                self.status_bar.showMessage(f"Error: Image file not found at {image_path}", 5000)
-                return
+            # Use the prefetched image if ready, otherwise load synchronously
+            if self.prefetcher is None:
+                self.prefetcher = ImagePrefetcher(self.db_conn, parent=self)
+                self.finished.connect(self.prefetcher.shutdown)
+            entry = self.prefetcher.take(new_image_id)
+            if entry is None:
+                entry = load_image_entry(self.db_conn, new_image_id)
                 
-            pixmap = QPixmap(image_path)
-            if pixmap.isNull():
-                self.status_bar.showMessage(f"Error: Failed to load image from {image_path}", 5000)
+            if entry is None:
+                print(f"Error: Failed to load image {new_image_id}")
                 return
-                
-            # Update the dialog with new image data
-            self.image_id = new_image_id
-            self.image_data = image_data
-            self.orig_pixmap = pixmap
-            self.pixmap = pixmap
-            self.image_width = pixmap.width()
-            self.image_height = pixmap.height()
             
-            # Update the window title
-            self.setWindowTitle(image_data.get('title') or f"Image {new_image_id}")
+            # Drop the regions drawn on the previous image
+            self.cancel_region_recognition(wait=False)
+            for region in self.selected_regions:
+                if region['rect_item']:
+                    self.scene.removeItem(region['rect_item'])
+            self.selected_regions.clear()
+            self.region_list.clear()
+            self.result_list.clear()
             
-            # Update the image view
-            self.image_view.set_image(pixmap, self.image_width, self.image_height)
+            # Update the dialog with the new image
+            self.image_id = new_image_id
+            # Regions are cropped from the full image, so decode large images too
+            self.image = entry['image'] if entry['image'] is not None else QImage(
+                os.path.join(entry['image_data']['path'], entry['image_data']['filename']))
+            self.scene.removeItem(self.pixmap_item)
+            self.pixmap_item = QGraphicsPixmapItem(QPixmap.fromImage(self.image))
+            self.scene.addItem(self.pixmap_item)
+            self.scene.setSceneRect(self.pixmap_item.boundingRect())
+            self.view.fitInView(self.scene.sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
             
-            # Update navigation buttons
-            self.prev_button.setEnabled(self.can_navigate_previous())
-            self.next_button.setEnabled(self.can_navigate_next())
+            # Update the window title
+            self.setWindowTitle(entry['image_data'].get('title') or f"Image {new_image_id}")
             
-            # Reload quick events and character tags
-            self.load_quick_events()
-            self.load_character_tags()
+            # Start decoding the new neighbours
+            self.prefetcher.set_position(self.gallery_images, self.current_index)
             
-            # Show success message
-            self.status_bar.showMessage(f"Loaded image {self.current_index + 1} of {len(self.gallery_images)}", 3000)
+            print(f"Loaded image {self.current_index + 1} of {len(self.gallery_images)}")
             
         except Exception as e:
-            self.status_bar.showMessage(f"Error loading image: {str(e)}", 5000)
             print(f"Error loading image: {e}")
     
     def quick_event_shortcut_triggered(self):
@@ -4626,8 +6206,8 @@ class RegionSelectionDialog(QDialog):
         self.view.mouseReleaseEvent = self.view_mouse_release
         
         # Add image to scene
-        pixmap_item = QGraphicsPixmapItem(QPixmap.fromImage(self.image))
-        self.scene.addItem(pixmap_item)
+        self.pixmap_item = QGraphicsPixmapItem(QPixmap.fromImage(self.image))
+        self.scene.addItem(self.pixmap_item)
         self.view.fitInView(self.scene.sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
         
         # Add view to layout
@@ -4793,6 +6373,81 @@ class RegionSelectionDialog(QDialog):
         # and the grip can interfere with the layout or appear redundant
         self.status_bar.setSizeGripEnabled(False)
         main_layout.addWidget(self.status_bar)
+        
+        # Lets the user stop an import that is still running in the background
+        self.cancel_import_button = QPushButton("Cancel Import")
+        self.cancel_import_button.clicked.connect(self.cancel_import)
+        self.cancel_import_button.setVisible(False)
+        self.status_bar.addPermanentWidget(self.cancel_import_button)
+        
+        # Warns when the story already has an image that looks like this one
+        self.near_duplicate_label = QLabel()
+        self.near_duplicate_label.setStyleSheet("color: #e0a030;")
+        self.near_duplicate_label.setVisible(False)
+        self.status_bar.addPermanentWidget(self.near_duplicate_label)
+    
+    def set_near_duplicates(self, matches: List[Tuple[int, int]]):
+        """Warn that the story already has images that look like this one.
+        
+        Args:
+            matches: List of (image_id, distance) tuples, closest first
+        """
+        if not matches:
+            self.near_duplicate_label.setVisible(False)
+            return
+        closest_id, distance = matches[0]
+        self.near_duplicate_label.setText(
+            f"Looks like {len(matches)} image(s) already in the story (closest: image {closest_id})"
+        )
+        self.near_duplicate_label.setToolTip(
+            "\n".join(f"Image {image_id}: {distance} of 64 hash bits differ" for image_id, distance in matches[:10])
+        )
+        self.near_duplicate_label.setVisible(True)
+    
+    def set_ingest_job(self, job: ImageIngestJob):
+        """Attach the background job that is still saving this image.
+        
+        Args:
+            job: The ingest job
+        """
+        self.ingest_job = job
+        self.cancel_import_button.setVisible(True)
+    
+    def set_ingest_status(self, stage: int, label: str):
+        """Show the stage the background import has reached.
+        
+        Args:
+            stage: Pipeline stage
+            label: Description of the stage
+        """
+        self.status_bar.showMessage(label)
+        if stage >= STAGE_INSERT:
+            # The image is being added to the story and can no longer be cancelled
+            self.cancel_import_button.setVisible(False)
+    
+    def set_ingest_result(self, result: Dict[str, Any]):
+        """Take the result of the background import.
+        
+        Args:
+            result: Result dictionary from ImageIngestJob
+        """
+        self.ingest_job = None
+        self.cancel_import_button.setVisible(False)
+        self.image_id = result['image_id']
+        self.image_suggestions = result.get('suggestions', [])
+        
+        if self.image_suggestions:
+            names = ", ".join(f"{suggestion['character_name']} ({int(suggestion['similarity'] * 100)}%)"
+                              for suggestion in self.image_suggestions[:5])
+            self.status_bar.showMessage(f"Image saved. Possible characters: {names}")
+        else:
+            self.status_bar.showMessage("Image saved.", 5000)
+    
+    def cancel_import(self):
+        """Cancel the background import and close the dialog."""
+        if self.ingest_job is not None:
+            self.ingest_job.cancel()
+        self.reject()
     
     def on_character_selected(self, character_name: str):
         """Handle character selection from completer.
@@ -5376,7 +7031,10 @@ class RegionSelectionDialog(QDialog):
                 'width': width,
                 'height': height,
                 'rect_item': self.current_region['rect_item'],
-                'characters': []  # Will be populated after recognition
+                'characters': [],  # Will be populated after recognition
+                'recognition_job': None,
+                'recognizing': True,
+                'recognition_error': None
             }
             
             # Add region to the list
@@ -5422,90 +7080,162 @@ class RegionSelectionDialog(QDialog):
         )
     
     def recognize_characters_in_region(self, region_index: int, region_image: QImage):
-        """Recognize characters in a selected region.
+        """Start recognizing characters in a selected region.
+        
+        The suggestions are shown by on_region_recognized once the region's
+        background job is done.
         
         Args:
             region_index: Index of the region
             region_image: Image of the selected region
         """
+        region = self.selected_regions[region_index]
+        if region.get('recognition_job') is not None:
+            region['recognition_job'].cancel()
+        region['recognition_job'] = None
+        region['recognizing'] = True
+        region['recognition_error'] = None
+        
         try:
-            # Extract features from the region image
-            region_features = self.image_recognition.extract_features_from_qimage(region_image)
-            
-            # Identify potential characters
-            character_suggestions = self.image_recognition.identify_characters_in_image(
-                region_features,
-                threshold=0.5,  # Lower threshold to catch more potential matches
-                story_id=self.story_id  # Restrict to current story
-            )
-            
-            # Update region with character suggestions
-            self.selected_regions[region_index]['characters'] = character_suggestions
-            
-            # Clear the result list
-            self.result_list.clear()
-            
-            # Get all characters from the story
-            cursor = self.db_conn.cursor()
-            cursor.execute('SELECT id, name FROM characters WHERE story_id = ? ORDER BY name', (self.story_id,))
-            all_characters = {row['id']: row['name'] for row in cursor.fetchall()}
-            
-            # Create set of already suggested character IDs
-            suggested_ids = {suggestion['character_id'] for suggestion in character_suggestions}
-            
-            # Add header
-            header_item = QListWidgetItem(f"Characters found in Region {region_index + 1}:")
-            header_item.setFlags(header_item.flags() & ~Qt.ItemFlag.ItemIsSelectable)
-            header_item.setBackground(QColor(240, 240, 240))
-            header_item.setForeground(QColor(0, 0, 0))
-            self.result_list.addItem(header_item)
-            
-            # Add character suggestions with detected scores
-            if character_suggestions:
-                for suggestion in character_suggestions:
-                    item = QListWidgetItem()
-                    item.setText(f"{suggestion['character_name']} ({int(suggestion['similarity'] * 100)}% match)")
-                    item.setData(Qt.ItemDataRole.UserRole, {
-                        'region_index': region_index,
-                        'character_id': suggestion['character_id'],
-                        'character_name': suggestion['character_name'],
-                        'similarity': suggestion['similarity']
-                    })
-                    self.result_list.addItem(item)
-            
-            # Add separator if we have suggestions
-            if character_suggestions:
-                separator = QListWidgetItem("──────────────────────────────")
-                separator.setFlags(separator.flags() & ~Qt.ItemFlag.ItemIsSelectable)
-                separator.setForeground(QColor(150, 150, 150))
-                self.result_list.addItem(separator)
-                
-                other_characters = QListWidgetItem("Other characters in this story:")
-                other_characters.setFlags(other_characters.flags() & ~Qt.ItemFlag.ItemIsSelectable)
-                other_characters.setBackground(QColor(240, 240, 240))
-                other_characters.setForeground(QColor(0, 0, 0))
-                self.result_list.addItem(other_characters)
-            
-            # Add remaining characters with 0% match
-            for char_id, char_name in all_characters.items():
-                if char_id not in suggested_ids:
-                    item = QListWidgetItem()
-                    item.setText(f"{char_name} (0% match)")
-                    item.setData(Qt.ItemDataRole.UserRole, {
-                        'region_index': region_index,
-                        'character_id': char_id,
-                        'character_name': char_name,
-                        'similarity': 0.0
-                    })
-                    self.result_list.addItem(item)
-                    
-            # We no longer need this line since the save_tag_button was removed
-            # self.save_tag_button.setEnabled(False)
+            index = self.image_recognition.get_feature_index(self.story_id).snapshot()
         except Exception as e:
             print(f"Error during character recognition: {e}")
-            item = QListWidgetItem(f"Error during character recognition: {str(e)}")
+            self.on_region_recognition_failed(region, str(e))
+            return
+        
+        job = RegionRecognitionJob(
+            region_image, self.image_recognition, index,
+            {character['id']: character['name'] for character in self.characters}
+        )
+        job.signals.finished.connect(
+            lambda suggestions, job=job: self.on_region_recognized(job, suggestions))
+        region['recognition_job'] = job
+        self.recognition_jobs.append(job)
+        self.recognition_pool.start(job)
+    
+    def on_region_recognized(self, job: RegionRecognitionJob, suggestions: Optional[List[Dict[str, Any]]]):
+        """Show the suggestions of a region whose recognition finished.
+        
+        Args:
+            job: The finished job
+            suggestions: Suggested characters, or None if the job was cancelled or failed
+        """
+        if job in self.recognition_jobs:
+            self.recognition_jobs.remove(job)
+        if job.is_cancelled():
+            return
+        
+        # The region may have been removed while it was recognized
+        region = next((region for region in self.selected_regions if region.get('recognition_job') is job), None)
+        if region is None:
+            return
+        region['recognition_job'] = None
+        
+        if suggestions is None:
+            self.on_region_recognition_failed(region, job.error or "Unknown error")
+            return
+        
+        region['characters'] = suggestions
+        region['recognizing'] = False
+        if self.region_list.currentRow() == self.selected_regions.index(region):
+            self.show_region_results(self.selected_regions.index(region))
+    
+    def on_region_recognition_failed(self, region: Dict[str, Any], error: str):
+        """Record that a region couldn't be recognized.
+        
+        Args:
+            region: The region
+            error: Error message
+        """
+        region['recognizing'] = False
+        region['recognition_error'] = error
+        if self.region_list.currentRow() == self.selected_regions.index(region):
+            self.show_region_results(self.selected_regions.index(region))
+    
+    def cancel_region_recognition(self, *args, wait: bool = True):
+        """Cancel the recognition of every region.
+        
+        Args:
+            wait: Whether to wait for jobs that already started
+        """
+        # Cancelled jobs still report, so they are forgotten in on_region_recognized
+        for job in self.recognition_jobs:
+            job.cancel()
+        if wait:
+            self.recognition_pool.waitForDone()
+    
+    def show_region_results(self, row: int):
+        """Fill the result list with the suggestions of a region, then the other characters.
+        
+        Args:
+            row: Index of the region
+        """
+        region = self.selected_regions[row]
+        self.result_list.clear()
+        
+        if region.get('recognizing'):
+            item = QListWidgetItem(f"Recognizing characters in Region {row + 1}...")
+            item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsSelectable)
+            self.result_list.addItem(item)
+            return
+        
+        if region.get('recognition_error'):
+            item = QListWidgetItem(f"Error during character recognition: {region['recognition_error']}")
             item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsSelectable)
             self.result_list.addItem(item)
+            return
+        
+        # Get detected characters for this region
+        character_suggestions = region['characters']
+        
+        # Create set of already suggested character IDs
+        suggested_ids = {suggestion['character_id'] for suggestion in character_suggestions}
+        
+        # Add header
+        header_item = QListWidgetItem(f"Characters found in Region {row + 1}:")
+        header_item.setFlags(header_item.flags() & ~Qt.ItemFlag.ItemIsSelectable)
+        header_item.setBackground(QColor(240, 240, 240))
+        header_item.setForeground(QColor(0, 0, 0))
+        self.result_list.addItem(header_item)
+        
+        # Add character suggestions with detected scores
+        if character_suggestions:
+            for suggestion in character_suggestions:
+                item = QListWidgetItem()
+                item.setText(f"{suggestion['character_name']} ({int(suggestion['similarity'] * 100)}% match)")
+                item.setData(Qt.ItemDataRole.UserRole, {
+                    'region_index': row,
+                    'character_id': suggestion['character_id'],
+                    'character_name': suggestion['character_name'],
+                    'similarity': suggestion['similarity']
+                })
+                self.result_list.addItem(item)
+        
+        # Add separator if we have suggestions
+        if character_suggestions:
+            separator = QListWidgetItem("──────────────────────────────")
+            separator.setFlags(separator.flags() & ~Qt.ItemFlag.ItemIsSelectable)
+            separator.setForeground(QColor(150, 150, 150))
+            self.result_list.addItem(separator)
+            
+            other_characters = QListWidgetItem("Other characters in this story:")
+            other_characters.setFlags(other_characters.flags() & ~Qt.ItemFlag.ItemIsSelectable)
+            other_characters.setBackground(QColor(240, 240, 240))
+            other_characters.setForeground(QColor(0, 0, 0))
+            self.result_list.addItem(other_characters)
+        
+        # Add remaining characters (loaded once, sorted by name) with 0% match
+        for character in self.characters:
+            if character['id'] not in suggested_ids:
+                item = QListWidgetItem()
+                item.setText(f"{character['name']} (0% match)")
+                item.setData(Qt.ItemDataRole.UserRole, {
+                    'region_index': row,
+                    'character_id': character['id'],
+                    'character_name': character['name'],
+                    'similarity': 0.0
+                })
+                self.result_list.addItem(item)
     
     def on_region_selected(self, row: int):
         """Handle region selection change.
@@ -5527,67 +7257,7 @@ class RegionSelectionDialog(QDialog):
         
         if row >= 0 and row < len(self.selected_regions):
             # Update result list to show characters for the selected region
-            region = self.selected_regions[row]
-            
-            # Clear the result list
-            self.result_list.clear()
-            
-            # Get detected characters for this region
-            character_suggestions = region['characters']
-            
-            # Get all characters from the story
-            cursor = self.db_conn.cursor()
-            cursor.execute('SELECT id, name FROM characters WHERE story_id = ? ORDER BY name', (self.story_id,))
-            all_characters = {row['id']: row['name'] for row in cursor.fetchall()}
-            
-            # Create set of already suggested character IDs
-            suggested_ids = {suggestion['character_id'] for suggestion in character_suggestions}
-            
-            # Add header
-            header_item = QListWidgetItem(f"Characters found in Region {row + 1}:")
-            header_item.setFlags(header_item.flags() & ~Qt.ItemFlag.ItemIsSelectable)
-            header_item.setBackground(QColor(240, 240, 240))
-            header_item.setForeground(QColor(0, 0, 0))
-            self.result_list.addItem(header_item)
-            
-            # Add character suggestions with detected scores
-            if character_suggestions:
-                for suggestion in character_suggestions:
-                    item = QListWidgetItem()
-                    item.setText(f"{suggestion['character_name']} ({int(suggestion['similarity'] * 100)}% match)")
-                    item.setData(Qt.ItemDataRole.UserRole, {
-                        'region_index': row,
-                        'character_id': suggestion['character_id'],
-                        'character_name': suggestion['character_name'],
-                        'similarity': suggestion['similarity']
-                    })
-                    self.result_list.addItem(item)
-            
-            # Add separator if we have suggestions
-            if character_suggestions:
-                separator = QListWidgetItem("──────────────────────────────")
-                separator.setFlags(separator.flags() & ~Qt.ItemFlag.ItemIsSelectable)
-                separator.setForeground(QColor(150, 150, 150))
-                self.result_list.addItem(separator)
-                
-                other_characters = QListWidgetItem("Other characters in this story:")
-                other_characters.setFlags(other_characters.flags() & ~Qt.ItemFlag.ItemIsSelectable)
-                other_characters.setBackground(QColor(240, 240, 240))
-                other_characters.setForeground(QColor(0, 0, 0))
-                self.result_list.addItem(other_characters)
-            
-            # Add remaining characters with 0% match
-            for char_id, char_name in all_characters.items():
-                if char_id not in suggested_ids:
-                    item = QListWidgetItem()
-                    item.setText(f"{char_name} (0% match)")
-                    item.setData(Qt.ItemDataRole.UserRole, {
-                        'region_index': row,
-                        'character_id': char_id,
-                        'character_name': char_name,
-                        'similarity': 0.0
-                    })
-                    self.result_list.addItem(item)
+            self.show_region_results(row)
                 
             # Highlight the selected region
             for i, r in enumerate(self.selected_regions):
@@ -5610,6 +7280,10 @@ class RegionSelectionDialog(QDialog):
             if region['rect_item']:
                 self.scene.removeItem(region['rect_item'])
             
+            # Stop recognizing it
+            if region.get('recognition_job') is not None:
+                region['recognition_job'].cancel()
+            
             # Remove from lists
             self.selected_regions.pop(row)
             self.region_list.takeItem(row)
@@ -5635,6 +7309,7 @@ class RegionSelectionDialog(QDialog):
             
             if confirm == QMessageBox.StandardButton.Yes:
                 # Remove all regions
+                self.cancel_region_recognition(wait=False)
                 for region in self.selected_regions:
                     if region['rect_item']:
                         self.scene.removeItem(region['rect_item'])
@@ -5900,6 +7575,41 @@ class GraphicsTagView(QGraphicsView):
         matrix = self.transform()
         print(f"INITIAL TRANSFORM: m11={matrix.m11():.3f}, m22={matrix.m22():.3f}, dx={matrix.dx():.1f}, dy={matrix.dy():.1f}")
     
+    def set_tiled_image(self, image_path, orig_width=None, orig_height=None):
+        """Set a very large image for display, rendered in tiles.
+        
+        Only the tiles covering the viewport at the current zoom level are
+        decoded, instead of the whole image. The scene uses original image
+        pixels, so tag coordinates work the same as with set_image.
+        
+        Args:
+            image_path: Path to the image file
+            orig_width: Original image width (read from the file if not given)
+            orig_height: Original image height (read from the file if not given)
+        """
+        # Clear the scene
+        self.scene.clear()
+        self.tag_items.clear()
+        
+        size = QSize(orig_width, orig_height) if orig_width and orig_height else None
+        self.image_item = TiledImageItem(image_path, size)
+        self.image_item.setZValue(0)  # Put image at the bottom
+        self.scene.addItem(self.image_item)
+        
+        self.image_width = self.image_item.image_size.width()
+        self.image_height = self.image_item.image_size.height()
+        self.scale_x = 1.0
+        self.scale_y = 1.0
+        
+        print(f"GRAPHICS VIEW SET TILED IMAGE: {self.image_width}x{self.image_height}, "
+              f"levels={self.image_item.max_level + 1}")
+        
+        # Set scene rect to exactly match the original image dimensions
+        self.scene.setSceneRect(0, 0, self.image_width, self.image_height)
+        
+        # Fit the view to the image
+        self._update_view_transform()
+    
     def _update_view_transform(self):
         """Update the view transformation to ensure the image fits entirely within the view.
         
@@ -7023,61 +8733,10 @@ class CharacterListWidget(QListWidget):
                 if self.hoveredItem != item:
                     self.hoveredItem = item
                     
-                    # Get the character's avatar from the database
-                    cursor = self.db_conn.cursor()
-                    cursor.execute("SELECT avatar_path FROM characters WHERE id = ?", (character_id,))
-                    result = cursor.fetchone()
-                    
-                    if result and result['avatar_path']:
-                        avatar_path = result['avatar_path']
-                        if os.path.exists(avatar_path):
-                            # Create a pixmap from the avatar
-                            pixmap = QPixmap(avatar_path)
-                            if not pixmap.isNull():
-                                # Scale the pixmap to 160x160 preserving aspect ratio
-                                pixmap = pixmap.scaled(
-                                    160, 160, 
-                                    Qt.AspectRatioMode.KeepAspectRatio,
-                                    Qt.TransformationMode.SmoothTransformation
-                                )
-                                
-                                # Create HTML for the tooltip with the image
-                                from app.utils.color_utils import string_to_color, get_contrasting_text_color
-                                
-                                # Generate a consistent color based on character name
-                                character_name = data.get('character_name', "Unknown")
-                                bg_color = string_to_color(character_name)
-                                text_color = get_contrasting_text_color(bg_color)
-                                
-                                # Save the pixmap to a temporary QByteArray
-                                byte_array = QByteArray()
-                                buffer = QBuffer(byte_array)
-                                buffer.open(QIODevice.OpenModeFlag.WriteOnly)
-                                pixmap.save(buffer, "PNG")
-                                
-                                # Convert to base64 for inline HTML
-                                image_data = byte_array.toBase64().data().decode()
-                                
-                                # Create HTML tooltip with character name and avatar
-                                html = f"""
-                                <div style="background-color:{bg_color}; color:{text_color}; padding:5px; text-align:center;">
-                                    <b>{character_name}</b>
-                                </div>
-                                <div style="text-align:center; padding:5px;">
-                                    <img src="data:image/png;base64,{image_data}" width="160" height="160" style="max-width:160px; max-height:160px;"/>
-                                </div>
-                                """
-                                
-                                # Show the tooltip at the cursor position
-                                QToolTip.showText(self.mapToGlobal(event.pos()), html)
-                                return
-                    
-                    # If we get here, we don't have a valid avatar
-                    # Just show the character name
-                    QToolTip.showText(
-                        self.mapToGlobal(event.pos()), 
-                        f"<b>{data.get('character_name', 'Unknown')}</b>"
-                    )
+                    # Name and avatar come from the shared cache, so hovering costs no I/O
+                    tooltip = get_avatar_cache().get_tooltip_html(
+                        self.db_conn, character_id, data.get('character_name', "Unknown"))
+                    QToolTip.showText(self.mapToGlobal(event.pos()), tooltip)
             else:
                 self.hoveredItem = None
                 QToolTip.hideText()
@@ -7129,65 +8788,9 @@ class OnSceneCharacterListWidget(CharacterListWidget):
                 if self.hoveredItem != item:
                     self.hoveredItem = item
                     
-                    # Get the character's avatar from the database
-                    cursor = self.db_conn.cursor()
-                    cursor.execute("SELECT name, avatar_path FROM characters WHERE id = ?", (character_id,))
-                    result = cursor.fetchone()
-                    
-                    if result and result['avatar_path']:
-                        character_name = result['name']
-                        avatar_path = result['avatar_path']
-                        if os.path.exists(avatar_path):
-                            # Create a pixmap from the avatar
-                            pixmap = QPixmap(avatar_path)
-                            if not pixmap.isNull():
-                                # Scale the pixmap to 160x160 preserving aspect ratio
-                                pixmap = pixmap.scaled(
-                                    160, 160, 
-                                    Qt.AspectRatioMode.KeepAspectRatio,
-                                    Qt.TransformationMode.SmoothTransformation
-                                )
-                                
-                                # Create HTML for the tooltip with the image
-                                from app.utils.color_utils import string_to_color, get_contrasting_text_color
-                                
-                                # Generate a consistent color based on character name
-                                bg_color = string_to_color(character_name)
-                                text_color = get_contrasting_text_color(bg_color)
-                                
-                                # Save the pixmap to a temporary QByteArray
-                                byte_array = QByteArray()
-                                buffer = QBuffer(byte_array)
-                                buffer.open(QIODevice.OpenModeFlag.WriteOnly)
-                                pixmap.save(buffer, "PNG")
-                                
-                                # Convert to base64 for inline HTML
-                                image_data = byte_array.toBase64().data().decode()
-                                
-                                # Create HTML tooltip with character name and avatar
-                                html = f"""
-                                <div style="background-color:{bg_color}; color:{text_color}; padding:5px; text-align:center;">
-                                    <b>{character_name}</b>
-                                </div>
-                                <div style="text-align:center; padding:5px;">
-                                    <img src="data:image/png;base64,{image_data}" width="160" height="160" style="max-width:160px; max-height:160px;"/>
-                                </div>
-                                """
-                                
-                                # Show the tooltip at the cursor position
-                                QToolTip.showText(self.mapToGlobal(event.pos()), html)
-                                return
-                    
-                    # If we get here, we don't have a valid avatar
-                    # Just show the character name
-                    character_name = "Unknown"
-                    if result and 'name' in result:
-                        character_name = result['name']
-                    
-                    QToolTip.showText(
-                        self.mapToGlobal(event.pos()), 
-                        f"<b>{character_name}</b>"
-                    )
+                    # Name and avatar come from the shared cache, so hovering costs no I/O
+                    tooltip = get_avatar_cache().get_tooltip_html(self.db_conn, character_id)
+                    QToolTip.showText(self.mapToGlobal(event.pos()), tooltip)
             else:
                 self.hoveredItem = None
                 QToolTip.hideText()
@@ -7235,54 +8838,9 @@ class GalleryFilterCharacterListWidget(CharacterListWidget):
                     if self.hoveredItem != item:
                         self.hoveredItem = item
                         
-                        # Get avatar and display tooltip
-                        cursor = self.db_conn.cursor()
-                        cursor.execute("SELECT avatar_path FROM characters WHERE id = ?", (character_id,))
-                        result = cursor.fetchone()
-                        
-                        if result and result['avatar_path']:
-                            avatar_path = result['avatar_path']
-                            if os.path.exists(avatar_path):
-                                # Create and display tooltip with avatar
-                                pixmap = QPixmap(avatar_path)
-                                if not pixmap.isNull():
-                                    # Scale the pixmap
-                                    pixmap = pixmap.scaled(
-                                        160, 160, 
-                                        Qt.AspectRatioMode.KeepAspectRatio,
-                                        Qt.TransformationMode.SmoothTransformation
-                                    )
-                                    
-                                    # Create HTML for tooltip
-                                    from app.utils.color_utils import string_to_color, get_contrasting_text_color
-                                    bg_color = string_to_color(character_name)
-                                    text_color = get_contrasting_text_color(bg_color)
-                                    
-                                    # Save pixmap to byte array
-                                    byte_array = QByteArray()
-                                    buffer = QBuffer(byte_array)
-                                    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
-                                    pixmap.save(buffer, "PNG")
-                                    
-                                    # Create HTML tooltip
-                                    image_data = byte_array.toBase64().data().decode()
-                                    html = f"""
-                                    <div style="background-color:{bg_color}; color:{text_color}; padding:5px; text-align:center;">
-                                        <b>{character_name}</b>
-                                    </div>
-                                    <div style="text-align:center; padding:5px;">
-                                        <img src="data:image/png;base64,{image_data}" width="160" height="160" style="max-width:160px; max-height:160px;"/>
-                                    </div>
-                                    """
-                                    
-                                    QToolTip.showText(self.mapToGlobal(point), html)
-                                    return
-                        
-                        # Fallback to just showing the character name
-                        QToolTip.showText(
-                            self.mapToGlobal(point), 
-                            f"<b>{character_name}</b>"
-                        )
+                        # Name and avatar come from the shared cache, so hovering costs no I/O
+                        tooltip = get_avatar_cache().get_tooltip_html(self.db_conn, character_id, character_name)
+                        QToolTip.showText(self.mapToGlobal(point), tooltip)
                 else:
                     # Traditional way, try to get data from UserRole
                     super().mouseMoveEvent(event)
@@ -7384,61 +8942,10 @@ class FilterCharacterListWidget(CharacterListWidget):
                 if self.hoveredItem != item:
                     self.hoveredItem = item
                     
-                    # Get the character's avatar from the database
-                    cursor = self.db_conn.cursor()
-                    cursor.execute("SELECT avatar_path FROM characters WHERE id = ?", (character_id,))
-                    result = cursor.fetchone()
-                    
-                    if result and result['avatar_path']:
-                        avatar_path = result['avatar_path']
-                        if os.path.exists(avatar_path):
-                            # Create a pixmap from the avatar
-                            pixmap = QPixmap(avatar_path)
-                            if not pixmap.isNull():
-                                # Scale the pixmap to 160x160 preserving aspect ratio
-                                pixmap = pixmap.scaled(
-                                    160, 160, 
-                                    Qt.AspectRatioMode.KeepAspectRatio,
-                                    Qt.TransformationMode.SmoothTransformation
-                                )
-                                
-                                # Create HTML for the tooltip with the image
-                                from app.utils.color_utils import string_to_color, get_contrasting_text_color
-                                
-                                # Generate a consistent color based on character name
-                                character_name = data.get('character_name', "Unknown")
-                                bg_color = string_to_color(character_name)
-                                text_color = get_contrasting_text_color(bg_color)
-                                
-                                # Save the pixmap to a temporary QByteArray
-                                byte_array = QByteArray()
-                                buffer = QBuffer(byte_array)
-                                buffer.open(QIODevice.OpenModeFlag.WriteOnly)
-                                pixmap.save(buffer, "PNG")
-                                
-                                # Convert to base64 for inline HTML
-                                image_data = byte_array.toBase64().data().decode()
-                                
-                                # Create HTML tooltip with character name and avatar
-                                html = f"""
-                                <div style="background-color:{bg_color}; color:{text_color}; padding:5px; text-align:center;">
-                                    <b>{character_name}</b>
-                                </div>
-                                <div style="text-align:center; padding:5px;">
-                                    <img src="data:image/png;base64,{image_data}" width="160" height="160" style="max-width:160px; max-height:160px;"/>
-                                </div>
-                                """
-                                
-                                # Show the tooltip at the cursor position
-                                QToolTip.showText(self.mapToGlobal(event.pos()), html)
-                                return
-                    
-                    # If we get here, we don't have a valid avatar
-                    # Just show the character name
-                    QToolTip.showText(
-                        self.mapToGlobal(event.pos()), 
-                        f"<b>{data.get('character_name', 'Unknown')}</b>"
-                    )
+                    # Name and avatar come from the shared cache, so hovering costs no I/O
+                    tooltip = get_avatar_cache().get_tooltip_html(
+                        self.db_conn, character_id, data.get('character_name', "Unknown"))
+                    QToolTip.showText(self.mapToGlobal(event.pos()), tooltip)
                     return
             
             # No character data, hide tooltip
@@ -7467,11 +8974,16 @@ class GalleryFilterDialog(QDialog):
         self.db_conn = db_conn
         self.story_id = story_id
         self.character_filters = []  # List of tuples (character_id, include/exclude)
+        self.match_mode = MATCH_ALL  # How included characters are combined
+        
+        # Index of tagged characters per image, used for live match counts
+        self.tag_index = CharacterTagIndex(db_conn, story_id)
         
         self.setWindowTitle("Gallery Filters")
         self.resize(600, 500)
         self.init_ui()
         self.load_characters()
+        self.load_presets()
     
     def init_ui(self):
         """Initialize the user interface."""
@@ -7511,6 +9023,39 @@ class GalleryFilterDialog(QDialog):
         
         main_layout.addLayout(lists_layout)
         
+        # Match mode for included characters
+        match_layout = QHBoxLayout()
+        match_layout.addWidget(QLabel("Included characters:"))
+        self.match_mode_combo = QComboBox()
+        self.match_mode_combo.addItem("Must all appear (AND)", MATCH_ALL)
+        self.match_mode_combo.addItem("Any may appear (OR)", MATCH_ANY)
+        self.match_mode_combo.currentIndexChanged.connect(self.on_match_mode_changed)
+        match_layout.addWidget(self.match_mode_combo)
+        match_layout.addStretch()
+        
+        # Live count of matching images
+        self.match_count_label = QLabel()
+        match_layout.addWidget(self.match_count_label)
+        main_layout.addLayout(match_layout)
+        
+        # Saved filter presets
+        preset_layout = QHBoxLayout()
+        preset_layout.addWidget(QLabel("Presets:"))
+        self.preset_combo = QComboBox()
+        self.preset_combo.setMinimumWidth(200)
+        self.preset_combo.activated.connect(self.on_preset_selected)
+        preset_layout.addWidget(self.preset_combo)
+        
+        save_preset_button = QPushButton("Save Preset...")
+        save_preset_button.clicked.connect(self.save_preset)
+        preset_layout.addWidget(save_preset_button)
+        
+        delete_preset_button = QPushButton("Delete Preset")
+        delete_preset_button.clicked.connect(self.delete_preset)
+        preset_layout.addWidget(delete_preset_button)
+        preset_layout.addStretch()
+        main_layout.addLayout(preset_layout)
+        
         # Action buttons
         button_layout = QHBoxLayout()
         
@@ -7579,6 +9124,8 @@ class GalleryFilterDialog(QDialog):
                 # Remove existing item if it's different type (include/exclude)
                 if filter_data.get('include') != include:
                     self.filter_list.takeItem(i)
+                    if (character_id, not include) in self.character_filters:
+                        self.character_filters.remove((character_id, not include))
                     break
                 else:
                     # Already in the list with same type, do nothing
@@ -7609,6 +9156,7 @@ class GalleryFilterDialog(QDialog):
         
         # Update character_filters
         self.character_filters.append((character_id, include))
+        self.update_match_count()
     
     def remove_selected_filters(self):
         """Remove the selected filters from the list."""
@@ -7626,11 +9174,14 @@ class GalleryFilterDialog(QDialog):
             # Remove from the list
             row = self.filter_list.row(item)
             self.filter_list.takeItem(row)
+        
+        self.update_match_count()
     
     def clear_all_filters(self):
         """Clear all filters from the list."""
         self.filter_list.clear()
         self.character_filters.clear()
+        self.update_match_count()
     
     def populate_filter_list(self):
         """Populate the filter list with current filters."""
@@ -7667,6 +9218,83 @@ class GalleryFilterDialog(QDialog):
                 
                 # Add to the list
                 self.filter_list.addItem(item)
+        
+        # Reflect the current match mode and count
+        index = self.match_mode_combo.findData(self.match_mode)
+        self.match_mode_combo.blockSignals(True)
+        self.match_mode_combo.setCurrentIndex(max(index, 0))
+        self.match_mode_combo.blockSignals(False)
+        self.update_match_count()
+    
+    def on_match_mode_changed(self, index: int) -> None:
+        """Handle a change of the match mode for included characters."""
+        self.match_mode = self.match_mode_combo.itemData(index) or MATCH_ALL
+        self.update_match_count()
+    
+    def update_match_count(self) -> None:
+        """Update the live count of images matching the current filters."""
+        expression = build_filter_expression(self.character_filters, self.match_mode)
+        match_count = self.tag_index.count(expression)
+        total_count = len(self.tag_index.images)
+        self.match_count_label.setText(f"{match_count} of {total_count} images match")
+    
+    def load_presets(self) -> None:
+        """Load the saved filter presets for the story."""
+        from app.db_sqlite import get_gallery_filter_presets
+        
+        self.presets = get_gallery_filter_presets(self.db_conn, self.story_id)
+        
+        self.preset_combo.clear()
+        self.preset_combo.addItem("(Select a preset)", None)
+        for preset in self.presets:
+            self.preset_combo.addItem(preset['name'], preset['id'])
+    
+    def on_preset_selected(self, index: int) -> None:
+        """Load the filters of the selected preset."""
+        preset_id = self.preset_combo.itemData(index)
+        if preset_id is None:
+            return
+        
+        for preset in self.presets:
+            if preset['id'] == preset_id:
+                self.character_filters = list(preset['character_filters'])
+                self.match_mode = preset.get('match_mode') or MATCH_ALL
+                self.populate_filter_list()
+                break
+    
+    def save_preset(self) -> None:
+        """Save the current filters as a named preset."""
+        from app.db_sqlite import save_gallery_filter_preset
+        
+        if not self.character_filters:
+            QMessageBox.information(self, "Save Preset", "Add at least one filter before saving a preset.")
+            return
+        
+        current_name = self.preset_combo.currentText() if self.preset_combo.currentData() is not None else ""
+        name, ok = QInputDialog.getText(self, "Save Preset", "Preset name:", text=current_name)
+        name = name.strip()
+        if not ok or not name:
+            return
+        
+        try:
+            preset_id = save_gallery_filter_preset(self.db_conn, self.story_id, name,
+                                                   self.character_filters, self.match_mode)
+            self.load_presets()
+            self.preset_combo.setCurrentIndex(max(self.preset_combo.findData(preset_id), 0))
+        except Exception as e:
+            print(f"Error saving filter preset: {e}")
+            QMessageBox.warning(self, "Error", f"Failed to save preset: {str(e)}")
+    
+    def delete_preset(self) -> None:
+        """Delete the selected preset."""
+        from app.db_sqlite import delete_gallery_filter_preset
+        
+        preset_id = self.preset_combo.currentData()
+        if preset_id is None:
+            return
+        
+        delete_gallery_filter_preset(self.db_conn, preset_id)
+        self.load_presets()
     
     def get_character_filters(self) -> List[Tuple[int, bool]]:
         """Get the character filters.
@@ -7675,3 +9303,11 @@ class GalleryFilterDialog(QDialog):
             List of tuples (character_id, include/exclude)
         """
         return self.character_filters
+    
+    def get_match_mode(self) -> str:
+        """Get how included characters are combined.
+        
+        Returns:
+            MATCH_ALL or MATCH_ANY
+        """
+        return self.match_mode
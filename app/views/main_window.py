@@ -26,6 +26,7 @@ from app.views.settings_dialog import SettingsDialog
 from app.views.gallery_widget import GalleryWidget
 from app.views.timeline_widget import TimelineWidget
 from app.views.recognition_viewer import RecognitionDatabaseViewer
+from app.views.storage_cleanup_dialog import StorageCleanupDialog
 from app.db_sqlite import (
     get_story_characters, create_quick_event, get_next_quick_event_sequence_number,
     get_character, search_quick_events
@@ -261,6 +262,7 @@ class MainWindow(QMainWindow):
         
         self.db_conn = db_conn
         self.current_story_id: Optional[int] = None
+        self.current_story_data: Optional[Dict[str, Any]] = None
         self.settings = QSettings("ThePlotThickens", "ThePlotThickens")
         self.theme_manager = None  # This will be set in main.py
         
@@ -351,6 +353,12 @@ class MainWindow(QMainWindow):
         quick_event_action.triggered.connect(self.add_quick_event)
         tools_menu.addAction(quick_event_action)
         
+        # Add Reclaim Storage action
+        reclaim_storage_action = QAction("Reclaim &Storage...", self)
+        reclaim_storage_action.setStatusTip("Find and remove files the current story no longer uses")
+        reclaim_storage_action.triggered.connect(self.on_reclaim_storage)
+        tools_menu.addAction(reclaim_storage_action)
+        
         # Create Settings menu
         settings_menu = menu_bar.addMenu("&Settings")
         
@@ -374,6 +382,14 @@ class MainWindow(QMainWindow):
         recognition_viewer.exec()
         self.status_bar.showMessage("Recognition database viewer closed", 3000)
     
+    def on_reclaim_storage(self) -> None:
+        """Open the storage cleanup dialog for the current story."""
+        if not self.current_story_data:
+            QMessageBox.information(self, "Reclaim Storage", "Please select a story first.")
+            return
+        dialog = StorageCleanupDialog(self.db_conn, self.current_story_data, self)
+        dialog.exec()
+    
     def on_open_settings(self) -> None:
         """Open the settings dialog."""
         settings_dialog = SettingsDialog(self)
@@ -395,6 +411,7 @@ class MainWindow(QMainWindow):
             story_data: Data of the selected story
         """
         self.current_story_id = story_id
+        self.current_story_data = story_data
         self.story_board.set_story(story_id, story_data)
         self.gallery.set_story(story_id, story_data)
         self.timeline.story_id = story_id
@@ -439,6 +456,9 @@ class MainWindow(QMainWindow):
         # Save window state
         self.save_window_state()
         
+        # Auto-tagging resumes from its last saved batch next time
+        self.gallery.stop_auto_tagging()
+        
         # Accept the event
         event.accept()
 
@@ -18,10 +18,11 @@ from PyQt6.QtWidgets import (
     QScrollArea, QGridLayout, QFileDialog, QMessageBox, QProgressBar,
     QComboBox, QGroupBox
 )
-from PyQt6.QtCore import Qt, QSize
+from PyQt6.QtCore import Qt, QSize, QThreadPool
 from PyQt6.QtGui import QPixmap, QPainter, QColor, QBrush, QPen, QImage, QDragEnterEvent, QDropEvent, QIcon
 
 from app.utils.image_recognition_util import ImageRecognitionUtil
+from app.utils.training_harvest import TrainingHarvestJob
 
 
 class HistogramWidget(QWidget):
@@ -137,6 +138,11 @@ class RecognitionDatabaseViewer(QDialog):
         self.db_conn = db_conn
         self.image_recognition = ImageRecognitionUtil(db_conn)
         
+        # Harvest of tagged regions, running in the background
+        self.harvest_pool = QThreadPool()
+        self.harvest_pool.setMaxThreadCount(1)
+        self.harvest_job: Optional[TrainingHarvestJob] = None
+        
         self.setWindowTitle("Recognition Database Viewer")
         self.resize(1000, 700)
         
@@ -177,6 +183,12 @@ class RecognitionDatabaseViewer(QDialog):
         self.rebuild_button.clicked.connect(self.on_rebuild_database)
         left_layout.addWidget(self.rebuild_button)
         
+        # Create harvest button
+        self.harvest_button = QPushButton("Learn from Tagged Regions")
+        self.harvest_button.setToolTip("Add the regions of existing character tags to the recognition database")
+        self.harvest_button.clicked.connect(self.on_harvest_tagged_regions)
+        left_layout.addWidget(self.harvest_button)
+        
         # Add left panel to splitter
         self.splitter.addWidget(left_panel)
         
@@ -425,6 +437,64 @@ class RecognitionDatabaseViewer(QDialog):
             # Hide progress after a moment
             self.progress_bar.setVisible(False)
     
+    def on_harvest_tagged_regions(self) -> None:
+        """Handle harvest button click: start or stop learning from tagged regions."""
+        if self.harvest_job is not None:
+            self.harvest_job.cancel()
+            self.harvest_button.setEnabled(False)
+            return
+        
+        self.harvest_job = TrainingHarvestJob(self.db_conn, self.story_combo.currentData())
+        self.harvest_job.signals.progress.connect(self._on_harvest_progress)
+        self.harvest_job.signals.finished.connect(self._on_harvest_finished)
+        self.harvest_button.setText("Stop Learning")
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setVisible(True)
+        self.harvest_job.start(self.harvest_pool)
+    
+    def _on_harvest_progress(self, summary: Dict[str, Any]) -> None:
+        """Show how many tags have been harvested.
+        
+        Args:
+            summary: Summary so far (see TrainingHarvestJob.process)
+        """
+        self.progress_bar.setRange(0, max(1, summary['tags']))
+        done = summary['added'] + summary['duplicates'] + summary['capped'] + summary['too_small']
+        self.progress_bar.setValue(min(done, summary['tags']))
+    
+    def _on_harvest_finished(self, summary: Dict[str, Any]) -> None:
+        """Report the result of the harvest.
+        
+        Args:
+            summary: Final summary (see TrainingHarvestJob.process)
+        """
+        self.harvest_job = None
+        self.harvest_button.setText("Learn from Tagged Regions")
+        self.harvest_button.setEnabled(True)
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setVisible(False)
+        self.load_characters(self.story_combo.currentData())
+        
+        if not self.isVisible():
+            return
+        message = (f"Added {summary['added']} tagged regions to the recognition database.\n"
+                   f"Skipped {summary['duplicates']} near-duplicates and {summary['capped']} regions of "
+                   f"characters that already have enough.")
+        if summary['errors']:
+            message += f"\n{len(summary['errors'])} images could not be read."
+        QMessageBox.information(self, "Learn from Tagged Regions", message)
+    
+    def done(self, result: int) -> None:
+        """Stop a running harvest before the dialog closes.
+        
+        Args:
+            result: Dialog result
+        """
+        if self.harvest_job is not None:
+            self.harvest_job.cancel()
+            self.harvest_pool.waitForDone()
+        super().done(result)
+    
     def dragEnterEvent(self, event: QDragEnterEvent) -> None:
         """Handle drag enter event.
         
@@ -484,11 +554,13 @@ class RecognitionDatabaseViewer(QDialog):
                 )
                 self.test_image_label.setPixmap(scaled_pixmap)
             
+            story_id = self.story_combo.currentData()  # May be None for all stories
+            
             # Extract features
-            features = self.image_recognition.extract_features_from_path(image_path)
+            features = self.image_recognition.extract_features_from_path(
+                image_path, self.image_recognition.needs_descriptor(story_id))
             
             # Run recognition
-            story_id = self.story_combo.currentData()  # May be None for all stories
             results = self.image_recognition.identify_characters_in_image(
                 features, 
                 threshold=0.5,  # Lower threshold for testing
@@ -14,10 +14,14 @@ from typing import Optional, Dict, Any
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, 
     QPushButton, QLabel, QLineEdit, QFileDialog,
-    QDialogButtonBox, QGroupBox, QMessageBox
+    QDialogButtonBox, QGroupBox, QMessageBox, QComboBox, QSpinBox
 )
 from PyQt6.QtCore import Qt, QSettings
 
+from app.utils.ingest_pipeline import (
+    ENCODE_FORMAT_SETTING, ENCODE_QUALITY_SETTING, get_encode_settings
+)
+
 
 class SettingsDialog(QDialog):
     """Dialog for configuring application settings."""
@@ -71,6 +75,31 @@ class SettingsDialog(QDialog):
         
         main_layout.addWidget(folder_group)
         
+        # Create image import settings group
+        import_group = QGroupBox("Image Import")
+        import_layout = QFormLayout(import_group)
+        
+        self.encode_format_combo = QComboBox()
+        self.encode_format_combo.addItem("PNG (lossless)", 'png')
+        self.encode_format_combo.addItem("JPEG", 'jpeg')
+        self.encode_format_combo.addItem("WebP", 'webp')
+        import_layout.addRow("Clipboard Image Format:", self.encode_format_combo)
+        
+        self.encode_quality_spin = QSpinBox()
+        self.encode_quality_spin.setRange(-1, 100)
+        self.encode_quality_spin.setSpecialValueText("Default")
+        import_layout.addRow("Quality / Compression:", self.encode_quality_spin)
+        
+        import_explanation_label = QLabel(
+            "Imported files and downloaded images are stored as they are. "
+            "Only pasted screenshots and other raw clipboard images are encoded, "
+            "using this format. For PNG, a lower value compresses more but is slower."
+        )
+        import_explanation_label.setWordWrap(True)
+        import_layout.addRow("", import_explanation_label)
+        
+        main_layout.addWidget(import_group)
+        
         # Add dialog buttons
         button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
         button_box.accepted.connect(self.on_accept)
@@ -80,6 +109,10 @@ class SettingsDialog(QDialog):
     def load_settings(self) -> None:
         """Load settings from QSettings."""
         self.user_folder_edit.setText(self.user_folder)
+        
+        encode_format, encode_quality = get_encode_settings()
+        self.encode_format_combo.setCurrentIndex(max(0, self.encode_format_combo.findData(encode_format)))
+        self.encode_quality_spin.setValue(encode_quality)
     
     def on_browse_folder(self) -> None:
         """Handle browse folder button click."""
@@ -109,6 +142,8 @@ class SettingsDialog(QDialog):
         
         # Save the settings
         self.settings.setValue("user_folder", user_folder)
+        self.settings.setValue(ENCODE_FORMAT_SETTING, self.encode_format_combo.currentData())
+        self.settings.setValue(ENCODE_QUALITY_SETTING, self.encode_quality_spin.value())
         
         # Accept the dialog
         self.accept()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Storage cleanup dialog for The Plot Thickens application.
+
+This module defines the dialog that finds files of a story that are no longer
+used and moves them to the trash or deletes them.
+"""
+
+import os
+from typing import Dict, Any, Optional
+
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+    QListWidget, QListWidgetItem, QMessageBox, QProgressBar
+)
+
+from app.utils.storage_gc import (
+    StorageGCJob, empty_trash, get_trash_size, format_size,
+    ACTION_REPORT, ACTION_TRASH, ACTION_DELETE, CATEGORIES, DEFAULT_FACES_FOLDER
+)
+
+
+# Maximum number of orphaned files listed in the dialog
+MAX_LISTED_FILES = 1000
+
+
+class StorageCleanupDialog(QDialog):
+    """Dialog for reclaiming the disk space of files a story no longer uses."""
+
+    def __init__(self, db_conn, story_data: Dict[str, Any], parent=None) -> None:
+        """Initialize the dialog and start scanning.
+
+        Args:
+            db_conn: Database connection
+            story_data: Data of the story
+            parent: Parent widget
+        """
+        super().__init__(parent)
+        self.db_conn = db_conn
+        self.story_data = story_data
+        self.folder_path = story_data['folder_path']
+        self.current_job: Optional[StorageGCJob] = None
+        self.report: Optional[Dict[str, Any]] = None
+
+        self.setWindowTitle(f"Reclaim Storage - {story_data.get('title', '')}")
+        self.resize(600, 500)
+
+        self.init_ui()
+        self.scan()
+
+    def init_ui(self) -> None:
+        """Set up the user interface."""
+        layout = QVBoxLayout(self)
+
+        self.summary_label = QLabel()
+        self.summary_label.setWordWrap(True)
+        layout.addWidget(self.summary_label)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 0)  # Busy indicator; the number of files isn't known up front
+        layout.addWidget(self.progress_bar)
+
+        self.file_list = QListWidget()
+        layout.addWidget(self.file_list)
+
+        self.trash_label = QLabel()
+        layout.addWidget(self.trash_label)
+
+        button_layout = QHBoxLayout()
+
+        self.scan_button = QPushButton("Scan Again")
+        self.scan_button.clicked.connect(self.scan)
+        button_layout.addWidget(self.scan_button)
+
+        self.trash_button = QPushButton("Move to Trash")
+        self.trash_button.setToolTip("Move the unused files to the story's .trash folder")
+        self.trash_button.clicked.connect(lambda: self.collect(ACTION_TRASH))
+        button_layout.addWidget(self.trash_button)
+
+        self.delete_button = QPushButton("Delete Permanently")
+        self.delete_button.clicked.connect(lambda: self.collect(ACTION_DELETE))
+        button_layout.addWidget(self.delete_button)
+
+        self.empty_trash_button = QPushButton("Empty Trash")
+        self.empty_trash_button.clicked.connect(self.on_empty_trash)
+        button_layout.addWidget(self.empty_trash_button)
+
+        button_layout.addStretch()
+
+        self.close_button = QPushButton("Close")
+        self.close_button.clicked.connect(self.reject)
+        button_layout.addWidget(self.close_button)
+
+        layout.addLayout(button_layout)
+
+        self.update_trash_label()
+
+    def scan(self) -> None:
+        """Look for unused files in the background."""
+        self.report = None
+        self.file_list.clear()
+        self.summary_label.setText("Scanning story folders...")
+        self.start_job(StorageGCJob(self.db_conn, self.folder_path, ACTION_REPORT))
+
+    def collect(self, action: str) -> None:
+        """Move the reported files to the trash or delete them.
+
+        Args:
+            action: ACTION_TRASH or ACTION_DELETE
+        """
+        if not self.report or not self.report['orphans']:
+            return
+
+        if action == ACTION_DELETE:
+            reply = QMessageBox.question(
+                self,
+                "Delete Files",
+                f"Permanently delete {len(self.report['orphans'])} unused files "
+                f"({format_size(self.report['reclaimable_bytes'])})?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.No
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+
+        self.summary_label.setText("Moving files to the trash..." if action == ACTION_TRASH else "Deleting files...")
+        self.start_job(StorageGCJob(self.db_conn, self.folder_path, action, candidates=self.report['orphans']))
+
+    def start_job(self, job: StorageGCJob) -> None:
+        """Run a job and show its progress."""
+        self.current_job = job
+        self.set_busy(True)
+        job.signals.progress.connect(self.on_progress)
+        job.signals.finished.connect(lambda summary: self.on_finished(job, summary))
+        job.start()
+
+    def on_progress(self, summary: Dict[str, Any]) -> None:
+        """Show the progress of the running job."""
+        if summary['collected']:
+            self.summary_label.setText(f"Removed {summary['collected']} files "
+                                       f"({format_size(summary['collected_bytes'])})...")
+        else:
+            self.summary_label.setText(f"Scanned {summary['scanned']} files, "
+                                       f"{summary['orphan_count']} unused "
+                                       f"({format_size(summary['reclaimable_bytes'])})...")
+
+    def on_finished(self, job: StorageGCJob, summary: Dict[str, Any]) -> None:
+        """Show the outcome of a job."""
+        if job is not self.current_job:
+            return
+        self.current_job = None
+        self.set_busy(False)
+
+        if job.action == ACTION_REPORT:
+            self.show_report(summary)
+            return
+
+        message = f"Removed {summary['collected']} files ({format_size(summary['collected_bytes'])})."
+        if summary['trash_folder']:
+            message += f"\nThey can be restored from {summary['trash_folder']} until the trash is emptied."
+        if summary['errors']:
+            message += f"\n{len(summary['errors'])} files could not be removed."
+        QMessageBox.information(self, "Reclaim Storage", message)
+        self.update_trash_label()
+        self.scan()
+
+    def show_report(self, summary: Dict[str, Any]) -> None:
+        """Show the unused files that were found."""
+        self.report = summary
+
+        parts = [f"{totals['count']} {category} ({format_size(totals['bytes'])})"
+                 for category, totals in summary['categories'].items() if totals['count']]
+        if summary['orphans']:
+            text = (f"{len(summary['orphans'])} of {summary['scanned']} files are no longer used: "
+                    f"{format_size(summary['reclaimable_bytes'])} can be reclaimed.\n" + ", ".join(parts))
+        else:
+            text = f"All {summary['scanned']} files are in use. Nothing to reclaim."
+        if summary['cancelled']:
+            text += "\nThe scan was cancelled before it finished."
+        self.summary_label.setText(text)
+
+        self.file_list.clear()
+        orphans = sorted(summary['orphans'], key=lambda orphan: (CATEGORIES.index(orphan['category']), orphan['path']))
+        for orphan in orphans[:MAX_LISTED_FILES]:
+            item = QListWidgetItem(f"[{orphan['category']}] {os.path.basename(orphan['path'])} "
+                                   f"({format_size(orphan['size'])})")
+            item.setToolTip(orphan['path'])
+            self.file_list.addItem(item)
+        if len(orphans) > MAX_LISTED_FILES:
+            self.file_list.addItem(f"... and {len(orphans) - MAX_LISTED_FILES} more")
+
+        self.trash_button.setEnabled(bool(summary['orphans']))
+        self.delete_button.setEnabled(bool(summary['orphans']))
+
+    def on_empty_trash(self) -> None:
+        """Permanently delete the files in the trash."""
+        count, total = get_trash_size(self.folder_path, DEFAULT_FACES_FOLDER)
+        if not count:
+            return
+        reply = QMessageBox.question(
+            self,
+            "Empty Trash",
+            f"Permanently delete the {count} files ({format_size(total)}) in the trash?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            empty_trash(self.folder_path, DEFAULT_FACES_FOLDER)
+            self.update_trash_label()
+
+    def update_trash_label(self) -> None:
+        """Show how much the trash holds."""
+        count, total = get_trash_size(self.folder_path, DEFAULT_FACES_FOLDER)
+        self.trash_label.setText(f"Trash: {count} files ({format_size(total)})")
+        self.empty_trash_button.setEnabled(count > 0)
+
+    def set_busy(self, busy: bool) -> None:
+        """Enable or disable the buttons while a job runs."""
+        self.progress_bar.setVisible(busy)
+        self.scan_button.setEnabled(not busy)
+        self.trash_button.setEnabled(not busy and bool(self.report and self.report['orphans']))
+        self.delete_button.setEnabled(not busy and bool(self.report and self.report['orphans']))
+        self.empty_trash_button.setEnabled(not busy and get_trash_size(self.folder_path, DEFAULT_FACES_FOLDER)[0] > 0)
+
+    def reject(self) -> None:
+        """Cancel the running job when the dialog is closed."""
+        if self.current_job is not None:
+            self.current_job.cancel()
+            self.current_job = None
+        super().reject()
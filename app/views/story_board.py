@@ -24,7 +24,7 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt, QSize, QPointF, QRectF, QLineF, pyqtSignal, QTimer, QObject
 from PyQt6.QtGui import (
-    QPixmap, QImage, QColor, QPen, QBrush, QFont, QPainter, QPainterPath,
+    QImage, QColor, QPen, QBrush, QFont, QPainter, QPainterPath,
     QTransform, QCursor, QDrag, QMouseEvent, QWheelEvent, QKeyEvent
 )
 
@@ -35,6 +35,7 @@ from app.db_sqlite import (
     get_story_relationships, get_used_relationship_types, delete_character,
     get_character
 )
+from app.utils.avatar_cache import get_avatar_cache
 
 
 def create_vertical_line() -> QFrame:
@@ -129,17 +130,10 @@ class CharacterCard(QGraphicsItemGroup):
         photo_rect.setZValue(1.5)
         self.addToGroup(photo_rect)
         
-        # Add avatar if it exists
-        if self.character_data['avatar_path'] and os.path.exists(self.character_data['avatar_path']):
+        # Add avatar if it exists (scaled once and shared through the avatar cache)
+        scaled_pixmap = get_avatar_cache().get_pixmap(self.character_data['avatar_path'], (photo_width, photo_height))
+        if scaled_pixmap is not None:
             try:
-                pixmap = QPixmap(self.character_data['avatar_path'])
-                scaled_pixmap = pixmap.scaled(
-                    photo_width,
-                    photo_height,
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation
-                )
-                
                 # Center the pixmap in the photo area
                 pixmap_width = scaled_pixmap.width()
                 pixmap_height = scaled_pixmap.height()
@@ -317,6 +311,8 @@ class CharacterCard(QGraphicsItemGroup):
         
         # Delete the character from the database
         if delete_character(scene.db_conn, self._character_id):
+            get_avatar_cache().invalidate(character_id=self._character_id)
+            
             # Remove all relationships involving this character
             relationships_to_remove = self.relationships.copy()  # Create a copy to avoid modifying while iterating
             for relationship in relationships_to_remove:
@@ -636,17 +632,9 @@ class CharacterCard(QGraphicsItemGroup):
         photo_height = card_height - (photo_margin * 2) - 40  # Leave space for name at bottom
         
         # Update avatar if it exists
-        if self.character_data['avatar_path'] and os.path.exists(self.character_data['avatar_path']):
+        scaled_pixmap = get_avatar_cache().get_pixmap(self.character_data['avatar_path'], (photo_width, photo_height))
+        if scaled_pixmap is not None:
             try:
-                # Load new pixmap
-                pixmap = QPixmap(self.character_data['avatar_path'])
-                scaled_pixmap = pixmap.scaled(
-                    photo_width,
-                    photo_height,
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation
-                )
-                
                 # Center the pixmap in the photo area
                 pixmap_width = scaled_pixmap.width()
                 pixmap_height = scaled_pixmap.height()